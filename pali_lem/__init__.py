@@ -0,0 +1,24 @@
+"""Núcleo de Pali Glosser sin dependencia de Streamlit.
+
+Módulos:
+    text          tokenización de pali y fallbacks de vocal final
+    lookup        consultas a dpd.db y construcción de entradas de glosa
+    formatting    salidas compacta, enriquecida y HTML
+    engine        motor compartido: pool de conexiones y caché por forma
+    batch         glosado de muchos archivos con un pool de procesos
+    service       servicio HTTP local de glosado (JSON)
+    daemon        daemon de la CLI sobre un socket Unix
+    concordance   índice invertido de un corpus y concordancias KWIC
+    vocabulary    vocabulario por lema con frecuencias
+    coverage      informe de cobertura de un corpus, por archivo y por tipo de coincidencia
+    gloss_store   glosas precalculadas de un corpus conocido, por párrafo y release de DPD
+    result_cache  caché de resultados de glosa compartida entre usuarios, limitada por bytes
+    dictionary    `dpd_dictionary.json` de respaldo
+    dpd_db        descarga, versiones, parches y estadísticas de dpd.db
+    sessions      sesiones guardadas y re-glosado tras una release nueva
+    provisioning  locks de aprovisionamiento entre hilos y procesos
+
+Este paquete no importa nada al cargarse: cada consumidor importa solo los
+módulos que usa, y los módulos pesados de la biblioteca estándar (`tarfile`,
+`urllib.request`, `gzip`) se importan dentro de las funciones que los necesitan.
+"""
@@ -0,0 +1,192 @@
+"""Glosado por lotes: muchos archivos con un pool de procesos.
+
+Cada proceso del pool arranca una vez y crea su propio `GlossEngine`, así que
+las formas frecuentes (`ca`, `na`, `bhikkhave`...) se consultan una sola vez por
+proceso y no una vez por archivo.
+"""
+
+import functools
+import glob
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .dictionary import load_dictionary
+from .engine import GlossEngine, coverage_counts, gloss_line_record
+from .formatting import generate_compact_gloss, generate_rich_gloss_text
+from .lookup import pinned_dpd_db
+from .text import _dedupe
+
+BATCH_OUTPUT_SUFFIX = ".gloss.txt"
+# Formatos con otra extensión que `BATCH_OUTPUT_SUFFIX`.
+BATCH_OUTPUT_SUFFIXES = {"jsonl": ".gloss.jsonl"}
+_BATCH_TOP_MISSING = 20
+
+_WORKER_STATE = {}
+
+
+def _render_text(render, engine, text):
+    """Glosa el archivo entero y lo formatea con `render`; devuelve `(salida, entradas)`."""
+    gloss_entries = engine.gloss(text)
+    return render(gloss_entries), gloss_entries
+
+
+def _render_jsonl(engine, text):
+    """Un `gloss_line_record` por línea del archivo, como `app_cli.py --lines --format jsonl`."""
+    lines = [line.rstrip("\r") for line in text.split("\n")]
+    if lines and not lines[-1]:
+        lines.pop()
+    glosses = engine.gloss_many([line if line.strip() else "" for line in lines])
+    output = "".join(
+        json.dumps(gloss_line_record(line_number, line, entries), ensure_ascii=False) + "\n"
+        for line_number, (line, entries) in enumerate(zip(lines, glosses), start=1)
+    )
+    return output, [entry for entries in glosses for entry in entries]
+
+
+# Formato → `(engine, texto) → (salida, entradas)`.
+BATCH_OUTPUT_FORMATS = {
+    "compact": functools.partial(_render_text, generate_compact_gloss),
+    "rich": functools.partial(_render_text, generate_rich_gloss_text),
+    "jsonl": _render_jsonl,
+}
+
+
+def resolve_batch_inputs(patterns):
+    """Expande globs (`**` incluido) a una lista ordenada y sin duplicados de archivos."""
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(os.path.expanduser(pattern), recursive=True)
+        if not matches and Path(pattern).is_file():
+            matches = [pattern]
+        paths.extend(Path(match) for match in matches if Path(match).is_file())
+    return sorted(_dedupe(path.resolve() for path in paths))
+
+
+def batch_output_paths(input_paths, output_dir, suffix=BATCH_OUTPUT_SUFFIX):
+    """Ruta de salida de cada archivo, conservando la estructura relativa a su raíz común."""
+    output_dir = Path(output_dir)
+    if not input_paths:
+        return []
+    base_dir = Path(os.path.commonpath([str(path.parent) for path in input_paths]))
+    return [
+        output_dir / path.relative_to(base_dir).with_name(path.stem + suffix)
+        for path in input_paths
+    ]
+
+
+def _init_batch_worker(dpd_db_path, output_format):
+    """Prepara el motor de un proceso del pool (una vez por proceso, no por archivo)."""
+    if dpd_db_path:
+        # Como en la UI: con dpd.db el JSON es solo respaldo y puede faltar.
+        try:
+            dictionary = load_dictionary()
+        except FileNotFoundError:
+            dictionary = {}
+    else:
+        dictionary = load_dictionary()
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(
+        engine=GlossEngine(dpd_db_path, fallback_dictionary=dictionary),
+        render=BATCH_OUTPUT_FORMATS[output_format],
+    )
+
+
+def _gloss_batch_file(paths):
+    """Glosa un archivo y escribe su salida; devuelve las métricas para el resumen."""
+    input_path, output_path = paths
+    started = time.perf_counter()
+    try:
+        text = Path(input_path).read_text(encoding="utf-8")
+        output, gloss_entries = _WORKER_STATE["render"](_WORKER_STATE["engine"], text)
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = output_path.with_name(output_path.name + ".part")
+        temp_path.write_text(output, encoding="utf-8")
+        temp_path.replace(output_path)
+    except (OSError, UnicodeDecodeError) as exc:
+        return {"input": str(input_path), "error": f"{type(exc).__name__}: {exc}"}
+
+    word_total, found_words, missing = coverage_counts(gloss_entries)
+    return {
+        "input": str(input_path),
+        "output": str(output_path),
+        "words": word_total,
+        "found": found_words,
+        "coverage": round(found_words / word_total * 100, 2) if word_total else 0.0,
+        "missing": missing,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def gloss_files(input_paths, output_dir, output_format="compact", dpd_db_path="", workers=None):
+    """Glosa `input_paths` en `output_dir` con `workers` procesos y devuelve el resumen agregado.
+
+    Con `workers=1` todo corre en el proceso actual. El pool usa `spawn`: el núcleo
+    no importa Streamlit, así que arrancar un proceso cuesta ~100 ms y no hereda los
+    hilos de fondo (comprobación de releases, estadísticas) del proceso padre.
+    """
+    if output_format not in BATCH_OUTPUT_FORMATS:
+        raise ValueError(f"Formato no soportado: {output_format}")
+    input_paths = [Path(path) for path in input_paths]
+    suffix = BATCH_OUTPUT_SUFFIXES.get(output_format, BATCH_OUTPUT_SUFFIX)
+    tasks = list(zip(input_paths, batch_output_paths(input_paths, output_dir, suffix)))
+    started = time.perf_counter()
+    results, workers = map_batch_tasks(_gloss_batch_file, tasks, dpd_db_path, output_format, workers)
+    elapsed = time.perf_counter() - started
+    return summarize_batch(results, elapsed, workers)
+
+
+def map_batch_tasks(worker, tasks, dpd_db_path="", output_format="compact", workers=None):
+    """Aplica `worker` a cada tarea en un pool de procesos con un `GlossEngine` por proceso.
+
+    `worker` debe ser una función de módulo (el pool usa `spawn`) y leer el motor
+    de `_WORKER_STATE`. Los resultados salen en el orden de `tasks`, sea cual sea
+    el número de procesos. Devuelve `(resultados, procesos usados)`.
+    """
+    tasks = list(tasks)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    with pinned_dpd_db(dpd_db_path):
+        if workers == 1:
+            _init_batch_worker(dpd_db_path, output_format)
+            return [worker(task) for task in tasks], workers
+        # Lotes de tareas por mensaje para que el IPC no domine con textos cortos.
+        chunksize = max(1, min(64, len(tasks) // (workers * 8)))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_batch_worker,
+            initargs=(dpd_db_path, output_format),
+        ) as executor:
+            return list(executor.map(worker, tasks, chunksize=chunksize)), workers
+
+
+def summarize_batch(results, elapsed_seconds, workers):
+    """Resumen agregado de cobertura y throughput de un lote."""
+    glossed = [result for result in results if "error" not in result]
+    word_total = sum(result["words"] for result in glossed)
+    found_words = sum(result["found"] for result in glossed)
+    missing = Counter()
+    for result in glossed:
+        missing.update(result["missing"])
+    return {
+        "files": len(results),
+        "glossed": len(glossed),
+        "failed": [{"input": result["input"], "error": result["error"]} for result in results if "error" in result],
+        "words": word_total,
+        "found": found_words,
+        "coverage": round(found_words / word_total * 100, 2) if word_total else 0.0,
+        "top_missing": missing.most_common(_BATCH_TOP_MISSING),
+        "workers": workers,
+        "seconds": round(elapsed_seconds, 3),
+        "files_per_second": round(len(results) / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+        "words_per_second": round(word_total / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+        "per_file": [
+            {key: result[key] for key in ("input", "output", "words", "found", "coverage")}
+            for result in glossed
+        ],
+    }
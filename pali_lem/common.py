@@ -0,0 +1,61 @@
+"""Utilidades compartidas del núcleo: rutas, logger, cachés y JSON en disco."""
+
+import functools
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+logger = logging.getLogger("pali_lem")
+
+# Activa trazas completas: PALI_LEM_DEBUG=1
+IS_DEBUG = os.environ.get("PALI_LEM_DEBUG") == "1"
+if IS_DEBUG:
+    logger.setLevel(logging.DEBUG)
+
+
+def memoize(maxsize=None):
+    """`functools.lru_cache` con `.clear()`, la misma interfaz que las cachés de Streamlit."""
+
+    def decorator(func):
+        cached = functools.lru_cache(maxsize=maxsize)(func)
+        cached.clear = cached.cache_clear
+        return cached
+
+    return decorator
+
+
+def _as_bool(value, default=True):
+    if value is None:
+        return default
+    return str(value).strip().lower() not in {"0", "false", "no", "off", ""}
+
+
+def _load_json_file(path, default):
+    if not path.exists():
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as file_handle:
+            return json.load(file_handle)
+    except Exception:
+        logger.exception("Error leyendo JSON desde %s", path)
+        return default
+
+
+def _save_json_file(path, payload):
+    temp_path = path.with_suffix(".tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8") as file_handle:
+            json.dump(payload, file_handle, ensure_ascii=False, indent=2)
+        temp_path.replace(path)
+    except Exception:
+        logger.exception("Error guardando JSON en %s", path)
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
@@ -0,0 +1,272 @@
+"""Índice invertido de un corpus pali y concordancias KWIC.
+
+El índice es una base SQLite aparte de dpd.db:
+
+    documents    ruta, tamaño, mtime y texto (NFC) de cada documento indexado
+    forms        cada forma normalizada, una sola vez
+    form_lemmas  lema(s) DPD de cada forma, resueltos con el motor de glosado
+    postings     (forma, documento, desplazamiento, longitud) de cada aparición
+
+Los lemas se guardan por forma y no por aparición: `dhammo` aparece miles de
+veces pero se resuelve una sola vez, y consultar por lema junta las postings de
+todas sus formas. El texto se guarda en el índice para recortar el contexto KWIC
+sin releer los archivos, que pueden haber cambiado o desaparecido.
+
+Añadir documentos es incremental: solo se reindexan los archivos nuevos o cuyo
+tamaño o mtime cambió. Si cambia la dpd.db con la que se resolvieron los lemas,
+se vuelven a resolver los de todas las formas; las postings no cambian.
+"""
+
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+from .common import PROJECT_ROOT, logger
+from .lookup import dpd_db_version_id, pinned_dpd_db
+from .text import _dedupe, _normalize_lemma, _normalize_token, tokenize_pali_with_separators
+
+CONCORDANCE_INDEX_PATH = Path(os.environ.get("PALI_LEM_CONCORDANCE_INDEX", "") or PROJECT_ROOT / "concordance.db")
+CONCORDANCE_MODES = ("lemma", "form")
+# Documentos por transacción: un corte a mitad de corpus conserva lo ya indexado.
+_COMMIT_EVERY = 200
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS forms (id INTEGER PRIMARY KEY, form TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS form_lemmas (
+    lemma TEXT NOT NULL,
+    form_id INTEGER NOT NULL,
+    PRIMARY KEY (lemma, form_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    form_id INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (form_id, doc_id, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_doc ON postings (doc_id);
+"""
+
+
+def _connect_index(index_path, create=False):
+    if not create and not Path(index_path).is_file():
+        raise FileNotFoundError(f"No existe el índice de concordancias: {index_path}")
+    conn = sqlite3.connect(str(index_path))
+    if create:
+        conn.execute("PRAGMA journal_mode=WAL")
+        # En WAL, NORMAL no arriesga la integridad del índice y ahorra un fsync por commit.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+    return conn
+
+
+def _meta(conn, key, default=""):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _lemma_source(engine):
+    """Con qué se resolvieron los lemas: la versión de dpd.db o el diccionario JSON."""
+    return f"dpd.db:{dpd_db_version_id(engine.dpd_db_path)}" if engine.dpd_db_path else "json"
+
+
+def _resolve_form_lemmas(engine, forms):
+    """`[(lema, forma)]` de cada forma según la glosa del motor, fallbacks incluidos."""
+    pairs = []
+    # Una forma normalizada es un texto de una sola palabra: gloss_many resuelve
+    # todas con una consulta y aplica los mismos fallbacks que la glosa normal.
+    for form, entries in zip(forms, engine.gloss_many(forms)):
+        lemmas = str(entries[0].get("lemma", "") or "") if entries else ""
+        for lemma in _dedupe(_normalize_lemma(value) for value in lemmas.split(";")):
+            pairs.append((lemma, form))
+    return pairs
+
+
+def _store_form_lemmas(conn, engine, form_ids, forms):
+    conn.executemany(
+        "INSERT OR IGNORE INTO form_lemmas (lemma, form_id) VALUES (?, ?)",
+        [(lemma, form_ids[form]) for lemma, form in _resolve_form_lemmas(engine, forms)],
+    )
+
+
+def _index_document(conn, path, text, stat, form_ids, new_forms):
+    """(Re)indexa un documento; las formas nunca vistas se añaden a `new_forms`."""
+    # Los desplazamientos de las postings se refieren al texto en NFC, que es el que se guarda.
+    text = unicodedata.normalize("NFC", text)
+    words = [token for token in tokenize_pali_with_separators(text, with_offsets=True) if token["kind"] == "word"]
+    conn.execute("DELETE FROM postings WHERE doc_id IN (SELECT id FROM documents WHERE path = ?)", (path,))
+    conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+    doc_id = conn.execute(
+        "INSERT INTO documents (path, size, mtime_ns, words, text) VALUES (?, ?, ?, ?, ?)",
+        (path, stat.st_size, stat.st_mtime_ns, len(words), text),
+    ).lastrowid
+    postings = []
+    for token in words:
+        form_id = form_ids.get(token["norm"])
+        if form_id is None:
+            form_id = conn.execute("INSERT INTO forms (form) VALUES (?)", (token["norm"],)).lastrowid
+            form_ids[token["norm"]] = form_id
+            new_forms.append(token["norm"])
+        postings.append((form_id, doc_id, token["start"], token["end"] - token["start"]))
+    conn.executemany("INSERT INTO postings (form_id, doc_id, start, length) VALUES (?, ?, ?, ?)", postings)
+    return len(words)
+
+
+def update_concordance(input_paths, engine, index_path=CONCORDANCE_INDEX_PATH):
+    """Añade al índice los documentos nuevos o modificados de `input_paths`.
+
+    `engine` (un `GlossEngine`) resuelve el lema de cada forma nueva. Devuelve un
+    resumen: documentos añadidos, actualizados, sin cambios y con error, formas
+    nuevas y segundos.
+    """
+    started = time.perf_counter()
+    summary = {"added": 0, "updated": 0, "unchanged": 0, "failed": [], "words": 0, "new_forms": 0}
+    conn = _connect_index(index_path, create=True)
+    try:
+        with pinned_dpd_db(engine.dpd_db_path):
+            lemma_source = _lemma_source(engine)
+            form_ids = dict(conn.execute("SELECT form, id FROM forms"))
+            if _meta(conn, "lemma_source") != lemma_source:
+                if form_ids:
+                    logger.info("La fuente de lemas cambió; se re-resuelven %d formas", len(form_ids))
+                conn.execute("DELETE FROM form_lemmas")
+                _store_form_lemmas(conn, engine, form_ids, list(form_ids))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('lemma_source', ?)", (lemma_source,))
+                conn.commit()
+
+            known = {path: (size, mtime_ns) for path, size, mtime_ns in conn.execute("SELECT path, size, mtime_ns FROM documents")}
+            new_forms, pending = [], 0
+            for input_path in input_paths:
+                path = str(Path(input_path).resolve())
+                try:
+                    stat = os.stat(path)
+                    if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                        summary["unchanged"] += 1
+                        continue
+                    text = Path(path).read_text(encoding="utf-8")
+                except (OSError, UnicodeDecodeError) as exc:
+                    summary["failed"].append({"path": path, "error": f"{type(exc).__name__}: {exc}"})
+                    continue
+                summary["words"] += _index_document(conn, path, text, stat, form_ids, new_forms)
+                summary["updated" if path in known else "added"] += 1
+                pending += 1
+                if pending >= _COMMIT_EVERY:
+                    _store_form_lemmas(conn, engine, form_ids, new_forms)
+                    conn.commit()
+                    summary["new_forms"] += len(new_forms)
+                    new_forms, pending = [], 0
+            _store_form_lemmas(conn, engine, form_ids, new_forms)
+            conn.commit()
+            summary["new_forms"] += len(new_forms)
+    finally:
+        conn.close()
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def _kwic_side(text):
+    return _WHITESPACE_RE.sub(" ", text)
+
+
+def concordance_query(term, mode="lemma", width=40, limit=50, offset=0, index_path=CONCORDANCE_INDEX_PATH):
+    """Concordancia KWIC de `term` como lema (todas sus formas) o como forma exacta.
+
+    Los hits salen en orden de indexación de los documentos y, dentro de cada uno,
+    por posición; ordenar por `doc_id` (no por ruta) deja que SQLite recorra las
+    postings en el orden de su clave sin ordenar todas las apariciones.
+
+    Devuelve `{"term", "mode", "total", "forms", "hits"}`; cada hit lleva el
+    documento, el desplazamiento, la forma y `left`/`match`/`right` con hasta
+    `width` caracteres de contexto a cada lado (saltos de línea como espacios).
+    """
+    if mode not in CONCORDANCE_MODES:
+        raise ValueError(f"Modo de concordancia desconocido: {mode!r}")
+    normalized = _normalize_lemma(term) if mode == "lemma" else _normalize_token(str(term))
+    conn = _connect_index(index_path)
+    try:
+        if mode == "lemma":
+            form_rows = conn.execute(
+                "SELECT f.id, f.form FROM form_lemmas fl JOIN forms f ON f.id = fl.form_id WHERE fl.lemma = ?",
+                (normalized,),
+            ).fetchall()
+        else:
+            form_rows = conn.execute("SELECT id, form FROM forms WHERE form = ?", (normalized,)).fetchall()
+        forms_by_id = dict(form_rows)
+        if not forms_by_id:
+            return {"term": normalized, "mode": mode, "total": 0, "forms": {}, "hits": []}
+
+        placeholders = ", ".join("?" for _ in forms_by_id)
+        form_ids = tuple(forms_by_id)
+        counts = dict(
+            conn.execute(
+                f"SELECT form_id, COUNT(*) FROM postings WHERE form_id IN ({placeholders}) GROUP BY form_id", form_ids
+            )
+        )
+        rows = conn.execute(
+            f"SELECT p.form_id, p.doc_id, d.path, p.start, p.length FROM postings p JOIN documents d ON d.id = p.doc_id"
+            f" WHERE p.form_id IN ({placeholders}) ORDER BY p.doc_id, p.start LIMIT ? OFFSET ?",
+            (*form_ids, limit, offset),
+        ).fetchall()
+
+        # Cada documento con hits se lee una sola vez por consulta.
+        texts = {}
+        hits = []
+        for form_id, doc_id, path, start, length in rows:
+            if doc_id not in texts:
+                texts[doc_id] = conn.execute("SELECT text FROM documents WHERE id = ?", (doc_id,)).fetchone()[0]
+            text = texts[doc_id]
+            end = start + length
+            hits.append(
+                {
+                    "document": path,
+                    "start": start,
+                    "form": forms_by_id[form_id],
+                    "left": _kwic_side(text[max(0, start - width):start]),
+                    "match": text[start:end],
+                    "right": _kwic_side(text[end:end + width]),
+                }
+            )
+    finally:
+        conn.close()
+    return {
+        "term": normalized,
+        "mode": mode,
+        "total": sum(counts.values()),
+        "forms": {forms_by_id[form_id]: count for form_id, count in sorted(counts.items(), key=lambda item: -item[1])},
+        "hits": hits,
+    }
+
+
+def concordance_stats(index_path=CONCORDANCE_INDEX_PATH):
+    """Documentos, palabras, formas, lemas y tamaño en disco del índice."""
+    conn = _connect_index(index_path)
+    try:
+        documents, words = conn.execute("SELECT COUNT(*), COALESCE(SUM(words), 0) FROM documents").fetchone()
+        return {
+            "documents": documents,
+            "words": words,
+            "forms": conn.execute("SELECT COUNT(*) FROM forms").fetchone()[0],
+            "lemmas": conn.execute("SELECT COUNT(DISTINCT lemma) FROM form_lemmas").fetchone()[0],
+            "lemma_source": _meta(conn, "lemma_source"),
+            "size_bytes": Path(index_path).stat().st_size,
+        }
+    finally:
+        conn.close()
+
+
+def format_kwic_line(hit, width=40):
+    """Una línea de concordancia con la forma centrada: `...contexto [forma] contexto...`."""
+    return f"{hit['left'].rstrip().rjust(width)} [{hit['match']}] {hit['right'].lstrip()}"
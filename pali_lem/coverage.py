@@ -0,0 +1,174 @@
+"""Informe de cobertura de un corpus completo con un pool de procesos.
+
+Para cada archivo: palabras, encontradas y desglose por tipo de coincidencia.
+
+    exact     la forma (o su variante de vocal final larga) está en `lookup`
+    fallback  se resolvió con otra forma candidata (vocal final, niggahita)
+    lemma     no está en `lookup`, pero coincide con un `lemma_1` de dpd.db
+    json      solo la resolvió el diccionario JSON de respaldo
+    missing   sin glosa
+
+El agregado suma los archivos y ordena las formas sin glosa (y las resueltas por
+fallback) por apariciones: es donde un fallo de búsqueda cuesta más. El informe
+es determinista (archivos en orden, empates por forma, rutas relativas a la raíz
+común del corpus y sin tiempos), así que dos informes de releases distintas de
+DPD se pueden comparar con `diff` o con `compare_coverage_reports`. Los tiempos
+van aparte, en `run`.
+"""
+
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+from .batch import _WORKER_STATE, map_batch_tasks
+from .formatting import _entry_has_lexical_data
+from .vocabulary import count_forms, resolve_form_entries
+
+COVERAGE_REPORT_FORMAT = "pali-lem-coverage/1"
+MATCH_CATEGORIES = ("exact", "fallback", "lemma", "json", "missing")
+
+
+def match_category(entry):
+    """Categoría de coincidencia de una entrada de glosa (ver `MATCH_CATEGORIES`)."""
+    if not _entry_has_lexical_data(entry):
+        return "missing"
+    if entry.get("match_source") in {"lemma", "json"}:
+        return entry["match_source"]
+    return "fallback" if entry.get("match_type") == "fallback" else "exact"
+
+
+def _form_categories(forms):
+    """Categoría de cada forma, recordada por proceso: en un corpus las formas se repiten."""
+    categories = _WORKER_STATE.setdefault("match_categories", {})
+    pending = [form for form in forms if form not in categories]
+    if pending:
+        for form, entry in resolve_form_entries(pending, _WORKER_STATE["engine"]).items():
+            categories[form] = match_category(entry)
+    return categories
+
+
+def _coverage_file(input_path):
+    """Cobertura de un archivo (se ejecuta en un proceso del pool).
+
+    Cuenta las formas y clasifica cada forma distinta, sin construir una entrada
+    de glosa por token: da lo mismo que clasificar `engine.gloss(text)`.
+    """
+    try:
+        text = Path(input_path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as exc:
+        return {"input": str(input_path), "error": f"{type(exc).__name__}: {exc}"}
+    form_counts = count_forms([text])
+    categories = _form_categories(form_counts)
+    match_types = Counter()
+    missing, fallback = Counter(), Counter()
+    for form, count in form_counts.items():
+        category = categories[form]
+        match_types[category] += count
+        if category == "missing":
+            missing[form] = count
+        elif category == "fallback":
+            fallback[form] = count
+    return {"input": str(input_path), "match_types": match_types, "missing": missing, "fallback": fallback}
+
+
+def _ranked_forms(counts, file_counts, top):
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    if top:
+        ranked = ranked[:top]
+    return [{"form": form, "count": count, "files": file_counts[form]} for form, count in ranked]
+
+
+def _coverage_block(match_types):
+    words = sum(match_types.values())
+    found = words - match_types.get("missing", 0)
+    return {
+        "words": words,
+        "found": found,
+        "coverage": round(found / words * 100, 2) if words else 0.0,
+        "match_types": {category: match_types.get(category, 0) for category in MATCH_CATEGORIES},
+    }
+
+
+def coverage_report(input_paths, dpd_db_path="", workers=None, top=100):
+    """Informe de cobertura de `input_paths` con `workers` procesos.
+
+    `top` limita las listas de formas sin glosa y por fallback (0 = todas).
+    """
+    input_paths = [Path(path) for path in input_paths]
+    started = time.perf_counter()
+    results, workers = map_batch_tasks(_coverage_file, input_paths, dpd_db_path, workers=workers)
+    elapsed = time.perf_counter() - started
+
+    base_dir = Path(os.path.commonpath([str(path.parent) for path in input_paths])) if input_paths else Path()
+    totals = Counter()
+    missing, missing_files = Counter(), Counter()
+    fallback, fallback_files = Counter(), Counter()
+    per_file, failed = [], []
+    for path, result in zip(input_paths, results):
+        name = path.relative_to(base_dir).as_posix()
+        if "error" in result:
+            failed.append({"file": name, "error": result["error"]})
+            continue
+        totals.update(result["match_types"])
+        missing.update(result["missing"])
+        missing_files.update(result["missing"].keys())
+        fallback.update(result["fallback"])
+        fallback_files.update(result["fallback"].keys())
+        per_file.append({"file": name, **_coverage_block(result["match_types"])})
+
+    return {
+        "format": COVERAGE_REPORT_FORMAT,
+        "files": len(input_paths),
+        "failed": failed,
+        **_coverage_block(totals),
+        "distinct_missing": len(missing),
+        "top_missing": _ranked_forms(missing, missing_files, top),
+        "top_fallback": _ranked_forms(fallback, fallback_files, top),
+        "per_file": per_file,
+        "run": {
+            "source": f"dpd.db ({dpd_db_path})" if dpd_db_path else "dpd_dictionary.json",
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "files_per_second": round(len(input_paths) / elapsed, 1) if elapsed else 0.0,
+        },
+    }
+
+
+def compare_coverage_reports(old_report, new_report, top=20):
+    """Diferencias entre dos informes (p. ej. antes y después de una release de DPD).
+
+    Las formas solo se comparan dentro de las listas `top_missing` de cada
+    informe: una forma ausente de una lista tiene `None` en ese lado (se resolvió
+    o quedó por debajo del corte).
+    """
+    def _delta(old, new):
+        return {"old": old, "new": new, "delta": round(new - old, 2)}
+
+    old_missing = {item["form"]: item["count"] for item in old_report.get("top_missing", [])}
+    new_missing = {item["form"]: item["count"] for item in new_report.get("top_missing", [])}
+    forms = sorted(
+        (form for form in set(old_missing) | set(new_missing) if old_missing.get(form) != new_missing.get(form)),
+        key=lambda form: (-abs(new_missing.get(form, 0) - old_missing.get(form, 0)), form),
+    )
+    old_files = {item["file"]: item["coverage"] for item in old_report.get("per_file", [])}
+    files = sorted(
+        (
+            (item["file"], old_files[item["file"]], item["coverage"])
+            for item in new_report.get("per_file", [])
+            if item["file"] in old_files and item["coverage"] != old_files[item["file"]]
+        ),
+        key=lambda row: (-abs(row[2] - row[1]), row[0]),
+    )
+    return {
+        "coverage": _delta(old_report.get("coverage", 0.0), new_report.get("coverage", 0.0)),
+        "words": _delta(old_report.get("words", 0), new_report.get("words", 0)),
+        "match_types": {
+            category: _delta(old_report.get("match_types", {}).get(category, 0), new_report.get("match_types", {}).get(category, 0))
+            for category in MATCH_CATEGORIES
+        },
+        "missing_forms": [
+            {"form": form, "old": old_missing.get(form), "new": new_missing.get(form)} for form in forms[:top]
+        ],
+        "files": [{"file": name, **_delta(old, new)} for name, old, new in files[:top]],
+    }
@@ -0,0 +1,326 @@
+"""Daemon de glosado sobre un socket Unix para invocaciones repetidas de la CLI.
+
+Cada `app_cli.py` reimporta el núcleo y arranca con cachés vacías; el daemon
+mantiene un `GlossEngine` caliente por dpd.db y la CLI solo le reenvía el texto.
+
+Protocolo (una petición por conexión): una línea JSON con `op` y sus campos, y
+una línea JSON de respuesta con `ok`.
+
+    {"op": "gloss", "text": "dhammo", "format": "compact", "db": ""}
+    → {"ok": true, "output": "...", "coverage": 100.0, "source": "dpd.db (...)"}
+    {"op": "ping"}      → {"ok": true, "pid": 1234, "protocol": 1, "uptime_seconds": 12.5}
+    {"op": "shutdown"}  → {"ok": true}
+
+El lado cliente (`daemon_request`, `start_daemon`) solo importa la biblioteca
+estándar, para que reenviar una petición no cueste lo que cuesta importar el núcleo.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+import time
+from pathlib import Path
+
+DAEMON_PROTOCOL = 1
+MAX_DAEMON_MESSAGE_BYTES = 16 * 1024 * 1024
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _tmp_socket_dir():
+    """Directorio privado del socket cuando no hay `$XDG_RUNTIME_DIR`: `<tmp>/pali-lem-<uid>/`."""
+    import tempfile
+
+    return Path(tempfile.gettempdir()) / f"pali-lem-{os.getuid()}"
+
+
+def default_socket_path():
+    """`PALI_LEM_DAEMON_SOCKET`, o un socket por usuario en `$XDG_RUNTIME_DIR` (o en `_tmp_socket_dir`)."""
+    configured = os.environ.get("PALI_LEM_DAEMON_SOCKET", "").strip()
+    if configured:
+        return configured
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return str(Path(runtime_dir) / f"pali-lem-{os.getuid()}.sock")
+    return str(_tmp_socket_dir() / "daemon.sock")
+
+
+def _socket_dir_is_private(socket_path, create=False):
+    """¿Es seguro usar `socket_path`? Solo se comprueba el directorio de `_tmp_socket_dir`.
+
+    Su nombre es predecible y el tmp del sistema es de todos: otro usuario podría
+    crearlo antes (o dejar ahí un enlace) y hacerse pasar por el daemon o leer
+    los textos. Se usa solo si es un directorio real, nuestro y sin permisos para
+    nadie más; con `create` se crea con `0700` si no existe.
+    """
+    directory = Path(socket_path).parent
+    if directory != _tmp_socket_dir():
+        return True
+    if create:
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+    try:
+        dir_stat = os.lstat(directory)
+    except FileNotFoundError:
+        return False
+    return (
+        stat.S_ISDIR(dir_stat.st_mode)
+        and dir_stat.st_uid == os.getuid()
+        and not dir_stat.st_mode & 0o077
+    )
+
+
+def _daemon_idle_seconds():
+    return float(os.environ.get("PALI_LEM_DAEMON_IDLE_SECONDS", "1800"))
+
+
+def _read_line(sock_file):
+    line = sock_file.readline(MAX_DAEMON_MESSAGE_BYTES + 1)
+    if len(line) > MAX_DAEMON_MESSAGE_BYTES:
+        raise ValueError(f"Mensaje de más de {MAX_DAEMON_MESSAGE_BYTES} bytes")
+    return json.loads(line) if line else None
+
+
+def daemon_request(request, socket_path=None, timeout=30.0, connect_timeout=0.5):
+    """Envía `request` al daemon y devuelve su respuesta; None si no hay daemon escuchando."""
+    socket_path = socket_path or default_socket_path()
+    if not _socket_dir_is_private(socket_path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(connect_timeout)
+        try:
+            client.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError, socket.timeout):
+            return None
+        client.settimeout(timeout)
+        client.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        with client.makefile("rb") as sock_file:
+            return _read_line(sock_file)
+    except (OSError, ValueError):
+        return None
+    finally:
+        client.close()
+
+
+def start_daemon(socket_path=None, wait_seconds=10.0):
+    """Arranca el daemon en segundo plano (si no hay uno) y espera a que responda.
+
+    Devuelve la respuesta a `ping` del daemon que queda escuchando, o None si no
+    llegó a arrancar en `wait_seconds`.
+    """
+    import subprocess
+
+    socket_path = socket_path or default_socket_path()
+    pong = daemon_request({"op": "ping"}, socket_path)
+    if pong:
+        return pong
+    subprocess.Popen(
+        [sys.executable, "-m", "pali_lem.daemon", "--socket", socket_path],
+        cwd=_PROJECT_ROOT,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        # Sesión propia: el daemon sobrevive a la terminal que lo lanzó.
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + wait_seconds
+    while time.monotonic() < deadline:
+        pong = daemon_request({"op": "ping"}, socket_path)
+        if pong:
+            return pong
+        time.sleep(0.05)
+    return None
+
+
+def stop_daemon(socket_path=None):
+    """Pide al daemon que termine; devuelve si había uno escuchando."""
+    return daemon_request({"op": "shutdown"}, socket_path) is not None
+
+
+# ---------------------------------------------------------------------------
+# Lado servidor
+# ---------------------------------------------------------------------------
+
+def _make_daemon_server(socket_path, idle_seconds):
+    import socketserver
+    import threading
+
+    from .common import logger
+    from .dictionary import load_dictionary
+    from .dpd_db import follow_dpd_db_path
+    from .engine import GlossEngine, coverage_counts
+    from .formatting import generate_compact_gloss, generate_rich_gloss_text
+
+    formats = {"compact": generate_compact_gloss, "rich": generate_rich_gloss_text}
+
+    class _DaemonHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = _read_line(self.rfile)
+                if not isinstance(request, dict):
+                    raise ValueError("La petición debe ser un objeto JSON")
+                response = self.server.dispatch(request)
+            except ValueError as exc:
+                response = {"ok": False, "error": str(exc)}
+            except Exception as exc:
+                logger.exception("Error atendiendo una petición del daemon")
+                response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    class GlossDaemon(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self):
+            # El socket nace ya sin permisos para otros: con solo un chmod tras el
+            # bind habría una ventana en la que cualquiera podría conectarse.
+            previous_umask = os.umask(0o077)
+            try:
+                super().__init__(socket_path, _DaemonHandler)
+            finally:
+                os.umask(previous_umask)
+            os.chmod(socket_path, 0o600)
+            self.started_at = time.monotonic()
+            self.last_request_at = time.monotonic()
+            # Motor por `db` explícita; el de la clave None sigue la dpd.db instalada.
+            self._engines = {}
+            self._engines_lock = threading.Lock()
+
+        def _engine(self, db_path):
+            follow = not db_path
+            if follow:
+                # Se resuelve en cada petición: otro proceso puede haber instalado una release.
+                db_path = follow_dpd_db_path()
+            with self._engines_lock:
+                engine = self._engines.get(None if follow else db_path)
+                if engine is None:
+                    try:
+                        dictionary = load_dictionary()
+                    except FileNotFoundError:
+                        if not db_path:
+                            raise
+                        dictionary = {}
+                    engine = self._engines[None if follow else db_path] = GlossEngine(
+                        db_path, fallback_dictionary=dictionary
+                    )
+                elif follow and db_path and db_path != engine.dpd_db_path:
+                    logger.info("dpd.db nueva para el daemon: %s", db_path)
+                    engine.switch_dpd_db(db_path)
+                return engine
+
+        def engines_info(self):
+            with self._engines_lock:
+                engines = list(self._engines.values())
+            return {engine.dpd_db_path or "dpd_dictionary.json": engine.cache_info() for engine in engines}
+
+        def dispatch(self, request):
+            self.last_request_at = time.monotonic()
+            op = request.get("op")
+            if op == "ping":
+                return {
+                    "ok": True,
+                    "pid": os.getpid(),
+                    "protocol": DAEMON_PROTOCOL,
+                    "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+                    "engines": self.engines_info(),
+                }
+            if op == "shutdown":
+                threading.Thread(target=self.shutdown, daemon=True).start()
+                return {"ok": True}
+            if op != "gloss":
+                raise ValueError(f"Operación desconocida: {op!r}")
+            text = request.get("text")
+            output_format = request.get("format") or "compact"
+            if not isinstance(text, str) or output_format not in formats:
+                raise ValueError("'gloss' necesita 'text' (cadena) y 'format' compact|rich")
+            try:
+                engine = self._engine(request.get("db") or "")
+            except FileNotFoundError as exc:
+                return {"ok": False, "error": str(exc)}
+            gloss_entries = engine.gloss(text)
+            word_total, found_words, _ = coverage_counts(gloss_entries)
+            return {
+                "ok": True,
+                "output": formats[output_format](gloss_entries),
+                "coverage": round(found_words / word_total * 100, 2) if word_total else 0.0,
+                "source": f"dpd.db ({engine.dpd_db_path})" if engine.dpd_db_path else "dpd_dictionary.json",
+            }
+
+        def watch_idle(self):
+            # Un daemon olvidado no debe quedarse para siempre con la base abierta.
+            while True:
+                time.sleep(min(30.0, max(0.05, idle_seconds / 4)))
+                if time.monotonic() - self.last_request_at >= idle_seconds:
+                    logger.info("Daemon inactivo %.0f s; se detiene", idle_seconds)
+                    self.shutdown()
+                    return
+
+        def server_close(self):
+            super().server_close()
+            for engine in self._engines.values():
+                engine.close()
+
+    return GlossDaemon()
+
+
+def serve_daemon(socket_path=None, idle_seconds=None):
+    """Atiende peticiones en `socket_path` hasta `shutdown` o `idle_seconds` sin peticiones.
+
+    Devuelve False sin hacer nada si ya hay otro daemon escuchando en ese socket,
+    y lanza `PermissionError` si el directorio del socket por defecto en el tmp
+    del sistema no es privado (ver `_socket_dir_is_private`).
+    """
+    import threading
+
+    from .provisioning import ProvisioningLock
+
+    socket_path = socket_path or default_socket_path()
+    idle_seconds = _daemon_idle_seconds() if idle_seconds is None else idle_seconds
+    if not _socket_dir_is_private(socket_path, create=True):
+        raise PermissionError(f"El directorio del socket no es privado de este usuario: {Path(socket_path).parent}")
+    # Comprobar, limpiar un socket huérfano y enlazar es atómico entre daemons que
+    # arrancan a la vez: si no, uno podría borrar el socket recién creado del otro.
+    lock = ProvisioningLock(socket_path + ".lock")
+    if not lock.acquire(timeout=10, poll_seconds=0.05):
+        return False
+    try:
+        if daemon_request({"op": "ping"}, socket_path):
+            return False
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+        server = _make_daemon_server(socket_path, idle_seconds)
+    finally:
+        lock.release()
+
+    threading.Thread(target=server.watch_idle, daemon=True, name="daemon-idle").start()
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+    return True
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Daemon de glosado sobre un socket Unix")
+    parser.add_argument("--socket", default="", help="Ruta del socket (default: PALI_LEM_DAEMON_SOCKET o por usuario)")
+    parser.add_argument("--idle-seconds", type=float, default=None, help="Se detiene tras este tiempo sin peticiones")
+    args = parser.parse_args()
+    try:
+        serve_daemon(args.socket or None, args.idle_seconds)
+    except PermissionError as exc:
+        raise SystemExit(str(exc))
+
+
+if __name__ == "__main__":
+    main()
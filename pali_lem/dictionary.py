@@ -0,0 +1,129 @@
+"""`dpd_dictionary.json`: aprovisionamiento y carga del diccionario de respaldo."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from .common import PROJECT_ROOT, logger, memoize
+from .provisioning import provision_once
+
+DPD_JSON_PATH = PROJECT_ROOT / "dpd_dictionary.json"
+# Versión del `dpd_dictionary.json` que devolvió la última llamada a `load_dictionary`.
+_LOADED_DICTIONARY = {"version": ""}
+
+
+def _stat_version_id(path, stat_result):
+    stat_key = f"{Path(path).resolve()}|{stat_result.st_size}|{stat_result.st_mtime_ns}|{stat_result.st_ino}"
+    return hashlib.sha256(stat_key.encode("utf-8")).hexdigest()[:16]
+
+
+def dpd_json_version_id(dict_path=None):
+    """ID de `dpd_dictionary.json` derivado del `stat` (`""` si no existe), como el de una dpd.db suelta."""
+    dict_path = DPD_JSON_PATH if dict_path is None else dict_path
+    try:
+        return _stat_version_id(dict_path, os.stat(dict_path))
+    except OSError:
+        return ""
+
+
+def fallback_dictionary_version(fallback_dictionary, version=None):
+    """Versión con la que un diccionario de respaldo entra en claves de caché y almacenes.
+
+    `"none"` si está vacío; si no, `version` o, por omisión, la del
+    `dpd_dictionary.json` que cargó `load_dictionary`. No recorre el
+    diccionario. `""` si no hay versión conocida: quien la use no debe
+    reutilizar resultados guardados.
+    """
+    if not isinstance(fallback_dictionary, dict) or not fallback_dictionary:
+        return "none"
+    return version or _LOADED_DICTIONARY["version"]
+
+
+@memoize(maxsize=1)
+def load_dictionary():
+    """Carga únicamente `dpd_dictionary.json` y recuerda su versión (`fallback_dictionary_version`)."""
+    ensure_dpd_json_available()
+    dict_path = DPD_JSON_PATH
+
+    if not dict_path.exists():
+        raise FileNotFoundError(
+            "No se encontró dpd_dictionary.json. Configura DPD_JSON_URL o añade dpd_dictionary.json.gz/local."
+        )
+
+    with open(dict_path, "r", encoding="utf-8") as f:
+        # El `stat` del archivo abierto: un reemplazo durante la lectura no cambia la versión registrada.
+        version = _stat_version_id(dict_path, os.fstat(f.fileno()))
+        dictionary = json.load(f)
+    _LOADED_DICTIONARY["version"] = version
+    return dictionary
+
+
+@memoize()
+def ensure_dpd_json_available():
+    """Asegura `dpd_dictionary.json` desde archivo local comprimido o URL remota.
+
+    La descompresión o descarga se hace una sola vez aunque arranquen varias
+    sesiones (o procesos) a la vez: las demás esperan a que termine.
+    """
+    dict_path = DPD_JSON_PATH
+    if dict_path.exists():
+        return str(dict_path)
+    result = provision_once(
+        "dpd_json",
+        dict_path.with_suffix(".json.lock"),
+        _provision_dpd_json,
+        wait_seconds=int(os.environ.get("DPD_JSON_PROVISION_WAIT_SECONDS", "600")),
+    )
+    if result is None:
+        return str(dict_path) if dict_path.exists() else ""
+    return result
+
+
+def _provision_dpd_json():
+    import gzip
+    import urllib.request
+
+    dict_path = DPD_JSON_PATH
+    gz_path = dict_path.with_suffix(".json.gz")
+    if dict_path.exists():
+        return str(dict_path)
+
+    if gz_path.exists():
+        temp_path = dict_path.with_suffix(".json.part")
+        try:
+            with gzip.open(gz_path, "rb") as input_file, open(temp_path, "wb") as output_file:
+                while True:
+                    chunk = input_file.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    output_file.write(chunk)
+            temp_path.replace(dict_path)
+            return str(dict_path)
+        except Exception:
+            logger.exception("Error descomprimiendo dpd_dictionary.json.gz desde %s", gz_path)
+            if temp_path.exists():
+                temp_path.unlink()
+            return ""
+
+    dpd_json_url = os.environ.get("DPD_JSON_URL", "").strip()
+    if not dpd_json_url:
+        return ""
+
+    temp_path = dict_path.with_suffix(".json.part")
+    try:
+        with urllib.request.urlopen(dpd_json_url, timeout=180) as response, open(
+            temp_path, "wb"
+        ) as output_file:
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                output_file.write(chunk)
+        temp_path.replace(dict_path)
+        return str(dict_path)
+    except Exception:
+        logger.exception("Error descargando dpd_dictionary.json desde %s", dpd_json_url)
+        if temp_path.exists():
+            temp_path.unlink()
+        return ""
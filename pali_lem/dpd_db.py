@@ -0,0 +1,1397 @@
+"""Aprovisionamiento de dpd.db: descarga, versiones, parches, optimización y estadísticas.
+
+Las actualizaciones corren en hilos de fondo; nada de este módulo bloquea la
+primera consulta esperando a la red.
+"""
+
+import base64
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .common import PROJECT_ROOT, _as_bool, _load_json_file, _save_json_file, _utcnow, logger, memoize
+from .lookup import DPD_GLOSS_QUERIES, _DPD_DB_READERS, _reader_lease_dir, dpd_db_version_id, pinned_dpd_db
+from .provisioning import ProvisioningLock, provision_once
+from .sessions import get_sessions_store, regloss_saved_sessions
+
+# Directorio de la dpd.db gestionada (descargas, metadatos y lock).
+DPD_DB_DIR = PROJECT_ROOT / "dpd-db"
+
+
+def _is_valid_dpd_db(path):
+    if not path or not path.exists() or not path.is_file():
+        return False
+    try:
+        conn = sqlite3.connect(str(path))
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='lookup' LIMIT 1"
+        )
+        result = cursor.fetchone()
+        conn.close()
+        return result is not None
+    except sqlite3.Error:
+        logger.debug("_is_valid_dpd_db: error SQLite en %s", path, exc_info=True)
+        return False
+
+
+def _build_dpd_db_candidates():
+    module_dir = PROJECT_ROOT
+    env_path = os.environ.get("DPD_DB_PATH", "").strip()
+
+    candidate_paths = []
+    if env_path:
+        candidate_paths.append(Path(env_path).expanduser())
+    candidate_paths.append(DPD_DB_DIR / "dpd.db")
+
+    search_roots = [module_dir, Path.cwd(), *module_dir.parents]
+    for root in search_roots:
+        candidate_paths.append(root / "dpd-db" / "dpd.db")
+        candidate_paths.append(root / "dpd.db")
+    return candidate_paths
+
+
+def _resolve_dpd_db_download_url():
+    db_url = os.environ.get("DPD_DB_URL", "").strip()
+    if db_url:
+        return db_url
+
+    release_tag = os.environ.get("DPD_DB_RELEASE_TAG", "").strip()
+    if release_tag:
+        return (
+            "https://github.com/digitalpalidictionary/dpd-db/"
+            f"releases/download/{release_tag}/dpd.db.tar.bz2"
+        )
+
+    return os.environ.get(
+        "DPD_DB_TARBZ2_URL",
+        "https://github.com/digitalpalidictionary/dpd-db/releases/latest/download/dpd.db.tar.bz2",
+    ).strip()
+
+
+def _should_check_update(last_checked_at, interval_hours):
+    if interval_hours <= 0:
+        return True
+    if not last_checked_at:
+        return True
+    try:
+        parsed = datetime.fromisoformat(last_checked_at)
+    except ValueError:
+        logger.debug("_should_check_update: valor de fecha inválido: %r", last_checked_at)
+        return True
+    return _utcnow() - parsed >= timedelta(hours=interval_hours)
+
+
+def _fetch_remote_signature(download_url, timeout):
+    import urllib.request
+
+    def build_signature(response):
+        return {
+            "resolved_url": response.geturl(),
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", ""),
+            "content_length": response.headers.get("Content-Length", ""),
+        }
+
+    try:
+        request = urllib.request.Request(download_url, method="HEAD")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return build_signature(response)
+    except Exception:
+        logger.exception("Error obteniendo firma remota (HEAD) de %s", download_url)
+        return {}
+
+
+def _copy_stream(source_file, output_file, chunk_size=1024 * 1024):
+    while True:
+        chunk = source_file.read(chunk_size)
+        if not chunk:
+            break
+        output_file.write(chunk)
+
+
+class _DownloadRestartRequired(Exception):
+    """El servidor no puede continuar desde el offset pedido (ETag distinto o sin Range)."""
+
+
+class _ResumableResponse:
+    """Lector tipo archivo sobre una URL que se reconecta con `Range` si se corta.
+
+    Calcula un SHA-256 de los bytes mientras se leen. Tras un corte reintenta con
+    backoff exponencial pidiendo `Range: bytes=<offset>-` e `If-Range: <etag>`;
+    si el servidor responde 200 (recurso cambiado o sin soporte de rangos) con un
+    offset > 0, lanza `_DownloadRestartRequired`.
+    """
+
+    def __init__(self, url, timeout, offset=0, etag="", hasher=None, retries=None, backoff_seconds=None, end=None):
+        self.url = url
+        self.timeout = timeout
+        self.offset = offset
+        # Último byte (inclusive) de un rango acotado; None = hasta el final.
+        self.end = end
+        self.etag = etag
+        self.hasher = hasher or hashlib.sha256()
+        self.retries = (
+            int(os.environ.get("DPD_DB_DOWNLOAD_RETRIES", "5")) if retries is None else retries
+        )
+        self.backoff_seconds = (
+            float(os.environ.get("DPD_DB_RETRY_BACKOFF_SECONDS", "2"))
+            if backoff_seconds is None
+            else backoff_seconds
+        )
+        self.total_length = None
+        self._response = None
+        self._failures = 0
+
+    def _open(self):
+        import urllib.request
+
+        request = urllib.request.Request(self.url)
+        ranged = self.offset > 0 or self.end is not None
+        if ranged:
+            request.add_header("Range", f"bytes={self.offset}-{'' if self.end is None else self.end}")
+            if self.etag:
+                request.add_header("If-Range", self.etag)
+        response = urllib.request.urlopen(request, timeout=self.timeout)
+        status = getattr(response, "status", 200)
+        if ranged and status != 206:
+            response.close()
+            raise _DownloadRestartRequired(f"{self.url} no reanuda desde el byte {self.offset}")
+        if status == 206:
+            content_range = response.headers.get("Content-Range", "")
+            match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", content_range)
+            if not match or int(match.group(1)) != self.offset:
+                response.close()
+                raise _DownloadRestartRequired(f"Content-Range inesperado: {content_range!r}")
+            if match.group(2) != "*":
+                self.total_length = int(match.group(2))
+        else:
+            content_length = response.headers.get("Content-Length", "")
+            self.total_length = int(content_length) if content_length.isdigit() else None
+        if not self.etag:
+            self.etag = response.headers.get("ETag", "")
+        self._response = response
+
+    def _backoff(self, exc):
+        self._failures += 1
+        if self._failures > self.retries:
+            raise exc
+        delay = min(60.0, self.backoff_seconds * (2 ** (self._failures - 1)))
+        logger.warning(
+            "Descarga de %s interrumpida en el byte %s (%s); reintento %s/%s en %.1fs",
+            self.url, self.offset, exc, self._failures, self.retries, delay,
+        )
+        self.close()
+        time.sleep(delay)
+
+    def read(self, size=-1):
+        import http.client
+
+        while True:
+            try:
+                if self._response is None:
+                    self._open()
+                chunk = self._response.read(size)
+            except _DownloadRestartRequired:
+                raise
+            except (OSError, http.client.HTTPException) as exc:
+                self._backoff(exc)
+                continue
+            if chunk:
+                self.offset += len(chunk)
+                self.hasher.update(chunk)
+                return chunk
+            expected_end = self.end + 1 if self.end is not None else self.total_length
+            if expected_end is not None and self.offset < expected_end:
+                self._backoff(http.client.IncompleteRead(b"", expected_end - self.offset))
+                continue
+            return b""
+
+    def close(self):
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+            self._response = None
+
+
+def _download_to_file_resumable(download_url, part_path, timeout, etag=""):
+    """Descarga a `part_path` reanudando una descarga previa con la misma ETag.
+
+    El estado (URL + ETag) se guarda junto a `.part` para sobrevivir a reinicios
+    del contenedor. Devuelve `(sha256, bytes)` y deja `.part` completo; ante un
+    error conserva `.part` para el siguiente intento.
+    """
+    state_path = part_path.with_name(part_path.name + ".json")
+    state = _load_json_file(state_path, default={})
+    offset = 0
+    hasher = hashlib.sha256()
+    if (
+        etag
+        and part_path.exists()
+        and state.get("etag") == etag
+        and state.get("download_url") == download_url
+    ):
+        with open(part_path, "rb") as existing_file:
+            while True:
+                chunk = existing_file.read(1024 * 1024)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        offset = part_path.stat().st_size
+        logger.info("Reanudando descarga de %s desde el byte %s", download_url, offset)
+    elif part_path.exists():
+        part_path.unlink()
+
+    _save_json_file(state_path, {"download_url": download_url, "etag": etag})
+    for _ in range(2):
+        reader = _ResumableResponse(download_url, timeout, offset=offset, etag=etag, hasher=hasher)
+        try:
+            with open(part_path, "ab" if offset else "wb") as output_file:
+                _copy_stream(reader, output_file)
+        except _DownloadRestartRequired:
+            logger.info("El servidor no permite reanudar %s; descargando desde cero", download_url)
+            offset = 0
+            hasher = hashlib.sha256()
+            continue
+        finally:
+            reader.close()
+        if reader.total_length is not None and reader.offset != reader.total_length:
+            raise IOError(f"Descarga incompleta: {reader.offset} de {reader.total_length} bytes")
+        if state_path.exists():
+            state_path.unlink()
+        return hasher.hexdigest(), reader.offset
+    raise IOError(f"No se pudo descargar {download_url}")
+
+
+_PARALLEL_MIN_PART_BYTES = 1024 * 1024
+
+
+def _probe_range_support(download_url, timeout):
+    """Devuelve `(tamaño, etag)` si el servidor anuncia `Accept-Ranges: bytes`, o None."""
+    import urllib.request
+
+    try:
+        request = urllib.request.Request(download_url, method="HEAD")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            accept_ranges = response.headers.get("Accept-Ranges", "").lower()
+            content_length = response.headers.get("Content-Length", "")
+            if accept_ranges != "bytes" or not content_length.isdigit():
+                return None
+            return int(content_length), response.headers.get("ETag", "")
+    except Exception:
+        logger.debug("_probe_range_support: HEAD falló para %s", download_url, exc_info=True)
+        return None
+
+
+def _download_to_file_parallel(download_url, part_path, timeout, workers, etag=""):
+    """Descarga por rangos en paralelo con un pool de hilos y escribe cada rango en su offset.
+
+    Si el servidor no anuncia `Accept-Ranges` (o el archivo es pequeño) recurre a
+    `_download_to_file_resumable`. El SHA-256 se calcula al final sobre el archivo
+    reensamblado. Devuelve `(sha256, bytes)`.
+    """
+    probe = _probe_range_support(download_url, timeout)
+    if probe is None:
+        logger.info("%s no admite rangos; descarga en un solo stream", download_url)
+        return _download_to_file_resumable(download_url, part_path, timeout, etag=etag)
+    total_size, probed_etag = probe
+    part_count = max(1, min(workers, total_size // _PARALLEL_MIN_PART_BYTES))
+    if part_count == 1:
+        return _download_to_file_resumable(download_url, part_path, timeout, etag=etag or probed_etag)
+
+    etag = etag or probed_etag
+    part_size = -(-total_size // part_count)
+    ranges = [
+        (start, min(start + part_size, total_size) - 1)
+        for start in range(0, total_size, part_size)
+    ]
+    with open(part_path, "wb") as output_file:
+        output_file.truncate(total_size)
+
+    def _fetch_range(byte_range):
+        start, end = byte_range
+        reader = _ResumableResponse(download_url, timeout, offset=start, end=end, etag=etag)
+        try:
+            with open(part_path, "r+b") as output_file:
+                output_file.seek(start)
+                _copy_stream(reader, output_file)
+        finally:
+            reader.close()
+        if reader.offset != end + 1:
+            raise IOError(f"Rango {start}-{end} incompleto ({reader.offset - start} bytes)")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="dpd-range") as pool:
+        for future in [pool.submit(_fetch_range, byte_range) for byte_range in ranges]:
+            future.result()
+
+    hasher = hashlib.sha256()
+    with open(part_path, "rb") as assembled_file:
+        while True:
+            chunk = assembled_file.read(1024 * 1024)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest(), total_size
+
+
+def _download_to_file(download_url, part_path, timeout, etag="", workers=1):
+    if workers > 1:
+        return _download_to_file_parallel(download_url, part_path, timeout, workers, etag=etag)
+    return _download_to_file_resumable(download_url, part_path, timeout, etag=etag)
+
+
+def _download_workers():
+    return max(1, int(os.environ.get("DPD_DB_DOWNLOAD_WORKERS", "1")))
+
+
+class _ChecksumMismatch(IOError):
+    pass
+
+
+def _verify_download_checksum(sha256_hex):
+    expected = os.environ.get("DPD_DB_SHA256", "").strip().lower()
+    if expected and expected != sha256_hex:
+        raise _ChecksumMismatch(f"Checksum SHA-256 no coincide: esperado {expected}, obtenido {sha256_hex}")
+
+
+def _extract_dpd_db_member(archive, members, temp_db_path):
+    """Extrae el primer miembro `dpd.db` de `members` a `temp_db_path`."""
+    for member in members:
+        if member.isfile() and Path(member.name).name == "dpd.db":
+            with archive.extractfile(member) as source_file, open(temp_db_path, "wb") as output_file:
+                _copy_stream(source_file, output_file)
+            return True
+    return False
+
+
+def _slim_install(slim=None):
+    """¿Se instala la base slim? (`slim` explícito o `DPD_DB_SLIM`)."""
+    if slim is None:
+        return _as_bool(os.environ.get("DPD_DB_SLIM", "0"), default=False)
+    return bool(slim)
+
+
+def _install_content_digest(db_path, slim=None):
+    """Digest de contenido de una base recién descargada, antes de optimizarla.
+
+    Solo hace falta para buscar cadenas de parches, así que sin
+    `DPD_DB_DELTA_MANIFEST_URL` no se calcula. Una base slim no conserva las filas
+    de la release publicada: nunca coincide con el origen de un parche.
+    """
+    if _slim_install(slim) or not os.environ.get("DPD_DB_DELTA_MANIFEST_URL", "").strip():
+        return ""
+    return dpd_db_content_digest(db_path)
+
+
+def _download_dpd_db(
+    download_url, target_dir, target_db, timeout, stream_extract=None, remote_signature=None, workers=None,
+    optimize=None, slim=None,
+):
+    """Descarga dpd.db (directo o desde tarball) y lo instala de forma atómica.
+
+    Con `stream_extract` (por defecto `DPD_DB_STREAM_EXTRACT=1`) el tarball se
+    descomprime y desempaqueta mientras llegan los bytes, sin guardar el archivo
+    comprimido: la descarga y la extracción se solapan y el disco solo aloja la base.
+    Los cortes se reanudan con peticiones `Range`; los archivos `.part` (descarga
+    directa o sin streaming) sobreviven a reinicios si la ETag no cambió. Con
+    `workers` > 1 (`DPD_DB_DOWNLOAD_WORKERS`) se descarga por rangos en paralelo,
+    lo que implica el modo sin streaming.
+
+    Antes del reemplazo atómico la base se optimiza (`_optimize_dpd_db`) salvo con
+    `optimize=False` o `DPD_DB_OPTIMIZE=0`; con `slim` (`DPD_DB_SLIM=1`) se instala
+    en su lugar la versión reducida de `build_slim_dpd_db`.
+
+    Devuelve `{"sha256", "bytes", "seconds", "throughput_mbps", "workers", "optimization",
+    "content_digest"}`, o None si falla.
+    """
+    import tarfile
+
+    etag = (remote_signature or {}).get("etag", "")
+    workers = _download_workers() if workers is None else max(1, workers)
+    started = time.perf_counter()
+    optimization = None
+
+    content_digest = ""
+
+    def _result(sha256_hex, size):
+        seconds = max(time.perf_counter() - started, 1e-6)
+        throughput_mbps = round(size * 8 / seconds / 1_000_000, 2)
+        logger.info(
+            "dpd.db descargado: %s bytes en %.1fs (%.2f Mbit/s, %s conexiones)",
+            size, seconds, throughput_mbps, workers,
+        )
+        return {
+            "sha256": sha256_hex,
+            "bytes": size,
+            "seconds": round(seconds, 3),
+            "throughput_mbps": throughput_mbps,
+            "workers": workers,
+            "optimization": optimization,
+            "content_digest": content_digest,
+        }
+
+    if download_url.endswith(".db"):
+        temp_path = target_db.with_suffix(".db.part")
+        try:
+            sha256_hex, size = _download_to_file(download_url, temp_path, timeout, etag=etag, workers=workers)
+            _verify_download_checksum(sha256_hex)
+            if not _is_valid_dpd_db(temp_path):
+                logger.error("%s no es una dpd.db válida; se descarta", download_url)
+                temp_path.unlink()
+                return None
+            content_digest = _install_content_digest(temp_path, slim)
+            optimization = _optimize_downloaded_dpd_db(temp_path, optimize, slim)
+            temp_path.replace(target_db)
+            return _result(sha256_hex, size)
+        except Exception as exc:
+            logger.exception("Error descargando dpd.db directamente desde %s", download_url)
+            # Un `.part` corrupto no sirve para reanudar; uno cortado sí se conserva.
+            if isinstance(exc, _ChecksumMismatch) and temp_path.exists():
+                temp_path.unlink()
+            return None
+
+    if stream_extract is None:
+        stream_extract = workers == 1 and _as_bool(os.environ.get("DPD_DB_STREAM_EXTRACT", "1"), default=True)
+
+    archive_path = target_dir / "dpd.db.tar.bz2.part"
+    temp_db_path = target_dir / "dpd.db.part"
+    completed = False
+    try:
+        if stream_extract:
+            reader = _ResumableResponse(download_url, timeout, etag=etag)
+            try:
+                # Modo stream de tarfile ("r|*"): lectura secuencial directamente del socket.
+                with tarfile.open(fileobj=reader, mode="r|*") as archive:
+                    extracted = _extract_dpd_db_member(archive, archive, temp_db_path)
+                # Consumir el relleno final del tar para que el checksum cubra el archivo completo.
+                while reader.read(1024 * 1024):
+                    pass
+            finally:
+                reader.close()
+            sha256_hex, size = reader.hasher.hexdigest(), reader.offset
+        else:
+            sha256_hex, size = _download_to_file(download_url, archive_path, timeout, etag=etag, workers=workers)
+            with tarfile.open(archive_path, mode="r:*") as archive:
+                extracted = _extract_dpd_db_member(archive, archive.getmembers(), temp_db_path)
+        completed = True
+        _verify_download_checksum(sha256_hex)
+        if not extracted:
+            logger.error("El archivo descargado de %s no contiene dpd.db", download_url)
+            return None
+        if not _is_valid_dpd_db(temp_db_path):
+            logger.error("La dpd.db extraída de %s no es válida; se descarta", download_url)
+            return None
+
+        content_digest = _install_content_digest(temp_db_path, slim)
+        optimization = _optimize_downloaded_dpd_db(temp_db_path, optimize, slim)
+        temp_db_path.replace(target_db)
+        return _result(sha256_hex, size)
+    except Exception:
+        logger.exception("Error descargando/extrayendo dpd.db.tar.bz2 desde %s", download_url)
+        return None
+    finally:
+        if temp_db_path.exists():
+            temp_db_path.unlink()
+        # Un archivo parcial se conserva para reanudar; uno completo (o inválido) se descarta.
+        if completed and archive_path.exists():
+            archive_path.unlink()
+
+
+_DPD_DB_META_LOCK = threading.Lock()
+
+
+def _managed_dpd_db_path(target_dir, meta):
+    """dpd.db gestionada actual: `versions/<current_version>` o el `dpd.db` heredado."""
+    current_version = meta.get("current_version", "")
+    if current_version:
+        versioned_db = target_dir / "versions" / current_version / "dpd.db"
+        if versioned_db.exists():
+            return versioned_db
+    return target_dir / "dpd.db"
+
+
+def _version_grace_seconds():
+    return int(os.environ.get("DPD_DB_VERSION_GRACE_SECONDS", "600"))
+
+
+def _gc_dpd_db_versions(target_dir, meta_path):
+    """Borra las versiones retiradas sin lectores y con el periodo de gracia cumplido.
+
+    El periodo de gracia cubre lecturas de reruns que aún tengan la ruta antigua
+    en caché; los lectores cuentan tanto en este proceso como en otros (el
+    servicio HTTP, el daemon), por sus concesiones de lectura. Devuelve los ids
+    eliminados.
+    """
+    removed = []
+    with _DPD_DB_META_LOCK:
+        meta = _load_json_file(meta_path, default={})
+        current_version = meta.get("current_version", "")
+        retired_versions = dict(meta.get("retired_versions", {}))
+        if not current_version:
+            return removed
+        grace = timedelta(seconds=_version_grace_seconds())
+        now = _utcnow()
+        for version_id, retired_at in list(retired_versions.items()):
+            if version_id == current_version:
+                retired_versions.pop(version_id)
+                continue
+            version_db = target_dir / "dpd.db" if version_id == "legacy" else (
+                target_dir / "versions" / version_id / "dpd.db"
+            )
+            try:
+                retired_time = datetime.fromisoformat(retired_at)
+            except (TypeError, ValueError):
+                retired_time = now - grace
+            if now - retired_time < grace or _DPD_DB_READERS.has_readers(version_db):
+                continue
+            try:
+                if version_id == "legacy":
+                    if version_db.exists():
+                        version_db.unlink()
+                    shutil.rmtree(_reader_lease_dir(version_db), ignore_errors=True)
+                elif version_db.parent.exists():
+                    shutil.rmtree(version_db.parent)
+            except OSError:
+                logger.exception("No se pudo borrar la versión retirada %s de dpd.db", version_id)
+                continue
+            retired_versions.pop(version_id)
+            removed.append(version_id)
+        if removed:
+            meta["retired_versions"] = retired_versions
+            _save_json_file(meta_path, meta)
+    if removed:
+        logger.info("Versiones de dpd.db eliminadas: %s", ", ".join(removed))
+    return removed
+
+
+def _install_dpd_db_version(target_dir, incoming_dir, version_id):
+    """Mueve la descarga de `incoming_dir` a `versions/<version_id>` (rename atómico)."""
+    version_dir = target_dir / "versions" / version_id
+    if version_dir.exists():
+        # Misma release ya instalada: los lectores siguen usando la existente.
+        shutil.rmtree(incoming_dir)
+    else:
+        incoming_dir.rename(version_dir)
+    return version_dir / "dpd.db"
+
+
+DPD_DELTA_FORMAT = "pali-lem-dpd-delta"
+DPD_DELTA_VERSION = 1
+DPD_DELTA_MANIFEST_FORMAT = "pali-lem-dpd-deltas"
+
+
+def _user_tables(conn, schema="main"):
+    rows = conn.execute(
+        f"SELECT name FROM {schema}.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _table_columns(conn, table, schema="main"):
+    """`(columnas, columnas de clave primaria)` de `table`."""
+    info = conn.execute(f'PRAGMA {schema}.table_info("{table}")').fetchall()
+    columns = [row[1] for row in info]
+    primary_key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    return columns, primary_key
+
+
+def _encode_sql_value(value):
+    if isinstance(value, bytes):
+        return {"$b64": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_sql_value(value):
+    if isinstance(value, dict) and "$b64" in value:
+        return base64.b64decode(value["$b64"])
+    return value
+
+
+def _row_digest(row):
+    payload = json.dumps([_encode_sql_value(value) for value in row], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+def dpd_db_content_digest(dpd_db_path):
+    """SHA-256 del contenido lógico de una dpd.db (tablas, columnas y filas).
+
+    Es independiente del orden físico de las filas, de los índices y de VACUUM,
+    así que identifica igual una release recién descargada y su copia optimizada.
+    Las filas se combinan con una suma módulo 2**256 de sus hashes.
+    """
+    conn = sqlite3.connect(str(dpd_db_path))
+    try:
+        digest = hashlib.sha256()
+        for table in _user_tables(conn):
+            columns, _ = _table_columns(conn, table)
+            digest.update(json.dumps([table, columns], ensure_ascii=False).encode("utf-8"))
+            row_sum = 0
+            row_count = 0
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            for row in conn.execute(f'SELECT {column_list} FROM "{table}"'):
+                row_sum = (row_sum + int.from_bytes(_row_digest(row), "big")) % (1 << 256)
+                row_count += 1
+            digest.update(f"{row_count}:{row_sum:064x}".encode("ascii"))
+        return digest.hexdigest()
+    finally:
+        conn.close()
+
+
+def build_dpd_delta(old_db_path, new_db_path, output_file):
+    """Escribe en `output_file` (binario) el parche SQL de `old_db_path` a `new_db_path`.
+
+    Formato: JSON Lines con gzip; una cabecera con los digests de contenido y una
+    operación `delete`/`insert` por línea (los cambios son borrado + inserción).
+    Las tablas con clave primaria se comparan por clave; el resto, por fila completa.
+    Requiere el mismo esquema en ambas bases (si no, ValueError: hace falta la
+    descarga completa). Devuelve la cabecera con el recuento de operaciones.
+    """
+    import gzip
+
+    conn = sqlite3.connect(str(new_db_path))
+    try:
+        conn.execute("ATTACH DATABASE ? AS old", (str(old_db_path),))
+        tables = _user_tables(conn)
+        if tables != _user_tables(conn, "old"):
+            raise ValueError("Las bases no tienen las mismas tablas")
+        header = {
+            "format": DPD_DELTA_FORMAT,
+            "version": DPD_DELTA_VERSION,
+            "from": dpd_db_content_digest(old_db_path),
+            "to": dpd_db_content_digest(new_db_path),
+            "deletes": 0,
+            "inserts": 0,
+        }
+        operations = []
+        for table in tables:
+            columns, primary_key = _table_columns(conn, table)
+            if (columns, primary_key) != _table_columns(conn, table, "old"):
+                raise ValueError(f"El esquema de {table} cambió entre releases")
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            key_positions = [columns.index(column) for column in primary_key]
+
+            def _rows_by_key(schema):
+                rows = {}
+                for row in conn.execute(f'SELECT {column_list} FROM {schema}."{table}"'):
+                    key = tuple(row[position] for position in key_positions) if primary_key else _row_digest(row)
+                    rows.setdefault(key, []).append(row)
+                return rows
+
+            old_rows = _rows_by_key("old")
+            new_rows = _rows_by_key("main")
+            key_columns = primary_key or columns
+            for key, rows in old_rows.items():
+                remaining = list(new_rows.get(key, []))
+                for row in rows:
+                    if row in remaining:
+                        remaining.remove(row)
+                        continue
+                    key_values = [row[columns.index(column)] for column in key_columns]
+                    operations.append(
+                        {"table": table, "op": "delete", "key": dict(zip(key_columns, map(_encode_sql_value, key_values)))}
+                    )
+            for key, rows in new_rows.items():
+                remaining = list(old_rows.get(key, []))
+                for row in rows:
+                    if row in remaining:
+                        remaining.remove(row)
+                        continue
+                    operations.append(
+                        {"table": table, "op": "insert", "row": dict(zip(columns, map(_encode_sql_value, row)))}
+                    )
+        header["deletes"] = sum(1 for operation in operations if operation["op"] == "delete")
+        header["inserts"] = len(operations) - header["deletes"]
+    finally:
+        conn.close()
+
+    with gzip.GzipFile(fileobj=output_file, mode="wb") as archive:
+        archive.write((json.dumps(header, ensure_ascii=False) + "\n").encode("utf-8"))
+        for operation in operations:
+            archive.write((json.dumps(operation, ensure_ascii=False) + "\n").encode("utf-8"))
+    return header
+
+
+def apply_dpd_delta(dpd_db_path, input_file):
+    """Aplica un parche de `build_dpd_delta` sobre `dpd_db_path` en una sola transacción.
+
+    Devuelve la cabecera del parche. No verifica el resultado: quien llama compara
+    `dpd_db_content_digest` con `header["to"]`.
+    """
+    import gzip
+
+    conn = sqlite3.connect(str(dpd_db_path), isolation_level=None)
+    try:
+        with gzip.GzipFile(fileobj=input_file, mode="rb") as archive:
+            header = json.loads(archive.readline().decode("utf-8"))
+            if header.get("format") != DPD_DELTA_FORMAT:
+                raise ValueError("El archivo no es un parche de dpd.db")
+            conn.execute("BEGIN")
+            try:
+                for line in archive:
+                    operation = json.loads(line.decode("utf-8"))
+                    table = operation["table"]
+                    if operation["op"] == "delete":
+                        key = operation["key"]
+                        condition = " AND ".join(f'"{column}" IS ?' for column in key)
+                        conn.execute(
+                            f'DELETE FROM "{table}" WHERE rowid IN '
+                            f'(SELECT rowid FROM "{table}" WHERE {condition} LIMIT 1)',
+                            [_decode_sql_value(value) for value in key.values()],
+                        )
+                    else:
+                        row = operation["row"]
+                        column_list = ", ".join(f'"{column}"' for column in row)
+                        placeholders = ", ".join("?" for _ in row)
+                        conn.execute(
+                            f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})',
+                            [_decode_sql_value(value) for value in row.values()],
+                        )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+    return header
+
+
+def _find_delta_chain(manifest, start_digest, target_digest):
+    """Cadena más corta de parches del manifiesto entre dos digests, o None."""
+    if not start_digest or not target_digest or start_digest == target_digest:
+        return None
+    deltas_by_source = {}
+    for delta in manifest.get("deltas", []):
+        deltas_by_source.setdefault(delta.get("from"), []).append(delta)
+    frontier = [(start_digest, [])]
+    visited = {start_digest}
+    while frontier:
+        next_frontier = []
+        for digest, chain in frontier:
+            for delta in deltas_by_source.get(digest, []):
+                if delta.get("to") == target_digest:
+                    return chain + [delta]
+                if delta.get("to") not in visited:
+                    visited.add(delta.get("to"))
+                    next_frontier.append((delta.get("to"), chain + [delta]))
+        frontier = next_frontier
+    return None
+
+
+def _remember_content_digest(meta_path, meta, content_digest):
+    """Guarda en `meta` el digest de la versión actual para no recalcularlo en cada comprobación."""
+    meta["current_content_digest"] = content_digest
+    with _DPD_DB_META_LOCK:
+        latest_meta = _load_json_file(meta_path, default={})
+        if latest_meta.get("current_version", "") != meta.get("current_version", ""):
+            return
+        latest_meta["current_content_digest"] = content_digest
+        _save_json_file(meta_path, latest_meta)
+
+
+def _try_delta_update(previous_db, incoming_dir, meta, meta_path, timeout):
+    """Actualiza con parches de `DPD_DB_DELTA_MANIFEST_URL` en vez de la descarga completa.
+
+    Copia la base actual a `incoming_dir`, aplica la cadena de parches hasta
+    `manifest["latest"]` verificando el SHA-256 de cada parche y el digest de
+    contenido final. Devuelve un resultado como el de `_download_dpd_db`, o None
+    si no hay manifiesto, no hay cadena o algo falla (y entonces se descarga todo).
+
+    El digest de la base local se calcula al instalarla y se lee de `meta`; solo
+    las instalaciones anteriores a guardarlo lo calculan aquí, una vez. Las bases
+    slim no se parchean: sus filas no son las de la release publicada.
+    """
+    import urllib.request
+
+    manifest_url = os.environ.get("DPD_DB_DELTA_MANIFEST_URL", "").strip()
+    if not manifest_url:
+        return None
+    if meta.get("current_slim") or _slim_install():
+        logger.info("Instalación slim de dpd.db: sin parches, descarga completa")
+        return None
+    started = time.perf_counter()
+    part_path = incoming_dir / "dpd.db.delta.part"
+    try:
+        with urllib.request.urlopen(manifest_url, timeout=timeout) as response:
+            manifest = json.loads(response.read().decode("utf-8"))
+        if manifest.get("format") != DPD_DELTA_MANIFEST_FORMAT:
+            logger.warning("%s no es un manifiesto de parches de dpd.db", manifest_url)
+            return None
+        local_digest = meta.get("current_content_digest", "")
+        if not local_digest:
+            local_digest = dpd_db_content_digest(previous_db)
+            _remember_content_digest(meta_path, meta, local_digest)
+        chain = _find_delta_chain(manifest, local_digest, manifest.get("latest", ""))
+        if not chain:
+            logger.info("No hay cadena de parches desde %s; descarga completa", local_digest[:12])
+            return None
+
+        shutil.copyfile(previous_db, part_path)
+        delta_bytes = 0
+        for delta in chain:
+            buffer = io.BytesIO()
+            reader = _ResumableResponse(urllib.parse.urljoin(manifest_url, delta["url"]), timeout)
+            try:
+                _copy_stream(reader, buffer)
+            finally:
+                reader.close()
+            if reader.hasher.hexdigest() != delta.get("sha256"):
+                raise _ChecksumMismatch(f"SHA-256 inesperado en el parche {delta['url']}")
+            delta_bytes += reader.offset
+            buffer.seek(0)
+            apply_dpd_delta(part_path, buffer)
+        content_digest = dpd_db_content_digest(part_path)
+        if content_digest != chain[-1]["to"]:
+            raise _ChecksumMismatch("El contenido parcheado no coincide con la release esperada")
+        optimization = _optimize_downloaded_dpd_db(part_path, None, slim=False)
+        part_path.replace(incoming_dir / "dpd.db")
+    except Exception:
+        logger.exception("Error aplicando parches de dpd.db; se recurre a la descarga completa")
+        return None
+    finally:
+        if part_path.exists():
+            part_path.unlink()
+
+    seconds = max(time.perf_counter() - started, 1e-6)
+    logger.info(
+        "dpd.db actualizada con %s parche(s): %s bytes en %.1fs", len(chain), delta_bytes, seconds
+    )
+    return {
+        "sha256": content_digest,
+        "bytes": delta_bytes,
+        "seconds": round(seconds, 3),
+        "throughput_mbps": round(delta_bytes * 8 / seconds / 1_000_000, 2),
+        "workers": 1,
+        "optimization": optimization,
+        "delta_chain": len(chain),
+        "content_digest": content_digest,
+    }
+
+
+def _start_background_db_download(
+    download_url, target_dir, target_db, timeout, meta, meta_path, remote_signature, sessions_store=None
+):
+    """Descarga dpd.db en un hilo de fondo para no bloquear el script de Streamlit.
+
+    La release nueva se descarga en `versions/_incoming/` y se instala como un
+    directorio de versión nuevo; la anterior queda retirada hasta que
+    `_gc_dpd_db_versions` la borra. `target_db` es la base gestionada actual.
+    """
+    # El hilo de fondo no tiene contexto de script: resolvemos el store aquí.
+    if sessions_store is None:
+        sessions_store = get_sessions_store()
+
+    # Lock con PID y latido: si el proceso que descargaba murió, se reclama.
+    # Cubre también la optimización/slim posterior, que corre dentro del worker.
+    download_lock = ProvisioningLock(target_dir / ".dpd_db_downloading")
+    if not download_lock.acquire():
+        return
+
+    def _worker():
+        previous_db = target_db if _is_valid_dpd_db(target_db) else None
+        previous_version = ""
+        if previous_db is not None:
+            previous_version = "legacy" if previous_db == target_dir / "dpd.db" else previous_db.parent.name
+        incoming_dir = target_dir / "versions" / "_incoming"
+        incoming_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with pinned_dpd_db(str(previous_db) if previous_db else ""):
+                download_result = None
+                if previous_db is not None:
+                    download_result = _try_delta_update(previous_db, incoming_dir, meta, meta_path, timeout)
+                if download_result is None:
+                    download_result = _download_dpd_db(
+                        download_url, incoming_dir, incoming_dir / "dpd.db", timeout,
+                        remote_signature=remote_signature,
+                    )
+                if not download_result or not _is_valid_dpd_db(incoming_dir / "dpd.db"):
+                    return
+                version_id = download_result["sha256"][:16]
+                new_db = _install_dpd_db_version(target_dir, incoming_dir, version_id)
+                with _DPD_DB_META_LOCK:
+                    meta.update(_load_json_file(meta_path, default={}))
+                    retired_versions = dict(meta.get("retired_versions", {}))
+                    if previous_version and previous_version != version_id:
+                        retired_versions[previous_version] = _utcnow().isoformat()
+                    meta.update(
+                        {
+                            "download_url": download_url,
+                            "updated_at": _utcnow().isoformat(),
+                            "last_checked_at": _utcnow().isoformat(),
+                            "remote_signature": remote_signature,
+                            "download_sha256": download_result["sha256"],
+                            "download_bytes": download_result["bytes"],
+                            "last_download": download_result,
+                            "current_version": version_id,
+                            "current_content_digest": download_result.get("content_digest", ""),
+                            "current_slim": bool((download_result.get("optimization") or {}).get("slim")),
+                            "retired_versions": retired_versions,
+                            "last_known_good_path": str(new_db.resolve()),
+                        }
+                    )
+                    _save_json_file(meta_path, meta)
+                get_dpd_db_path.clear()
+                try:
+                    release_tag = _release_tag_from_url(
+                        (remote_signature or {}).get("resolved_url")
+                    ) or _release_tag_from_url(download_url)
+                    _store_dpd_db_stats(meta_path, compute_dpd_db_stats(new_db, release_tag=release_tag))
+                except (OSError, sqlite3.Error):
+                    logger.exception("Error calculando estadísticas de %s", new_db)
+                if previous_db is not None and previous_version != version_id:
+                    release_info = {
+                        "dpd_db_updated_at": meta["updated_at"],
+                        "dpd_db_etag": (remote_signature or {}).get("etag", ""),
+                        "dpd_db_version": version_id,
+                    }
+                    try:
+                        regloss_report = regloss_saved_sessions(
+                            sessions_store, previous_db, new_db, release_info=release_info
+                        )
+                        with _DPD_DB_META_LOCK:
+                            latest_meta = _load_json_file(meta_path, default={})
+                            latest_meta["last_regloss"] = regloss_report
+                            _save_json_file(meta_path, latest_meta)
+                    except Exception:
+                        logger.exception("Error re-glosando sesiones guardadas tras actualizar dpd.db")
+            _gc_dpd_db_versions(target_dir, meta_path)
+        finally:
+            download_lock.release()
+
+    t = threading.Thread(target=_worker, daemon=True)
+    t.start()
+
+
+_DPD_DB_VALIDATION_CACHE = {}
+_DPD_DB_VALIDATION_LOCK = threading.Lock()
+_DPD_DB_UPDATE_CHECK_LOCK = threading.Lock()
+
+
+def _is_valid_dpd_db_cached(path):
+    """`_is_valid_dpd_db` memoizado por `stat` (mtime, tamaño e inodo) del archivo.
+
+    Un reemplazo atómico cambia el inodo, así que una base nueva se revalida.
+    """
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return False
+    cache_key = str(path.resolve())
+    stat_key = (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+    with _DPD_DB_VALIDATION_LOCK:
+        cached = _DPD_DB_VALIDATION_CACHE.get(cache_key)
+    if cached and cached[0] == stat_key:
+        return cached[1]
+    valid = _is_valid_dpd_db(path)
+    with _DPD_DB_VALIDATION_LOCK:
+        _DPD_DB_VALIDATION_CACHE[cache_key] = (stat_key, valid)
+    return valid
+
+
+def _select_dpd_db(meta):
+    """Primera base válida: la última conocida en `meta` o, si no, el escaneo de candidatos."""
+    last_known_good = meta.get("last_known_good_path", "")
+    if last_known_good and not os.environ.get("DPD_DB_PATH", "").strip():
+        last_known_good_path = Path(last_known_good)
+        if _is_valid_dpd_db_cached(last_known_good_path):
+            return last_known_good_path.resolve()
+
+    seen = set()
+    candidates = _build_dpd_db_candidates()
+    managed_db = _managed_dpd_db_path(DPD_DB_DIR, meta)
+    if managed_db != DPD_DB_DIR / "dpd.db":
+        candidates.insert(1 if os.environ.get("DPD_DB_PATH", "").strip() else 0, managed_db)
+    for candidate in candidates:
+        resolved = str(candidate.resolve()) if candidate.exists() else str(candidate)
+        if resolved in seen:
+            continue
+        seen.add(resolved)
+        if _is_valid_dpd_db_cached(candidate):
+            return candidate.resolve()
+    return None
+
+
+def _check_dpd_db_update(download_url, target_dir, target_db, meta_path, has_db, sessions_store):
+    """Consulta el release remoto y, si hay uno nuevo (o no hay base), lanza su descarga."""
+    timeout = int(os.environ.get("DPD_DB_DOWNLOAD_TIMEOUT", "300"))
+    head_timeout = int(os.environ.get("DPD_DB_HEAD_TIMEOUT", "10"))
+    auto_update = _as_bool(os.environ.get("DPD_DB_AUTO_UPDATE", "1"), default=True)
+    interval_hours = int(os.environ.get("DPD_DB_UPDATE_INTERVAL_HOURS", "24"))
+
+    _gc_dpd_db_versions(target_dir, meta_path)
+    meta = _load_json_file(meta_path, default={})
+    if has_db and not (auto_update and _should_check_update(meta.get("last_checked_at", ""), interval_hours)):
+        return
+
+    remote_signature = _fetch_remote_signature(download_url, head_timeout)
+    should_download = not has_db
+    if has_db and remote_signature:
+        should_download = meta.get("remote_signature", {}) != remote_signature
+
+    if not should_download:
+        meta.update(
+            {
+                "download_url": download_url,
+                "last_checked_at": _utcnow().isoformat(),
+                "remote_signature": remote_signature or meta.get("remote_signature", {}),
+            }
+        )
+        _save_json_file(meta_path, meta)
+        return
+
+    _start_background_db_download(
+        download_url, target_dir, target_db, timeout, meta, meta_path, remote_signature,
+        sessions_store=sessions_store,
+    )
+
+
+def _start_background_update_check(download_url, target_dir, target_db, meta_path, has_db):
+    """Lanza `_check_dpd_db_update` en un hilo; como mucho una comprobación a la vez."""
+    if not _DPD_DB_UPDATE_CHECK_LOCK.acquire(blocking=False):
+        return
+    try:
+        sessions_store = get_sessions_store()
+    except Exception:
+        _DPD_DB_UPDATE_CHECK_LOCK.release()
+        raise
+
+    def _worker():
+        try:
+            _check_dpd_db_update(download_url, target_dir, target_db, meta_path, has_db, sessions_store)
+        except Exception:
+            logger.exception("Error comprobando actualizaciones de dpd.db")
+        finally:
+            _DPD_DB_UPDATE_CHECK_LOCK.release()
+
+    threading.Thread(target=_worker, daemon=True, name="dpd-update-check").start()
+
+
+def ensure_dpd_db_available():
+    """Devuelve una `dpd.db` local utilizable sin esperar a la red.
+
+    Usa la última ruta válida conocida (o el escaneo de candidatos, validados una
+    vez por `stat`) y deja la consulta de releases remotos a un hilo de fondo, que
+    solo instala una base nueva cuando está descargada y verificada.
+    """
+    target_dir = DPD_DB_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+    meta_path = target_dir / ".dpd_db_meta.json"
+
+    meta = _load_json_file(meta_path, default={})
+    target_db = _managed_dpd_db_path(target_dir, meta)
+    selected_db = _select_dpd_db(meta)
+    if selected_db is not None and meta.get("last_known_good_path") != str(selected_db):
+        meta["last_known_good_path"] = str(selected_db)
+        _save_json_file(meta_path, meta)
+
+    if selected_db and selected_db != target_db.resolve():
+        return str(selected_db)
+
+    download_url = _resolve_dpd_db_download_url()
+    if download_url:
+        _start_background_update_check(download_url, target_dir, target_db, meta_path, selected_db is not None)
+    return str(selected_db) if selected_db else ""
+
+
+@memoize(maxsize=1)
+def get_dpd_db_path():
+    """Encuentra una base `dpd.db` válida usando referencias relativas al proyecto.
+
+    El resultado se cachea para evitar re-escaneos y comprobaciones de releases en
+    cada rerun de Streamlit (por ejemplo, al pulsar 'Cargar sesión').
+    """
+    return ensure_dpd_db_available()
+
+
+_FOLLOWED_META_STATE = {"stat": None}
+_FOLLOWED_META_LOCK = threading.Lock()
+
+
+def follow_dpd_db_path():
+    """`get_dpd_db_path()` para procesos de larga vida (servicio HTTP, daemon).
+
+    Otro proceso (la UI, la CLI) puede instalar una release nueva: si el archivo
+    de metadatos cambió desde la última resolución, se vacía la caché de
+    `get_dpd_db_path` y se resuelve de nuevo. Sin cambios solo cuesta un `stat`.
+    """
+    meta_path = DPD_DB_DIR / ".dpd_db_meta.json"
+    try:
+        stat_result = meta_path.stat()
+        meta_key = (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+    except FileNotFoundError:
+        meta_key = None
+    with _FOLLOWED_META_LOCK:
+        if meta_key != _FOLLOWED_META_STATE["stat"]:
+            get_dpd_db_path.clear()
+            _FOLLOWED_META_STATE["stat"] = meta_key
+    return get_dpd_db_path()
+
+
+_DPD_DB_STATS_KEEP = 8
+_DPD_DB_STATS_CACHE = {}
+
+
+def _release_tag_from_url(url):
+    match = re.search(r"/releases/download/([^/]+)/", url or "")
+    return urllib.parse.unquote(match.group(1)) if match else ""
+
+
+def compute_dpd_db_stats(dpd_db_path, release_tag=""):
+    """Recuentos y datos de archivo de una dpd.db; se calcula al aprovisionarla."""
+    path = Path(dpd_db_path)
+    counts = {}
+    conn = sqlite3.connect(str(path))
+    try:
+        for key, table in (("lookup_entries", "lookup"), ("headwords", "dpd_headwords"), ("roots", "dpd_roots")):
+            try:
+                counts[key] = int(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+            except sqlite3.OperationalError:
+                counts[key] = 0
+    finally:
+        conn.close()
+    stat_result = path.stat()
+    return {
+        "version": dpd_db_version_id(path),
+        **counts,
+        "release_tag": release_tag,
+        "size_bytes": stat_result.st_size,
+        "built_at": datetime.fromtimestamp(stat_result.st_mtime, timezone.utc).isoformat(timespec="seconds"),
+        "computed_at": _utcnow().isoformat(timespec="seconds"),
+    }
+
+
+def _store_dpd_db_stats(meta_path, stats):
+    """Guarda `stats` en `db_stats` de los metadatos, indexado por versión."""
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    with _DPD_DB_META_LOCK:
+        meta = _load_json_file(meta_path, default={})
+        all_stats = dict(meta.get("db_stats", {}))
+        all_stats[stats["version"]] = stats
+        for version in sorted(all_stats, key=lambda item: all_stats[item].get("computed_at", ""))[:-_DPD_DB_STATS_KEEP]:
+            all_stats.pop(version)
+        meta["db_stats"] = all_stats
+        _save_json_file(meta_path, meta)
+    _DPD_DB_STATS_CACHE[stats["version"]] = stats
+    return stats
+
+
+def get_dpd_db_stats(dpd_db_path):
+    """Estadísticas de `dpd_db_path` (entradas, headwords, raíces, release, tamaño).
+
+    Se leen de los metadatos sin tocar la base. Si aún no existen (una base
+    externa o anterior a este registro) se calculan en segundo plano y mientras
+    tanto se devuelve None.
+    """
+    if not dpd_db_path:
+        return None
+    version = dpd_db_version_id(dpd_db_path)
+    if not version:
+        return None
+    stats = _DPD_DB_STATS_CACHE.get(version)
+    if stats:
+        return stats
+    meta_path = DPD_DB_DIR / ".dpd_db_meta.json"
+    stats = _load_json_file(meta_path, default={}).get("db_stats", {}).get(version)
+    if stats:
+        _DPD_DB_STATS_CACHE[version] = stats
+        return stats
+
+    def _refresh():
+        try:
+            # Con una base externa `dpd-db/` puede no existir todavía.
+            DPD_DB_DIR.mkdir(parents=True, exist_ok=True)
+            provision_once(
+                f"dpd_db_stats:{version}",
+                DPD_DB_DIR / ".dpd_db_stats.lock",
+                lambda: _store_dpd_db_stats(meta_path, compute_dpd_db_stats(dpd_db_path)),
+                wait_seconds=60,
+            )
+        except Exception:
+            logger.exception("Error calculando estadísticas de %s", dpd_db_path)
+
+    threading.Thread(target=_refresh, daemon=True, name="dpd-db-stats").start()
+    return None
+
+
+# Índices que se crean tras la descarga si la consulta asociada recorre la tabla entera.
+# `dpd_headwords.id` suele ser INTEGER PRIMARY KEY y entonces no necesita índice.
+_DPD_DB_INDEXES = [
+    ("lookup", "idx_pali_lem_lookup_key", "lookup(lookup_key)"),
+    ("headwords_by_id", "idx_pali_lem_headwords_id", "dpd_headwords(id)"),
+    ("roots", "idx_pali_lem_roots_root", "dpd_roots(root)"),
+    ("root_group", "idx_pali_lem_roots_root", "dpd_roots(root)"),
+    ("headwords_by_lemma", "idx_pali_lem_headwords_lemma", "dpd_headwords(lower(lemma_1))"),
+]
+
+
+def _query_plan_full_scans(conn, query, params):
+    """Devuelve los pasos `SCAN <tabla>` del plan de `query` (recorridos completos)."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [
+        row[-1]
+        for row in rows
+        if str(row[-1]).startswith("SCAN ") and not str(row[-1]).startswith("SCAN CONSTANT")
+    ]
+
+
+def dpd_gloss_query_full_scans(dpd_db_path):
+    """Mapea cada consulta de glosado que recorre una tabla entera a sus pasos `SCAN`."""
+    conn = sqlite3.connect(str(dpd_db_path))
+    try:
+        full_scans = {}
+        for name, (query, params) in DPD_GLOSS_QUERIES.items():
+            scans = _query_plan_full_scans(conn, query, params)
+            if scans:
+                full_scans[name] = scans
+        return full_scans
+    finally:
+        conn.close()
+
+
+def _optimize_dpd_db(db_path):
+    """Prepara una dpd.db recién descargada: índices de glosado, ANALYZE y VACUUM.
+
+    Solo crea un índice si la consulta que lo usaría hace hoy un recorrido completo,
+    así que es idempotente y no duplica índices que la release ya traiga.
+    """
+    started = time.perf_counter()
+    size_before = os.path.getsize(db_path)
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        indexes_created = []
+        for query_name, index_name, target in _DPD_DB_INDEXES:
+            query, params = DPD_GLOSS_QUERIES[query_name]
+            try:
+                needs_index = bool(_query_plan_full_scans(conn, query, params))
+            except sqlite3.OperationalError:
+                # Tabla o columna ausente en esta release: nada que indexar.
+                continue
+            if needs_index:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {target}")
+                indexes_created.append(index_name)
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return {
+        "indexes_created": indexes_created,
+        "analyzed": True,
+        "vacuumed": True,
+        "size_before": size_before,
+        "size_after": os.path.getsize(db_path),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+# Columnas que leen las consultas de glosado; la base "slim" conserva solo estas.
+DPD_SLIM_COLUMNS = {
+    "lookup": ("lookup_key", "headwords", "grammar"),
+    "dpd_headwords": (
+        "id", "lemma_1", "pos", "grammar", "meaning_1", "meaning_2", "meaning_lit", "sanskrit",
+        "root_key", "root_sign", "derived_from", "construction", "stem", "pattern",
+    ),
+    "dpd_roots": ("root", "root_sign", "root_group"),
+}
+
+
+def build_slim_dpd_db(source_path, output_path):
+    """Deriva de `source_path` una dpd.db con solo las tablas y columnas del glosado.
+
+    Conserva tipos y la clave primaria de cada columna, la optimiza con
+    `_optimize_dpd_db` y la instala en `output_path` de forma atómica.
+    Devuelve `{"source_bytes", "slim_bytes", "tables", "optimization"}`.
+    """
+    source_path = Path(source_path)
+    output_path = Path(output_path)
+    part_path = output_path.with_name(output_path.name + ".part")
+    if part_path.exists():
+        part_path.unlink()
+    conn = sqlite3.connect(str(part_path), isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (str(source_path),))
+        conn.execute("BEGIN")
+        for table, columns in DPD_SLIM_COLUMNS.items():
+            source_columns = {
+                row[1]: row for row in conn.execute(f"PRAGMA source.table_info({table})").fetchall()
+            }
+            missing = [column for column in columns if column not in source_columns]
+            if missing:
+                raise ValueError(f"{source_path}: faltan columnas en {table}: {', '.join(missing)}")
+            primary_keys = [name for name, row in source_columns.items() if row[5]]
+            definitions = []
+            for column in columns:
+                column_type = source_columns[column][2]
+                definition = f'"{column}" {column_type}'.strip()
+                if primary_keys == [column]:
+                    definition += " PRIMARY KEY"
+                definitions.append(definition)
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            conn.execute(f"CREATE TABLE {table} ({', '.join(definitions)})")
+            conn.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM source.{table}")
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE source")
+    except Exception:
+        conn.close()
+        if part_path.exists():
+            part_path.unlink()
+        raise
+    conn.close()
+    try:
+        optimization = _optimize_dpd_db(part_path)
+        part_path.replace(output_path)
+    finally:
+        if part_path.exists():
+            part_path.unlink()
+    return {
+        "source_bytes": os.path.getsize(source_path),
+        "slim_bytes": os.path.getsize(output_path),
+        "tables": {table: list(columns) for table, columns in DPD_SLIM_COLUMNS.items()},
+        "optimization": optimization,
+    }
+
+
+def _optimize_downloaded_dpd_db(db_path, optimize, slim=None):
+    """Optimiza (o reduce a slim) la base descargada; un fallo no impide instalarla.
+
+    Con `slim` (por defecto `DPD_DB_SLIM=0`) la base completa se sustituye por su
+    versión slim, que ya sale optimizada.
+    """
+    if _slim_install(slim):
+        slim_path = Path(db_path).with_name("dpd.slim.db.part")
+        try:
+            slim_report = build_slim_dpd_db(db_path, slim_path)
+        except (sqlite3.Error, ValueError) as exc:
+            logger.exception("Error generando la base slim desde %s; se instala la completa", db_path)
+            if slim_path.exists():
+                slim_path.unlink()
+            return {"error": str(exc)}
+        slim_path.replace(db_path)
+        logger.info(
+            "dpd.db slim: %s → %s bytes", slim_report["source_bytes"], slim_report["slim_bytes"]
+        )
+        return dict(slim_report["optimization"], slim=True, source_bytes=slim_report["source_bytes"])
+    if optimize is None:
+        optimize = _as_bool(os.environ.get("DPD_DB_OPTIMIZE", "1"), default=True)
+    if not optimize:
+        return None
+    try:
+        report = _optimize_dpd_db(db_path)
+    except sqlite3.Error as exc:
+        logger.exception("Error optimizando %s; se instala sin optimizar", db_path)
+        return {"error": str(exc)}
+    logger.info(
+        "dpd.db optimizada en %.1fs: índices=%s, %s → %s bytes",
+        report["seconds"], report["indexes_created"] or "ninguno", report["size_before"], report["size_after"],
+    )
+    return report
@@ -0,0 +1,192 @@
+"""Motor de glosado de larga vida: conexiones a dpd.db reutilizadas y caché por forma.
+
+`lookup_words_in_dpd` cachea por texto completo y abre una conexión por consulta,
+lo justo para reruns de Streamlit. Un servicio o un lote que glosa miles de textos
+distintos necesita otra cosa: que `ca`, `na` o `bhikkhave` se busquen una sola vez
+y que las conexiones se reutilicen entre peticiones. `GlossEngine` es ese motor y
+lo comparten el glosado por lotes, el servicio HTTP y el daemon de la CLI.
+"""
+
+import contextlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from .formatting import _entry_has_lexical_data
+from .lookup import _query_dpd_lookup, dpd_db_version_id, pinned_dpd_db, process_pali_text, process_pali_with_lookup_map
+from .text import _dedupe, _normalize_token, tokenize_pali_text
+
+# Formas distintas (encontradas o no) que recuerda el motor antes de expulsar las más antiguas.
+ENGINE_CACHE_SIZE = 200_000
+_MISSING = object()
+
+
+class GlossEngine:
+    """Glosa textos contra una dpd.db (o el diccionario JSON si no hay base).
+
+    Es seguro usarlo desde varios hilos: cada consulta toma una conexión del pool
+    y la caché LRU se protege con un lock. Las formas sin entrada también se
+    cachean, así que una palabra desconocida no vuelve a consultar la base.
+    """
+
+    def __init__(self, dpd_db_path="", fallback_dictionary=None, cache_size=ENGINE_CACHE_SIZE):
+        self.dpd_db_path = dpd_db_path or ""
+        self.fallback_dictionary = fallback_dictionary if isinstance(fallback_dictionary, dict) else {}
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._connections = []
+        self._version = dpd_db_version_id(self.dpd_db_path) if self.dpd_db_path else ""
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    # -- conexiones ---------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _connection(self, dpd_db_path, version):
+        with self._lock:
+            conn = self._connections.pop() if self._connections and version == self._version else None
+        if conn is None:
+            # Cada conexión la usa un solo hilo a la vez; el pool solo la reutiliza.
+            conn = sqlite3.connect(dpd_db_path, check_same_thread=False)
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        with self._lock:
+            if version == self._version:
+                self._connections.append(conn)
+                return
+        # La base cambió mientras se usaba: la conexión apunta al archivo anterior.
+        conn.close()
+
+    def close(self):
+        """Cierra las conexiones libres del pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def _check_version(self):
+        """Vacía caché y pool si el archivo de `dpd_db_path` fue reemplazado."""
+        dpd_db_path = self.dpd_db_path
+        version = dpd_db_version_id(dpd_db_path)
+        with self._lock:
+            # Un `switch_dpd_db` concurrente ya dejó versión, caché y pool al día.
+            if dpd_db_path != self.dpd_db_path or version == self._version:
+                return
+            self._version = version
+            self._cache.clear()
+        self.close()
+
+    def switch_dpd_db(self, dpd_db_path):
+        """Pasa a glosar contra `dpd_db_path` (p. ej. una release recién instalada).
+
+        Las consultas en curso terminan contra la base anterior, pero lo que
+        encuentran ya no entra en la caché ni sus conexiones vuelven al pool.
+        """
+        dpd_db_path = dpd_db_path or ""
+        if dpd_db_path == self.dpd_db_path:
+            return
+        version = dpd_db_version_id(dpd_db_path) if dpd_db_path else ""
+        with self._lock:
+            self.dpd_db_path = dpd_db_path
+            self._version = version
+            self._cache.clear()
+        self.close()
+
+    # -- consultas ----------------------------------------------------------
+
+    def lookup(self, words):
+        """Como `lookup_words_in_dpd`, pero con caché por forma compartida entre llamadas."""
+        if not self.dpd_db_path:
+            return {}
+        words = [word for word in _dedupe(words) if word]
+        self._check_version()
+        result, pending = {}, []
+        with self._lock:
+            dpd_db_path, version = self.dpd_db_path, self._version
+            for word in words:
+                entry = self._cache.get(word, _MISSING)
+                if entry is _MISSING:
+                    pending.append(word)
+                    continue
+                self._cache.move_to_end(word)
+                if entry is not None:
+                    result[word] = entry
+            self.hits += len(words) - len(pending)
+            self.misses += len(pending)
+        if not pending or not dpd_db_path:
+            return result
+
+        with pinned_dpd_db(dpd_db_path), self._connection(dpd_db_path, version) as conn:
+            found = _query_dpd_lookup(tuple(pending), dpd_db_path, conn=conn)
+        with self._lock:
+            self.queries += 1
+            if version == self._version:
+                for word in pending:
+                    self._cache[word] = found.get(word)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        result.update(found)
+        return result
+
+    def lookup_raw(self, words):
+        """`lookup` para formas sin normalizar (como llegan de un cliente externo)."""
+        normalized = {word: _normalize_token(str(word)) for word in words}
+        entries = self.lookup(normalized.values())
+        return {word: entries.get(norm) for word, norm in normalized.items()}
+
+    def gloss(self, text):
+        """Entradas de glosa de `text`, como `process_pali_with_lookup_map`."""
+        return self.gloss_many([text])[0]
+
+    def gloss_many(self, texts):
+        """Glosa varios textos con una sola consulta para todas sus formas nuevas."""
+        if not self.dpd_db_path:
+            return [process_pali_text(text, self.fallback_dictionary) for text in texts]
+        lookup_map = self.lookup(word for text in texts for word in tokenize_pali_text(text))
+        return [
+            process_pali_with_lookup_map(text, lookup_map, fallback_dictionary=self.fallback_dictionary)
+            for text in texts
+        ]
+
+    def cache_info(self):
+        with self._lock:
+            return {
+                "forms": len(self._cache),
+                "max_forms": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "queries": self.queries,
+                "pooled_connections": len(self._connections),
+            }
+
+
+def coverage_counts(gloss_entries):
+    """`(palabras, encontradas, formas sin glosa → apariciones)` de una glosa."""
+    word_total, found_words, missing = 0, 0, {}
+    for entry in gloss_entries:
+        if entry.get("part_of_speech") == "SEP":
+            continue
+        word_total += 1
+        if _entry_has_lexical_data(entry):
+            found_words += 1
+        else:
+            missing[entry.get("word")] = missing.get(entry.get("word"), 0) + 1
+    return word_total, found_words, missing
+
+
+def gloss_line_record(line_number, text, gloss_entries):
+    """Objeto JSONL de una línea glosada: `{"line", "text", "entries", "words", "found", "coverage"}`."""
+    word_total, found_words, _ = coverage_counts(gloss_entries)
+    return {
+        "line": line_number,
+        "text": text,
+        "entries": gloss_entries,
+        "words": word_total,
+        "found": found_words,
+        "coverage": round(found_words / word_total * 100, 2) if word_total else 0.0,
+    }
@@ -0,0 +1,249 @@
+"""Formatos de salida de una glosa: compacto, enriquecido y tarjetas HTML."""
+
+import html
+import re
+
+from .common import memoize
+
+
+POS_LABELS = {
+    "noun": "sustantivo",
+    "adj": "adjetivo",
+    "adjective": "adjetivo",
+    "verb": "verbo",
+    "adv": "adverbio",
+    "adverb": "adverbio",
+    "prep": "preposición",
+    "preposition": "preposición",
+    "conj": "conjunción",
+    "conjunction": "conjunción",
+    "pron": "pronombre",
+    "pronoun": "pronombre",
+    "num": "numeral",
+    "numeral": "numeral",
+    "part": "partícula",
+    "particle": "partícula",
+    "prefix": "prefijo",
+    "suffix": "sufijo",
+    "interj": "interjección",
+    "interjection": "interjección",
+    "idiom": "modismo",
+    "loc": "locativo",
+    "locative": "locativo",
+    "indeclinable": "indeclinable",
+    "ind": "indeclinable",
+}
+# Una sola pasada con todas las abreviaturas (las largas primero, para que
+# `adjective` no quede como `adjetivo` + `ective`).
+_POS_LABEL_RE = re.compile(
+    r"(?<!\w)(?:" + "|".join(re.escape(source) for source in sorted(POS_LABELS, key=len, reverse=True)) + r")(?!\w)",
+    re.IGNORECASE,
+)
+
+
+def humanize_part_of_speech(pos_value):
+    if not pos_value or pos_value == "---":
+        return ""
+    return _humanize_part_of_speech_cached(str(pos_value))
+
+
+# Hay pocas categorías distintas y se repiten en cada palabra de cada glosa.
+@memoize(maxsize=1024)
+def _humanize_part_of_speech_cached(pos_value):
+    parts = [part.strip() for part in pos_value.split(";")]
+    mapped = []
+    for part in parts:
+        if not part:
+            continue
+        mapped.append(_POS_LABEL_RE.sub(lambda match: POS_LABELS[match.group(0).lower()], part))
+    return "; ".join(mapped)
+
+# Generar formato compacto de glosa (una línea por palabra)
+def generate_compact_gloss(gloss_entries):
+    lines = []
+    for entry in gloss_entries:
+        if entry["part_of_speech"] == "SEP":
+            symbol = entry.get("separator_symbol", "")
+            line = f"{entry['word']} {symbol}".strip()
+            lines.append(line)
+            continue
+
+        pos = humanize_part_of_speech(entry.get('part_of_speech'))
+        morph = entry['morphology'] if entry['morphology'] != "---" else ""
+        meaning = entry['meaning']
+        
+        fallback_suffix = ""
+        if entry.get("match_type") == "fallback" and entry.get("matched_form") and entry.get("matched_form") != entry.get("word"):
+            fallback_suffix = f" [≈ {entry.get('matched_form')}]"
+
+        if pos and morph:
+            line = f"{entry['word']}{fallback_suffix} ({pos}) ({morph}): {meaning}"
+        elif pos:
+            line = f"{entry['word']}{fallback_suffix} ({pos}): {meaning}"
+        else:
+            line = f"{entry['word']}{fallback_suffix}: {meaning}"
+        
+        lines.append(line)
+    
+    return "\n".join(lines)
+
+
+def _display_value(value, fallback="—"):
+    if value is None:
+        return fallback
+    normalized = str(value).strip()
+    if not normalized or normalized in {"---", "N/A"}:
+        return fallback
+    return normalized
+
+
+def _same_content(value_a, value_b):
+    norm_a = re.sub(r"\s+", " ", str(value_a or "").strip()).lower()
+    norm_b = re.sub(r"\s+", " ", str(value_b or "").strip()).lower()
+    return bool(norm_a and norm_b and norm_a == norm_b)
+
+
+def _entry_has_lexical_data(entry):
+    if entry.get("part_of_speech") == "SEP":
+        return False
+
+    placeholders = {"", "---", "N/A", "—", "[No encontrado en diccionario]"}
+    fields = [
+        entry.get("part_of_speech"),
+        entry.get("morphology"),
+        entry.get("meaning"),
+        entry.get("root"),
+        entry.get("sanskrit_root"),
+        entry.get("etymology"),
+    ]
+    for value in fields:
+        normalized = str(value or "").strip()
+        if normalized and normalized not in placeholders:
+            return True
+    return False
+
+
+def _gloss_coverage_stats(gloss_entries):
+    """Devuelve `(encontradas, total, cobertura %)` de una lista de entradas."""
+    found_words = sum(1 for entry in gloss_entries if _entry_has_lexical_data(entry))
+    word_total = sum(1 for entry in gloss_entries if entry.get("part_of_speech") != "SEP")
+    coverage = (found_words / word_total * 100) if word_total else 0
+    return found_words, word_total, coverage
+
+
+def build_philological_gloss_html(gloss_entries):
+    """HTML de las tarjetas de glosa (una por palabra, chips para los separadores)."""
+    def _row(label, value, extra_class=""):
+        if value == "—":
+            val_html = f'<span class="gloss-dash">—</span>'
+        else:
+            val_html = html.escape(value)
+        return (
+            f'<div class="gloss-row {extra_class}">'
+            f'<span class="gloss-label">{label}</span>'
+            f'<span class="gloss-value">{val_html}</span>'
+            f'</div>'
+        )
+
+    # Todo el HTML en una sola cadena: la UI lo emite con un único st.markdown(), lo que
+    # evita la penalización de N llamadas individuales a Streamlit (crítico con 1000+ tarjetas).
+    parts = []
+    entry_number = 0
+    for entry in gloss_entries:
+        if entry.get("part_of_speech") == "SEP":
+            symbol = _display_value(entry.get("separator_symbol"), "")
+            parts.append(f'<span class="sep-chip">{html.escape(symbol)}</span>')
+            continue
+
+        entry_number += 1
+        word       = _display_value(entry.get("word"))
+        pos        = _display_value(humanize_part_of_speech(entry.get("part_of_speech")))
+        morphology = _display_value(entry.get("morphology"))
+        meaning    = _display_value(entry.get("meaning"))
+        translation = _display_value(entry.get("translation"))
+        show_translation = translation != "—" and not _same_content(meaning, translation)
+        root         = _display_value(entry.get("root"))
+        sanskrit_root = _display_value(entry.get("sanskrit_root"))
+        etymology    = _display_value(entry.get("etymology"))
+
+        has_data = _entry_has_lexical_data(entry)
+        card_class = "gloss-card" if has_data else "gloss-card not-found"
+
+        fallback_html = ""
+        if entry.get("match_type") == "fallback":
+            mf = _display_value(entry.get("matched_form"), "")
+            if mf and mf != word:
+                fallback_html = f'<span class="gloss-fallback"> ≈ {html.escape(mf)}</span>'
+
+        not_found_html = "" if has_data else ' <span title="No encontrado en el diccionario">⚠️</span>'
+        pos_badge = f'<span class="pos-badge">{html.escape(pos)}</span>' if pos != "—" else ""
+
+        rows_html = "".join([
+            _row("Morfología", morphology, "gloss-morph"),
+            _row("Significado", meaning, "gloss-meaning"),
+            (_row("Traducción", translation) if show_translation else ""),
+            _row("Raíz", root, "gloss-root"),
+            _row("Sánscrito", sanskrit_root),
+            _row("Etimología", etymology, "gloss-etym"),
+        ])
+
+        parts.append(
+            f'<div class="{card_class}">'
+            f'<div class="gloss-card-header">'
+            f'<span class="gloss-num">{entry_number}.</span>'
+            f'<span class="gloss-word">{html.escape(word)}</span>{fallback_html}{not_found_html}'
+            f' {pos_badge}'
+            f'</div>'
+            f'<div class="gloss-fields">{rows_html}</div>'
+            f'</div>'
+        )
+
+    return "\n".join(parts)
+
+
+def generate_rich_gloss_text(gloss_entries):
+    lines = []
+    entry_number = 0
+    for entry in gloss_entries:
+        if entry.get("part_of_speech") == "SEP":
+            symbol = _display_value(entry.get("separator_symbol"), "")
+            label = _display_value(entry.get("word"), "<SEP>")
+            lines.append(f"{label} {symbol}".strip())
+            continue
+
+        entry_number += 1
+        word = _display_value(entry.get("word"))
+        fallback_suffix = ""
+        if entry.get("match_type") == "fallback":
+            matched_form = _display_value(entry.get("matched_form"), "")
+            if matched_form and matched_form != word:
+                fallback_suffix = f" [≈ {matched_form}]"
+        pos = _display_value(humanize_part_of_speech(entry.get("part_of_speech")))
+        morphology = _display_value(entry.get("morphology"))
+        meaning = _display_value(entry.get("meaning"))
+        translation = _display_value(entry.get("translation"))
+        show_translation = translation != "—" and not _same_content(meaning, translation)
+        root = _display_value(entry.get("root"))
+        sanskrit_root = _display_value(entry.get("sanskrit_root"))
+        etymology = _display_value(entry.get("etymology"))
+
+        lines.extend(
+            [
+                f"{entry_number}. {word}{fallback_suffix}",
+                f"  Categoría: {pos}",
+                f"  Morfología: {morphology}",
+                f"  Significado: {meaning}",
+            ]
+        )
+        if show_translation:
+            lines.append(f"  Traducción: {translation}")
+        lines.extend(
+            [
+                f"  Raíz: {root}",
+                f"  Raíz sánscrita: {sanskrit_root}",
+                f"  Etimología: {etymology}",
+                "",
+            ]
+        )
+
+    return "\n".join(lines).strip()
@@ -0,0 +1,256 @@
+"""Almacén precalculado de glosas de un corpus conocido, por release de DPD.
+
+Un trabajo offline glosa el corpus canónico una vez por release y guarda la glosa
+de cada párrafo bajo el digest de su contenido normalizado:
+
+    digest   SHA-256 (16 bytes) de la secuencia de tokens del párrafo: la forma
+             normalizada de cada palabra y el símbolo de cada separador
+    entries  las entradas de glosa del párrafo, en JSON comprimido con zlib
+
+La glosa depende solo de esa secuencia, así que mayúsculas, espacios, saltos de
+línea o la forma Unicode del texto pegado no cambian el digest, y un párrafo
+repetido en el corpus se guarda una sola vez. Glosar un texto párrafo a párrafo
+da las mismas entradas que glosarlo entero (los párrafos se cortan en líneas en
+blanco, que nunca forman parte de un token): el texto se glosa con los párrafos
+del almacén y solo los que faltan se glosan en vivo.
+
+El almacén registra el `dpd_db_version_id` de la base con la que se construyó y
+la versión del diccionario de respaldo (`fallback_dictionary_version`) que
+resolvió las formas ausentes de la base; con otra dpd.db u otro
+`dpd_dictionary.json` no se usa y todo se glosa en vivo hasta reconstruirlo.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+from .common import PROJECT_ROOT, _utcnow, logger
+from .dictionary import dpd_json_version_id, fallback_dictionary_version
+from .lookup import dpd_db_version_id, lookup_words_in_dpd, process_pali_text, process_pali_with_lookup_map
+from .text import token_sequence_digest, tokenize_pali_text
+
+GLOSS_STORE_PATH = Path(os.environ.get("PALI_LEM_GLOSS_STORE", "") or PROJECT_ROOT / "gloss_store.db")
+GLOSS_STORE_FORMAT = "pali-lem-gloss-store/1"
+# Digests por consulta `IN (...)`, por debajo del límite de variables de SQLite.
+_DIGESTS_PER_QUERY = 500
+_PARAGRAPH_RE = re.compile(r"\n[^\S\n]*\n")
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE glosses (digest BLOB PRIMARY KEY, entries BLOB NOT NULL) WITHOUT ROWID;
+"""
+
+
+def split_paragraphs(text):
+    """Párrafos de `text`, separados por líneas en blanco."""
+    return [paragraph for paragraph in _PARAGRAPH_RE.split(text) if paragraph.strip()]
+
+
+def paragraph_digest(text):
+    """Digest del contenido normalizado de un párrafo (`None` si no tiene tokens)."""
+    return token_sequence_digest(text)
+
+
+def _encode_entries(gloss_entries):
+    return zlib.compress(json.dumps(gloss_entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def _decode_entries(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _corpus_fingerprint(input_paths):
+    """Cambia si se añade, quita o modifica algún archivo del corpus."""
+    digest = hashlib.sha256()
+    for path in input_paths:
+        stat_result = path.stat()
+        digest.update(f"{path}|{stat_result.st_size}|{stat_result.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def gloss_store_meta(store_path=GLOSS_STORE_PATH):
+    """Metadatos del almacén (`{}` si no existe o no es legible)."""
+    store_path = Path(store_path)
+    if not store_path.is_file():
+        return {}
+    try:
+        conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM meta"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        logger.warning("Almacén de glosas ilegible: %s", store_path, exc_info=True)
+        return {}
+
+
+def _store_file(input_path):
+    """Glosa los párrafos de un archivo (se ejecuta en un proceso del pool)."""
+    from .batch import _WORKER_STATE
+
+    try:
+        text = Path(input_path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as exc:
+        return {"input": str(input_path), "error": f"{type(exc).__name__}: {exc}"}
+    paragraphs = {}
+    for paragraph in split_paragraphs(text):
+        digest = paragraph_digest(paragraph)
+        if digest is not None:
+            paragraphs.setdefault(digest, paragraph)
+    engine = _WORKER_STATE["engine"]
+    glosses = engine.gloss_many(list(paragraphs.values()))
+    return {
+        "input": str(input_path),
+        "fallback_version": fallback_dictionary_version(engine.fallback_dictionary),
+        "paragraphs": [(digest, _encode_entries(entries)) for digest, entries in zip(paragraphs, glosses)],
+    }
+
+
+def build_gloss_store(input_paths, dpd_db_path, store_path=GLOSS_STORE_PATH, workers=None, force=False):
+    """Glosa `input_paths` con `workers` procesos y escribe el almacén en `store_path`.
+
+    Si el almacén ya corresponde a esta dpd.db, a este `dpd_dictionary.json` y a
+    este corpus (mismos archivos, tamaños y mtimes) no se rehace salvo con
+    `force`. Se construye en un archivo aparte y se reemplaza de una vez: los
+    lectores ven el almacén anterior o el nuevo, nunca uno a medias.
+    """
+    # La UI solo lee el almacén: el pool de procesos se importa al construirlo.
+    from .batch import map_batch_tasks
+
+    if not dpd_db_path:
+        raise ValueError("El almacén de glosas se construye contra una dpd.db")
+    input_paths = [Path(path) for path in input_paths]
+    store_path = Path(store_path)
+    version = dpd_db_version_id(dpd_db_path)
+    corpus = _corpus_fingerprint(input_paths)
+    # Lo que registrará `load_dictionary` en los procesos del pool; sin el archivo, un diccionario vacío.
+    fallback_version = dpd_json_version_id() or "none"
+    meta = gloss_store_meta(store_path)
+    if (
+        not force
+        and meta.get("dpd_db_version") == version
+        and meta.get("fallback_dictionary_version") == fallback_version
+        and meta.get("corpus") == corpus
+    ):
+        return {"up_to_date": True, "files": len(input_paths), "paragraphs": int(meta.get("paragraphs", 0))}
+
+    started = time.perf_counter()
+    results, workers = map_batch_tasks(_store_file, input_paths, dpd_db_path, workers=workers)
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = store_path.with_name(store_path.name + ".part")
+    temp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(temp_path))
+    failed, paragraphs = [], 0
+    try:
+        conn.executescript(_SCHEMA)
+        for result in results:
+            if "error" in result:
+                failed.append({"input": result["input"], "error": result["error"]})
+                continue
+            paragraphs += len(result["paragraphs"])
+            # La versión que usaron de verdad los procesos (el JSON pudo aprovisionarse al arrancar).
+            fallback_version = result["fallback_version"]
+            conn.executemany("INSERT OR IGNORE INTO glosses (digest, entries) VALUES (?, ?)", result["paragraphs"])
+        unique = conn.execute("SELECT COUNT(*) FROM glosses").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("format", GLOSS_STORE_FORMAT),
+                ("dpd_db_version", version),
+                ("fallback_dictionary_version", fallback_version),
+                ("corpus", corpus),
+                ("files", str(len(input_paths) - len(failed))),
+                ("paragraphs", str(unique)),
+                ("built_at", _utcnow().isoformat()),
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    temp_path.replace(store_path)
+    elapsed = time.perf_counter() - started
+    return {
+        "up_to_date": False,
+        "files": len(input_paths),
+        "failed": failed,
+        "paragraphs": paragraphs,
+        "unique": unique,
+        "size_bytes": store_path.stat().st_size,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def load_stored_glosses(digests, dpd_db_path, store_path=GLOSS_STORE_PATH, fallback_version="none"):
+    """Glosas guardadas para `digests` (`{digest: entradas}`).
+
+    `{}` si el almacén no vale para esta base o para el diccionario de respaldo
+    de versión `fallback_version` (la de `fallback_dictionary_version`).
+    """
+    store_path = Path(store_path)
+    digests = list(dict.fromkeys(digests))
+    if not digests or not dpd_db_path or not fallback_version or not store_path.is_file():
+        return {}
+    try:
+        conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        logger.warning("No se pudo abrir el almacén de glosas: %s", store_path, exc_info=True)
+        return {}
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('dpd_db_version', 'fallback_dictionary_version')"))
+        if meta.get("dpd_db_version") != dpd_db_version_id(dpd_db_path):
+            logger.debug("Almacén de glosas de otra dpd.db (%s): se ignora", meta.get("dpd_db_version", "-"))
+            return {}
+        if meta.get("fallback_dictionary_version") != fallback_version:
+            logger.debug(
+                "Almacén de glosas de otro diccionario de respaldo (%s): se ignora", meta.get("fallback_dictionary_version", "-")
+            )
+            return {}
+        stored = {}
+        for index in range(0, len(digests), _DIGESTS_PER_QUERY):
+            chunk = digests[index:index + _DIGESTS_PER_QUERY]
+            placeholders = ", ".join("?" * len(chunk))
+            for digest, blob in conn.execute(
+                f"SELECT digest, entries FROM glosses WHERE digest IN ({placeholders})", chunk
+            ):
+                stored[bytes(digest)] = _decode_entries(blob)
+        return stored
+    except sqlite3.Error:
+        logger.warning("Almacén de glosas ilegible: %s", store_path, exc_info=True)
+        return {}
+    finally:
+        conn.close()
+
+
+def gloss_with_store(text, dpd_db_path, fallback_dictionary=None, store_path=GLOSS_STORE_PATH, fallback_version=None):
+    """Glosa `text` con los párrafos precalculados y glosa en vivo solo los que faltan.
+
+    Da las mismas entradas que `process_pali_with_lookup_map` sobre el texto
+    entero: el almacén solo se usa si se construyó con el mismo diccionario de
+    respaldo (`fallback_version`, por omisión la del `dpd_dictionary.json` que
+    cargó `load_dictionary`). Devuelve `(entradas, {"paragraphs": N, "stored": M})`.
+    """
+    if not dpd_db_path:
+        return process_pali_text(text, fallback_dictionary), {"paragraphs": 0, "stored": 0}
+    paragraphs = [(paragraph, paragraph_digest(paragraph)) for paragraph in split_paragraphs(text)]
+    paragraphs = [(paragraph, digest) for paragraph, digest in paragraphs if digest is not None]
+    fallback_version = fallback_dictionary_version(fallback_dictionary, fallback_version)
+    stored = load_stored_glosses([digest for _, digest in paragraphs], dpd_db_path, store_path, fallback_version)
+
+    pending = [paragraph for paragraph, digest in paragraphs if digest not in stored]
+    lookup_map = {}
+    if pending:
+        lookup_map = lookup_words_in_dpd(tuple(word for paragraph in pending for word in tokenize_pali_text(paragraph)), dpd_db_path)
+    gloss_entries = []
+    for paragraph, digest in paragraphs:
+        if digest in stored:
+            gloss_entries.extend(stored[digest])
+        else:
+            gloss_entries.extend(process_pali_with_lookup_map(paragraph, lookup_map, fallback_dictionary=fallback_dictionary))
+    return gloss_entries, {"paragraphs": len(paragraphs), "stored": len(paragraphs) - len(pending)}
@@ -0,0 +1,689 @@
+"""Motor de búsqueda: consultas a dpd.db y construcción de entradas de glosa."""
+
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .common import _utcnow, logger, memoize
+from .provisioning import _pid_alive
+from .text import (
+    _dedupe,
+    _dedupe_normalized,
+    _generate_final_vowel_fallbacks,
+    _is_final_long_vowel_shortening,
+    _normalize_token,
+    _resolve_entry_with_fallback,
+    tokenize_pali_with_separators,
+)
+
+
+def _load_json_field(value, default):
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        logger.debug("_load_json_field: JSON inválido en campo: %r", value)
+        return default
+
+
+ROOT_GROUP_NAMES = {
+    "1": "bhvādi",
+    "2": "adādi",
+    "3": "juhotyādi",
+    "4": "divādi",
+    "5": "svādi",
+    "6": "tudādi",
+    "7": "rudhādi",
+    "8": "tanādi",
+    "9": "kryādi",
+    "10": "curādi",
+}
+
+
+def _build_root_label(root_sign, root_key, root_group):
+    if not root_key:
+        return ""
+
+    base_root = f"{root_sign or ''}{root_key}"
+    group_text = str(root_group).strip() if root_group is not None else ""
+    if group_text and group_text not in {"N/A", "---"}:
+        group_label = ROOT_GROUP_NAMES.get(group_text, "")
+        group_display = f"{group_text} ({group_label})" if group_label else group_text
+        if base_root.strip().endswith(f" {group_text}"):
+            if group_label:
+                return f"{base_root} ({group_label})"
+            return base_root
+        return f"{base_root} · {group_display}"
+    return base_root
+
+
+def _build_etymology_label(derived_from_values, construction_values, stem_values, pattern_values):
+    derived_from = "; ".join(_dedupe(derived_from_values))
+    construction = "; ".join(_dedupe(construction_values))
+    stem = "; ".join(_dedupe(stem_values))
+    pattern = "; ".join(_dedupe(pattern_values))
+
+    parts = []
+    if derived_from:
+        parts.append(f"deriva de {derived_from}")
+    if construction:
+        parts.append(f"construcción: {construction}")
+    if stem:
+        parts.append(f"tema: {stem}")
+    if pattern:
+        parts.append(f"patrón: {pattern}")
+
+    return " · ".join(parts)
+
+
+def _fetch_root_group(conn, root_key, root_sign, root_group_cache):
+    if not root_key:
+        return ""
+
+    cache_key = (str(root_sign or ""), str(root_key))
+    if cache_key in root_group_cache:
+        return root_group_cache[cache_key]
+
+    row = conn.execute(_ROOT_GROUP_QUERY, (root_key, root_sign or "")).fetchone()
+
+    root_group = ""
+    if row and row["root_group"] is not None:
+        root_group = str(row["root_group"]).strip()
+
+    root_group_cache[cache_key] = root_group
+    return root_group
+
+
+_SQLITE_MAX_VARS = 900  # SQLite limita a 999; usamos 900 para margen seguro
+
+
+def _sqlite_fetchall_chunked(conn, query_prefix, params, query_suffix=""):
+    """Ejecuta una query con IN(?) dividiendo params en chunks seguros para SQLite."""
+    rows = []
+    for i in range(0, len(params), _SQLITE_MAX_VARS):
+        chunk = params[i:i + _SQLITE_MAX_VARS]
+        placeholders = ",".join("?" for _ in chunk)
+        rows.extend(conn.execute(f"{query_prefix} ({placeholders}) {query_suffix}", chunk).fetchall())
+    return rows
+
+
+# Consultas de glosado sobre dpd.db (prefijos para `_sqlite_fetchall_chunked`).
+_LOOKUP_QUERY = "SELECT lookup_key, headwords, grammar FROM lookup WHERE lookup_key IN"
+_HEADWORDS_BY_ID_QUERY = (
+    "SELECT id, lemma_1, pos, grammar, meaning_1, meaning_2, meaning_lit, sanskrit,"
+    " root_key, root_sign, derived_from, construction, stem, pattern"
+    " FROM dpd_headwords WHERE id IN"
+)
+_ROOTS_QUERY = "SELECT root, root_sign, root_group FROM dpd_roots WHERE root IN"
+_HEADWORDS_BY_LEMMA_QUERY = (
+    "SELECT lemma_1, pos, grammar, meaning_1, meaning_2, meaning_lit, sanskrit, root_key, root_sign"
+    ", derived_from, construction, stem, pattern"
+    " FROM dpd_headwords WHERE lower(lemma_1) IN"
+)
+_ROOT_GROUP_QUERY = """
+        SELECT root_group
+        FROM dpd_roots
+        WHERE root = ?
+        ORDER BY CASE WHEN root_sign = ? THEN 0 ELSE 1 END
+        LIMIT 1
+        """
+
+# Consulta representativa de cada acceso de glosado, para EXPLAIN QUERY PLAN.
+DPD_GLOSS_QUERIES = {
+    "lookup": (f"{_LOOKUP_QUERY} (?)", ("dhammo",)),
+    "headwords_by_id": (f"{_HEADWORDS_BY_ID_QUERY} (?)", (1,)),
+    "roots": (f"{_ROOTS_QUERY} (?)", ("√dhar",)),
+    "headwords_by_lemma": (f"{_HEADWORDS_BY_LEMMA_QUERY} (?)", ("dhamma",)),
+    "root_group": (_ROOT_GROUP_QUERY, ("√dhar", "")),
+}
+
+
+READER_LEASE_SECONDS = float(os.environ.get("PALI_LEM_READER_LEASE_SECONDS", "120"))
+
+
+def _reader_lease_dir(dpd_db_path):
+    """Directorio de concesiones de lectura de una dpd.db (`dpd.db.readers/` al lado)."""
+    path = Path(dpd_db_path)
+    return path.with_name(path.name + ".readers")
+
+
+def _is_managed_dpd_db(path):
+    """Solo las bases gestionadas (las que el GC puede borrar) llevan concesiones."""
+    return path.parent.parent.name == "versions" or (path.parent / ".dpd_db_meta.json").exists()
+
+
+def _read_lease(lease_path):
+    try:
+        with open(lease_path, "r", encoding="utf-8") as file_handle:
+            owner = json.load(file_handle)
+        return owner if isinstance(owner, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+class _DpdDbReaders:
+    """Lectores activos por ruta de dpd.db.
+
+    Dentro del proceso es un contador. Para los demás procesos, el primer pin de
+    una base gestionada crea una concesión en `dpd.db.readers/<host>-<pid>-<token>.lease`
+    con `{pid, host, token, started_at}`, cuyo mtime renueva un latido mientras
+    haya lectores y hasta `PALI_LEM_READER_LEASE_SECONDS` (por defecto 120)
+    después del último; así una petición tras otra no crea y borra archivos.
+    Una versión con lectores, en este proceso o en otro, no se borra aunque ya
+    no sea la actual.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        # key -> [ruta de la concesión, último uso (monotonic)]
+        self._leases = {}
+        self._pid = os.getpid()
+        self._heartbeat_thread = None
+
+    @staticmethod
+    def _key(dpd_db_path):
+        return str(Path(dpd_db_path).resolve())
+
+    def _take_lease(self, key):
+        path = Path(key)
+        if not _is_managed_dpd_db(path):
+            return
+        host = socket.gethostname()
+        token = uuid.uuid4().hex
+        lease_path = _reader_lease_dir(path) / f"{host}-{os.getpid()}-{token}.lease"
+        owner = {"pid": os.getpid(), "host": host, "token": token, "started_at": _utcnow().isoformat()}
+        try:
+            lease_path.parent.mkdir(exist_ok=True)
+            with open(lease_path, "x", encoding="utf-8") as file_handle:
+                json.dump(owner, file_handle)
+        except OSError:
+            logger.debug("No se pudo crear la concesión de lectura de %s", key, exc_info=True)
+            return
+        self._leases[key] = [lease_path, time.monotonic()]
+        if self._heartbeat_thread is None:
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat, daemon=True, name="dpd-db-readers-heartbeat"
+            )
+            self._heartbeat_thread.start()
+
+    def _heartbeat(self):
+        interval = max(0.05, READER_LEASE_SECONDS / 4)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if self._pid != os.getpid():
+                    return
+                now = time.monotonic()
+                for key, lease in list(self._leases.items()):
+                    lease_path, last_used = lease
+                    if self._counts.get(key):
+                        lease[1] = now
+                    elif now - last_used > READER_LEASE_SECONDS:
+                        self._leases.pop(key)
+                        lease_path.unlink(missing_ok=True)
+                        continue
+                    try:
+                        os.utime(lease_path)
+                    except OSError:
+                        # La versión ya no existe: el próximo pin crea otra concesión.
+                        self._leases.pop(key)
+                if not self._leases:
+                    self._heartbeat_thread = None
+                    return
+
+    def pin(self, dpd_db_path):
+        key = self._key(dpd_db_path)
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso hijo (fork): las concesiones y el latido heredados son del padre.
+                self._pid = os.getpid()
+                self._counts, self._leases, self._heartbeat_thread = {}, {}, None
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if key in self._leases:
+                self._leases[key][1] = time.monotonic()
+            else:
+                self._take_lease(key)
+
+    def unpin(self, dpd_db_path):
+        key = self._key(dpd_db_path)
+        with self._lock:
+            remaining = self._counts.get(key, 0) - 1
+            if remaining > 0:
+                self._counts[key] = remaining
+            else:
+                self._counts.pop(key, None)
+                if key in self._leases:
+                    self._leases[key][1] = time.monotonic()
+
+    def is_pinned(self, dpd_db_path):
+        with self._lock:
+            return self._counts.get(self._key(dpd_db_path), 0) > 0
+
+    def has_readers(self, dpd_db_path):
+        """¿Tiene `dpd_db_path` lectores en este proceso o una concesión viva de otro?
+
+        Las concesiones de procesos muertos (mismo host) o sin latido desde hace
+        más de `PALI_LEM_READER_LEASE_SECONDS` se borran al pasar.
+        """
+        if self.is_pinned(dpd_db_path):
+            return True
+        lease_dir = _reader_lease_dir(Path(self._key(dpd_db_path)))
+        try:
+            lease_paths = list(lease_dir.glob("*.lease"))
+        except OSError:
+            return False
+        host = socket.gethostname()
+        live = False
+        for lease_path in lease_paths:
+            owner = _read_lease(lease_path)
+            pid = owner.get("pid")
+            if owner.get("host") == host and pid == os.getpid():
+                # Las propias solo prolongan el uso: cuenta el contador.
+                continue
+            try:
+                heartbeat_age = time.time() - lease_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            dead = owner.get("host") == host and isinstance(pid, int) and not _pid_alive(pid)
+            if dead or heartbeat_age > READER_LEASE_SECONDS:
+                logger.info("Concesión de lectura abandonada en %s (%s); se borra", lease_path, owner or "sin dueño")
+                lease_path.unlink(missing_ok=True)
+                continue
+            live = True
+        return live
+
+
+_DPD_DB_READERS = _DpdDbReaders()
+
+
+@contextlib.contextmanager
+def pinned_dpd_db(dpd_db_path):
+    """Fija `dpd_db_path` mientras dura una lectura o una petición."""
+    if not dpd_db_path:
+        yield dpd_db_path
+        return
+    _DPD_DB_READERS.pin(dpd_db_path)
+    try:
+        yield dpd_db_path
+    finally:
+        _DPD_DB_READERS.unpin(dpd_db_path)
+
+
+def dpd_db_version_id(dpd_db_path):
+    """ID de contenido de una dpd.db.
+
+    Las versiones gestionadas viven en `versions/<id>/dpd.db` (id = SHA-256 de la
+    descarga); para cualquier otra ruta se deriva del `stat`, que cambia con cada
+    reemplazo del archivo.
+    """
+    path = Path(dpd_db_path)
+    if path.parent.parent.name == "versions":
+        return path.parent.name
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return ""
+    stat_key = f"{path.resolve()}|{stat_result.st_size}|{stat_result.st_mtime_ns}|{stat_result.st_ino}"
+    return hashlib.sha256(stat_key.encode("utf-8")).hexdigest()[:16]
+
+
+def lookup_words_in_dpd(words, dpd_db_path):
+    """Busca palabras en `lookup` y `dpd_headwords` usando dpd.db.
+
+    La caché se indexa por `dpd_db_version_id`, así que una release nueva nunca
+    sirve resultados de la anterior; la versión queda fijada durante la consulta.
+    """
+    if not dpd_db_path:
+        return {}
+    with pinned_dpd_db(dpd_db_path):
+        return _lookup_words_in_dpd_cached(tuple(words), dpd_db_version_id(dpd_db_path), dpd_db_path)
+
+
+@memoize(maxsize=128)
+def _lookup_words_in_dpd_cached(words, db_version, dpd_db_path):
+    return _query_dpd_lookup(words, dpd_db_path)
+
+
+def _query_dpd_lookup(words, dpd_db_path, conn=None):
+    """Versión sin caché de `lookup_words_in_dpd`, usable desde hilos de fondo.
+
+    Con `conn` reutiliza una conexión ya abierta (p. ej. de un pool) y no la cierra.
+    """
+    unique_words = [word for word in _dedupe(words) if word]
+    if not unique_words or not dpd_db_path:
+        return {}
+
+    result = {}
+    word_candidates = {
+        word: _generate_final_vowel_fallbacks(word)
+        for word in unique_words
+    }
+    query_words = [
+        candidate
+        for candidate in _dedupe(
+            item
+            for candidates in word_candidates.values()
+            for item in candidates
+        )
+        if candidate
+    ]
+
+    if not query_words:
+        return {}
+
+    owns_conn = conn is None
+    if owns_conn:
+        conn = sqlite3.connect(dpd_db_path)
+    try:
+        conn.row_factory = sqlite3.Row
+        root_group_cache = {}
+        lookup_rows = _sqlite_fetchall_chunked(
+            conn,
+            _LOOKUP_QUERY,
+            query_words,
+        )
+        # Parsear headwords JSON una sola vez y almacenarlo junto a la fila
+        lookup_map = {}
+        headword_ids = []
+        for row in lookup_rows:
+            parsed_ids = _load_json_field(row["headwords"], [])
+            if not isinstance(parsed_ids, list):
+                parsed_ids = []
+            lookup_map[row["lookup_key"]] = (row, parsed_ids)
+            headword_ids.extend(parsed_ids)
+        # _dedupe ahora preserva 0 como entero válido; además filtramos solo ints
+        unique_headword_ids = [item for item in _dedupe(headword_ids) if isinstance(item, int)]
+
+        headwords_by_id = {}
+        if unique_headword_ids:
+            hw_rows = _sqlite_fetchall_chunked(
+                conn,
+                _HEADWORDS_BY_ID_QUERY,
+                unique_headword_ids,
+            )
+            headwords_by_id = {row["id"]: row for row in hw_rows}
+
+        # Bulk-load root_group para todas las raíces únicas encontradas en headwords
+        # evitando N queries individuales a dpd_roots
+        all_root_keys = set()
+        for hw in headwords_by_id.values():
+            if hw["root_key"]:
+                all_root_keys.add(str(hw["root_key"]))
+        if all_root_keys:
+            root_rows = _sqlite_fetchall_chunked(
+                conn,
+                _ROOTS_QUERY,
+                list(all_root_keys),
+            )
+            for rr in root_rows:
+                cache_key = (str(rr["root_sign"] or ""), str(rr["root"] or ""))
+                if cache_key not in root_group_cache:
+                    root_group_cache[cache_key] = str(rr["root_group"]).strip() if rr["root_group"] is not None else ""
+
+        missing_words = []
+        for word in unique_words:
+            row = None
+            parsed_ids = []
+            matched_candidate = word
+            for candidate in word_candidates.get(word, [word]):
+                entry = lookup_map.get(candidate)
+                if entry:
+                    row, parsed_ids = entry
+                    matched_candidate = candidate
+                    break
+            if not row:
+                missing_words.append(word)
+                continue
+
+            grammar_list = _load_json_field(row["grammar"], [])
+            pos_list = []
+            morph_list = []
+            if isinstance(grammar_list, list):
+                for item in grammar_list:
+                    if isinstance(item, (list, tuple)) and len(item) >= 3:
+                        if item[1]:
+                            pos_list.append(str(item[1]))
+                        if item[2]:
+                            morph_list.append(str(item[2]))
+
+            meanings = []
+            lemmas = []
+            headword_pos_list = []
+            headword_morph_list = []
+            root_key_value = ""
+            root_sign_value = ""
+            sanskrit_root = ""
+            derived_from_values = []
+            construction_values = []
+            stem_values = []
+            pattern_values = []
+            if isinstance(parsed_ids, list):
+                for headword_id in parsed_ids:
+                    hw = headwords_by_id.get(headword_id)
+                    if not hw:
+                        continue
+                    meaning = hw["meaning_1"] or hw["meaning_2"] or ""
+                    if hw["meaning_lit"]:
+                        meaning = f"{meaning} ({hw['meaning_lit']})" if meaning else hw["meaning_lit"]
+                    if meaning:
+                        meanings.append(meaning)
+                    if hw["lemma_1"]:
+                        lemmas.append(hw["lemma_1"])
+                    if hw["pos"]:
+                        headword_pos_list.append(str(hw["pos"]))
+                    if hw["grammar"]:
+                        headword_morph_list.append(str(hw["grammar"]))
+                    if not root_key_value and hw["root_key"]:
+                        root_key_value = str(hw["root_key"])
+                        root_sign_value = str(hw["root_sign"] or "")
+                    if not sanskrit_root and hw["sanskrit"]:
+                        sanskrit_root = str(hw["sanskrit"]).strip()
+                    if hw["derived_from"]:
+                        derived_from_values.append(str(hw["derived_from"]).strip())
+                    if hw["construction"]:
+                        construction_values.append(str(hw["construction"]).strip())
+                    if hw["stem"]:
+                        stem_values.append(str(hw["stem"]).strip())
+                    if hw["pattern"]:
+                        pattern_values.append(str(hw["pattern"]).strip())
+
+            final_pos_list = _dedupe(pos_list) or _dedupe(headword_pos_list)
+            final_morph_list = _dedupe(morph_list) or _dedupe(headword_morph_list)
+            root_group = _fetch_root_group(
+                conn,
+                root_key_value,
+                root_sign_value,
+                root_group_cache,
+            )
+            root_label = _build_root_label(root_sign_value, root_key_value, root_group)
+            etymology_label = _build_etymology_label(
+                derived_from_values,
+                construction_values,
+                stem_values,
+                pattern_values,
+            )
+            merged_meaning = "; ".join(_dedupe_normalized(meanings)) or "; ".join(_dedupe_normalized(lemmas))
+            result[word] = {
+                "meaning": merged_meaning or "N/A",
+                "morphology": "; ".join(final_morph_list) or "N/A",
+                "part_of_speech": "; ".join(final_pos_list) or "N/A",
+                "root": root_label or etymology_label or "N/A",
+                "sanskrit_root": sanskrit_root or "N/A",
+                "etymology": etymology_label or "N/A",
+                "translation": merged_meaning or "N/A",
+                "match_type": (
+                    "exact"
+                    if matched_candidate == word
+                    or _is_final_long_vowel_shortening(word, matched_candidate)
+                    else "fallback"
+                ),
+                "matched_form": matched_candidate,
+                "match_source": "lookup",
+                "lemma": "; ".join(_dedupe(lemmas)),
+            }
+
+        if missing_words:
+            lemma_candidates = [
+                candidate
+                for candidate in _dedupe(
+                    item
+                    for word in missing_words
+                    for item in word_candidates.get(word, [word])
+                )
+                if candidate
+            ]
+            if not lemma_candidates:
+                return result
+
+            lemma_rows = _sqlite_fetchall_chunked(
+                conn,
+                _HEADWORDS_BY_LEMMA_QUERY,
+                lemma_candidates,
+            )
+
+            lemma_map = {}
+            for row in lemma_rows:
+                lemma_key = _normalize_token(row["lemma_1"] or "")
+                if not lemma_key or lemma_key in lemma_map:
+                    continue
+                meaning = row["meaning_1"] or row["meaning_2"] or ""
+                if row["meaning_lit"]:
+                    meaning = f"{meaning} ({row['meaning_lit']})" if meaning else row["meaning_lit"]
+                root_group = _fetch_root_group(
+                    conn,
+                    row["root_key"] or "",
+                    row["root_sign"] or "",
+                    root_group_cache,
+                )
+                root = _build_root_label(
+                    row["root_sign"] or "",
+                    row["root_key"] or "",
+                    root_group,
+                )
+                etymology = _build_etymology_label(
+                    [str(row["derived_from"] or "").strip()],
+                    [str(row["construction"] or "").strip()],
+                    [str(row["stem"] or "").strip()],
+                    [str(row["pattern"] or "").strip()],
+                )
+                lemma_map[lemma_key] = {
+                    "meaning": meaning or "N/A",
+                    "morphology": row["grammar"] or "N/A",
+                    "part_of_speech": row["pos"] or "N/A",
+                    "root": root or etymology or "N/A",
+                    "sanskrit_root": (row["sanskrit"] or "").strip() or "N/A",
+                    "etymology": etymology or "N/A",
+                    "translation": meaning or "N/A",
+                    "lemma": row["lemma_1"] or "",
+                    "match_source": "lemma",
+                }
+
+            for word in missing_words:
+                for candidate in word_candidates.get(word, [word]):
+                    if candidate in lemma_map:
+                        lemma_entry = dict(lemma_map[candidate])
+                        lemma_entry["match_type"] = (
+                            "exact"
+                            if candidate == word
+                            or _is_final_long_vowel_shortening(word, candidate)
+                            else "fallback"
+                        )
+                        lemma_entry["matched_form"] = candidate
+                        result[word] = lemma_entry
+                        break
+    finally:
+        if owns_conn:
+            conn.close()
+
+    return result
+
+
+def _separator_gloss_entry(token):
+    return {
+        "word": token["separator"],
+        "meaning": "[Separador sintáctico]",
+        "morphology": "---",
+        "part_of_speech": "SEP",
+        "root": "---",
+        "translation": token["surface"],
+        "separator_symbol": token["surface"],
+    }
+
+
+def _gloss_entry_for_word(word, *dictionaries):
+    """Construye la entrada de glosa de `word` con el primer diccionario que la resuelva."""
+    entry, used_fallback, matched_form = None, False, ""
+    for dictionary in dictionaries:
+        entry, used_fallback, matched_form = _resolve_entry_with_fallback(word, dictionary)
+        if entry:
+            break
+    if entry:
+        return {
+            "word": word,
+            "meaning": entry.get("meaning", "N/A"),
+            "morphology": entry.get("morphology", "N/A"),
+            "part_of_speech": entry.get("part_of_speech", "N/A"),
+            "root": entry.get("root", "N/A"),
+            "sanskrit_root": entry.get("sanskrit_root", "N/A"),
+            "etymology": entry.get("etymology", "N/A"),
+            "translation": entry.get("translation", "N/A"),
+            "match_type": entry.get("match_type", "fallback" if used_fallback else "exact"),
+            "matched_form": entry.get("matched_form", matched_form or word),
+            # Quién resolvió la forma: tabla `lookup` de dpd.db, `lemma_1` de dpd.db o el JSON.
+            "match_source": entry.get("match_source", "json"),
+            "lemma": entry.get("lemma", ""),
+        }
+    return {
+        "word": word,
+        "meaning": "[No encontrado en diccionario]",
+        "morphology": "---",
+        "part_of_speech": "---",
+        "root": "---",
+        "sanskrit_root": "---",
+        "etymology": "---",
+        "translation": "---"
+    }
+
+
+# Procesar texto Pali
+def process_pali_text(text, dictionary):
+    if not isinstance(dictionary, dict):
+        logger.debug("process_pali_text: dictionary inválido (%s), usando diccionario vacío", type(dictionary).__name__)
+        dictionary = {}
+    token_stream = tokenize_pali_with_separators(text)
+    gloss_entries = []
+
+    for token in token_stream:
+        if token["kind"] == "separator":
+            gloss_entries.append(_separator_gloss_entry(token))
+            continue
+        gloss_entries.append(_gloss_entry_for_word(token["norm"], dictionary))
+
+    return gloss_entries
+
+
+def process_pali_with_lookup_map(text, lookup_map, fallback_dictionary=None):
+    if not isinstance(lookup_map, dict):
+        logger.debug("process_pali_with_lookup_map: lookup_map inválido (%s), usando mapa vacío", type(lookup_map).__name__)
+        lookup_map = {}
+    if fallback_dictionary is None or not isinstance(fallback_dictionary, dict):
+        fallback_dictionary = {}
+    token_stream = tokenize_pali_with_separators(text)
+    gloss_entries = []
+
+    for token in token_stream:
+        if token["kind"] == "separator":
+            gloss_entries.append(_separator_gloss_entry(token))
+            continue
+        gloss_entries.append(_gloss_entry_for_word(token["norm"], lookup_map, fallback_dictionary))
+
+    return gloss_entries
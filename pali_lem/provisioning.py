@@ -0,0 +1,203 @@
+"""Aprovisionamiento: un solo trabajo a la vez por recurso, entre hilos y procesos."""
+
+import concurrent.futures
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .common import _utcnow, logger
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class ProvisioningLock:
+    """Lock de archivo con PID y latido para trabajos de aprovisionamiento.
+
+    El archivo guarda `{pid, host, token, started_at}` y su mtime se renueva
+    mientras el trabajo sigue vivo. Se considera abandonado si el proceso dueño
+    ya no existe (mismo host) o si el latido lleva más de `stale_seconds` parado
+    (`PALI_LEM_LOCK_STALE_SECONDS`, por defecto 120), y entonces se reclama.
+    """
+
+    def __init__(self, path, stale_seconds=None):
+        self.path = Path(path)
+        if stale_seconds is None:
+            stale_seconds = int(os.environ.get("PALI_LEM_LOCK_STALE_SECONDS", "120"))
+        self.stale_seconds = stale_seconds
+        self.token = uuid.uuid4().hex
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat_thread = None
+
+    def _read_owner(self, path=None):
+        try:
+            with open(path or self.path, "r", encoding="utf-8") as file_handle:
+                owner = json.load(file_handle)
+            return owner if isinstance(owner, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _stale_owner(self):
+        """`(dueño, (st_dev, st_ino))` del lock si está abandonado; `None` si sigue vivo.
+
+        Latido, dueño e identidad salen del mismo archivo abierto: si entre medias
+        otro lo reemplaza, no se mezcla el mtime de uno con el dueño del otro. El
+        dueño es `{}` si no se puede leer, y la identidad `None` si ya no existe.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as file_handle:
+                stat_result = os.fstat(file_handle.fileno())
+                heartbeat_age = time.time() - stat_result.st_mtime
+                try:
+                    owner = json.load(file_handle)
+                except ValueError:
+                    owner = {}
+        except FileNotFoundError:
+            return {}, None
+        except OSError:
+            return None
+        owner = owner if isinstance(owner, dict) else {}
+        pid = owner.get("pid")
+        stale = heartbeat_age > self.stale_seconds or (
+            owner.get("host") == socket.gethostname() and isinstance(pid, int) and not _pid_alive(pid)
+        )
+        return (owner, (stat_result.st_dev, stat_result.st_ino)) if stale else None
+
+    def is_stale(self):
+        return self._stale_owner() is not None
+
+    def _reclaim(self, stale_owner, file_id):
+        """Retira el lock abandonado (`stale_owner`, archivo `file_id`) sin pisar uno nuevo.
+
+        Leer, borrar y crear no es atómico: entre la lectura y el borrado otro
+        reclamador puede haber tomado el lock, y se borraría el suyo. Por eso el
+        archivo se aparta con `rename` (atómico) a un nombre propio y solo se
+        borra si el apartado sigue siendo el abandonado (mismo archivo y mismo
+        token); si no, se devuelve a su sitio.
+        """
+        aside = self.path.with_name(f"{self.path.name}.reclaim-{self.token}")
+        try:
+            os.rename(self.path, aside)
+        except FileNotFoundError:
+            return
+        try:
+            stat_result = aside.stat()
+            same_file = (stat_result.st_dev, stat_result.st_ino) == file_id
+        except FileNotFoundError:
+            return
+        if same_file and self._read_owner(aside).get("token") == stale_owner.get("token"):
+            aside.unlink(missing_ok=True)
+            return
+        try:
+            # `link` no sobrescribe: si ya hay otro lock en su sitio, ese gana.
+            os.link(aside, self.path)
+        except FileExistsError:
+            logger.warning("Lock de %s reemplazado mientras se reclamaba", self.path)
+        except OSError:
+            logger.warning("No se pudo devolver el lock de %s a su sitio", self.path, exc_info=True)
+        aside.unlink(missing_ok=True)
+
+    def _heartbeat(self):
+        interval = max(1.0, self.stale_seconds / 4)
+        while not self._stop_heartbeat.wait(interval):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def acquire(self, timeout=0, poll_seconds=0.5):
+        """Intenta tomar el lock durante `timeout` segundos; devuelve si lo consiguió."""
+        deadline = time.monotonic() + timeout
+        owner = {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "token": self.token,
+            "started_at": _utcnow().isoformat(),
+        }
+        while True:
+            try:
+                file_descriptor = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                stale = self._stale_owner()
+                if stale is not None:
+                    stale_owner, file_id = stale
+                    # Sin identidad el archivo ya desapareció: basta con reintentar.
+                    if file_id is not None:
+                        logger.warning("Lock abandonado en %s (%s); se reclama", self.path, stale_owner or "sin dueño")
+                        self._reclaim(stale_owner, file_id)
+                    continue
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(poll_seconds)
+                continue
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as file_handle:
+                json.dump(owner, file_handle)
+            self._stop_heartbeat.clear()
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat, daemon=True, name=f"lock-heartbeat-{self.path.name}"
+            )
+            self._heartbeat_thread.start()
+            return True
+
+    def release(self):
+        self._stop_heartbeat.set()
+        if self._read_owner().get("token") == self.token:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def provision_once(key, lock_path, work, wait_seconds=0):
+    """Ejecuta `work()` una sola vez aunque lo pidan varias sesiones o procesos.
+
+    Dentro del proceso, las llamadas concurrentes con la misma `key` esperan el
+    resultado de la que ya está en curso. Entre procesos se usa `ProvisioningLock`
+    sobre `lock_path`: si otro proceso lo tiene, se espera hasta `wait_seconds` y,
+    si no llega a liberarse, se devuelve None. `work` debe comprobar primero si
+    el recurso ya existe, porque quizá lo preparó el otro proceso.
+    """
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = concurrent.futures.Future()
+            _IN_FLIGHT[key] = future
+    if not is_owner:
+        return future.result()
+
+    try:
+        lock = ProvisioningLock(lock_path)
+        if lock.acquire(timeout=wait_seconds):
+            try:
+                result = work()
+            finally:
+                lock.release()
+        else:
+            logger.info("%s sigue ocupado por otro proceso; se omite %s", lock_path, key)
+            result = None
+        future.set_result(result)
+        return result
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT.pop(key, None)
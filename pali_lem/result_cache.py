@@ -0,0 +1,252 @@
+"""Caché de resultados de glosa compartida por todos los usuarios del proceso.
+
+La clave es el digest de la secuencia de tokens normalizada del texto
+(`token_sequence_digest`) más la versión de la base que lo glosó y la versión del
+diccionario de respaldo, y el valor son las `gloss_entries` finales, serializadas
+en JSON comprimido. Dos usuarios que pegan el mismo pasaje, con otras mayúsculas
+o saltos de línea, comparten resultado; una dpd.db o un `dpd_dictionary.json`
+nuevos cambian todas las claves, y las entradas anteriores salen por expulsión.
+
+La caché en memoria se limita por bytes (el tamaño serializado de cada entrada)
+y expulsa las menos usadas. Con `PALI_LEM_RESULT_CACHE=<ruta>` hay además una
+capa en disco (SQLite), también limitada por bytes, que sobrevive a reinicios y
+que comparten los procesos que apuntan al mismo archivo: un acierto en disco se
+sube a memoria.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from .common import logger
+from .dictionary import fallback_dictionary_version
+from .gloss_store import gloss_with_store
+from .lookup import dpd_db_version_id
+from .text import token_sequence_digest
+
+RESULT_CACHE_BYTES = int(os.environ.get("PALI_LEM_RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_PATH = os.environ.get("PALI_LEM_RESULT_CACHE", "").strip()
+RESULT_CACHE_DISK_BYTES = int(os.environ.get("PALI_LEM_RESULT_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Filas que se borran por pasada al expulsar de disco.
+_DISK_EVICT_BATCH = 64
+
+_DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    entries BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_use ON results (used_at);
+"""
+
+_RESULT_CACHE = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def result_cache_key(text, dpd_db_path, fallback_version="none"):
+    """Clave de `text` glosado contra `dpd_db_path` y el diccionario de respaldo de versión `fallback_version`.
+
+    `fallback_version` es la de `fallback_dictionary_version`. `None` si el
+    texto no tiene tokens o el diccionario no tiene versión conocida.
+    """
+    digest = token_sequence_digest(text)
+    if digest is None or not fallback_version:
+        return None
+    version = dpd_db_version_id(dpd_db_path) if dpd_db_path else "json"
+    version += "|" + fallback_version
+    return hashlib.sha256(digest + version.encode("utf-8")).digest()[:16]
+
+
+def _encode_entries(gloss_entries):
+    return zlib.compress(json.dumps(gloss_entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1)
+
+
+def _decode_entries(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class GlossResultCache:
+    """Resultados de glosa por clave, en memoria y opcionalmente en disco.
+
+    Es seguro usarla desde varios hilos (las sesiones de Streamlit comparten
+    proceso). Cada acierto devuelve una copia nueva de las entradas, así que
+    quien la modifique no altera lo que reciben los demás.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES, disk_path="", max_disk_bytes=RESULT_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_path = str(disk_path or "")
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = None
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk_path:
+            self._open_disk()
+
+    # -- disco --------------------------------------------------------------
+
+    def _open_disk(self):
+        try:
+            Path(self.disk_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.disk_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_DISK_SCHEMA)
+            self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            self._disk = conn
+        except (OSError, sqlite3.Error):
+            logger.warning("Caché de resultados en disco no disponible (%s); solo memoria", self.disk_path, exc_info=True)
+
+    def _disk_failed(self):
+        logger.warning("Error en la caché de resultados en disco (%s); se desactiva", self.disk_path, exc_info=True)
+        try:
+            self._disk.close()
+        except sqlite3.Error:
+            pass
+        self._disk = None
+
+    def _disk_get(self, key):
+        row = self._disk.execute("SELECT entries FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._disk.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key))
+        self._disk.commit()
+        return bytes(row[0])
+
+    def _disk_put(self, key, blob):
+        self._disk.execute(
+            "INSERT OR REPLACE INTO results (key, entries, size, used_at) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+        self._disk_bytes += len(blob)
+        if self._disk_bytes > self.max_disk_bytes:
+            # Otros procesos pueden escribir en el mismo archivo: el total se recalcula antes de expulsar.
+            self._disk_bytes = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            while self._disk_bytes > self.max_disk_bytes:
+                oldest = self._disk.execute(
+                    "SELECT key, size FROM results ORDER BY used_at LIMIT ?", (_DISK_EVICT_BATCH,)
+                ).fetchall()
+                if not oldest:
+                    break
+                self._disk.executemany("DELETE FROM results WHERE key = ?", [(old_key,) for old_key, _ in oldest])
+                self._disk_bytes -= sum(size for _, size in oldest)
+        self._disk.commit()
+
+    # -- memoria ------------------------------------------------------------
+
+    def _memory_put(self, key, blob):
+        size = len(key) + len(blob)
+        if size > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(key) + len(previous)
+        self._memory[key] = blob
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            old_key, old_blob = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_key) + len(old_blob)
+            self.evictions += 1
+
+    # -- API ----------------------------------------------------------------
+
+    def get(self, key):
+        """Entradas guardadas bajo `key`, o `None`."""
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            elif self._disk is not None:
+                try:
+                    blob = self._disk_get(key)
+                except sqlite3.Error:
+                    self._disk_failed()
+                if blob is not None:
+                    self._memory_put(key, blob)
+                    self.hits += 1
+                    self.disk_hits += 1
+            if blob is None:
+                self.misses += 1
+                return None
+        return _decode_entries(blob)
+
+    def put(self, key, gloss_entries):
+        blob = _encode_entries(gloss_entries)
+        with self._lock:
+            self._memory_put(key, blob)
+            if self._disk is not None:
+                try:
+                    self._disk_put(key, blob)
+                except sqlite3.Error:
+                    self._disk_failed()
+
+    def clear(self):
+        """Vacía la memoria (el disco se conserva) y pone los contadores a cero."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def cache_info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_path": self.disk_path if self._disk is not None else "",
+                "disk_bytes": self._disk_bytes if self._disk is not None else 0,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
+
+
+def get_result_cache():
+    """Caché del proceso, creada en el primer uso con la configuración del entorno."""
+    global _RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = GlossResultCache(RESULT_CACHE_BYTES, RESULT_CACHE_PATH, RESULT_CACHE_DISK_BYTES)
+        return _RESULT_CACHE
+
+
+def cached_gloss(text, dpd_db_path, fallback_dictionary=None, cache=None, fallback_version=None):
+    """Glosa `text` pasando por la caché de resultados y, si falla, por `gloss_with_store`.
+
+    `fallback_version` identifica `fallback_dictionary` en la clave; por omisión
+    es la del `dpd_dictionary.json` que cargó `load_dictionary`.
+
+    Devuelve `(entradas, {"cache": "hit" | "miss", "paragraphs": N, "stored": M})`;
+    con un acierto no se glosa nada y los párrafos quedan en 0.
+    """
+    cache = get_result_cache() if cache is None else cache
+    fallback_version = fallback_dictionary_version(fallback_dictionary, fallback_version)
+    key = result_cache_key(text, dpd_db_path, fallback_version)
+    if key is not None:
+        gloss_entries = cache.get(key)
+        if gloss_entries is not None:
+            return gloss_entries, {"cache": "hit", "paragraphs": 0, "stored": 0}
+    gloss_entries, store_stats = gloss_with_store(
+        text, dpd_db_path, fallback_dictionary=fallback_dictionary, fallback_version=fallback_version
+    )
+    if key is not None:
+        cache.put(key, gloss_entries)
+    return gloss_entries, {"cache": "miss", **store_stats}
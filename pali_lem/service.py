@@ -0,0 +1,225 @@
+"""Servicio HTTP local de glosado (JSON) sobre un `GlossEngine` compartido.
+
+Endpoints:
+    GET  /health    estado, dpd.db en uso, estadísticas de la base y de la caché
+    POST /tokenize  {"text": "..."} → tokens con separadores
+    POST /lookup    {"words": ["dhammo", ...]} → entrada de dpd.db por forma (o null)
+    POST /gloss     {"text": "..."} o {"texts": [...]}, opcional "format": compact|rich
+
+Las peticiones comparten motor: la caché por forma, el pool de conexiones y la
+dpd.db fijada. Con `resolve_dpd_db_path` el servicio vuelve a resolver la base
+en cada petición y el motor pasa a la release que se haya instalado mientras
+tanto. `/gloss` con `texts` resuelve todas las formas nuevas de todos los
+textos en una sola consulta. La concurrencia se acota con un semáforo: si
+no hay hueco en `queue_timeout` segundos se responde 503 en vez de encolar sin
+límite.
+"""
+
+import http.server
+import json
+import threading
+import time
+
+from .common import logger
+from .dpd_db import get_dpd_db_stats
+from .engine import GlossEngine, coverage_counts
+from .formatting import generate_compact_gloss, generate_rich_gloss_text
+from .text import tokenize_pali_with_separators
+
+SERVICE_FORMATS = {
+    "compact": generate_compact_gloss,
+    "rich": generate_rich_gloss_text,
+}
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_TEXTS_PER_REQUEST = 256
+
+
+class _RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _gloss_payload(gloss_entries, output_format):
+    word_total, found_words, _ = coverage_counts(gloss_entries)
+    payload = {
+        "entries": gloss_entries,
+        "words": word_total,
+        "found": found_words,
+        "coverage": round(found_words / word_total * 100, 2) if word_total else 0.0,
+    }
+    if output_format:
+        payload["gloss"] = SERVICE_FORMATS[output_format](gloss_entries)
+    return payload
+
+
+def _required_text(value, field):
+    if not isinstance(value, str):
+        raise _RequestError(400, f"'{field}' debe ser una cadena")
+    return value
+
+
+def handle_tokenize(engine, body):
+    return {"tokens": tokenize_pali_with_separators(_required_text(body.get("text"), "text"))}
+
+
+def handle_lookup(engine, body):
+    words = body.get("words")
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        raise _RequestError(400, "'words' debe ser una lista de cadenas")
+    return {"entries": engine.lookup_raw(words)}
+
+
+def handle_gloss(engine, body):
+    output_format = body.get("format") or ""
+    if output_format and output_format not in SERVICE_FORMATS:
+        raise _RequestError(400, f"'format' debe ser uno de: {', '.join(SERVICE_FORMATS)}")
+    if "texts" in body:
+        texts = body["texts"]
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise _RequestError(400, "'texts' debe ser una lista de cadenas")
+        if len(texts) > MAX_TEXTS_PER_REQUEST:
+            raise _RequestError(413, f"Como máximo {MAX_TEXTS_PER_REQUEST} textos por petición")
+        return {"results": [_gloss_payload(entries, output_format) for entries in engine.gloss_many(texts)]}
+    return _gloss_payload(engine.gloss(_required_text(body.get("text"), "text")), output_format)
+
+
+POST_HANDLERS = {
+    "/tokenize": handle_tokenize,
+    "/lookup": handle_lookup,
+    "/gloss": handle_gloss,
+}
+
+
+class GlossServiceHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1: los clientes pueden reutilizar la conexión entre peticiones.
+    protocol_version = "HTTP/1.1"
+    server_version = "PaliGlosser"
+    # Cabeceras y cuerpo salen en dos escrituras; con Nagle + ACK retardado del
+    # cliente cada respuesta esperaría ~40 ms.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _content_length(self):
+        """Longitud del cuerpo: 400 si no es un entero >= 0, 413 si supera `MAX_REQUEST_BYTES`."""
+        value = (self.headers.get("Content-Length") or "0").strip()
+        # `int()` aceptaría "-1", "+5" o "1_0"; un -1 llegaría a `rfile.read(-1)` y bloquearía.
+        if not (value.isascii() and value.isdigit()):
+            raise _RequestError(400, "Content-Length inválido")
+        length = int(value)
+        if length > MAX_REQUEST_BYTES:
+            raise _RequestError(413, f"El cuerpo supera {MAX_REQUEST_BYTES} bytes")
+        return length
+
+    def _read_json_body(self, length):
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise _RequestError(400, "El cuerpo debe ser JSON UTF-8")
+        if not isinstance(body, dict):
+            raise _RequestError(400, "El cuerpo debe ser un objeto JSON")
+        return body
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Ruta desconocida: {self.path}"})
+            return
+        engine = self.server.current_engine()
+        self._send_json(
+            200,
+            {
+                "status": "ok",
+                "dpd_db_path": engine.dpd_db_path,
+                "db_stats": get_dpd_db_stats(engine.dpd_db_path) if engine.dpd_db_path else None,
+                "cache": engine.cache_info(),
+                "in_flight": self.server.in_flight,
+                "max_concurrency": self.server.max_concurrency,
+                "uptime_seconds": round(time.monotonic() - self.server.started_at, 1),
+            },
+        )
+
+    def do_POST(self):
+        handler = POST_HANDLERS.get(self.path)
+        try:
+            length = self._content_length()
+            if handler is None:
+                # El cuerpo se descarta para no romper la conexión persistente.
+                self.rfile.read(length)
+                self._send_json(404, {"error": f"Ruta desconocida: {self.path}"})
+                return
+            body = self._read_json_body(length)
+        except _RequestError as exc:
+            self.close_connection = True
+            self._send_json(exc.status, {"error": str(exc)})
+            return
+        if not self.server.slots.acquire(timeout=self.server.queue_timeout):
+            self._send_json(503, {"error": "Servicio saturado, reintenta"}, headers={"Retry-After": "1"})
+            return
+        try:
+            with self.server.in_flight_lock:
+                self.server.in_flight += 1
+            status, payload = 200, handler(self.server.current_engine(), body)
+        except _RequestError as exc:
+            status, payload = exc.status, {"error": str(exc)}
+        except Exception:
+            logger.exception("Error atendiendo %s", self.path)
+            status, payload = 500, {"error": "Error interno"}
+        finally:
+            with self.server.in_flight_lock:
+                self.server.in_flight -= 1
+            self.server.slots.release()
+        # El hueco se libera antes de escribir: un cliente lento no bloquea a los demás.
+        self._send_json(status, payload)
+
+
+class GlossService(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # El backlog por defecto (5) descarta conexiones en ráfagas de clientes nuevos.
+    request_queue_size = 128
+
+    def __init__(self, address, engine, max_concurrency=8, queue_timeout=5.0, resolve_dpd_db_path=None):
+        super().__init__(address, GlossServiceHandler)
+        self.engine = engine
+        self.resolve_dpd_db_path = resolve_dpd_db_path
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def current_engine(self):
+        """El motor, apuntando a la dpd.db que resuelve `resolve_dpd_db_path` (si hay)."""
+        if self.resolve_dpd_db_path is not None:
+            dpd_db_path = self.resolve_dpd_db_path()
+            # Sin base resuelta (p. ej. durante una reinstalación) se sigue con la anterior.
+            if dpd_db_path and dpd_db_path != self.engine.dpd_db_path:
+                logger.info("dpd.db nueva para el servicio: %s", dpd_db_path)
+                self.engine.switch_dpd_db(dpd_db_path)
+        return self.engine
+
+    def server_close(self):
+        super().server_close()
+        self.engine.close()
+
+
+def create_gloss_service(dpd_db_path="", fallback_dictionary=None, host="127.0.0.1", port=8765, **options):
+    """Crea (sin arrancar) el servicio; `port=0` elige un puerto libre.
+
+    Con `resolve_dpd_db_path` (p. ej. `follow_dpd_db_path`) el motor sigue las
+    releases que se instalen con el servicio en marcha.
+    """
+    engine = GlossEngine(dpd_db_path, fallback_dictionary=fallback_dictionary)
+    return GlossService((host, port), engine, **options)
@@ -0,0 +1,716 @@
+"""Sesiones guardadas: store por usuario, exportación/importación y re-glosado."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from pathlib import Path
+
+from .common import PROJECT_ROOT, _load_json_file, _save_json_file, _utcnow, logger, memoize
+from .dictionary import DPD_JSON_PATH
+from .formatting import _gloss_coverage_stats, generate_compact_gloss, generate_rich_gloss_text
+from .lookup import _gloss_entry_for_word, _query_dpd_lookup
+from .text import _dedupe, _normalize_lemma, _normalize_token, tokenize_pali_text
+
+SAVED_SESSIONS_PATH = PROJECT_ROOT / "saved_sessions.json"
+SAVED_SESSIONS_DIR = PROJECT_ROOT / "saved_sessions"
+DEFAULT_SESSION_NAMESPACE = "default"
+_SESSION_STORE_MAX_CAS_RETRIES = 1000
+# Las sesiones con más entradas guardan `gloss_entries` en fragmentos aparte:
+# una página de la UI solo lee los fragmentos que la cubren.
+SESSION_ENTRIES_CHUNK_SIZE = int(os.environ.get("PALI_LEM_SESSION_CHUNK_SIZE", "500"))
+# Los fragmentos sin referencias se borran al guardar, pasado este margen (otro
+# proceso puede haberlos escrito y no haber publicado aún su archivo de sesiones).
+_SESSION_CHUNK_GRACE_SECONDS = 3600
+_SESSION_CHUNK_NAME_RE = re.compile(r"^[0-9a-f]{32}$")
+# Campos de la forma guardada de una sesión fragmentada (en lugar de `gloss_entries`).
+_CHUNKED_SESSION_KEYS = ("gloss_entries_chunks", "gloss_entries_count", "gloss_entries_chunk_size", "search_terms")
+
+
+def is_chunked_session(session_data):
+    """¿Guarda la sesión sus `gloss_entries` en fragmentos aparte?"""
+    return isinstance(session_data, dict) and isinstance(session_data.get("gloss_entries_chunks"), list)
+
+
+def session_entry_count(session_data):
+    """Número de `gloss_entries` de una sesión, esté fragmentada o no."""
+    if not isinstance(session_data, dict):
+        return 0
+    if is_chunked_session(session_data):
+        count = session_data.get("gloss_entries_count")
+        return count if isinstance(count, int) and count > 0 else 0
+    gloss_entries = session_data.get("gloss_entries", [])
+    return len(gloss_entries) if isinstance(gloss_entries, list) else 0
+
+
+def _inline_session(session_data, gloss_entries):
+    """Copia de `session_data` con `gloss_entries` en línea y sin referencias a fragmentos."""
+    inline = {key: value for key, value in session_data.items() if key not in _CHUNKED_SESSION_KEYS}
+    inline["gloss_entries"] = gloss_entries
+    return inline
+
+
+def _session_search_terms(session_data):
+    """Términos indexables de una sesión: palabras del texto, formas y lemas encontrados."""
+    if not isinstance(session_data, dict):
+        return frozenset()
+    if is_chunked_session(session_data):
+        # Calculados al fragmentarla: indexar no obliga a leer sus fragmentos.
+        stored_terms = session_data.get("search_terms")
+        return frozenset(term for term in stored_terms if isinstance(term, str)) if isinstance(stored_terms, list) else frozenset()
+    terms = set(tokenize_pali_text(str(session_data.get("pali_text", ""))))
+    gloss_entries = session_data.get("gloss_entries", [])
+    if isinstance(gloss_entries, list):
+        for entry in gloss_entries:
+            if not isinstance(entry, dict) or entry.get("part_of_speech") == "SEP":
+                continue
+            if entry.get("matched_form"):
+                terms.add(_normalize_token(str(entry["matched_form"])))
+            for lemma in str(entry.get("lemma", "") or "").split(";"):
+                normalized_lemma = _normalize_lemma(lemma)
+                if normalized_lemma:
+                    terms.add(normalized_lemma)
+    terms.discard("")
+    return frozenset(terms)
+
+
+def _reindex_sessions_locked(record, old_sessions, new_sessions):
+    """Actualiza el índice invertido solo para las sesiones añadidas, cambiadas o borradas."""
+    changed_names = [
+        name for name in set(old_sessions) | set(new_sessions)
+        if old_sessions.get(name) is not new_sessions.get(name)
+    ]
+    for name in changed_names:
+        for term in record.session_terms.pop(name, ()):
+            names = record.index.get(term)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del record.index[term]
+        if name in new_sessions:
+            terms = _session_search_terms(new_sessions[name])
+            record.session_terms[name] = terms
+            for term in terms:
+                record.index.setdefault(term, set()).add(name)
+
+
+class _SessionNamespace:
+    """Estado de un espacio de nombres: lock propio, versión y dict inmutable de sesiones."""
+
+    __slots__ = ("lock", "version", "sessions", "loaded", "disk_mtime_ns", "session_terms", "index")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.sessions = {}
+        self.loaded = False
+        self.disk_mtime_ns = None
+        # Índice invertido término → nombres de sesión, mantenido en cada swap.
+        self.session_terms = {}
+        self.index = {}
+
+
+class SessionStore:
+    """Store de sesiones en memoria con un espacio de nombres por usuario.
+
+    Cada espacio tiene su propio lock y un contador de versión. Las escrituras
+    son compare-and-swap sobre esa versión y reemplazan el dict completo
+    (copy-on-write): los lectores nunca ven un estado a medias y los usuarios
+    no se bloquean entre sí. Cada espacio se persiste en su propio archivo JSON.
+
+    Con disco, las sesiones de más de `SESSION_ENTRIES_CHUNK_SIZE` entradas se
+    guardan (y se mantienen en memoria) sin `gloss_entries`: las entradas van en
+    fragmentos `<espacio>.chunks/<hash>.json` que se leen bajo demanda con
+    `read_entries`, y la sesión guarda la lista de fragmentos, el número de
+    entradas y sus términos de búsqueda. `full_session` la reconstruye entera.
+    """
+
+    def __init__(self, storage_dir=None, legacy_path=None):
+        self._storage_dir = Path(storage_dir) if storage_dir else None
+        self._legacy_path = Path(legacy_path) if legacy_path else None
+        self._registry_lock = threading.Lock()
+        self._namespaces = {}
+
+    def _namespace_path(self, namespace):
+        if self._storage_dir is None:
+            return None
+        return self._storage_dir / f"{urllib.parse.quote(namespace, safe='-_')}.json"
+
+    def _chunks_dir(self, namespace):
+        return self._storage_dir / f"{urllib.parse.quote(namespace, safe='-_')}.chunks"
+
+    def _chunk_session(self, namespace, session_data):
+        """Forma guardada de una sesión: fragmentada si es grande y hay disco.
+
+        Cada fragmento se nombra por el hash de su contenido, así que los que no
+        cambian no se reescriben y dos sesiones iguales los comparten. Devuelve
+        `session_data` tal cual si es pequeña, ya está fragmentada o no se pudo
+        escribir algún fragmento (entonces se guarda en línea, como antes).
+        """
+        if self._storage_dir is None or not isinstance(session_data, dict):
+            return session_data
+        gloss_entries = session_data.get("gloss_entries")
+        if not isinstance(gloss_entries, list) or len(gloss_entries) <= SESSION_ENTRIES_CHUNK_SIZE:
+            return session_data
+        chunks_dir = self._chunks_dir(namespace)
+        chunk_names = []
+        try:
+            chunks_dir.mkdir(parents=True, exist_ok=True)
+            for start in range(0, len(gloss_entries), SESSION_ENTRIES_CHUNK_SIZE):
+                chunk = gloss_entries[start:start + SESSION_ENTRIES_CHUNK_SIZE]
+                blob = json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                chunk_name = hashlib.sha256(blob).hexdigest()[:32]
+                chunk_path = chunks_dir / f"{chunk_name}.json"
+                if chunk_path.exists():
+                    # Vuelve a estar en uso: que el borrado de huérfanos no lo alcance.
+                    os.utime(chunk_path)
+                else:
+                    temp_path = chunks_dir / f".{chunk_name}.{uuid.uuid4().hex}.tmp"
+                    try:
+                        temp_path.write_bytes(blob)
+                        temp_path.replace(chunk_path)
+                    finally:
+                        temp_path.unlink(missing_ok=True)
+                chunk_names.append(chunk_name)
+        except (OSError, TypeError, ValueError):
+            logger.warning("SessionStore: no se pudieron fragmentar las entradas en %s", chunks_dir, exc_info=True)
+            return session_data
+        stored = {
+            key: value for key, value in session_data.items()
+            if key != "gloss_entries" and key not in _CHUNKED_SESSION_KEYS
+        }
+        stored.update(
+            {
+                "gloss_entries_chunks": chunk_names,
+                "gloss_entries_count": len(gloss_entries),
+                "gloss_entries_chunk_size": SESSION_ENTRIES_CHUNK_SIZE,
+                "search_terms": sorted(_session_search_terms(session_data)),
+            }
+        )
+        return stored
+
+    def _read_chunk(self, namespace, chunk_name):
+        if self._storage_dir is None or not isinstance(chunk_name, str) or not _SESSION_CHUNK_NAME_RE.match(chunk_name):
+            return None
+        chunk_path = self._chunks_dir(namespace) / f"{chunk_name}.json"
+        try:
+            with open(chunk_path, "r", encoding="utf-8") as file_handle:
+                chunk = json.load(file_handle)
+        except (OSError, ValueError):
+            logger.warning("SessionStore: fragmento de sesión ilegible: %s", chunk_path, exc_info=True)
+            return None
+        return chunk if isinstance(chunk, list) else None
+
+    def _collect_chunks_locked(self, namespace, sessions):
+        """Borra los fragmentos (y temporales) de `namespace` que ya no usa ninguna sesión."""
+        chunks_dir = self._chunks_dir(namespace)
+        if not chunks_dir.is_dir():
+            return
+        referenced = {
+            chunk_name
+            for session_data in sessions.values() if is_chunked_session(session_data)
+            for chunk_name in session_data["gloss_entries_chunks"]
+        }
+        cutoff = time.time() - _SESSION_CHUNK_GRACE_SECONDS
+        try:
+            for path in chunks_dir.iterdir():
+                if path.suffix == ".json" and path.stem in referenced:
+                    continue
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+        except OSError:
+            logger.debug("SessionStore: no se pudieron recoger fragmentos en %s", chunks_dir, exc_info=True)
+
+    def read_entries(self, namespace, session_data, start=0, limit=None):
+        """`gloss_entries[start:start + limit]` de una sesión (`limit=None`: hasta el final).
+
+        De una sesión fragmentada solo se leen los fragmentos que cubren el rango;
+        si falta alguno (la sesión cambió en otro proceso), se devuelve lo leído
+        hasta ahí.
+        """
+        if not isinstance(session_data, dict):
+            return []
+        start = max(0, start)
+        if not is_chunked_session(session_data):
+            gloss_entries = session_data.get("gloss_entries", [])
+            if not isinstance(gloss_entries, list):
+                return []
+            return gloss_entries[start:] if limit is None else gloss_entries[start:start + max(0, limit)]
+        namespace = namespace or DEFAULT_SESSION_NAMESPACE
+        total = session_entry_count(session_data)
+        end = total if limit is None else min(total, start + max(0, limit))
+        chunk_size = session_data.get("gloss_entries_chunk_size")
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            return []
+        chunk_names = session_data["gloss_entries_chunks"]
+        entries = []
+        for index in range(start // chunk_size, (end - 1) // chunk_size + 1 if end > start else 0):
+            chunk = self._read_chunk(namespace, chunk_names[index]) if index < len(chunk_names) else None
+            if chunk is None:
+                break
+            chunk_start = index * chunk_size
+            entries.extend(chunk[max(0, start - chunk_start):end - chunk_start])
+        return entries
+
+    def full_session(self, namespace, session_data):
+        """La sesión con todas sus `gloss_entries` en línea (lee sus fragmentos si los tiene)."""
+        if not is_chunked_session(session_data):
+            return session_data
+        return _inline_session(session_data, self.read_entries(namespace, session_data))
+
+    def namespaces(self):
+        """Espacios conocidos: los cargados en memoria y los persistidos en disco."""
+        with self._registry_lock:
+            names = set(self._namespaces)
+        if self._storage_dir is not None and self._storage_dir.is_dir():
+            for path in self._storage_dir.glob("*.json"):
+                names.add(urllib.parse.unquote(path.stem))
+        if self._legacy_path is not None and self._legacy_path.exists():
+            names.add(DEFAULT_SESSION_NAMESPACE)
+        return sorted(names)
+
+    def _read_namespace(self, namespace):
+        candidates = [self._namespace_path(namespace)]
+        if namespace == DEFAULT_SESSION_NAMESPACE:
+            # Migración: el antiguo saved_sessions.json compartido pasa al espacio por defecto.
+            candidates.append(self._legacy_path)
+        for path in candidates:
+            if path is None or not path.exists():
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as file_handle:
+                    data = json.load(file_handle)
+            except (json.JSONDecodeError, OSError, ValueError):
+                logger.debug("SessionStore: no se pudo leer %s", path, exc_info=True)
+                continue
+            if isinstance(data, dict):
+                return data
+        return {}
+
+    def _get_namespace(self, namespace):
+        namespace = namespace or DEFAULT_SESSION_NAMESPACE
+        with self._registry_lock:
+            record = self._namespaces.get(namespace)
+            if record is None:
+                record = _SessionNamespace()
+                self._namespaces[namespace] = record
+        if not record.loaded:
+            with record.lock:
+                if not record.loaded:
+                    record.disk_mtime_ns = self._disk_mtime_ns(namespace)
+                    record.sessions = self._read_namespace(namespace)
+                    _reindex_sessions_locked(record, {}, record.sessions)
+                    record.loaded = True
+        return record
+
+    def _disk_mtime_ns(self, namespace):
+        path = self._namespace_path(namespace)
+        try:
+            return path.stat().st_mtime_ns if path is not None else None
+        except OSError:
+            return None
+
+    def _refresh_from_disk_locked(self, namespace, record):
+        """Recarga el espacio si otro proceso (p. ej. la CLI de importación) reescribió su archivo."""
+        disk_mtime_ns = self._disk_mtime_ns(namespace)
+        if disk_mtime_ns is None or disk_mtime_ns == record.disk_mtime_ns:
+            return
+        new_sessions = self._read_namespace(namespace)
+        _reindex_sessions_locked(record, record.sessions, new_sessions)
+        record.sessions = new_sessions
+        record.version += 1
+        record.disk_mtime_ns = disk_mtime_ns
+
+    def snapshot(self, namespace):
+        """Devuelve `(versión, sesiones)`. El dict devuelto no debe mutarse."""
+        namespace = namespace or DEFAULT_SESSION_NAMESPACE
+        record = self._get_namespace(namespace)
+        with record.lock:
+            self._refresh_from_disk_locked(namespace, record)
+            return record.version, record.sessions
+
+    def get(self, namespace, session_name):
+        return self._get_namespace(namespace).sessions.get(session_name)
+
+    def compare_and_swap(self, namespace, expected_version, sessions):
+        """Reemplaza las sesiones solo si nadie escribió desde `expected_version`."""
+        namespace = namespace or DEFAULT_SESSION_NAMESPACE
+        record = self._get_namespace(namespace)
+        with record.lock:
+            self._refresh_from_disk_locked(namespace, record)
+            if record.version != expected_version:
+                return False
+            self._swap_locked(namespace, record, sessions)
+            return True
+
+    def replace(self, namespace, sessions):
+        """Reemplaza las sesiones sin comprobar versión (última escritura gana)."""
+        namespace = namespace or DEFAULT_SESSION_NAMESPACE
+        record = self._get_namespace(namespace)
+        with record.lock:
+            self._swap_locked(namespace, record, sessions)
+
+    def update(self, namespace, mutate):
+        """Aplica `mutate(sesiones)` sobre una copia y la publica con compare-and-swap.
+
+        `mutate` puede ejecutarse varias veces si otra escritura gana la carrera,
+        así que no debe tener efectos secundarios fuera del dict recibido.
+        """
+        for _ in range(_SESSION_STORE_MAX_CAS_RETRIES):
+            version, current = self.snapshot(namespace)
+            working = dict(current)
+            mutate(working)
+            if self.compare_and_swap(namespace, version, working):
+                return working
+        raise RuntimeError(f"SessionStore: demasiados conflictos actualizando '{namespace}'")
+
+    def search(self, namespace, query):
+        """Sesiones que contienen todas las palabras o lemas de `query`, ordenadas por nombre."""
+        terms = _dedupe(tokenize_pali_text(query or ""))
+        if not terms:
+            return []
+        record = self._get_namespace(namespace)
+        with record.lock:
+            postings = [record.index.get(term, ()) for term in terms]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            matches = set(postings[0]).intersection(*postings[1:])
+        return sorted(matches)
+
+    def claim_legacy_sessions(self, namespace):
+        """Mueve las sesiones del antiguo `saved_sessions.json` compartido a `namespace`.
+
+        Solo las recibe el primer espacio que las reclama, entre todos los
+        procesos: el archivo se renombra de forma atómica antes de leerlo y quien
+        pierde la carrera no encuentra nada. Los nombres que ya existan en
+        `namespace` se importan con otro nombre. Devuelve cuántas se movieron.
+        """
+        if self._legacy_path is None or not self._legacy_path.exists():
+            return 0
+        claimed_path = self._legacy_path.with_name(
+            f"{self._legacy_path.name}.migrated-{urllib.parse.quote(namespace, safe='-_')}"
+        )
+        try:
+            os.rename(self._legacy_path, claimed_path)
+        except FileNotFoundError:
+            return 0
+        except OSError:
+            logger.warning("SessionStore: no se pudo reclamar %s", self._legacy_path, exc_info=True)
+            return 0
+        data = _load_json_file(claimed_path, {})
+        legacy_sessions = {
+            name: session_data for name, session_data in data.items() if isinstance(session_data, dict)
+        } if isinstance(data, dict) else {}
+
+        # El espacio por defecto ya no ve el archivo antiguo si no tiene uno propio.
+        default_record = self._get_namespace(DEFAULT_SESSION_NAMESPACE)
+        with default_record.lock:
+            if self._disk_mtime_ns(DEFAULT_SESSION_NAMESPACE) is None and default_record.sessions:
+                _reindex_sessions_locked(default_record, default_record.sessions, {})
+                default_record.sessions = {}
+                default_record.version += 1
+
+        if legacy_sessions:
+            def _merge(sessions):
+                for name, session_data in legacy_sessions.items():
+                    sessions[_import_name_for(name, session_data, sessions, "rename")] = session_data
+
+            self.update(namespace, _merge)
+            logger.info("SessionStore: %d sesiones antiguas movidas al espacio '%s'", len(legacy_sessions), namespace)
+        return len(legacy_sessions)
+
+    def _swap_locked(self, namespace, record, sessions):
+        path = self._namespace_path(namespace)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        # Las sesiones sin cambios conservan su objeto (y su entrada en el índice).
+        new_sessions = {name: self._chunk_session(namespace, session_data) for name, session_data in sessions.items()}
+        _reindex_sessions_locked(record, record.sessions, new_sessions)
+        record.sessions = new_sessions
+        record.version += 1
+        if path is not None:
+            # _save_json_file ignora errores de escritura (p. ej. sistemas de archivos de solo lectura).
+            _save_json_file(path, new_sessions)
+            record.disk_mtime_ns = self._disk_mtime_ns(namespace)
+            self._collect_chunks_locked(namespace, new_sessions)
+
+
+@memoize(maxsize=1)
+def get_sessions_store():
+    """Store de sesiones del proceso sobre `saved_sessions/` (la UI usa el suyo propio).
+
+    Varios stores sobre el mismo directorio son seguros: cada uno recarga un
+    espacio cuando otro reescribe su archivo.
+    """
+    return SessionStore(SAVED_SESSIONS_DIR, legacy_path=SAVED_SESSIONS_PATH)
+
+
+SESSIONS_ARCHIVE_FORMAT = "pali-lem-sessions"
+SESSIONS_ARCHIVE_VERSION = 1
+SESSION_IMPORT_POLICIES = {
+    "skip": "Conservar la existente",
+    "overwrite": "Sobrescribir",
+    "rename": "Importar con otro nombre",
+    "newest": "Quedarse con la más reciente",
+}
+_SESSIONS_IMPORT_BATCH_SIZE = 50
+
+
+def export_sessions_archive(output_file, session_names=None, namespace=None, store=None):
+    """Escribe sesiones en `output_file` (binario) como JSON Lines comprimido con gzip.
+
+    La primera línea es una cabecera de formato; cada línea siguiente contiene
+    una sesión, serializada de una en una. Devuelve el número de sesiones exportadas.
+    """
+    import gzip
+
+    store = store or get_sessions_store()
+    _, sessions = store.snapshot(namespace or DEFAULT_SESSION_NAMESPACE)
+    names = sorted(sessions) if session_names is None else [name for name in session_names if name in sessions]
+    header = {
+        "format": SESSIONS_ARCHIVE_FORMAT,
+        "version": SESSIONS_ARCHIVE_VERSION,
+        "exported_at": _utcnow().isoformat(timespec="seconds").replace("+00:00", "Z"),
+    }
+    with gzip.GzipFile(fileobj=output_file, mode="wb") as archive:
+        archive.write((json.dumps(header, ensure_ascii=False) + "\n").encode("utf-8"))
+        for name in names:
+            session_data = store.full_session(namespace or DEFAULT_SESSION_NAMESPACE, sessions[name])
+            line = json.dumps({"name": name, "session": session_data}, ensure_ascii=False)
+            archive.write((line + "\n").encode("utf-8"))
+    return len(names)
+
+
+def _import_name_for(name, incoming, sessions, policy):
+    """Nombre con el que guardar `incoming`, o None si se descarta según la política."""
+    existing = sessions.get(name)
+    if existing is None or policy == "overwrite":
+        return name
+    if policy == "newest":
+        incoming_saved_at = str(incoming.get("saved_at", ""))
+        existing_saved_at = str(existing.get("saved_at", "")) if isinstance(existing, dict) else ""
+        return name if incoming_saved_at > existing_saved_at else None
+    if policy == "rename":
+        suffix = 1
+        candidate = f"{name} (importada)"
+        while candidate in sessions:
+            suffix += 1
+            candidate = f"{name} (importada {suffix})"
+        return candidate
+    return None
+
+
+def import_sessions_archive(input_file, policy="skip", namespace=None, store=None):
+    """Fusiona en el store las sesiones de un archivo creado por `export_sessions_archive`.
+
+    Se lee línea a línea y se confirma por lotes con compare-and-swap, así que
+    nunca hay más de un lote en memoria. `policy` decide qué hacer con nombres
+    existentes (ver `SESSION_IMPORT_POLICIES`). Devuelve un resumen con contadores.
+    """
+    import gzip
+
+    if policy not in SESSION_IMPORT_POLICIES:
+        raise ValueError(f"Política de importación desconocida: {policy}")
+    store = store or get_sessions_store()
+    namespace = namespace or DEFAULT_SESSION_NAMESPACE
+    report = {"imported": 0, "overwritten": 0, "renamed": 0, "skipped": 0, "invalid": 0}
+
+    def _flush(batch):
+        batch_report = {}
+
+        def _merge(sessions):
+            batch_report.clear()
+            batch_report.update({key: 0 for key in report})
+            for name, incoming in batch:
+                target_name = _import_name_for(name, incoming, sessions, policy)
+                if target_name is None:
+                    batch_report["skipped"] += 1
+                    continue
+                if target_name != name:
+                    batch_report["renamed"] += 1
+                elif name in sessions:
+                    batch_report["overwritten"] += 1
+                sessions[target_name] = incoming
+                batch_report["imported"] += 1
+
+        store.update(namespace, _merge)
+        for key, value in batch_report.items():
+            report[key] += value
+
+    with gzip.GzipFile(fileobj=input_file, mode="rb") as archive:
+        header_line = archive.readline()
+        try:
+            header = json.loads(header_line.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            header = {}
+        if not isinstance(header, dict) or header.get("format") != SESSIONS_ARCHIVE_FORMAT:
+            raise ValueError("El archivo no es una exportación de sesiones de Pali Glosser")
+
+        batch = []
+        for raw_line in archive:
+            if not raw_line.strip():
+                continue
+            try:
+                record = json.loads(raw_line.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                report["invalid"] += 1
+                continue
+            name = str(record.get("name", "")).strip() if isinstance(record, dict) else ""
+            session_data = record.get("session") if isinstance(record, dict) else None
+            # Las referencias a fragmentos solo valen en el store que las escribió.
+            if not name or not isinstance(session_data, dict) or is_chunked_session(session_data):
+                report["invalid"] += 1
+                continue
+            batch.append((name, session_data))
+            if len(batch) >= _SESSIONS_IMPORT_BATCH_SIZE:
+                _flush(batch)
+                batch = []
+        if batch:
+            _flush(batch)
+    return report
+
+
+def _collect_session_forms(store):
+    """Formas normalizadas glosadas en todas las sesiones de todos los usuarios."""
+    forms = set()
+    for namespace in store.namespaces():
+        _, sessions = store.snapshot(namespace)
+        for session_data in sessions.values():
+            if not isinstance(session_data, dict) or not session_data.get("generated_gloss"):
+                continue
+            for entry in store.read_entries(namespace, session_data):
+                if isinstance(entry, dict) and entry.get("part_of_speech") != "SEP" and entry.get("word"):
+                    forms.add(entry["word"])
+    return forms
+
+
+def _regloss_session_needed(store, namespace, session_data, changed_forms):
+    if not isinstance(session_data, dict) or not session_data.get("generated_gloss"):
+        return False
+    gloss_entries = store.read_entries(namespace, session_data)
+    return any(
+        isinstance(entry, dict) and entry.get("part_of_speech") != "SEP" and entry.get("word") in changed_forms
+        for entry in gloss_entries
+    )
+
+
+def estimate_json_size(payload):
+    """Bytes del payload serializado como se guarda (`size_bytes` de una sesión); -1 si no es serializable."""
+    try:
+        return len(json.dumps(payload, ensure_ascii=False))
+    except Exception:
+        return -1
+
+
+def _regloss_session(session_data, gloss_entries, changed_forms, new_lookup_map, fallback_dictionary, release_info):
+    """Devuelve una copia de la sesión con solo las entradas afectadas re-glosadas, o None.
+
+    La copia lleva las entradas en línea; el store la vuelve a fragmentar al guardarla.
+    """
+    if not isinstance(session_data, dict) or not session_data.get("generated_gloss"):
+        return None
+
+    new_entries = None
+    changed_words = []
+    for index, entry in enumerate(gloss_entries):
+        if not isinstance(entry, dict) or entry.get("part_of_speech") == "SEP":
+            continue
+        word = entry.get("word")
+        if word not in changed_forms:
+            continue
+        if new_entries is None:
+            new_entries = list(gloss_entries)
+        new_entries[index] = _gloss_entry_for_word(word, new_lookup_map, fallback_dictionary)
+        changed_words.append(word)
+    if new_entries is None:
+        return None
+
+    found_words, word_total, coverage = _gloss_coverage_stats(new_entries)
+    updated = _inline_session(session_data, new_entries)
+    updated.update(
+        {
+            "gloss_compact_text": generate_compact_gloss(new_entries),
+            "gloss_rich_text": generate_rich_gloss_text(new_entries),
+            "gloss_word_total": word_total,
+            "gloss_found_words": found_words,
+            "gloss_coverage": coverage,
+            "regloss": {
+                "reglossed_at": _utcnow().isoformat(timespec="seconds").replace("+00:00", "Z"),
+                **release_info,
+                "changed_entries": len(changed_words),
+                "changed_words": _dedupe(changed_words),
+            },
+        }
+    )
+    updated.pop("size_bytes", None)
+    updated["size_bytes"] = max(0, estimate_json_size(updated))
+    return updated
+
+
+def regloss_saved_sessions(store, old_db_path, new_db_path, release_info=None, fallback_dictionary=None):
+    """Re-glosa las sesiones guardadas tras instalar una nueva release de dpd.db.
+
+    Solo se consultan en ambas bases las formas usadas en las sesiones, y solo
+    se reescriben las entradas cuyo resultado cambió entre releases. Cada
+    sesión tocada registra en `regloss` qué palabras cambiaron.
+    """
+    started = time.perf_counter()
+    release_info = dict(release_info or {})
+    forms = _collect_session_forms(store)
+    report = {"forms_checked": len(forms), "forms_changed": 0, "sessions_updated": 0, "entries_updated": 0}
+    if not forms:
+        return report
+
+    ordered_forms = sorted(forms)
+    old_lookup_map = _query_dpd_lookup(ordered_forms, str(old_db_path))
+    new_lookup_map = _query_dpd_lookup(ordered_forms, str(new_db_path))
+    changed_forms = {
+        form for form in ordered_forms if old_lookup_map.get(form) != new_lookup_map.get(form)
+    }
+    report["forms_changed"] = len(changed_forms)
+    if not changed_forms:
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        return report
+
+    if fallback_dictionary is None and any(form not in new_lookup_map for form in changed_forms):
+        fallback_dictionary = _load_json_file(DPD_JSON_PATH, default={})
+    fallback_dictionary = fallback_dictionary if isinstance(fallback_dictionary, dict) else {}
+
+    for namespace in store.namespaces():
+        namespace_stats = {"sessions": 0, "entries": 0}
+
+        def _mutate(sessions, namespace_stats=namespace_stats):
+            namespace_stats.update(sessions=0, entries=0)
+            for session_name, session_data in list(sessions.items()):
+                if not isinstance(session_data, dict) or not session_data.get("generated_gloss"):
+                    continue
+                updated = _regloss_session(
+                    session_data,
+                    store.read_entries(namespace, session_data),
+                    changed_forms,
+                    new_lookup_map,
+                    fallback_dictionary,
+                    release_info,
+                )
+                if updated is not None:
+                    sessions[session_name] = updated
+                    namespace_stats["sessions"] += 1
+                    namespace_stats["entries"] += updated["regloss"]["changed_entries"]
+
+        _, current_sessions = store.snapshot(namespace)
+        if not any(
+            _regloss_session_needed(store, namespace, session_data, changed_forms)
+            for session_data in current_sessions.values()
+        ):
+            continue
+        store.update(namespace, _mutate)
+        report["sessions_updated"] += namespace_stats["sessions"]
+        report["entries_updated"] += namespace_stats["entries"]
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,180 @@
+"""Tokenización de texto pali y fallbacks de vocal final."""
+
+import hashlib
+import re
+import unicodedata
+
+PUNCTUATION_LABELS = {
+    ".": "<PUNTO>",
+    ",": "<COMA>",
+    ";": "<PUNTO_Y_COMA>",
+    ":": "<DOS_PUNTOS>",
+    "!": "<EXCLAMACION>",
+    "?": "<INTERROGACION>",
+    "—": "<RAYA>",
+    "–": "<GUION>",
+    "-": "<GUION>",
+    "(": "<ABRE_PARENTESIS>",
+    ")": "<CIERRA_PARENTESIS>",
+    "«": "<ABRE_COMILLAS>",
+    "»": "<CIERRA_COMILLAS>",
+    '"': "<COMILLAS>",
+    "'": "<APOSTROFE>",
+    "“": "<ABRE_COMILLAS>",
+    "”": "<CIERRA_COMILLAS>",
+    "‘": "<ABRE_COMILLA_SIMPLE>",
+    "’": "<CIERRA_COMILLA_SIMPLE>",
+    "…": "<ELIPSIS>",
+    "...": "<ELIPSIS>",
+    "¶": "<FIN_SECCION>",
+}
+
+WORD_RE = re.compile(r"[^\W\d_]+", flags=re.UNICODE)
+TOKEN_RE = re.compile(r"[^\W\d_]+|\.\.\.|[.,;:!?…—–\-()«»\"'“”‘’¶]", flags=re.UNICODE)
+
+
+def _dedupe(values):
+    """Deduplica preservando orden. Descarta None y cadenas vacías, pero conserva 0 y otros falsos numéricos."""
+    seen = set()
+    result = []
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, str) and not value:
+            continue
+        if value not in seen:
+            seen.add(value)
+            result.append(value)
+    return result
+
+
+def _dedupe_normalized(values):
+    seen = set()
+    result = []
+    for value in values:
+        if not value:
+            continue
+        normalized_key = re.sub(r"\s+", " ", str(value).strip()).lower()
+        if normalized_key and normalized_key not in seen:
+            seen.add(normalized_key)
+            result.append(value)
+    return result
+
+
+def _normalize_token(token):
+    normalized = unicodedata.normalize("NFC", token.strip().lower())
+    return normalized.replace("ṁ", "ṃ")
+
+
+FINAL_LONG_VOWEL_MAP = {
+    "ā": "a",
+    "ī": "i",
+    "ū": "u",
+}
+
+FINAL_NIGGAHITA_MAP = {
+    "ṃ": "m",
+    "m": "ṃ",
+}
+
+
+def _generate_final_vowel_fallbacks(word):
+    normalized_word = _normalize_token(word)
+    if not normalized_word:
+        return []
+
+    candidates = [normalized_word]
+    for long_vowel, short_vowel in FINAL_LONG_VOWEL_MAP.items():
+        if normalized_word.endswith(long_vowel):
+            candidates.append(f"{normalized_word[:-1]}{short_vowel}")
+            break
+
+    for source_char, target_char in FINAL_NIGGAHITA_MAP.items():
+        if normalized_word.endswith(source_char):
+            candidates.append(f"{normalized_word[:-1]}{target_char}")
+            break
+
+    return _dedupe(candidates)
+
+
+def _is_final_long_vowel_shortening(original, candidate):
+    """True when candidate is original with its final long vowel (ā/ī/ū) shortened.
+
+    Pali words frequently end in a lengthened vowel due to ā+ti sandhi or
+    metrical requirements.  That is a natural phonological variant of the same
+    word, not a different lexical form, so it should not be flagged as an
+    approximate ('fallback') match.
+    """
+    for long_v, short_v in FINAL_LONG_VOWEL_MAP.items():
+        if original.endswith(long_v) and candidate == original[:-1] + short_v:
+            return True
+    return False
+
+
+def _resolve_entry_with_fallback(word, dictionary):
+    normalized_word = _normalize_token(word)
+    for candidate in _generate_final_vowel_fallbacks(normalized_word):
+        entry = dictionary.get(candidate)
+        if entry:
+            is_fallback = (
+                candidate != normalized_word
+                and not _is_final_long_vowel_shortening(normalized_word, candidate)
+            )
+            return entry, is_fallback, candidate
+    return None, False, ""
+
+
+def tokenize_pali_with_separators(text, with_offsets=False):
+    """Tokens de palabra y separador; con `with_offsets`, cada token lleva `start`/`end`
+    (posiciones de carácter en el texto normalizado a NFC)."""
+    normalized_text = unicodedata.normalize("NFC", text)
+    token_stream = []
+    for match in TOKEN_RE.finditer(normalized_text):
+        raw_token = match.group()
+        if WORD_RE.fullmatch(raw_token):
+            normalized_word = _normalize_token(raw_token)
+            if not normalized_word:
+                continue
+            token = {
+                "kind": "word",
+                "surface": raw_token,
+                "norm": normalized_word,
+            }
+        else:
+            token = {
+                "kind": "separator",
+                "surface": raw_token,
+                "separator": PUNCTUATION_LABELS.get(
+                    raw_token, f"<SIMBOLO:{raw_token}>"
+                ),
+            }
+        if with_offsets:
+            token["start"], token["end"] = match.span()
+        token_stream.append(token)
+    return token_stream
+
+
+def tokenize_pali_text(text):
+    token_stream = tokenize_pali_with_separators(text)
+    return [token["norm"] for token in token_stream if token["kind"] == "word"]
+
+
+def token_sequence_digest(text):
+    """Digest (16 bytes) de la secuencia de tokens de `text`: forma normalizada de
+    cada palabra y símbolo de cada separador. `None` si no hay tokens.
+
+    La glosa depende solo de esa secuencia, así que textos que difieren en
+    mayúsculas, espacios, saltos de línea o forma Unicode comparten digest.
+    """
+    token_stream = tokenize_pali_with_separators(text)
+    if not token_stream:
+        return None
+    key = "\n".join(
+        f"w{token['norm']}" if token["kind"] == "word" else f"s{token['surface']}" for token in token_stream
+    )
+    return hashlib.sha256(key.encode("utf-8")).digest()[:16]
+
+
+def _normalize_lemma(lemma):
+    """`dhamma 1.01` → `dhamma`: los lemas DPD llevan número de homónimo."""
+    return _normalize_token(re.sub(r"\s+\d+(?:\.\d+)*$", "", str(lemma or "").strip()))
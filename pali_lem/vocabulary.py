@@ -0,0 +1,162 @@
+"""Vocabulario de un texto o corpus: lemas únicos ordenados por frecuencia.
+
+En vez de una tarjeta por token, una entrada por lema con sus formas y cuántas
+veces aparece cada una. El flujo de tokens solo se cuenta (`Counter` por forma
+normalizada); cada forma distinta se busca una vez y las entradas se agregan
+por lema. Lo que se renderiza y exporta crece con el vocabulario, no con el
+número de tokens.
+
+Las entradas de vocabulario tienen las mismas claves que las de glosa (`word`,
+`meaning`, `part_of_speech`, `root`...), así que se exportan con los formatos
+de siempre (`generate_compact_gloss`, `generate_rich_gloss_text`, tarjetas
+HTML). `word` es el lema, `morphology` resume la frecuencia y las formas, y se
+añaden `lemma`, `count`, `forms` y `found`.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+
+from .formatting import _entry_has_lexical_data
+from .lookup import _gloss_entry_for_word
+from .text import WORD_RE, _dedupe, _normalize_lemma, _normalize_token
+
+# Formas que se listan por lema en `morphology`; el resto se resume como «+N».
+_VOCABULARY_FORMS_SHOWN = 6
+# Separadores de las categorías compuestas de `part_of_speech` («adj; masc», «ind, adv»).
+_POS_SEPARATOR_RE = re.compile(r"[;,\s]+")
+
+
+def count_forms(texts, counts=None):
+    """Cuenta las formas normalizadas de un iterable de textos (p. ej. las líneas de un archivo).
+
+    Cuenta lo mismo que `tokenize_pali_text`, pero sin construir un token por
+    palabra: las superficies se cuentan con `WORD_RE.findall` y cada superficie
+    distinta se normaliza una sola vez (~3x más rápido en un corpus grande).
+    """
+    counts = Counter() if counts is None else counts
+    surfaces = Counter()
+    for text in texts:
+        surfaces.update(WORD_RE.findall(unicodedata.normalize("NFC", text)))
+    for surface, count in surfaces.items():
+        form = _normalize_token(surface)
+        if form:
+            counts[form] += count
+    return counts
+
+
+def _lemma_key(entry):
+    lemmas = _dedupe(_normalize_lemma(value) for value in str(entry.get("lemma", "") or "").split(";"))
+    return "; ".join(lemmas)
+
+
+def _pos_parts(part_of_speech):
+    """Las partes de `part_of_speech` en minúsculas («Adj; PRON» → adj, pron)."""
+    return [part for part in _POS_SEPARATOR_RE.split(str(part_of_speech or "").strip().lower()) if part]
+
+
+def _pos_components(part_of_speech):
+    """El valor de `part_of_speech` en minúsculas y cada una de sus partes."""
+    value = str(part_of_speech or "").strip().lower()
+    return {value, *_pos_parts(value)} - {""}
+
+
+def _wanted_pos(parts_of_speech):
+    return {str(pos).strip().lower() for pos in parts_of_speech or () if str(pos).strip()}
+
+
+def filter_by_part_of_speech(entries, parts_of_speech):
+    """Entradas cuyo `part_of_speech` entero o alguna de sus partes está en `parts_of_speech`.
+
+    El mismo criterio que `aggregate_vocabulary`, para filtrar un vocabulario ya
+    agregado (la UI) sin volver a agregarlo. Sin filtro se devuelven todas.
+    """
+    wanted_pos = _wanted_pos(parts_of_speech)
+    if not wanted_pos:
+        return list(entries)
+    return [entry for entry in entries if not wanted_pos.isdisjoint(_pos_components(entry.get("part_of_speech")))]
+
+
+def _forms_summary(count, forms):
+    shown = ", ".join(f"{form} {form_count}" for form, form_count in forms[:_VOCABULARY_FORMS_SHOWN])
+    if len(forms) > _VOCABULARY_FORMS_SHOWN:
+        shown += f", +{len(forms) - _VOCABULARY_FORMS_SHOWN}"
+    return f"×{count} · {shown}"
+
+
+def aggregate_vocabulary(form_counts, form_entries, parts_of_speech=None, min_count=1, limit=None):
+    """Agrega por lema las entradas de glosa de cada forma distinta.
+
+    `form_counts` mapea forma → apariciones y `form_entries` forma → entrada de
+    glosa. Las formas sin lema (no encontradas) quedan como entrada propia.
+    `parts_of_speech` filtra por categoría gramatical sin distinguir
+    mayúsculas: una entrada pasa si su `part_of_speech` entero o alguna de sus
+    partes (separadas por `;`, comas o espacios) está en el filtro. Devuelve las entradas
+    ordenadas por frecuencia descendente y, a igual frecuencia, por lema.
+    """
+    wanted_pos = _wanted_pos(parts_of_speech)
+    groups = {}
+    # De la forma más frecuente a la menos: los datos léxicos del lema salen de su forma más común.
+    for form, count in sorted(form_counts.items(), key=lambda item: (-item[1], item[0])):
+        entry = form_entries.get(form)
+        if entry is None:
+            continue
+        if wanted_pos and wanted_pos.isdisjoint(_pos_components(entry.get("part_of_speech"))):
+            continue
+        lemma = _lemma_key(entry)
+        group = groups.get(lemma or f"\0{form}")
+        if group is None:
+            group = groups[lemma or f"\0{form}"] = {
+                key: value for key, value in entry.items() if key not in {"match_type", "matched_form", "match_source"}
+            }
+            group.update(word=lemma or form, lemma=lemma, count=0, forms=[], found=_entry_has_lexical_data(entry))
+        group["count"] += count
+        group["forms"].append([form, count])
+
+    vocabulary = [group for group in groups.values() if group["count"] >= min_count]
+    vocabulary.sort(key=lambda group: (-group["count"], group["word"]))
+    if limit:
+        vocabulary = vocabulary[:limit]
+    for group in vocabulary:
+        group["morphology"] = _forms_summary(group["count"], group["forms"])
+    return vocabulary
+
+
+def resolve_form_entries(forms, engine):
+    """Entrada de glosa de cada forma distinta con una sola búsqueda en dpd.db."""
+    forms = list(forms)
+    if not engine.dpd_db_path:
+        return {form: _gloss_entry_for_word(form, engine.fallback_dictionary) for form in forms}
+    lookup_map = engine.lookup(forms)
+    return {form: _gloss_entry_for_word(form, lookup_map, engine.fallback_dictionary) for form in forms}
+
+
+def vocabulary_from_texts(texts, engine, **options):
+    """Vocabulario de un iterable de textos; solo guarda en memoria el conteo por forma."""
+    form_counts = count_forms(texts)
+    return aggregate_vocabulary(form_counts, resolve_form_entries(form_counts, engine), **options)
+
+
+def vocabulary_from_gloss_entries(gloss_entries, **options):
+    """Vocabulario de una glosa ya generada (p. ej. la de la UI), sin volver a buscar."""
+    form_counts, form_entries = Counter(), {}
+    for entry in gloss_entries:
+        if entry.get("part_of_speech") == "SEP" or not entry.get("word"):
+            continue
+        form_counts[entry["word"]] += 1
+        form_entries.setdefault(entry["word"], entry)
+    return aggregate_vocabulary(form_counts, form_entries, **options)
+
+
+def vocabulary_parts_of_speech(vocabulary):
+    """Categorías gramaticales presentes, de la más a la menos frecuente (para filtros).
+
+    Una categoría compuesta («adj; pron») cuenta para cada una de sus partes, que
+    son las opciones que entiende `filter_by_part_of_speech`.
+    """
+    counts = Counter()
+    for entry in vocabulary:
+        if entry.get("found"):
+            for part in dict.fromkeys(_pos_parts(entry.get("part_of_speech"))):
+                counts[part] += entry["count"]
+    return [pos for pos, _ in counts.most_common()]
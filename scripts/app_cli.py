@@ -1,49 +1,19 @@
 #!/usr/bin/env python3
 
 import argparse
-import contextlib
-import io
-import logging
+import json
 import os
 import sys
 from pathlib import Path
 
-os.environ["PALI_LEM_NO_UI"] = "1"
-
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-for logger_name in ["streamlit", "streamlit.runtime", "streamlit.runtime.caching", "streamlit.runtime.scriptrunner_utils"]:
-    logging.getLogger(logger_name).setLevel(logging.ERROR)
-
-with contextlib.redirect_stderr(io.StringIO()):
-    from streamlit_app import (  # noqa: E402
-        generate_compact_gloss,
-        generate_rich_gloss_text,
-        get_dpd_db_path,
-        load_dictionary,
-        lookup_words_in_dpd,
-        process_pali_text,
-        process_pali_with_lookup_map,
-        tokenize_pali_text,
-    )
-
+from pali_lem import daemon as gloss_daemon  # noqa: E402
 
-    def _entry_has_lexical_data(entry: dict) -> bool:
-        if entry.get("part_of_speech") == "SEP":
-            return False
-
-        placeholders = {"", "---", "N/A", "—", "[No encontrado en diccionario]"}
-        fields = [
-            entry.get("part_of_speech"),
-            entry.get("morphology"),
-            entry.get("meaning"),
-            entry.get("root"),
-            entry.get("sanskrit_root"),
-            entry.get("etymology"),
-        ]
-        return any(str(value or "").strip() not in placeholders for value in fields if str(value or "").strip())
+# El núcleo se importa dentro de cada modo: si hay un daemon escuchando, la CLI
+# solo reenvía el texto y no paga la importación.
 
 
 def read_input_text(args) -> str:
@@ -67,24 +37,27 @@ def read_input_text(args) -> str:
 
 
 def run_gloss(text: str, dictionary_name: str, db_path_override: str = "", debug: bool = False):
-    with contextlib.redirect_stderr(io.StringIO()):
-        if dictionary_name != "dpd" and debug:
-            print("[debug] '--dict local' ya no se usa; forzando '--dict dpd'")
+    from pali_lem.dictionary import load_dictionary
+    from pali_lem.dpd_db import get_dpd_db_path, get_dpd_db_stats
+    from pali_lem.formatting import _entry_has_lexical_data
+    from pali_lem.lookup import process_pali_text
+    from pali_lem.result_cache import cached_gloss, get_result_cache
 
-        dictionary = load_dictionary("dpd")
-        dpd_db_path = db_path_override or get_dpd_db_path()
-        if dpd_db_path:
-            words = tuple(tokenize_pali_text(text))
-            lookup_map = lookup_words_in_dpd(words, dpd_db_path)
-            gloss_entries = process_pali_with_lookup_map(
-                text,
-                lookup_map,
-                fallback_dictionary=dictionary,
-            )
-            source = f"dpd.db ({dpd_db_path})"
-        else:
-            gloss_entries = process_pali_text(text, dictionary)
-            source = "dpd_dictionary.json"
+    if dictionary_name != "dpd" and debug:
+        print("[debug] '--dict local' ya no se usa; forzando '--dict dpd'")
+
+    dpd_db_path = db_path_override or get_dpd_db_path()
+    if dpd_db_path:
+        # Como en la UI: con dpd.db el JSON es solo respaldo y puede faltar.
+        try:
+            dictionary = load_dictionary()
+        except FileNotFoundError:
+            dictionary = {}
+        gloss_entries, gloss_stats = cached_gloss(text, dpd_db_path, fallback_dictionary=dictionary)
+        source = f"dpd.db ({dpd_db_path})"
+    else:
+        gloss_entries = process_pali_text(text, load_dictionary())
+        source = "dpd_dictionary.json"
 
     found_words = sum(1 for entry in gloss_entries if _entry_has_lexical_data(entry))
     total_words = sum(1 for entry in gloss_entries if entry.get("part_of_speech") != "SEP")
@@ -92,6 +65,22 @@ def run_gloss(text: str, dictionary_name: str, db_path_override: str = "", debug
 
     if debug:
         print(f"[debug] source={source}")
+        if dpd_db_path:
+            db_stats = get_dpd_db_stats(dpd_db_path)
+            if db_stats:
+                print(
+                    f"[debug] db_stats lookup={db_stats['lookup_entries']} headwords={db_stats['headwords']}"
+                    f" roots={db_stats['roots']} release={db_stats.get('release_tag') or '-'}"
+                    f" size={db_stats['size_bytes']} built_at={db_stats['built_at']}"
+                )
+            else:
+                print("[debug] db_stats=pendiente (calculándose en segundo plano)")
+            cache_info = get_result_cache().cache_info()
+            print(
+                f"[debug] result_cache={gloss_stats['cache']} disk={cache_info['disk_path'] or '-'}"
+                f" disk_bytes={cache_info['disk_bytes']}"
+            )
+            print(f"[debug] gloss_store={gloss_stats['stored']}/{gloss_stats['paragraphs']} párrafos precalculados")
         print(f"[debug] tokens_total={total_words} tokens_found={found_words} coverage={coverage:.1f}%")
         missing = [e.get("word") for e in gloss_entries if e.get("part_of_speech") != "SEP" and not _entry_has_lexical_data(e)]
         if missing:
@@ -100,12 +89,236 @@ def run_gloss(text: str, dictionary_name: str, db_path_override: str = "", debug
     return gloss_entries, coverage
 
 
+def run_batch(args):
+    from pali_lem.batch import gloss_files, resolve_batch_inputs
+    from pali_lem.dictionary import load_dictionary
+    from pali_lem.dpd_db import get_dpd_db_path
+
+    if not args.output_dir:
+        raise SystemExit("--inputs requiere --output-dir")
+    input_paths = resolve_batch_inputs(args.inputs)
+    if not input_paths:
+        raise SystemExit(f"Ningún archivo coincide con: {' '.join(args.inputs)}")
+
+    dpd_db_path = args.db or get_dpd_db_path()
+    if not dpd_db_path:
+        # Sin dpd.db los procesos dependen del JSON: mejor fallar aquí que en cada uno.
+        try:
+            load_dictionary()
+        except FileNotFoundError as exc:
+            raise SystemExit(str(exc))
+
+    summary = gloss_files(
+        input_paths,
+        args.output_dir,
+        output_format=args.format,
+        dpd_db_path=dpd_db_path,
+        workers=args.workers,
+    )
+    summary_path = Path(args.output_dir) / "batch_summary.json"
+    summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(
+        f"{summary['glossed']}/{summary['files']} archivos en {summary['seconds']:.2f}s"
+        f" con {summary['workers']} procesos ({summary['files_per_second']:.1f} archivos/s,"
+        f" {summary['words_per_second']:.0f} palabras/s)"
+    )
+    print(f"Cobertura: {summary['found']}/{summary['words']} palabras ({summary['coverage']:.1f}%)")
+    if args.debug:
+        print(f"[debug] source={'dpd.db (' + dpd_db_path + ')' if dpd_db_path else 'dpd_dictionary.json'}")
+        if summary["top_missing"]:
+            print("[debug] top_missing=" + ",".join(f"{word}:{count}" for word, count in summary["top_missing"]))
+    for failure in summary["failed"]:
+        print(f"Error en {failure['input']}: {failure['error']}", file=sys.stderr)
+    print(f"Resumen: {summary_path}")
+    return 1 if summary["failed"] else 0
+
+
+def open_engine(db_path_override: str = ""):
+    """`GlossEngine` sobre dpd.db (o el JSON si no hay base) para los modos de larga duración."""
+    from pali_lem.dictionary import load_dictionary
+    from pali_lem.dpd_db import get_dpd_db_path
+    from pali_lem.engine import GlossEngine
+
+    dpd_db_path = db_path_override or get_dpd_db_path()
+    try:
+        dictionary = load_dictionary()
+    except FileNotFoundError as exc:
+        if not dpd_db_path:
+            raise SystemExit(str(exc))
+        # Como en la UI: con dpd.db el JSON es solo respaldo y puede faltar.
+        dictionary = {}
+    return GlossEngine(dpd_db_path, fallback_dictionary=dictionary)
+
+
+def iter_vocabulary_texts(args):
+    """Líneas de --inputs, --file o stdin (o el --text entero), sin cargar el corpus en memoria."""
+    if args.text:
+        yield args.text
+        return
+    if args.inputs:
+        from pali_lem.batch import resolve_batch_inputs
+
+        paths = resolve_batch_inputs(args.inputs)
+        if not paths:
+            raise SystemExit(f"Ningún archivo coincide con: {' '.join(args.inputs)}")
+    elif args.file:
+        paths = [Path(args.file)]
+        if not paths[0].exists():
+            raise SystemExit(f"No existe el archivo: {paths[0]}")
+    else:
+        yield from sys.stdin
+        return
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as file_handle:
+                yield from file_handle
+        except (OSError, UnicodeDecodeError) as exc:
+            print(f"✗ {path}: {type(exc).__name__}: {exc}", file=sys.stderr)
+
+
+def run_vocabulary(args):
+    """Lemas únicos del texto o corpus, por frecuencia, en los formatos de glosa."""
+    import time
+
+    from pali_lem.formatting import generate_compact_gloss, generate_rich_gloss_text
+    from pali_lem.vocabulary import aggregate_vocabulary, count_forms, resolve_form_entries
+
+    if args.text and (args.file or args.inputs) or (args.file and args.inputs):
+        raise SystemExit("Usa solo una de estas opciones: --text, --file o --inputs")
+    parts_of_speech = [pos for value in args.pos for pos in value.split(",")]
+    started = time.perf_counter()
+    form_counts = count_forms(iter_vocabulary_texts(args))
+    counted = time.perf_counter()
+    engine = open_engine(args.db)
+    try:
+        form_entries = resolve_form_entries(form_counts, engine)
+    finally:
+        engine.close()
+    vocabulary = aggregate_vocabulary(
+        form_counts, form_entries, parts_of_speech=parts_of_speech, min_count=args.min_count, limit=args.top
+    )
+
+    if args.format == "jsonl":
+        fields = ("lemma", "word", "count", "forms", "part_of_speech", "meaning", "root", "found")
+        for entry in vocabulary:
+            print(json.dumps({field: entry.get(field) for field in fields}, ensure_ascii=False))
+    elif args.format == "rich":
+        print(generate_rich_gloss_text(vocabulary))
+    else:
+        print(generate_compact_gloss(vocabulary))
+    if args.debug:
+        print(
+            f"[debug] tokens={sum(form_counts.values())} forms={len(form_counts)} entries={len(vocabulary)}"
+            f" count_s={counted - started:.3f} lookup_s={time.perf_counter() - counted:.3f}",
+            file=sys.stderr,
+        )
+
+
+def run_lines(args):
+    """Filtro de tubería: glosa cada línea de stdin en cuanto llega y vacía la salida.
+
+    El motor (caché por forma y conexión a dpd.db) se mantiene entre líneas. Con
+    `--format jsonl` cada línea produce un objeto con su número (desde 1), también
+    las vacías, para que quien consume pueda realinear los resultados.
+    """
+    import time
+
+    from pali_lem.engine import gloss_line_record
+    from pali_lem.formatting import generate_compact_gloss, generate_rich_gloss_text
+
+    engine = open_engine(args.db)
+    render = {"compact": generate_compact_gloss, "rich": generate_rich_gloss_text}.get(args.format)
+
+    latencies_ms = []
+    line_number = 0
+    try:
+        while True:
+            line = sys.stdin.readline()
+            if not line:
+                break
+            line_number += 1
+            started = time.perf_counter()
+            text = line.rstrip("\r\n")
+            gloss_entries = engine.gloss(text) if text.strip() else []
+            if render is None:
+                sys.stdout.write(json.dumps(gloss_line_record(line_number, text, gloss_entries), ensure_ascii=False) + "\n")
+            else:
+                # Una línea en blanco separa las glosas de dos líneas de entrada.
+                sys.stdout.write((render(gloss_entries) + "\n" if gloss_entries else "") + "\n")
+            sys.stdout.flush()
+            latencies_ms.append((time.perf_counter() - started) * 1000)
+    except BrokenPipeError:
+        # El consumidor cerró la tubería (p. ej. `| head`): terminar sin traza.
+        sys.stdout = open(os.devnull, "w")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+
+    if args.debug and latencies_ms:
+        latencies_ms.sort()
+        cache = engine.cache_info()
+        print(
+            f"[debug] lines={len(latencies_ms)} p50_ms={latencies_ms[len(latencies_ms) // 2]:.2f}"
+            f" p99_ms={latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.99))]:.2f}"
+            f" cache_forms={cache['forms']} cache_hits={cache['hits']} db_queries={cache['queries']}",
+            file=sys.stderr,
+        )
+
+
+def run_via_daemon(text: str, args):
+    """Reenvía la glosa al daemon; None si no hay daemon (y no se pidió arrancarlo)."""
+    if args.daemon and not gloss_daemon.start_daemon():
+        print("No se pudo arrancar el daemon; se glosa en este proceso", file=sys.stderr)
+        return None
+    reply = gloss_daemon.daemon_request(
+        {
+            "op": "gloss",
+            "text": text,
+            "format": args.format,
+            "db": str(Path(args.db).resolve()) if args.db else "",
+        }
+    )
+    if reply is not None and not reply.get("ok"):
+        raise SystemExit(reply.get("error") or "El daemon no pudo glosar el texto")
+    return reply
+
+
+def run_daemon_command(args):
+    if args.daemon_start:
+        pong = gloss_daemon.start_daemon()
+        if not pong:
+            raise SystemExit("No se pudo arrancar el daemon")
+        print(f"Daemon escuchando en {gloss_daemon.default_socket_path()} (pid {pong['pid']})")
+    elif args.daemon_stop:
+        stopped = gloss_daemon.stop_daemon()
+        print("Daemon detenido" if stopped else "No hay daemon escuchando")
+    else:
+        pong = gloss_daemon.daemon_request({"op": "ping"})
+        if not pong:
+            raise SystemExit("No hay daemon escuchando")
+        print(json.dumps(pong, ensure_ascii=False, indent=2))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Prueba Pali Glosser por consola con argv y modo debug"
     )
     parser.add_argument("--text", help="Texto Pali directo")
     parser.add_argument("--file", help="Archivo UTF-8 con texto Pali")
+    parser.add_argument(
+        "--inputs",
+        nargs="+",
+        help="Modo por lotes: archivos o globs (admite **) a glosar; requiere --output-dir",
+    )
+    parser.add_argument("--output-dir", help="Directorio de salida del modo por lotes")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Procesos del modo por lotes (default: núcleos disponibles)",
+    )
     parser.add_argument(
         "--dict",
         dest="dictionary_name",
@@ -114,16 +327,77 @@ def main():
         help="Fuente de diccionario (solo: dpd)",
     )
     parser.add_argument("--db", default="", help="Ruta explícita a dpd.db")
+    parser.add_argument(
+        "--lines",
+        action="store_true",
+        help="Filtro de tubería: glosa stdin línea a línea y emite cada resultado al momento",
+    )
+    parser.add_argument(
+        "--vocabulary",
+        action="store_true",
+        help="Vocabulario: un lema por entrada con su frecuencia y formas, en vez de una glosa por token",
+    )
+    parser.add_argument(
+        "--pos",
+        action="append",
+        default=[],
+        help="Con --vocabulary: solo estas categorías (masc, fem, verb...; repetible o separadas por comas)",
+    )
+    parser.add_argument("--min-count", type=int, default=1, help="Con --vocabulary: frecuencia mínima del lema")
+    parser.add_argument("--top", type=int, default=0, help="Con --vocabulary: solo los N lemas más frecuentes")
     parser.add_argument(
         "--format",
-        choices=["compact", "rich"],
+        choices=["compact", "rich", "jsonl"],
         default="compact",
-        help="Formato de salida (default: compact)",
+        help="Formato de salida (default: compact; jsonl solo con --lines, --vocabulary o --inputs)",
     )
     parser.add_argument("--debug", action="store_true", help="Imprime información de depuración")
+    daemon_mode = parser.add_mutually_exclusive_group()
+    daemon_mode.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Glosa en el daemon, arrancándolo si no está (por defecto se usa solo si ya escucha)",
+    )
+    daemon_mode.add_argument("--no-daemon", action="store_true", help="Glosa siempre en este proceso")
+    daemon_mode.add_argument("--daemon-start", action="store_true", help="Arranca el daemon y sale")
+    daemon_mode.add_argument("--daemon-stop", action="store_true", help="Detiene el daemon y sale")
+    daemon_mode.add_argument("--daemon-status", action="store_true", help="Muestra el estado del daemon y sale")
     args = parser.parse_args()
 
+    if args.daemon_start or args.daemon_stop or args.daemon_status:
+        run_daemon_command(args)
+        return
+
+    if args.format == "jsonl" and not (args.lines or args.vocabulary or args.inputs):
+        raise SystemExit("--format jsonl solo se usa con --lines, --vocabulary o --inputs")
+
+    if args.vocabulary:
+        if args.lines:
+            raise SystemExit("--vocabulary no se combina con --lines")
+        run_vocabulary(args)
+        return
+
+    if args.lines:
+        if args.text or args.file or args.inputs:
+            raise SystemExit("--lines lee de stdin: no se combina con --text, --file ni --inputs")
+        run_lines(args)
+        return
+
+    if args.inputs:
+        if args.text or args.file:
+            raise SystemExit("Usa solo una de estas opciones: --text, --file o --inputs")
+        raise SystemExit(run_batch(args))
+
     text = read_input_text(args)
+    # --debug necesita las entradas y las estadísticas de la base: siempre en proceso.
+    if not args.no_daemon and not args.debug:
+        reply = run_via_daemon(text, args)
+        if reply is not None:
+            print(reply["output"])
+            return
+
+    from pali_lem.formatting import generate_compact_gloss, generate_rich_gloss_text
+
     gloss_entries, coverage = run_gloss(
         text=text,
         dictionary_name=args.dictionary_name,
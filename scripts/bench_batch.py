@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Mide el glosado por lotes con 1..N procesos sobre un corpus sintético.
+
+Genera una dpd.db sintética y miles de archivos con vocabulario de frecuencia tipo
+Zipf (pocas formas muy repetidas, muchas raras), como un corpus de suttas, y los
+glosa con `gloss_files` variando `workers`.
+
+Ejecutar:
+    python scripts/bench_batch.py --files 2000 --words-per-file 400 --workers 1,2,4,8
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from test_dpd_db import build_synthetic_dpd_db  # noqa: E402
+
+from pali_lem.batch import gloss_files  # noqa: E402
+from pali_lem.dpd_db import _optimize_dpd_db  # noqa: E402
+
+_SYLLABLES = ("dha", "mma", "bu", "ddha", "sa", "ṅgha", "ka", "ro", "ti", "vā", "naṃ", "su", "ttaṃ", "bhi", "kkhu")
+
+
+def _build_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de glosado por lotes con un pool de procesos")
+    parser.add_argument("--files", type=int, default=2000, help="Archivos del corpus")
+    parser.add_argument("--words-per-file", type=int, default=400, help="Palabras por archivo")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Formas distintas del corpus")
+    parser.add_argument("--workers", default="1,2,4,8", help="Procesos a probar, separados por comas")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = _build_vocabulary(args.vocabulary, rng)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    worker_counts = [int(value) for value in args.workers.split(",") if value.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        # Tres de cada cuatro formas están en la base, el resto queda sin glosa.
+        db_path = build_synthetic_dpd_db(
+            tmp_path / "dpd.db",
+            {word: (word, "noun", "masc", f"sentido de {word}", "") for word in vocabulary[::4] + vocabulary[1::4] + vocabulary[2::4]},
+        )
+        # Con los índices que crea la instalación, como una release real.
+        _optimize_dpd_db(db_path)
+        corpus_dir = tmp_path / "corpus"
+        corpus_dir.mkdir()
+        input_paths = []
+        for index in range(args.files):
+            path = corpus_dir / f"sutta_{index:05d}.txt"
+            words = rng.choices(vocabulary, weights=weights, k=args.words_per_file)
+            path.write_text(" ".join(words) + ".\n", encoding="utf-8")
+            input_paths.append(path)
+
+        print(f"Corpus: {args.files} archivos × {args.words_per_file} palabras, {len(vocabulary)} formas")
+        print(f"{'workers':>8} {'segundos':>9} {'archivos/s':>11} {'aceleración':>12} {'eficiencia':>11}")
+        baseline = None
+        for workers in worker_counts:
+            summary = gloss_files(
+                input_paths, tmp_path / f"out-{workers}", dpd_db_path=str(db_path), workers=workers
+            )
+            if summary["failed"]:
+                raise SystemExit(f"Fallaron {len(summary['failed'])} archivos con {workers} procesos")
+            baseline = baseline or summary["seconds"]
+            speedup = baseline / summary["seconds"]
+            print(
+                f"{summary['workers']:>8} {summary['seconds']:>9.2f} {summary['files_per_second']:>11.1f}"
+                f" {speedup:>11.2f}x {speedup / summary['workers'] * 100:>10.0f}%"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Mide la construcción del índice de concordancias y la latencia de sus consultas.
+
+Usa el mismo corpus sintético que `bench_batch.py` (vocabulario tipo Zipf sobre
+una dpd.db sintética): indexa el corpus completo, repite la indexación sin
+cambios (incremental), añade unos pocos archivos y consulta formas frecuentes,
+medias y raras por lema y por forma.
+
+Ejecutar:
+    python scripts/bench_concordance.py --files 2000 --words-per-file 400
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_batch import _build_vocabulary  # noqa: E402
+from test_dpd_db import build_synthetic_dpd_db  # noqa: E402
+
+from pali_lem.concordance import concordance_query, concordance_stats, update_concordance  # noqa: E402
+from pali_lem.dpd_db import _optimize_dpd_db  # noqa: E402
+from pali_lem.engine import GlossEngine  # noqa: E402
+
+
+def _write_corpus(corpus_dir, names, vocabulary, weights, words_per_file, rng):
+    paths = []
+    for name in names:
+        path = corpus_dir / name
+        words = rng.choices(vocabulary, weights=weights, k=words_per_file)
+        # Líneas de ~12 palabras, como un texto real.
+        lines = [" ".join(words[index:index + 12]) + "." for index in range(0, len(words), 12)]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de concordancias")
+    parser.add_argument("--files", type=int, default=2000, help="Archivos del corpus")
+    parser.add_argument("--words-per-file", type=int, default=400, help="Palabras por archivo")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Formas distintas del corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas por tipo de término")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = _build_vocabulary(args.vocabulary, rng)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        # Cada lema agrupa dos formas contiguas del vocabulario, como una declinación.
+        db_path = build_synthetic_dpd_db(
+            tmp_path / "dpd.db",
+            {word: (vocabulary[index - index % 2], "noun", "masc", f"sentido de {word}", "")
+             for index, word in enumerate(vocabulary) if index % 4 != 3},
+        )
+        _optimize_dpd_db(db_path)
+        corpus_dir = tmp_path / "corpus"
+        corpus_dir.mkdir()
+        input_paths = _write_corpus(
+            corpus_dir, [f"sutta_{index:05d}.txt" for index in range(args.files)],
+            vocabulary, weights, args.words_per_file, rng,
+        )
+        index_path = tmp_path / "concordance.db"
+        engine = GlossEngine(str(db_path))
+
+        print(f"Corpus: {args.files} archivos × {args.words_per_file} palabras, {len(vocabulary)} formas")
+        summary = update_concordance(input_paths, engine, index_path=index_path)
+        stats = concordance_stats(index_path)
+        print(
+            f"Indexación completa: {summary['seconds']:.2f} s ({summary['words'] / summary['seconds']:,.0f} palabras/s),"
+            f" índice {stats['size_bytes'] / 1_000_000:.1f} MB"
+            f" ({stats['size_bytes'] / max(1, stats['words']):.1f} bytes/palabra con el texto incluido)"
+        )
+        summary = update_concordance(input_paths, engine, index_path=index_path)
+        print(f"Reindexación sin cambios: {summary['seconds'] * 1000:.0f} ms ({summary['unchanged']} sin cambios)")
+        extra = _write_corpus(
+            corpus_dir, [f"nuevo_{index:03d}.txt" for index in range(10)], vocabulary, weights, args.words_per_file, rng
+        )
+        summary = update_concordance(input_paths + extra, engine, index_path=index_path)
+        print(f"Añadir {summary['added']} archivos: {summary['seconds'] * 1000:.0f} ms")
+        engine.close()
+
+        print(f"{'término':<10} {'modo':<6} {'apariciones (mediana)':>22} {'p50 ms':>8} {'p99 ms':>8}")
+        bands = {"frecuente": vocabulary[:20], "medio": vocabulary[200:2000], "raro": vocabulary[-5000:]}
+        for band, terms in bands.items():
+            for mode in ("lemma", "form"):
+                latencies, totals = [], []
+                for term in rng.choices(terms, k=args.queries):
+                    if mode == "lemma":
+                        term = vocabulary[vocabulary.index(term) // 2 * 2]
+                    started = time.perf_counter()
+                    result = concordance_query(term, mode=mode, limit=50, index_path=index_path)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    totals.append(result["total"])
+                latencies.sort()
+                print(
+                    f"{band:<10} {mode:<6} {statistics.median(totals):>22.0f} {statistics.median(latencies):>8.2f}"
+                    f" {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Mide el throughput de descarga de dpd.db con 1..N conexiones en paralelo.
+
+Sirve un archivo aleatorio desde un servidor local que limita el ancho de banda
+de cada conexión (como hacen muchos CDNs) y lo descarga con
+`_download_dpd_db` variando `workers`.
+
+Ejecutar:
+    python scripts/bench_download.py --size-mb 8 --workers 1,2,4,8
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import unittest.mock
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from test_dpd_db import dpd_db, serve_files  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de descarga paralela por rangos")
+    parser.add_argument("--size-mb", type=float, default=8, help="Tamaño del archivo servido (MB)")
+    parser.add_argument("--workers", default="1,2,4,8", help="Conexiones a probar, separadas por comas")
+    parser.add_argument(
+        "--per-connection-kbps",
+        type=float,
+        default=4000,
+        help="Ancho de banda máximo por conexión en KB/s (0 = sin límite)",
+    )
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    expected_sha256 = hashlib.sha256(payload).hexdigest()
+    chunk_size = 16 * 1024
+    chunk_delay = chunk_size / (args.per_connection_kbps * 1024) if args.per_connection_kbps > 0 else 0
+    worker_counts = [int(value) for value in args.workers.split(",") if value.strip()]
+
+    print(f"Archivo: {len(payload)} bytes, límite por conexión: {args.per_connection_kbps:g} KB/s")
+    print(f"{'workers':>8} {'segundos':>9} {'Mbit/s':>9}")
+    with serve_files({"/dpd.db": payload}, etag='"bench"', chunk_size=chunk_size, chunk_delay=chunk_delay) as (
+        base_url, _,
+    ), unittest.mock.patch.object(dpd_db, "_PARALLEL_MIN_PART_BYTES", 256 * 1024):
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                target_db = Path(tmp) / "dpd.db"
+                result = dpd_db._download_dpd_db(
+                    f"{base_url}/dpd.db", Path(tmp), target_db, 30,
+                    remote_signature={"etag": '"bench"'}, workers=workers,
+                )
+            if not result or result["sha256"] != expected_sha256:
+                raise SystemExit(f"La descarga con {workers} conexiones falló o no coincide el checksum")
+            print(f"{workers:>8} {result['seconds']:>9.2f} {result['throughput_mbps']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
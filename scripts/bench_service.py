@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Prueba de carga del servicio HTTP de glosado: p50/p99 por endpoint y concurrencia.
+
+Sin `--url` arranca `gloss_server.py` en otro proceso sobre una dpd.db sintética
+(vocabulario tipo Zipf, como en `bench_batch.py`); con `--url` mide un servicio
+ya levantado (p. ej. con la dpd.db real). Cada cliente reutiliza su conexión
+HTTP/1.1, como haría una app lectora.
+
+Ejecutar:
+    python scripts/bench_service.py --requests 2000 --concurrency 1,4,16
+    python scripts/bench_service.py --url http://127.0.0.1:8765 --concurrency 8
+"""
+
+import argparse
+import http.client
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_batch import _build_vocabulary  # noqa: E402
+from test_dpd_db import build_synthetic_dpd_db  # noqa: E402
+
+from pali_lem.dpd_db import _optimize_dpd_db  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _make_requests(vocabulary, count, rng):
+    """Mezcla de peticiones: frases sueltas, lotes de frases y búsquedas de formas."""
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    def sentence():
+        return " ".join(rng.choices(vocabulary, weights=weights, k=rng.randint(8, 30))) + "."
+
+    requests = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            requests.append(("/gloss", {"text": sentence(), "format": "compact"}))
+        elif kind < 0.8:
+            requests.append(("/gloss", {"texts": [sentence() for _ in range(8)]}))
+        else:
+            requests.append(("/lookup", {"words": rng.choices(vocabulary, weights=weights, k=5)}))
+    return requests
+
+
+def _run_load(host, port, requests, concurrency):
+    latencies = {}
+    errors = []
+    lock = threading.Lock()
+    chunks = [requests[index::concurrency] for index in range(concurrency)]
+
+    def client(chunk):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        local = []
+        try:
+            for path, payload in chunk:
+                body = json.dumps(payload).encode("utf-8")
+                started = time.perf_counter()
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if response.status != 200:
+                    with lock:
+                        errors.append(response.status)
+                    continue
+                label = path if "texts" not in payload else "/gloss (8 textos)"
+                local.append((label, elapsed_ms))
+        finally:
+            conn.close()
+        with lock:
+            for label, elapsed_ms in local:
+                latencies.setdefault(label, []).append(elapsed_ms)
+
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def _start_local_server(tmp_path, vocabulary):
+    # Tres de cada cuatro formas están en la base, el resto queda sin glosa.
+    db_path = build_synthetic_dpd_db(
+        tmp_path / "dpd.db",
+        {word: (word, "noun", "masc", f"sentido de {word}", "") for word in vocabulary[::4] + vocabulary[1::4] + vocabulary[2::4]},
+    )
+    _optimize_dpd_db(db_path)
+    process = subprocess.Popen(
+        [sys.executable, str(PROJECT_ROOT / "scripts" / "gloss_server.py"), "--port", "0", "--db", str(db_path),
+         "--max-concurrency", "16"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    banner = process.stdout.readline()
+    if "http://" not in banner:
+        process.kill()
+        raise SystemExit(f"El servicio no arrancó: {banner!r}")
+    return process, banner.split("http://", 1)[1].split(" ", 1)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio HTTP de glosado")
+    parser.add_argument("--url", default="", help="Servicio ya levantado (default: arranca uno sintético)")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por nivel de concurrencia")
+    parser.add_argument("--concurrency", default="1,4,16", help="Clientes simultáneos, separados por comas")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Formas distintas del corpus sintético")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = _build_vocabulary(args.vocabulary, rng)
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        if args.url:
+            address = urllib.parse.urlparse(args.url).netloc
+        else:
+            process, address = _start_local_server(Path(tmp), vocabulary)
+        host, port = address.rsplit(":", 1)
+        try:
+            print(f"{'clientes':>8} {'endpoint':<18} {'n':>6} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'req/s':>8}")
+            for concurrency in levels:
+                requests = _make_requests(vocabulary, args.requests, rng)
+                latencies, errors, elapsed = _run_load(host, int(port), requests, concurrency)
+                throughput = sum(len(values) for values in latencies.values()) / elapsed
+                for label, values in sorted(latencies.items()):
+                    values.sort()
+                    print(
+                        f"{concurrency:>8} {label:<18} {len(values):>6} {statistics.median(values):>8.2f}"
+                        f" {_percentile(values, 0.99):>8.2f} {values[-1]:>8.2f} {throughput:>8.0f}"
+                    )
+                if errors:
+                    print(f"{concurrency:>8} errores: {len(errors)} ({', '.join(sorted(set(map(str, errors))))})")
+            if args.url:
+                # Solo contra un servicio real: /health calcula y guarda estadísticas de la base.
+                conn = http.client.HTTPConnection(host, int(port), timeout=10)
+                conn.request("GET", "/health")
+                cache = json.loads(conn.getresponse().read())["cache"]
+                conn.close()
+                print(f"Caché: {cache['forms']} formas, {cache['hits']} aciertos, {cache['misses']} fallos,"
+                      f" {cache['queries']} consultas a dpd.db")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
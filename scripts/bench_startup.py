@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Mide el arranque de la CLI (núcleo `pali_lem`) frente a importar la app Streamlit.
+
+Cada medición es un proceso nuevo, como una invocación real de la CLI. Sale con
+código 1 si la mediana de la CLI supera `--max-ms`. También compara glosar una
+frase en proceso con reenviarla al daemon (sobre una dpd.db sintética) y mide la
+ida y vuelta por el socket sin arrancar Python, que es lo que ve un editor.
+
+Ejecutar:
+    python scripts/bench_startup.py --runs 15 --max-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+from test_dpd_db import BASE_ENTRIES, build_synthetic_dpd_db  # noqa: E402
+
+from pali_lem import daemon as gloss_daemon  # noqa: E402
+
+APP_CLI = str(PROJECT_ROOT / "scripts" / "app_cli.py")
+GLOSS_TEXT = "dhammo buddha saṅgho"
+
+COMMANDS = {
+    "python (vacío)": [sys.executable, "-c", "pass"],
+    "app_cli.py --help": [sys.executable, APP_CLI, "--help"],
+    "import streamlit_app": [sys.executable, "-c", "import streamlit_app"],
+}
+
+
+def _median_ms(command, runs, **env):
+    environ = dict(os.environ, PALI_LEM_NO_UI="1", **env)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            command, cwd=PROJECT_ROOT, env=environ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de la CLI")
+    parser.add_argument("--runs", type=int, default=15, help="Procesos por comando")
+    parser.add_argument("--max-ms", type=float, default=150, help="Mediana máxima aceptada para la CLI (ms)")
+    args = parser.parse_args()
+
+    # Los .pyc deben existir, como en un despliegue; si no, se mide la compilación.
+    subprocess.run(
+        [sys.executable, "-m", "compileall", "-q", "pali_lem", "scripts", "streamlit_app.py"],
+        cwd=PROJECT_ROOT,
+        check=True,
+    )
+
+    results = {label: _median_ms(command, args.runs) for label, command in COMMANDS.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(build_synthetic_dpd_db(Path(tmp) / "dpd.db", BASE_ENTRIES))
+        socket_path = str(Path(tmp) / "daemon.sock")
+        gloss = [sys.executable, APP_CLI, "--text", GLOSS_TEXT, "--db", db_path]
+        results["glosa en proceso"] = _median_ms(gloss + ["--no-daemon"], args.runs)
+        if not gloss_daemon.start_daemon(socket_path):
+            raise SystemExit("No se pudo arrancar el daemon")
+        try:
+            results["glosa vía daemon"] = _median_ms(gloss, args.runs, PALI_LEM_DAEMON_SOCKET=socket_path)
+            request = {"op": "gloss", "text": GLOSS_TEXT, "format": "compact", "db": db_path}
+            timings = []
+            for _ in range(args.runs * 10):
+                started = time.perf_counter()
+                gloss_daemon.daemon_request(request, socket_path)
+                timings.append((time.perf_counter() - started) * 1000)
+            results["socket del daemon"] = statistics.median(timings)
+        finally:
+            gloss_daemon.stop_daemon(socket_path)
+
+    print(f"{'comando':<22} {'mediana ms':>11}")
+    for label, median_ms in results.items():
+        print(f"{label:<22} {median_ms:>11.1f}")
+
+    cli_ms = results["app_cli.py --help"]
+    if cli_ms > args.max_ms:
+        raise SystemExit(f"La CLI tarda {cli_ms:.1f} ms en arrancar (objetivo: {args.max_ms:g} ms)")
+    print(f"CLI dentro del objetivo ({cli_ms:.1f} ≤ {args.max_ms:g} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Genera un parche entre dos releases de dpd.db y lo añade al manifiesto de parches.
+
+Ejecutar:
+    python scripts/build_dpd_delta.py --old dpd-old.db --new dpd-new.db --output-dir deltas/
+
+Publica el contenido de `--output-dir` en un servidor estático y apunta la app a
+él con `DPD_DB_DELTA_MANIFEST_URL=https://.../deltas/manifest.json`.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.dpd_db import DPD_DELTA_MANIFEST_FORMAT, build_dpd_delta  # noqa: E402
+
+
+def add_delta_to_manifest(manifest_path, delta_entry):
+    """Añade (o reemplaza) `delta_entry` en el manifiesto y marca su destino como `latest`."""
+    manifest = {"format": DPD_DELTA_MANIFEST_FORMAT, "latest": "", "deltas": []}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest["deltas"] = [
+        delta
+        for delta in manifest.get("deltas", [])
+        if (delta.get("from"), delta.get("to")) != (delta_entry["from"], delta_entry["to"])
+    ]
+    manifest["deltas"].append(delta_entry)
+    manifest["latest"] = delta_entry["to"]
+    temp_path = manifest_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    temp_path.replace(manifest_path)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un parche SQL entre dos releases de dpd.db")
+    parser.add_argument("--old", required=True, help="dpd.db de la release anterior")
+    parser.add_argument("--new", required=True, help="dpd.db de la release nueva")
+    parser.add_argument("--output-dir", required=True, help="Directorio del manifiesto y los parches")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for path in (args.old, args.new):
+        if not Path(path).exists():
+            raise SystemExit(f"No existe la base: {path}")
+
+    buffer = io.BytesIO()
+    try:
+        header = build_dpd_delta(args.old, args.new, buffer)
+    except ValueError as exc:
+        raise SystemExit(f"No se puede generar un parche: {exc}")
+    if header["from"] == header["to"]:
+        raise SystemExit("Las dos bases tienen el mismo contenido; no hay nada que parchear")
+
+    payload = buffer.getvalue()
+    delta_name = f"dpd-{header['from'][:12]}-{header['to'][:12]}.delta.jsonl.gz"
+    (output_dir / delta_name).write_bytes(payload)
+    add_delta_to_manifest(
+        output_dir / "manifest.json",
+        {
+            "from": header["from"],
+            "to": header["to"],
+            "url": delta_name,
+            "sha256": hashlib.sha256(payload).hexdigest(),
+            "bytes": len(payload),
+        },
+    )
+    new_size = Path(args.new).stat().st_size
+    print(
+        f"Parche {delta_name}: {len(payload)} bytes ({len(payload) / new_size * 100:.2f}% de la base nueva),"
+        f" {header['deletes']} borrados y {header['inserts']} inserciones"
+    )
+
+
+if __name__ == "__main__":
+    main()
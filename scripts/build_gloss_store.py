@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Precalcula las glosas de un corpus conocido (ver `pali_lem.gloss_store`).
+
+Se ejecuta una vez por release de DPD; la app y la CLI sirven desde el almacén
+los párrafos que ya contiene y glosan en vivo el resto.
+
+Ejecutar:
+    python scripts/build_gloss_store.py --inputs 'suttas/**/*.txt'
+    python scripts/build_gloss_store.py --inputs 'suttas/**/*.txt' --db nueva/dpd.db --force
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.batch import resolve_batch_inputs  # noqa: E402
+from pali_lem.dpd_db import get_dpd_db_path  # noqa: E402
+from pali_lem.gloss_store import GLOSS_STORE_PATH, build_gloss_store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacén precalculado de glosas de un corpus, por release de DPD")
+    parser.add_argument("--inputs", nargs="+", required=True, help="Archivos o globs ('suttas/**/*.txt')")
+    parser.add_argument("--db", default="", help="Ruta explícita a dpd.db")
+    parser.add_argument("--store", default=str(GLOSS_STORE_PATH), help=f"Almacén de salida (default: {GLOSS_STORE_PATH})")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos del pool (default: núcleos disponibles)")
+    parser.add_argument("--force", action="store_true", help="Reconstruye aunque la base y el corpus no hayan cambiado")
+    args = parser.parse_args()
+
+    input_paths = resolve_batch_inputs(args.inputs)
+    if not input_paths:
+        raise SystemExit(f"Ningún archivo coincide con: {' '.join(args.inputs)}")
+    dpd_db_path = args.db or get_dpd_db_path()
+    if not dpd_db_path:
+        raise SystemExit("No hay dpd.db: el almacén se construye contra una base (usa --db)")
+
+    summary = build_gloss_store(input_paths, dpd_db_path, args.store, workers=args.workers or None, force=args.force)
+    if summary["up_to_date"]:
+        print(f"Almacén al día: {summary['paragraphs']:,} párrafos de {summary['files']:,} archivos ({args.store})")
+        return
+    print(
+        f"Almacén: {summary['unique']:,} párrafos distintos ({summary['paragraphs']:,} en {summary['files']:,} archivos),"
+        f" {summary['size_bytes'] / 1_000_000:.1f} MB | {summary['workers']} procesos, {summary['seconds']:.1f} s"
+        f" | {args.store}"
+    )
+    for failure in summary["failed"]:
+        print(f"  ✗ {failure['input']}: {failure['error']}", file=sys.stderr)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
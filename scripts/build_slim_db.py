@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Genera una dpd.db "slim" con solo lo que usa el glosado y la compara con la completa.
+
+Ejecutar:
+    python scripts/build_slim_db.py --source dpd-db/dpd.db --output dpd-db/dpd.slim.db
+
+Después basta con `DPD_DB_PATH=dpd-db/dpd.slim.db` para que la app la use.
+"""
+
+import argparse
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.dpd_db import build_slim_dpd_db  # noqa: E402
+from pali_lem.lookup import _query_dpd_lookup  # noqa: E402
+
+
+def _sample_lookup_keys(db_path, sample_size):
+    """Toma `sample_size` claves de `lookup` repartidas uniformemente por la tabla."""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM lookup").fetchone()[0]
+        step = max(1, total // max(1, sample_size))
+        rows = conn.execute(
+            "SELECT lookup_key FROM lookup WHERE rowid % ? = 0 LIMIT ?", (step, sample_size)
+        ).fetchall()
+        return [row[0] for row in rows if row[0]]
+    finally:
+        conn.close()
+
+
+def _measure_latency_ms(db_path, words, batch_size, repeats):
+    """Mediana y p95 (ms) de `_query_dpd_lookup` por lote de `batch_size` palabras."""
+    timings = []
+    for _ in range(repeats):
+        for start in range(0, len(words), batch_size):
+            batch = tuple(words[start:start + batch_size])
+            started = time.perf_counter()
+            _query_dpd_lookup(batch, str(db_path))
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera dpd.db slim y compara tamaño y latencia")
+    parser.add_argument("--source", required=True, help="dpd.db completa")
+    parser.add_argument("--output", required=True, help="Ruta de la base slim a generar")
+    parser.add_argument("--sample", type=int, default=2000, help="Palabras de lookup para medir latencia")
+    parser.add_argument("--batch-size", type=int, default=200, help="Palabras por consulta de glosado")
+    parser.add_argument("--repeats", type=int, default=3, help="Repeticiones de la medición")
+    args = parser.parse_args()
+
+    source_path = Path(args.source)
+    if not source_path.exists():
+        raise SystemExit(f"No existe la base: {source_path}")
+
+    started = time.perf_counter()
+    report = build_slim_dpd_db(source_path, args.output)
+    build_seconds = time.perf_counter() - started
+
+    words = _sample_lookup_keys(source_path, args.sample)
+    full_median, full_p95 = _measure_latency_ms(source_path, words, args.batch_size, args.repeats)
+    slim_median, slim_p95 = _measure_latency_ms(args.output, words, args.batch_size, args.repeats)
+
+    source_mb = report["source_bytes"] / 1024 / 1024
+    slim_mb = report["slim_bytes"] / 1024 / 1024
+    print(f"Base slim generada en {build_seconds:.1f}s: {args.output}")
+    print(f"Índices creados: {', '.join(report['optimization']['indexes_created']) or 'ninguno'}")
+    print(f"{'':<8} {'MB':>10} {'mediana ms':>12} {'p95 ms':>10}")
+    print(f"{'completa':<8} {source_mb:>10.1f} {full_median:>12.2f} {full_p95:>10.2f}")
+    print(f"{'slim':<8} {slim_mb:>10.1f} {slim_median:>12.2f} {slim_p95:>10.2f}")
+    if report["source_bytes"]:
+        print(f"Reducción de tamaño: {100 - slim_mb / source_mb * 100:.1f}%"
+              f" | {len(words)} palabras en lotes de {args.batch_size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Índice de concordancias de un corpus pali (ver `pali_lem.concordance`).
+
+Ejecutar:
+    python scripts/concordance_cli.py build --inputs 'suttas/**/*.txt'
+    python scripts/concordance_cli.py query dhamma
+    python scripts/concordance_cli.py query dhammo --mode form --json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.concordance import (  # noqa: E402
+    CONCORDANCE_INDEX_PATH,
+    CONCORDANCE_MODES,
+    concordance_query,
+    concordance_stats,
+    format_kwic_line,
+    update_concordance,
+)
+
+
+def run_build(args):
+    from pali_lem.batch import resolve_batch_inputs
+    from pali_lem.dictionary import load_dictionary
+    from pali_lem.dpd_db import get_dpd_db_path
+    from pali_lem.engine import GlossEngine
+
+    input_paths = resolve_batch_inputs(args.inputs)
+    if not input_paths:
+        raise SystemExit("Ningún archivo coincide con --inputs")
+    dpd_db_path = args.db or get_dpd_db_path()
+    try:
+        dictionary = load_dictionary()
+    except FileNotFoundError as exc:
+        if not dpd_db_path:
+            raise SystemExit(str(exc))
+        dictionary = {}
+    engine = GlossEngine(dpd_db_path, fallback_dictionary=dictionary)
+    try:
+        summary = update_concordance(input_paths, engine, index_path=args.index)
+    finally:
+        engine.close()
+    stats = concordance_stats(args.index)
+    print(
+        f"Índice {args.index}: añadidos={summary['added']} actualizados={summary['updated']}"
+        f" sin cambios={summary['unchanged']} errores={len(summary['failed'])}"
+        f" | {summary['words']:,} palabras, {summary['new_forms']:,} formas nuevas en {summary['seconds']:.2f} s"
+    )
+    print(
+        f"Total: {stats['documents']:,} documentos, {stats['words']:,} palabras, {stats['forms']:,} formas,"
+        f" {stats['lemmas']:,} lemas, {stats['size_bytes'] / 1_000_000:.1f} MB"
+    )
+    for failure in summary["failed"]:
+        print(f"  ✗ {failure['path']}: {failure['error']}", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def run_query(args):
+    started = time.perf_counter()
+    try:
+        result = concordance_query(
+            args.term, mode=args.mode, width=args.width, limit=args.limit, offset=args.offset, index_path=args.index
+        )
+    except FileNotFoundError as exc:
+        raise SystemExit(f"{exc}. Créalo con: concordance_cli.py build --inputs ...")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+    forms = ", ".join(f"{form} ({count})" for form, count in result["forms"].items())
+    print(f"{result['term']} ({result['mode']}): {result['total']} apariciones | {forms or '—'} | {elapsed_ms:.1f} ms")
+    for hit in result["hits"]:
+        print(f"{format_kwic_line(hit, args.width)}   {Path(hit['document']).name}:{hit['start']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice invertido y concordancias KWIC de un corpus pali")
+    parser.add_argument(
+        "--index",
+        default=str(CONCORDANCE_INDEX_PATH),
+        help="Archivo del índice (default: PALI_LEM_CONCORDANCE_INDEX o concordance.db)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Indexa archivos nuevos o modificados")
+    build_parser.add_argument("--inputs", nargs="+", required=True, help="Archivos o globs ('suttas/**/*.txt')")
+    build_parser.add_argument("--db", default="", help="Ruta explícita a dpd.db para resolver lemas")
+
+    query_parser = subparsers.add_parser("query", help="Concordancia KWIC de un lema o una forma")
+    query_parser.add_argument("term", help="Lema (dhamma) o forma (dhammo)")
+    query_parser.add_argument("--mode", choices=CONCORDANCE_MODES, default="lemma", help="Buscar por lema o por forma")
+    query_parser.add_argument("--width", type=int, default=40, help="Caracteres de contexto a cada lado")
+    query_parser.add_argument("--limit", type=int, default=50, help="Máximo de apariciones a mostrar")
+    query_parser.add_argument("--offset", type=int, default=0, help="Saltar las primeras N apariciones")
+    query_parser.add_argument("--json", action="store_true", help="Salida JSON")
+
+    args = parser.parse_args()
+    handler = run_build if args.command == "build" else run_query
+    sys.exit(handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Informe de cobertura de un corpus completo (ver `pali_lem.coverage`).
+
+Ejecutar:
+    python scripts/coverage_report.py --inputs 'suttas/**/*.txt' --output cobertura.json
+    python scripts/coverage_report.py --inputs 'suttas/**/*.txt' --db nueva/dpd.db \
+        --output cobertura-nueva.json --compare cobertura.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.batch import resolve_batch_inputs  # noqa: E402
+from pali_lem.coverage import MATCH_CATEGORIES, compare_coverage_reports, coverage_report  # noqa: E402
+from pali_lem.dpd_db import get_dpd_db_path  # noqa: E402
+
+
+def _print_report(report, top):
+    run = report["run"]
+    print(
+        f"Cobertura: {report['coverage']:.2f}% ({report['found']:,}/{report['words']:,} palabras,"
+        f" {report['files'] - len(report['failed']):,}/{report['files']:,} archivos)"
+        f" | {run['source']} | {run['workers']} procesos, {run['seconds']:.1f} s ({run['files_per_second']:.0f} archivos/s)"
+    )
+    words = report["words"] or 1
+    print("  " + "  ".join(f"{category}={report['match_types'][category]:,} ({report['match_types'][category] / words * 100:.1f}%)"
+                           for category in MATCH_CATEGORIES))
+    print(f"Formas sin glosa: {report['distinct_missing']:,} distintas. Más frecuentes:")
+    for item in report["top_missing"][:top]:
+        print(f"  {item['count']:>7,}  {item['files']:>6,} archivos  {item['form']}")
+    for failure in report["failed"]:
+        print(f"  ✗ {failure['file']}: {failure['error']}", file=sys.stderr)
+
+
+def _print_comparison(comparison):
+    coverage = comparison["coverage"]
+    print(f"Comparación: cobertura {coverage['old']:.2f}% → {coverage['new']:.2f}% ({coverage['delta']:+.2f})")
+    print("  " + "  ".join(f"{category} {delta['delta']:+,}" for category, delta in comparison["match_types"].items()))
+    for item in comparison["missing_forms"]:
+        old = "—" if item["old"] is None else f"{item['old']:,}"
+        new = "—" if item["new"] is None else f"{item['new']:,}"
+        print(f"  {item['form']}: {old} → {new}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe de cobertura de un corpus con un pool de procesos")
+    parser.add_argument("--inputs", nargs="+", required=True, help="Archivos o globs ('suttas/**/*.txt')")
+    parser.add_argument("--db", default="", help="Ruta explícita a dpd.db")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos del pool (default: núcleos disponibles)")
+    parser.add_argument("--top", type=int, default=100, help="Formas en las listas sin glosa / fallback (0 = todas)")
+    parser.add_argument("--output", default="coverage_report.json", help="Informe JSON (default: coverage_report.json)")
+    parser.add_argument("--compare", default="", help="Informe anterior con el que comparar")
+    args = parser.parse_args()
+
+    input_paths = resolve_batch_inputs(args.inputs)
+    if not input_paths:
+        raise SystemExit(f"Ningún archivo coincide con: {' '.join(args.inputs)}")
+    report = coverage_report(input_paths, args.db or get_dpd_db_path(), workers=args.workers or None, top=args.top)
+
+    # Los tiempos no van al archivo: dos informes del mismo corpus y la misma base son idénticos.
+    output_path = Path(args.output)
+    output_path.write_text(
+        json.dumps({key: value for key, value in report.items() if key != "run"}, ensure_ascii=False, indent=1, sort_keys=True)
+        + "\n",
+        encoding="utf-8",
+    )
+    _print_report(report, top=20)
+    print(f"Informe: {output_path}")
+
+    if args.compare:
+        old_report = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        _print_comparison(compare_coverage_reports(old_report, report))
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
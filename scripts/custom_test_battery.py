@@ -1,36 +1,19 @@
 #!/usr/bin/env python3
 
 import argparse
-import contextlib
-import io
-import logging
-import os
 import sys
 from dataclasses import dataclass
 from pathlib import Path
 
-os.environ["PALI_LEM_NO_UI"] = "1"
-
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-for logger_name in ["streamlit", "streamlit.runtime", "streamlit.runtime.caching", "streamlit.runtime.scriptrunner_utils"]:
-    logging.getLogger(logger_name).setLevel(logging.ERROR)
-
-with contextlib.redirect_stderr(io.StringIO()):
-    from streamlit_app import (  # noqa: E402
-        generate_compact_gloss,
-        generate_rich_gloss_text,
-        get_dpd_db_path,
-        load_dictionary,
-        lookup_words_in_dpd,
-        process_pali_text,
-        process_pali_with_lookup_map,
-        tokenize_pali_text,
-        tokenize_pali_with_separators,
-    )
-
+from pali_lem.dictionary import load_dictionary  # noqa: E402
+from pali_lem.dpd_db import dpd_gloss_query_full_scans, get_dpd_db_path  # noqa: E402
+from pali_lem.formatting import generate_compact_gloss, generate_rich_gloss_text  # noqa: E402
+from pali_lem.lookup import lookup_words_in_dpd, process_pali_text, process_pali_with_lookup_map  # noqa: E402
+from pali_lem.text import tokenize_pali_text, tokenize_pali_with_separators  # noqa: E402
 from scripts.compare_with_dpdict import run_check  # noqa: E402
 
 
@@ -65,7 +48,7 @@ def _find_entry(gloss_entries, word):
 
 
 def _build_gloss(text: str, dictionary_name: str, db_path_override: str = ""):
-    dictionary = load_dictionary("dpd")
+    dictionary = load_dictionary()
     source = ""
 
     db_path = db_path_override or get_dpd_db_path()
@@ -178,6 +161,20 @@ def run_offline_tests(dictionary_name: str, db_path: str, min_coverage: float):
         )
     )
 
+    if db_path:
+        full_scans = dpd_gloss_query_full_scans(db_path)
+        results.append(
+            TestResult(
+                name="gloss_queries_use_indexes",
+                passed=not full_scans,
+                details=(
+                    "; ".join(f"{name}: {', '.join(scans)}" for name, scans in full_scans.items())
+                    if full_scans
+                    else "sin SCAN completos en EXPLAIN QUERY PLAN"
+                ),
+            )
+        )
+
     return results
 
 
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Servicio HTTP local de glosado en JSON (ver `pali_lem.service`).
+
+Ejecutar:
+    python scripts/gloss_server.py --port 8765
+    curl -s localhost:8765/gloss -d '{"text": "dhammo buddha", "format": "compact"}'
+"""
+
+import argparse
+import signal
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.dictionary import load_dictionary  # noqa: E402
+from pali_lem.dpd_db import follow_dpd_db_path, get_dpd_db_path  # noqa: E402
+from pali_lem.service import create_gloss_service  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de glosado Pali")
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz de escucha (default: solo local)")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto (0 = uno libre)")
+    parser.add_argument("--db", default="", help="Ruta explícita a dpd.db")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Peticiones atendidas a la vez")
+    parser.add_argument(
+        "--queue-timeout",
+        type=float,
+        default=5.0,
+        help="Segundos que una petición espera hueco antes de responder 503",
+    )
+    args = parser.parse_args()
+
+    dpd_db_path = args.db or get_dpd_db_path()
+    try:
+        dictionary = load_dictionary()
+    except FileNotFoundError as exc:
+        if not dpd_db_path:
+            raise SystemExit(str(exc))
+        # Como en la UI: con dpd.db el JSON es solo respaldo y puede faltar.
+        dictionary = {}
+
+    service = create_gloss_service(
+        dpd_db_path,
+        fallback_dictionary=dictionary,
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+        queue_timeout=args.queue_timeout,
+        # Con --db la base es fija; si no, se siguen las releases que se instalen.
+        resolve_dpd_db_path=None if args.db else follow_dpd_db_path,
+    )
+    host, port = service.server_address[:2]
+    source = f"dpd.db ({dpd_db_path})" if dpd_db_path else "dpd_dictionary.json"
+    print(f"Escuchando en http://{host}:{port} | fuente: {source}", flush=True)
+    # SIGTERM (systemd, `kill`) cierra igual que Ctrl+C: pool de conexiones incluido.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pali_lem.sessions import (  # noqa: E402
+    DEFAULT_SESSION_NAMESPACE,
+    SAVED_SESSIONS_DIR,
+    SAVED_SESSIONS_PATH,
+    SESSION_IMPORT_POLICIES,
+    SessionStore,
+    export_sessions_archive,
+    import_sessions_archive,
+)
+
+
+def _build_store(args):
+    storage_dir = Path(args.sessions_dir) if args.sessions_dir else SAVED_SESSIONS_DIR
+    return SessionStore(storage_dir, legacy_path=SAVED_SESSIONS_PATH)
+
+
+def run_export(args):
+    store = _build_store(args)
+    output_path = Path(args.output)
+    with open(output_path, "wb") as output_file:
+        exported = export_sessions_archive(
+            output_file,
+            session_names=args.session or None,
+            namespace=args.namespace,
+            store=store,
+        )
+    print(f"Exportadas {exported} sesiones de '{args.namespace}' a {output_path}")
+
+
+def run_import(args):
+    store = _build_store(args)
+    input_path = Path(args.input)
+    if not input_path.exists():
+        raise SystemExit(f"No existe el archivo: {input_path}")
+    with open(input_path, "rb") as input_file:
+        try:
+            report = import_sessions_archive(
+                input_file,
+                policy=args.policy,
+                namespace=args.namespace,
+                store=store,
+            )
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f"No se pudo importar {input_path}: {exc}")
+    print(
+        f"Importadas {report['imported']} sesiones en '{args.namespace}'"
+        f" (sobrescritas={report['overwritten']} renombradas={report['renamed']}"
+        f" omitidas={report['skipped']} inválidas={report['invalid']})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta o importa sesiones guardadas de Pali Glosser (.jsonl.gz)"
+    )
+    parser.add_argument(
+        "--namespace",
+        default=DEFAULT_SESSION_NAMESPACE,
+        help="Espacio de sesiones del usuario (valor de ?u= en la URL)",
+    )
+    parser.add_argument("--sessions-dir", default="", help="Directorio de sesiones (default: saved_sessions/)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporta sesiones a un archivo comprimido")
+    export_parser.add_argument("--output", required=True, help="Archivo de salida .jsonl.gz")
+    export_parser.add_argument(
+        "--session",
+        action="append",
+        default=[],
+        help="Nombre de sesión a exportar (repetible; por defecto todas)",
+    )
+    export_parser.set_defaults(handler=run_export)
+
+    import_parser = subparsers.add_parser("import", help="Importa sesiones desde un archivo comprimido")
+    import_parser.add_argument("--input", required=True, help="Archivo .jsonl.gz exportado")
+    import_parser.add_argument(
+        "--policy",
+        choices=list(SESSION_IMPORT_POLICIES),
+        default="skip",
+        help="Qué hacer si el nombre ya existe (default: skip)",
+    )
+    import_parser.set_defaults(handler=run_import)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
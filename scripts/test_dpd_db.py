@@ -0,0 +1,2102 @@
+"""Tests sobre el aprovisionamiento y el uso de dpd.db en el núcleo `pali_lem`.
+
+Usan bases SQLite sintéticas con el mismo esquema mínimo que lee la app.
+
+Ejecutar:
+    python scripts/test_dpd_db.py
+"""
+
+import collections
+import contextlib
+import gzip
+import http.server
+import io
+import json
+import hashlib
+import http.client
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import unicodedata
+import unittest
+import unittest.mock
+from pathlib import Path
+
+# Importar en modo consola (sin UI de Streamlit) ----------------------------------
+os.environ.setdefault("PALI_LEM_NO_UI", "1")
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pali_lem import batch, common, concordance, coverage, daemon as gloss_daemon, dictionary as pali_dictionary, dpd_db, engine, formatting, gloss_store, lookup, provisioning, result_cache, service, sessions as pali_sessions, text as pali_text, vocabulary  # noqa: E402
+
+
+def build_synthetic_dpd_db(path, entries, roots=None):
+    """Crea una dpd.db mínima.
+
+    `entries` mapea forma → (lema, pos, gramática, significado, root_key).
+    Cada forma recibe su propio headword con id incremental.
+    """
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE lookup (lookup_key TEXT, headwords TEXT, grammar TEXT, deconstructor TEXT);
+            CREATE TABLE dpd_headwords (
+                id INTEGER PRIMARY KEY, lemma_1 TEXT, pos TEXT, grammar TEXT,
+                meaning_1 TEXT, meaning_2 TEXT, meaning_lit TEXT, sanskrit TEXT,
+                root_key TEXT, root_sign TEXT, derived_from TEXT, construction TEXT,
+                stem TEXT, pattern TEXT, example_1 TEXT
+            );
+            CREATE TABLE dpd_roots (root TEXT, root_sign TEXT, root_group INTEGER, root_meaning TEXT);
+            CREATE TABLE sutta_info (id INTEGER PRIMARY KEY, title TEXT);
+            """
+        )
+        for headword_id, (form, (lemma, pos, grammar, meaning, root_key)) in enumerate(entries.items(), start=1):
+            conn.execute(
+                "INSERT INTO dpd_headwords (id, lemma_1, pos, grammar, meaning_1, root_key, root_sign, stem, pattern)"
+                " VALUES (?, ?, ?, ?, ?, ?, '', ?, ?)",
+                (headword_id, lemma, pos, grammar, meaning, root_key, lemma.split(" ")[0], "a masc"),
+            )
+            conn.execute(
+                "INSERT INTO lookup (lookup_key, headwords, grammar) VALUES (?, ?, ?)",
+                (form, json.dumps([headword_id]), json.dumps([[lemma, pos, grammar]])),
+            )
+        for root, root_group in (roots or {}).items():
+            conn.execute(
+                "INSERT INTO dpd_roots (root, root_sign, root_group, root_meaning) VALUES (?, '', ?, '')",
+                (root, root_group),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def build_dpd_tarball(db_path, compression="bz2", extra_members=()):
+    """Empaqueta `db_path` como `dpd.db` dentro de un tar comprimido (en memoria)."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=f"w:{compression}") as archive:
+        for name, payload in extra_members:
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            archive.addfile(info, io.BytesIO(payload))
+        archive.add(str(db_path), arcname="release/dpd.db")
+    return buffer.getvalue()
+
+
+class _StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Servidor de archivos estáticos que imita la descarga de releases.
+
+    Opciones (`server.options`): `etag`, `accept_ranges` (por defecto True) y
+    `drop_after`/`drops`: corta la conexión tras `drop_after` bytes, `drops` veces.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _payload(self):
+        return self.server.files.get(self.path)
+
+    def _send_common_headers(self):
+        options = self.server.options
+        if options.get("etag"):
+            self.send_header("ETag", options["etag"])
+        if options.get("accept_ranges", True):
+            self.send_header("Accept-Ranges", "bytes")
+
+    def do_HEAD(self):
+        payload = self._payload()
+        if payload is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self._send_common_headers()
+        self.end_headers()
+
+    def do_GET(self):
+        payload = self._payload()
+        if payload is None:
+            self.send_error(404)
+            return
+        options = self.server.options
+        range_header = self.headers.get("Range", "")
+        if_range = self.headers.get("If-Range", "")
+        self.server.requests.append((self.path, range_header))
+
+        start, end = 0, len(payload) - 1
+        partial = bool(
+            range_header
+            and options.get("accept_ranges", True)
+            and (not if_range or if_range == options.get("etag"))
+        )
+        if partial:
+            range_start, _, range_end = range_header.replace("bytes=", "").partition("-")
+            start = int(range_start)
+            end = int(range_end) if range_end else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+        else:
+            self.send_response(200)
+        body = payload[start:end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self._send_common_headers()
+        self.end_headers()
+
+        limit = len(body)
+        if options.get("drops", 0) > 0 and options.get("drop_after") is not None:
+            options["drops"] -= 1
+            limit = min(limit, options["drop_after"])
+        chunk_size = options.get("chunk_size", 16 * 1024)
+        throttle_seconds = options.get("chunk_delay", 0)
+        for offset in range(0, limit, chunk_size):
+            self.wfile.write(body[offset:min(offset + chunk_size, limit)])
+            if throttle_seconds:
+                time.sleep(throttle_seconds)
+        if limit < len(body):
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+
+
+@contextlib.contextmanager
+def serve_files(files, handler_class=_StandInHandler, **options):
+    """Levanta un servidor HTTP local en un hilo; devuelve su URL base."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    server.files = dict(files)
+    server.requests = []
+    server.options = options
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+BASE_ENTRIES = {
+    "dhammo": ("dhamma 1", "masc", "masc nom sg", "doctrina", "√dhar"),
+    "buddha": ("buddha 1", "masc", "masc voc sg", "el Despierto", "√budh"),
+    "saṅgho": ("saṅgha 1", "masc", "masc nom sg", "comunidad", ""),
+}
+BASE_ROOTS = {"√dhar": 1, "√budh": 4}
+
+
+# ---------------------------------------------------------------------------
+# Re-glosa incremental de sesiones guardadas
+# ---------------------------------------------------------------------------
+
+class TestReglossSavedSessions(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp_dir.name)
+        self.old_db = build_synthetic_dpd_db(tmp / "old.db", BASE_ENTRIES, BASE_ROOTS)
+        new_entries = dict(BASE_ENTRIES)
+        new_entries["dhammo"] = ("dhamma 1", "masc", "masc nom sg", "doctrina, verdad", "√dhar")
+        new_entries["navo"] = ("nava 1", "adj", "masc nom sg", "nuevo", "")
+        self.new_db = build_synthetic_dpd_db(tmp / "new.db", new_entries, BASE_ROOTS)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _session_for(self, text):
+        lookup_map = lookup._query_dpd_lookup(pali_text.tokenize_pali_text(text), str(self.old_db))
+        entries = lookup.process_pali_with_lookup_map(text, lookup_map, fallback_dictionary={})
+        found, total, coverage = formatting._gloss_coverage_stats(entries)
+        return {
+            "pali_text": text,
+            "generated_gloss": True,
+            "gloss_entries": entries,
+            "gloss_word_total": total,
+            "gloss_found_words": found,
+            "gloss_coverage": coverage,
+        }
+
+    def test_only_changed_entries_are_reglossed(self):
+        store = pali_sessions.SessionStore()
+        store.replace("ana", {"clase": self._session_for("dhammo, buddha navo")})
+        store.replace("beto", {"intacta": self._session_for("buddha saṅgho")})
+        untouched_version, _ = store.snapshot("beto")
+
+        report = pali_sessions.regloss_saved_sessions(
+            store, self.old_db, self.new_db, release_info={"dpd_db_etag": "v2"}, fallback_dictionary={}
+        )
+
+        self.assertEqual(report["forms_checked"], 4)
+        self.assertEqual(report["forms_changed"], 2)
+        self.assertEqual(report["sessions_updated"], 1)
+        self.assertEqual(report["entries_updated"], 2)
+
+        session = store.get("ana", "clase")
+        by_word = {entry["word"]: entry for entry in session["gloss_entries"]}
+        self.assertEqual(by_word["dhammo"]["meaning"], "doctrina, verdad")
+        self.assertEqual(by_word["navo"]["meaning"], "nuevo")
+        self.assertEqual(by_word["buddha"]["meaning"], "el Despierto")
+        self.assertEqual(session["gloss_found_words"], 3)
+        self.assertIn("doctrina, verdad", session["gloss_compact_text"])
+        self.assertEqual(session["regloss"]["changed_words"], ["dhammo", "navo"])
+        self.assertEqual(session["regloss"]["dpd_db_etag"], "v2")
+
+        self.assertEqual(store.snapshot("beto")[0], untouched_version)
+        self.assertNotIn("regloss", store.get("beto", "intacta"))
+
+    def test_identical_releases_change_nothing(self):
+        store = pali_sessions.SessionStore()
+        store.replace("ana", {"clase": self._session_for("dhammo buddha")})
+        version, _ = store.snapshot("ana")
+        report = pali_sessions.regloss_saved_sessions(store, self.old_db, self.old_db, fallback_dictionary={})
+        self.assertEqual(report["forms_changed"], 0)
+        self.assertEqual(store.snapshot("ana")[0], version)
+
+
+# ---------------------------------------------------------------------------
+# Descarga con extracción en streaming
+# ---------------------------------------------------------------------------
+
+class TestStreamingDownload(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.source_db = build_synthetic_dpd_db(self.tmp / "source.db", BASE_ENTRIES, BASE_ROOTS)
+        self.target_dir = self.tmp / "dpd-db"
+        self.target_dir.mkdir()
+        self.target_db = self.target_dir / "dpd.db"
+        # Comparan bytes de la base instalada: sin el paso de optimización.
+        self._env_patch = unittest.mock.patch.dict(os.environ, {"DPD_DB_OPTIMIZE": "0"})
+        self._env_patch.start()
+
+    def tearDown(self):
+        self._env_patch.stop()
+        self._tmp_dir.cleanup()
+
+    def test_stream_extract_installs_db_without_archive_file(self):
+        tarball = build_dpd_tarball(self.source_db, extra_members=[("release/README", b"x" * 50000)])
+        created_paths = []
+        real_open = open
+
+        def _tracking_open(path, *args, **kwargs):
+            created_paths.append(Path(path).name)
+            return real_open(path, *args, **kwargs)
+
+        with serve_files({"/dpd.db.tar.bz2": tarball}) as (base_url, _), \
+             unittest.mock.patch("builtins.open", _tracking_open):
+            ok = dpd_db._download_dpd_db(
+                f"{base_url}/dpd.db.tar.bz2", self.target_dir, self.target_db, 10, stream_extract=True
+            )
+        self.assertTrue(ok)
+        self.assertTrue(dpd_db._is_valid_dpd_db(self.target_db))
+        self.assertEqual(self.target_db.read_bytes(), self.source_db.read_bytes())
+        self.assertNotIn("dpd.db.tar.bz2.part", created_paths)
+        self.assertEqual(sorted(path.name for path in self.target_dir.iterdir()), ["dpd.db"])
+
+    def test_stream_extract_handles_gzip_archives(self):
+        tarball = build_dpd_tarball(self.source_db, compression="gz")
+        with serve_files({"/dpd.db.tar.gz": tarball}) as (base_url, _):
+            ok = dpd_db._download_dpd_db(
+                f"{base_url}/dpd.db.tar.gz", self.target_dir, self.target_db, 10, stream_extract=True
+            )
+        self.assertTrue(ok)
+        self.assertTrue(dpd_db._is_valid_dpd_db(self.target_db))
+
+    def test_archive_mode_still_supported(self):
+        tarball = build_dpd_tarball(self.source_db)
+        with serve_files({"/dpd.db.tar.bz2": tarball}) as (base_url, _):
+            ok = dpd_db._download_dpd_db(
+                f"{base_url}/dpd.db.tar.bz2", self.target_dir, self.target_db, 10, stream_extract=False
+            )
+        self.assertTrue(ok)
+        self.assertEqual(sorted(path.name for path in self.target_dir.iterdir()), ["dpd.db"])
+
+    def test_archive_without_db_leaves_nothing_behind(self):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:bz2") as archive:
+            info = tarfile.TarInfo("otro.txt")
+            info.size = 3
+            archive.addfile(info, io.BytesIO(b"abc"))
+        with serve_files({"/dpd.db.tar.bz2": buffer.getvalue()}) as (base_url, _):
+            ok = dpd_db._download_dpd_db(
+                f"{base_url}/dpd.db.tar.bz2", self.target_dir, self.target_db, 10, stream_extract=True
+            )
+        self.assertFalse(ok)
+        self.assertEqual(list(self.target_dir.iterdir()), [])
+
+
+# ---------------------------------------------------------------------------
+# Descargas reanudables con Range y checksum
+# ---------------------------------------------------------------------------
+
+class _DownloadFixture(unittest.TestCase):
+    """dpd.db sintética con relleno servida por `serve_files`."""
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.source_db = build_synthetic_dpd_db(self.tmp / "source.db", BASE_ENTRIES, BASE_ROOTS)
+        # Relleno para que haya bytes de sobra que cortar a mitad de transferencia.
+        conn = sqlite3.connect(str(self.source_db))
+        conn.execute("INSERT INTO sutta_info (title) VALUES (?)", (os.urandom(200000).hex(),))
+        conn.commit()
+        conn.close()
+        self.db_bytes = self.source_db.read_bytes()
+        self.target_dir = self.tmp / "dpd-db"
+        self.target_dir.mkdir()
+        self.target_db = self.target_dir / "dpd.db"
+        self._sleep_patch = unittest.mock.patch.object(time, "sleep")
+        self.mock_sleep = self._sleep_patch.start()
+        self._env_patch = unittest.mock.patch.dict(os.environ, {"DPD_DB_OPTIMIZE": "0"})
+        self._env_patch.start()
+
+    def tearDown(self):
+        self._env_patch.stop()
+        self._sleep_patch.stop()
+        self._tmp_dir.cleanup()
+
+    def _download(self, base_url, path="/dpd.db", etag='"v1"', **kwargs):
+        return dpd_db._download_dpd_db(
+            f"{base_url}{path}", self.target_dir, self.target_db, 10,
+            remote_signature={"etag": etag}, **kwargs,
+        )
+
+
+class TestResumableDownload(_DownloadFixture):
+
+    def test_reconnects_with_range_after_drops(self):
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"', drop_after=100000, drops=2) as (base_url, server):
+            result = self._download(base_url)
+        self.assertEqual(result["sha256"], hashlib.sha256(self.db_bytes).hexdigest())
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(
+            [header for _, header in server.requests],
+            ["", "bytes=100000-", "bytes=200000-"],
+        )
+        self.assertEqual([call.args[0] for call in self.mock_sleep.call_args_list], [2.0, 4.0])
+
+    def test_resumes_part_file_after_restart(self):
+        part_path = self.target_db.with_suffix(".db.part")
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"', drop_after=150000, drops=1) as (base_url, server):
+            with unittest.mock.patch.dict(os.environ, {"DPD_DB_DOWNLOAD_RETRIES": "0"}):
+                self.assertIsNone(self._download(base_url))
+            # El contenedor "se reinicia": el .part y su estado siguen en disco.
+            self.assertEqual(part_path.stat().st_size, 150000)
+            result = self._download(base_url)
+        self.assertEqual(server.requests[-1][1], "bytes=150000-")
+        self.assertEqual(result["sha256"], hashlib.sha256(self.db_bytes).hexdigest())
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(sorted(path.name for path in self.target_dir.iterdir()), ["dpd.db"])
+
+    def test_changed_etag_restarts_from_scratch(self):
+        part_path = self.target_db.with_suffix(".db.part")
+        part_path.write_bytes(b"x" * 1000)
+        common._save_json_file(
+            part_path.with_name(part_path.name + ".json"),
+            {"download_url": "otra", "etag": '"v0"'},
+        )
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"') as (base_url, server):
+            result = self._download(base_url)
+        self.assertEqual(server.requests, [("/dpd.db", "")])
+        self.assertEqual(result["bytes"], len(self.db_bytes))
+
+    def test_server_ignoring_range_restarts_download(self):
+        with serve_files(
+            {"/dpd.db": self.db_bytes}, etag='"v1"', accept_ranges=False, drop_after=100000, drops=1
+        ) as (base_url, server):
+            result = self._download(base_url)
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(result["bytes"], len(self.db_bytes))
+
+    def test_checksum_mismatch_rejects_download(self):
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"') as (base_url, _), \
+             unittest.mock.patch.dict(os.environ, {"DPD_DB_SHA256": "0" * 64}):
+            result = self._download(base_url)
+        self.assertIsNone(result)
+        self.assertFalse(self.target_db.exists())
+        self.assertFalse(self.target_db.with_suffix(".db.part").exists())
+
+    def test_stream_extract_survives_drops(self):
+        tarball = build_dpd_tarball(self.source_db)
+        with serve_files({"/dpd.db.tar.bz2": tarball}, etag='"v1"', drop_after=40000, drops=3) as (base_url, _):
+            result = self._download(base_url, path="/dpd.db.tar.bz2", stream_extract=True)
+        self.assertEqual(result["sha256"], hashlib.sha256(tarball).hexdigest())
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+
+    def test_archive_mode_resumes_after_restart(self):
+        tarball = build_dpd_tarball(self.source_db)
+        with serve_files({"/dpd.db.tar.bz2": tarball}, etag='"v1"', drop_after=len(tarball) // 2, drops=1) as (
+            base_url, server,
+        ):
+            with unittest.mock.patch.dict(os.environ, {"DPD_DB_DOWNLOAD_RETRIES": "0"}):
+                self.assertIsNone(self._download(base_url, path="/dpd.db.tar.bz2", stream_extract=False))
+            self.assertTrue((self.target_dir / "dpd.db.tar.bz2.part").exists())
+            result = self._download(base_url, path="/dpd.db.tar.bz2", stream_extract=False)
+        self.assertEqual(server.requests[-1][1], f"bytes={len(tarball) // 2}-")
+        self.assertEqual(result["sha256"], hashlib.sha256(tarball).hexdigest())
+        self.assertEqual(sorted(path.name for path in self.target_dir.iterdir()), ["dpd.db"])
+
+
+# ---------------------------------------------------------------------------
+# Descarga paralela por rangos
+# ---------------------------------------------------------------------------
+
+class TestParallelDownload(_DownloadFixture):
+
+    def setUp(self):
+        super().setUp()
+        self._part_patch = unittest.mock.patch.object(dpd_db, "_PARALLEL_MIN_PART_BYTES", 64 * 1024)
+        self._part_patch.start()
+
+    def tearDown(self):
+        self._part_patch.stop()
+        super().tearDown()
+
+    def test_ranges_are_fetched_and_reassembled_in_order(self):
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"') as (base_url, server):
+            result = self._download(base_url, workers=4)
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(result["sha256"], hashlib.sha256(self.db_bytes).hexdigest())
+        self.assertEqual(result["workers"], 4)
+        self.assertGreater(result["throughput_mbps"], 0)
+        ranges = sorted(header for _, header in server.requests)
+        self.assertEqual(len(ranges), 4)
+        self.assertTrue(all(header.startswith("bytes=") and not header.endswith("-") for header in ranges))
+
+    def test_falls_back_to_single_stream_without_accept_ranges(self):
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"', accept_ranges=False) as (base_url, server):
+            result = self._download(base_url, workers=4)
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(server.requests, [("/dpd.db", "")])
+        self.assertEqual(result["bytes"], len(self.db_bytes))
+
+    def test_dropped_range_is_resumed_within_its_bounds(self):
+        with serve_files({"/dpd.db": self.db_bytes}, etag='"v1"', drop_after=30000, drops=1) as (base_url, server):
+            result = self._download(base_url, workers=2)
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(result["sha256"], hashlib.sha256(self.db_bytes).hexdigest())
+        self.assertEqual(len(server.requests), 3)
+
+    def test_parallel_archive_download_extracts_db(self):
+        tarball = build_dpd_tarball(self.source_db, compression="gz")
+        with serve_files({"/dpd.db.tar.gz": tarball}, etag='"v1"') as (base_url, _):
+            result = self._download(base_url, path="/dpd.db.tar.gz", workers=3)
+        self.assertEqual(result["sha256"], hashlib.sha256(tarball).hexdigest())
+        self.assertEqual(self.target_db.read_bytes(), self.db_bytes)
+        self.assertEqual(sorted(path.name for path in self.target_dir.iterdir()), ["dpd.db"])
+
+
+# ---------------------------------------------------------------------------
+# Optimización posterior a la descarga
+# ---------------------------------------------------------------------------
+
+class TestDpdDbOptimization(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.source_db = build_synthetic_dpd_db(self.tmp / "source.db", BASE_ENTRIES, BASE_ROOTS)
+        # Con tablas de pocas filas ANALYZE hace que el planificador prefiera recorrerlas.
+        conn = sqlite3.connect(str(self.source_db))
+        conn.executemany(
+            "INSERT INTO dpd_roots (root, root_sign, root_group) VALUES (?, '', 1)",
+            [(f"√r{index}",) for index in range(1000)],
+        )
+        conn.executemany(
+            "INSERT INTO lookup (lookup_key, headwords, grammar) VALUES (?, '[]', '[]')",
+            [(f"forma{index}",) for index in range(1000)],
+        )
+        conn.executemany(
+            "INSERT INTO dpd_headwords (lemma_1, pos) VALUES (?, 'masc')",
+            [(f"lema{index} 1",) for index in range(1000)],
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_shipped_db_scans_and_optimized_db_does_not(self):
+        full_scans = dpd_db.dpd_gloss_query_full_scans(self.source_db)
+        self.assertEqual(set(full_scans), {"lookup", "roots", "root_group", "headwords_by_lemma"})
+
+        report = dpd_db._optimize_dpd_db(self.source_db)
+
+        self.assertEqual(
+            report["indexes_created"],
+            ["idx_pali_lem_lookup_key", "idx_pali_lem_roots_root", "idx_pali_lem_headwords_lemma"],
+        )
+        self.assertTrue(report["analyzed"] and report["vacuumed"])
+        self.assertEqual(dpd_db.dpd_gloss_query_full_scans(self.source_db), {})
+        conn = sqlite3.connect(str(self.source_db))
+        try:
+            self.assertTrue(conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0)
+        finally:
+            conn.close()
+
+    def test_optimization_is_idempotent_and_keeps_results(self):
+        words = tuple(pali_text.tokenize_pali_text("dhammo buddha saṅgha"))
+        before = lookup._query_dpd_lookup(words, str(self.source_db))
+        dpd_db._optimize_dpd_db(self.source_db)
+        self.assertEqual(dpd_db._optimize_dpd_db(self.source_db)["indexes_created"], [])
+        self.assertEqual(lookup._query_dpd_lookup(words, str(self.source_db)), before)
+
+    def test_download_optimizes_before_install(self):
+        target_dir = self.tmp / "dpd-db"
+        target_dir.mkdir()
+        target_db = target_dir / "dpd.db"
+        tarball = build_dpd_tarball(self.source_db)
+        with serve_files({"/dpd.db.tar.bz2": tarball}) as (base_url, _):
+            result = dpd_db._download_dpd_db(f"{base_url}/dpd.db.tar.bz2", target_dir, target_db, 10, optimize=True)
+        self.assertEqual(len(result["optimization"]["indexes_created"]), 3)
+        self.assertEqual(dpd_db.dpd_gloss_query_full_scans(target_db), {})
+        self.assertEqual(sorted(path.name for path in target_dir.iterdir()), ["dpd.db"])
+
+
+# ---------------------------------------------------------------------------
+# Base slim
+# ---------------------------------------------------------------------------
+
+class TestSlimDpdDb(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.source_db = build_synthetic_dpd_db(self.tmp / "source.db", BASE_ENTRIES, BASE_ROOTS)
+        conn = sqlite3.connect(str(self.source_db))
+        conn.execute("INSERT INTO sutta_info (title) VALUES (?)", ("x" * 200000,))
+        conn.execute("UPDATE dpd_headwords SET example_1 = ?", ("ejemplo " * 5000,))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _columns(self, db_path):
+        conn = sqlite3.connect(str(db_path))
+        try:
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            return {
+                table: [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                for table in tables
+                if not table.startswith("sqlite_")
+            }
+        finally:
+            conn.close()
+
+    def test_slim_db_keeps_only_gloss_columns_and_same_results(self):
+        slim_db = self.tmp / "dpd.slim.db"
+        report = dpd_db.build_slim_dpd_db(self.source_db, slim_db)
+
+        self.assertEqual(
+            self._columns(slim_db),
+            {table: list(columns) for table, columns in dpd_db.DPD_SLIM_COLUMNS.items()},
+        )
+        self.assertLess(report["slim_bytes"], report["source_bytes"] / 4)
+        self.assertIn("idx_pali_lem_lookup_key", report["optimization"]["indexes_created"])
+        words = tuple(pali_text.tokenize_pali_text("dhammo buddha saṅgha navo"))
+        self.assertEqual(
+            lookup._query_dpd_lookup(words, str(slim_db)),
+            lookup._query_dpd_lookup(words, str(self.source_db)),
+        )
+        self.assertEqual(sorted(path.name for path in self.tmp.iterdir()), ["dpd.slim.db", "source.db"])
+
+    def test_missing_column_is_rejected(self):
+        conn = sqlite3.connect(str(self.source_db))
+        conn.execute("ALTER TABLE dpd_roots DROP COLUMN root_group")
+        conn.commit()
+        conn.close()
+        with self.assertRaises(ValueError):
+            dpd_db.build_slim_dpd_db(self.source_db, self.tmp / "dpd.slim.db")
+        self.assertFalse((self.tmp / "dpd.slim.db").exists())
+
+    def test_download_can_install_slim_db(self):
+        target_dir = self.tmp / "dpd-db"
+        target_dir.mkdir()
+        target_db = target_dir / "dpd.db"
+        with serve_files({"/dpd.db": self.source_db.read_bytes()}) as (base_url, _):
+            result = dpd_db._download_dpd_db(f"{base_url}/dpd.db", target_dir, target_db, 10, slim=True)
+        self.assertTrue(result["optimization"]["slim"])
+        self.assertNotIn("sutta_info", self._columns(target_db))
+        self.assertEqual(sorted(path.name for path in target_dir.iterdir()), ["dpd.db"])
+
+
+# ---------------------------------------------------------------------------
+# Arranque sin bloqueos de red
+# ---------------------------------------------------------------------------
+
+class _ManagedDbFixture(unittest.TestCase):
+    """dpd.db gestionada en un `DPD_DB_DIR` temporal, sin red real."""
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_dir = self.tmp / "dpd-db"
+        self.db_dir.mkdir()
+        self.target_db = build_synthetic_dpd_db(self.db_dir / "dpd.db", BASE_ENTRIES, BASE_ROOTS)
+        self.meta_path = self.db_dir / ".dpd_db_meta.json"
+        environ = {key: value for key, value in os.environ.items() if key != "DPD_DB_PATH"}
+        environ.update({"DPD_DB_URL": "http://127.0.0.1:9/dpd.db", "DPD_DB_OPTIMIZE": "0"})
+        self._patches = [
+            unittest.mock.patch.object(dpd_db, "DPD_DB_DIR", self.db_dir),
+            unittest.mock.patch.dict(os.environ, environ, clear=True),
+        ]
+        for patcher in self._patches:
+            patcher.start()
+        dpd_db._DPD_DB_VALIDATION_CACHE.clear()
+        dpd_db._DPD_DB_STATS_CACHE.clear()
+
+    def tearDown(self):
+        for patcher in reversed(self._patches):
+            patcher.stop()
+        self._tmp_dir.cleanup()
+
+    def _wait_for_background_work(self):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            busy = any(
+                thread.name in ("dpd-update-check", "dpd-db-stats") for thread in threading.enumerate()
+            )
+            if not busy and not (self.db_dir / ".dpd_db_downloading").exists():
+                return
+            time.sleep(0.02)
+        self.fail("El trabajo de fondo no terminó")
+
+
+class TestNonBlockingColdStart(_ManagedDbFixture):
+
+    def test_returns_last_known_good_path_without_waiting_for_network(self):
+        release_head = threading.Event()
+
+        def _slow_head(url, timeout):
+            release_head.wait(5)
+            return {}
+
+        common._save_json_file(self.meta_path, {"last_known_good_path": str(self.target_db.resolve())})
+        with unittest.mock.patch.object(dpd_db, "_fetch_remote_signature", side_effect=_slow_head) as head:
+            started = time.perf_counter()
+            selected = dpd_db.ensure_dpd_db_available()
+            elapsed = time.perf_counter() - started
+            release_head.set()
+            self._wait_for_background_work()
+        self.assertEqual(selected, str(self.target_db.resolve()))
+        self.assertLess(elapsed, 1.0)
+        head.assert_called_once()
+
+    def test_recent_check_skips_head_request(self):
+        common._save_json_file(self.meta_path, {"last_checked_at": common._utcnow().isoformat()})
+        with unittest.mock.patch.object(dpd_db, "_fetch_remote_signature") as head:
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        head.assert_not_called()
+        self.assertEqual(
+            common._load_json_file(self.meta_path, {})["last_known_good_path"], str(self.target_db.resolve())
+        )
+
+    def test_validation_is_cached_by_file_stat(self):
+        with unittest.mock.patch.object(dpd_db, "_is_valid_dpd_db", wraps=dpd_db._is_valid_dpd_db) as validate:
+            self.assertTrue(dpd_db._is_valid_dpd_db_cached(self.target_db))
+            self.assertTrue(dpd_db._is_valid_dpd_db_cached(self.target_db))
+            self.assertEqual(validate.call_count, 1)
+            replacement = build_synthetic_dpd_db(self.tmp / "nueva.db", BASE_ENTRIES)
+            replacement.replace(self.target_db)
+            self.assertTrue(dpd_db._is_valid_dpd_db_cached(self.target_db))
+            self.assertEqual(validate.call_count, 2)
+
+    def test_background_check_swaps_in_verified_release_only(self):
+        new_entries = dict(BASE_ENTRIES, navo=("nava 1", "adj", "masc nom sg", "nuevo", ""))
+        new_db = build_synthetic_dpd_db(self.tmp / "new.db", new_entries, BASE_ROOTS)
+        original_bytes = self.target_db.read_bytes()
+        with serve_files({"/dpd.db": b"<html>no es una base</html>" * 100}, etag='"v2"') as (base_url, _):
+            os.environ["DPD_DB_URL"] = f"{base_url}/dpd.db"
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        self.assertEqual(self.target_db.read_bytes(), original_bytes)
+
+        common._save_json_file(self.meta_path, {})
+        with serve_files({"/dpd.db": new_db.read_bytes()}, etag='"v3"') as (base_url, _):
+            os.environ["DPD_DB_URL"] = f"{base_url}/dpd.db"
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        meta = common._load_json_file(self.meta_path, {})
+        self.assertEqual(meta["remote_signature"]["etag"], '"v3"')
+        self.assertEqual(Path(meta["last_known_good_path"]).read_bytes(), new_db.read_bytes())
+
+
+# ---------------------------------------------------------------------------
+# Versiones de dpd.db y cachés por versión
+# ---------------------------------------------------------------------------
+
+class TestVersionedDpdDb(_ManagedDbFixture):
+
+    def _install_release(self, entries, etag):
+        release_db = build_synthetic_dpd_db(self.tmp / f"release-{etag}.db", entries, BASE_ROOTS)
+        with serve_files({"/dpd.db": release_db.read_bytes()}, etag=f'"{etag}"') as (base_url, _):
+            os.environ["DPD_DB_URL"] = f"{base_url}/dpd.db"
+            common._save_json_file(
+                self.meta_path, dict(common._load_json_file(self.meta_path, {}), last_checked_at="")
+            )
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        return common._load_json_file(self.meta_path, {})
+
+    def test_release_is_installed_in_its_own_version_directory(self):
+        meta = self._install_release(BASE_ENTRIES, "v2")
+        version_db = self.db_dir / "versions" / meta["current_version"] / "dpd.db"
+        self.assertTrue(version_db.exists())
+        self.assertEqual(meta["last_known_good_path"], str(version_db.resolve()))
+        self.assertIn("legacy", meta["retired_versions"])
+        self.assertEqual(dpd_db.ensure_dpd_db_available(), str(version_db.resolve()))
+        self._wait_for_background_work()
+        self.assertFalse((self.db_dir / "versions" / "_incoming").exists())
+
+    def test_retired_versions_are_collected_only_without_readers(self):
+        first = self._install_release(BASE_ENTRIES, "v2")["current_version"]
+        first_db = self.db_dir / "versions" / first / "dpd.db"
+        new_entries = dict(BASE_ENTRIES, navo=("nava 1", "adj", "masc nom sg", "nuevo", ""))
+        with unittest.mock.patch.dict(os.environ, {"DPD_DB_VERSION_GRACE_SECONDS": "0"}), \
+             lookup.pinned_dpd_db(str(first_db)):
+            second = self._install_release(new_entries, "v3")["current_version"]
+            self.assertNotEqual(first, second)
+            # El lector fija la versión anterior: sigue en disco y consultable.
+            self.assertTrue(first_db.exists())
+            self.assertIn("dhammo", lookup._query_dpd_lookup(("dhammo",), str(first_db)))
+            # El dpd.db heredado no tenía lectores: ya se recogió al comprobar la release.
+            self.assertNotIn("legacy", common._load_json_file(self.meta_path, {})["retired_versions"])
+        with unittest.mock.patch.dict(os.environ, {"DPD_DB_VERSION_GRACE_SECONDS": "0"}):
+            removed = dpd_db._gc_dpd_db_versions(self.db_dir, self.meta_path)
+        self.assertEqual(removed, [first])
+        self.assertFalse(first_db.parent.exists())
+        self.assertFalse(self.target_db.exists())
+        self.assertEqual(os.listdir(self.db_dir / "versions"), [second])
+
+    def test_readers_in_another_process_keep_their_version(self):
+        first = self._install_release(BASE_ENTRIES, "v2")["current_version"]
+        first_db = self.db_dir / "versions" / first / "dpd.db"
+        reader_script = (
+            "import sys\n"
+            "from pali_lem import lookup\n"
+            "with lookup.pinned_dpd_db(sys.argv[1]):\n"
+            "    print(sorted(lookup._query_dpd_lookup(('dhammo',), sys.argv[1])), flush=True)\n"
+            "    sys.stdin.readline()\n"
+        )
+        reader = subprocess.Popen(
+            [sys.executable, "-c", reader_script, str(first_db)],
+            cwd=Path(__file__).resolve().parent.parent,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            self.assertEqual(reader.stdout.readline().strip(), "['dhammo']")
+            new_entries = dict(BASE_ENTRIES, navo=("nava 1", "adj", "masc nom sg", "nuevo", ""))
+            with unittest.mock.patch.dict(os.environ, {"DPD_DB_VERSION_GRACE_SECONDS": "0"}):
+                second = self._install_release(new_entries, "v3")["current_version"]
+                self.assertEqual(dpd_db._gc_dpd_db_versions(self.db_dir, self.meta_path), [])
+            # Este proceso no fija la versión: la mantiene la concesión del otro.
+            self.assertFalse(lookup._DPD_DB_READERS.is_pinned(first_db))
+            self.assertTrue(first_db.exists())
+            self.assertIn(first, common._load_json_file(self.meta_path, {})["retired_versions"])
+        finally:
+            # Muere sin soltar la concesión: su PID ya no existe y deja de contar.
+            reader.kill()
+            reader.wait()
+            reader.stdout.close()
+            reader.stdin.close()
+        with unittest.mock.patch.dict(os.environ, {"DPD_DB_VERSION_GRACE_SECONDS": "0"}):
+            removed = dpd_db._gc_dpd_db_versions(self.db_dir, self.meta_path)
+        self.assertEqual(removed, [first])
+        self.assertEqual(os.listdir(self.db_dir / "versions"), [second])
+
+    def test_lease_without_heartbeat_is_ignored(self):
+        first = self._install_release(BASE_ENTRIES, "v2")["current_version"]
+        first_db = self.db_dir / "versions" / first / "dpd.db"
+        lease_dir = lookup._reader_lease_dir(first_db)
+        lease_dir.mkdir()
+        lease_path = lease_dir / "otro-host-1-abc.lease"
+        lease_path.write_text(json.dumps({"pid": 1, "host": "otro-host", "token": "abc"}), encoding="utf-8")
+        self.assertTrue(lookup._DPD_DB_READERS.has_readers(first_db))
+        stale = time.time() - lookup.READER_LEASE_SECONDS - 5
+        os.utime(lease_path, (stale, stale))
+        self.assertFalse(lookup._DPD_DB_READERS.has_readers(first_db))
+        self.assertFalse(lease_path.exists())
+
+    def test_follow_dpd_db_path_sees_installs_from_other_processes(self):
+        self.addCleanup(dpd_db.get_dpd_db_path.clear)
+        first_path = dpd_db.follow_dpd_db_path()
+        self._wait_for_background_work()
+        self.assertEqual(first_path, dpd_db.get_dpd_db_path())
+        # Otro proceso instala una release: solo cambia el archivo de metadatos.
+        (self.db_dir / "versions" / "otra").mkdir(parents=True)
+        other_db = build_synthetic_dpd_db(self.db_dir / "versions" / "otra" / "dpd.db", BASE_ENTRIES, BASE_ROOTS)
+        meta = common._load_json_file(self.meta_path, {})
+        common._save_json_file(self.meta_path, dict(meta, current_version="otra", last_known_good_path=str(other_db.resolve())))
+        self.assertEqual(dpd_db.get_dpd_db_path(), first_path)
+        self.assertEqual(dpd_db.follow_dpd_db_path(), str(other_db.resolve()))
+        self._wait_for_background_work()
+
+    def test_grace_period_delays_collection(self):
+        self._install_release(BASE_ENTRIES, "v2")
+        self.assertEqual(dpd_db._gc_dpd_db_versions(self.db_dir, self.meta_path), [])
+        self.assertTrue(self.target_db.exists())
+
+    def test_lookup_cache_is_keyed_by_content_version(self):
+        external_db = self.tmp / "externa.db"
+        build_synthetic_dpd_db(external_db, BASE_ENTRIES)
+        first = lookup.lookup_words_in_dpd(("dhammo",), str(external_db))
+        self.assertEqual(first["dhammo"]["meaning"], "doctrina")
+
+        changed = dict(BASE_ENTRIES, dhammo=("dhamma 1", "masc", "masc nom sg", "verdad", "√dhar"))
+        build_synthetic_dpd_db(self.tmp / "externa-nueva.db", changed).replace(external_db)
+        second = lookup.lookup_words_in_dpd(("dhammo",), str(external_db))
+        self.assertEqual(second["dhammo"]["meaning"], "verdad")
+        self.assertEqual(dpd_db.compute_dpd_db_stats(external_db)["lookup_entries"], len(changed))
+
+    def test_version_id_of_managed_db_is_its_directory(self):
+        path = self.db_dir / "versions" / "abc123" / "dpd.db"
+        self.assertEqual(lookup.dpd_db_version_id(path), "abc123")
+        self.assertEqual(len(lookup.dpd_db_version_id(self.target_db)), 16)
+
+
+
+# ---------------------------------------------------------------------------
+# Estadísticas de dpd.db guardadas en los metadatos
+# ---------------------------------------------------------------------------
+
+class TestDpdDbStats(_ManagedDbFixture):
+
+    def test_download_records_stats_for_installed_version(self):
+        new_entries = dict(BASE_ENTRIES, navo=("nava 1", "adj", "masc nom sg", "nuevo", ""))
+        new_db = build_synthetic_dpd_db(self.tmp / "new.db", new_entries, BASE_ROOTS)
+        with serve_files({"/releases/download/v9.1/dpd.db": new_db.read_bytes()}, etag='"v2"') as (base_url, _):
+            os.environ["DPD_DB_URL"] = f"{base_url}/releases/download/v9.1/dpd.db"
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        meta = common._load_json_file(self.meta_path, {})
+        stats = meta["db_stats"][meta["current_version"]]
+        self.assertEqual(stats["lookup_entries"], len(new_entries))
+        self.assertEqual(stats["roots"], len(BASE_ROOTS))
+        self.assertEqual(stats["release_tag"], "v9.1")
+        self.assertEqual(stats["size_bytes"], new_db.stat().st_size)
+
+        with unittest.mock.patch.object(dpd_db, "compute_dpd_db_stats") as compute:
+            self.assertEqual(dpd_db.get_dpd_db_stats(meta["last_known_good_path"]), stats)
+        compute.assert_not_called()
+
+    def test_missing_stats_are_computed_in_background(self):
+        external_db = build_synthetic_dpd_db(self.tmp / "externa.db", BASE_ENTRIES, BASE_ROOTS)
+        self.assertIsNone(dpd_db.get_dpd_db_stats(str(external_db)))
+        self._wait_for_background_work()
+        stats = dpd_db.get_dpd_db_stats(str(external_db))
+        self.assertEqual(stats["lookup_entries"], len(BASE_ENTRIES))
+        self.assertEqual(stats["version"], lookup.dpd_db_version_id(external_db))
+        self.assertIn(stats["version"], common._load_json_file(self.meta_path, {})["db_stats"])
+
+    def test_external_db_stats_create_missing_dpd_db_dir(self):
+        external_db = build_synthetic_dpd_db(self.tmp / "externa.db", BASE_ENTRIES, BASE_ROOTS)
+        missing_dir = self.tmp / "sin-dpd-db"
+        with unittest.mock.patch.object(dpd_db, "DPD_DB_DIR", missing_dir):
+            self.assertIsNone(dpd_db.get_dpd_db_stats(str(external_db)))
+            self._wait_for_background_work()
+            stats = dpd_db.get_dpd_db_stats(str(external_db))
+        self.assertEqual(stats["lookup_entries"], len(BASE_ENTRIES))
+        self.assertTrue((missing_dir / ".dpd_db_meta.json").exists())
+
+    def test_only_recent_versions_are_kept(self):
+        for index in range(dpd_db._DPD_DB_STATS_KEEP + 3):
+            dpd_db._store_dpd_db_stats(
+                self.meta_path, {"version": f"v{index:02d}", "computed_at": f"2026-01-01T00:00:{index:02d}"}
+            )
+        kept = common._load_json_file(self.meta_path, {})["db_stats"]
+        self.assertEqual(len(kept), dpd_db._DPD_DB_STATS_KEEP)
+        self.assertNotIn("v00", kept)
+        self.assertIn(f"v{dpd_db._DPD_DB_STATS_KEEP + 2:02d}", kept)
+
+    def test_release_tag_is_parsed_from_github_url(self):
+        self.assertEqual(
+            dpd_db._release_tag_from_url("https://github.com/x/dpd-db/releases/download/v0.2.20250101/dpd.db.tar.bz2"),
+            "v0.2.20250101",
+        )
+        self.assertEqual(dpd_db._release_tag_from_url("http://127.0.0.1/dpd.db"), "")
+
+
+# ---------------------------------------------------------------------------
+# Actualizaciones por parches entre releases
+# ---------------------------------------------------------------------------
+
+class TestDeltaUpdates(_ManagedDbFixture):
+
+    def setUp(self):
+        super().setUp()
+        self.mid_entries = dict(BASE_ENTRIES, navo=("nava 1", "adj", "masc nom sg", "nuevo", ""))
+        self.new_entries = dict(self.mid_entries)
+        self.new_entries["dhammo"] = ("dhamma 1", "masc", "masc nom sg", "doctrina, verdad", "√dhar")
+        del self.new_entries["saṅgho"]
+        self.mid_db = build_synthetic_dpd_db(self.tmp / "mid.db", self.mid_entries, BASE_ROOTS)
+        self.new_db = build_synthetic_dpd_db(self.tmp / "new.db", self.new_entries, BASE_ROOTS)
+
+    def _delta(self, old_db, new_db):
+        buffer = io.BytesIO()
+        header = dpd_db.build_dpd_delta(old_db, new_db, buffer)
+        payload = buffer.getvalue()
+        name = f"{header['from'][:8]}-{header['to'][:8]}.delta.jsonl.gz"
+        entry = {
+            "from": header["from"], "to": header["to"], "url": name,
+            "sha256": hashlib.sha256(payload).hexdigest(), "bytes": len(payload),
+        }
+        return entry, payload
+
+    def _manifest(self, deltas, latest):
+        return json.dumps({"format": dpd_db.DPD_DELTA_MANIFEST_FORMAT, "latest": latest, "deltas": deltas}).encode()
+
+    def _run_update(self, files, etag='"v2"'):
+        with serve_files(files, etag=etag) as (base_url, server):
+            os.environ["DPD_DB_URL"] = f"{base_url}/dpd.db"
+            os.environ["DPD_DB_DELTA_MANIFEST_URL"] = f"{base_url}/deltas/manifest.json"
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        meta = common._load_json_file(self.meta_path, {})
+        return meta, [path for path, _ in server.requests]
+
+    def test_delta_roundtrip_reproduces_new_release(self):
+        entry, payload = self._delta(self.target_db, self.new_db)
+        patched = self.tmp / "patched.db"
+        patched.write_bytes(self.target_db.read_bytes())
+        dpd_db.apply_dpd_delta(patched, io.BytesIO(payload))
+        self.assertEqual(dpd_db.dpd_db_content_digest(patched), entry["to"])
+        self.assertEqual(dpd_db.dpd_db_content_digest(patched), dpd_db.dpd_db_content_digest(self.new_db))
+        # El digest no depende de índices ni de VACUUM.
+        dpd_db._optimize_dpd_db(patched)
+        self.assertEqual(dpd_db.dpd_db_content_digest(patched), entry["to"])
+
+    def test_update_applies_delta_chain_instead_of_full_download(self):
+        first, first_payload = self._delta(self.target_db, self.mid_db)
+        second, second_payload = self._delta(self.mid_db, self.new_db)
+        meta, requested = self._run_update({
+            "/dpd.db": self.new_db.read_bytes(),
+            "/deltas/manifest.json": self._manifest([first, second], second["to"]),
+            f"/deltas/{first['url']}": first_payload,
+            f"/deltas/{second['url']}": second_payload,
+        })
+        self.assertNotIn("/dpd.db", requested)
+        self.assertEqual(meta["last_download"]["delta_chain"], 2)
+        self.assertEqual(meta["current_content_digest"], second["to"])
+        installed = Path(meta["last_known_good_path"])
+        self.assertEqual(dpd_db.dpd_db_content_digest(installed), dpd_db.dpd_db_content_digest(self.new_db))
+        self.assertLess(meta["last_download"]["bytes"], self.new_db.stat().st_size / 5)
+
+    def test_missing_chain_falls_back_to_full_download(self):
+        unrelated, payload = self._delta(self.mid_db, self.new_db)
+        meta, requested = self._run_update({
+            "/dpd.db": self.new_db.read_bytes(),
+            "/deltas/manifest.json": self._manifest([unrelated], unrelated["to"]),
+            f"/deltas/{unrelated['url']}": payload,
+        })
+        self.assertIn("/dpd.db", requested)
+        self.assertNotIn("delta_chain", meta["last_download"])
+        self.assertEqual(Path(meta["last_known_good_path"]).read_bytes(), self.new_db.read_bytes())
+
+    def test_installed_content_digest_is_stored_and_reused(self):
+        unrelated, payload = self._delta(self.mid_db, self.new_db)
+        meta, _ = self._run_update({
+            "/dpd.db": self.new_db.read_bytes(),
+            "/deltas/manifest.json": self._manifest([unrelated], unrelated["to"]),
+        })
+        self.assertEqual(meta["current_content_digest"], dpd_db.dpd_db_content_digest(self.new_db))
+        installed = Path(meta["last_known_good_path"])
+
+        # La siguiente release llega por parche sin volver a calcular el digest de la base instalada.
+        newer_db = build_synthetic_dpd_db(self.tmp / "newer.db", dict(self.new_entries, kho=("kho 1", "ind", "ind", "en efecto", "")), BASE_ROOTS)
+        entry, payload = self._delta(self.new_db, newer_db)
+        hashed = []
+        original_digest = dpd_db.dpd_db_content_digest
+
+        def _tracking_digest(path):
+            hashed.append(Path(path).resolve())
+            return original_digest(path)
+
+        os.environ["DPD_DB_UPDATE_INTERVAL_HOURS"] = "0"
+        with unittest.mock.patch.object(dpd_db, "dpd_db_content_digest", side_effect=_tracking_digest):
+            meta, requested = self._run_update({
+                "/dpd.db": newer_db.read_bytes(),
+                "/deltas/manifest.json": self._manifest([entry], entry["to"]),
+                f"/deltas/{entry['url']}": payload,
+            }, etag='"v3"')
+        self.assertNotIn("/dpd.db", requested)
+        self.assertEqual(meta["current_content_digest"], entry["to"])
+        self.assertNotIn(installed.resolve(), hashed)
+        self.assertEqual(len(hashed), 1)  # solo la verificación del resultado parcheado
+
+    def test_slim_install_skips_delta_attempt(self):
+        entry, payload = self._delta(self.target_db, self.new_db)
+        os.environ["DPD_DB_SLIM"] = "1"
+        with unittest.mock.patch.object(dpd_db, "dpd_db_content_digest") as mock_digest:
+            meta, requested = self._run_update({
+                "/dpd.db": self.new_db.read_bytes(),
+                "/deltas/manifest.json": self._manifest([entry], entry["to"]),
+                f"/deltas/{entry['url']}": payload,
+            })
+        mock_digest.assert_not_called()
+        self.assertNotIn("/deltas/manifest.json", requested)
+        self.assertIn("/dpd.db", requested)
+        self.assertTrue(meta["current_slim"])
+        self.assertEqual(meta["current_content_digest"], "")
+
+    def test_corrupt_delta_falls_back_to_full_download(self):
+        entry, payload = self._delta(self.target_db, self.new_db)
+        meta, requested = self._run_update({
+            "/dpd.db": self.new_db.read_bytes(),
+            "/deltas/manifest.json": self._manifest([entry], entry["to"]),
+            f"/deltas/{entry['url']}": payload[:-10] + b"0" * 10,
+        })
+        self.assertIn("/dpd.db", requested)
+        self.assertEqual(Path(meta["last_known_good_path"]).read_bytes(), self.new_db.read_bytes())
+
+    def test_schema_change_cannot_be_patched(self):
+        conn = sqlite3.connect(str(self.new_db))
+        conn.execute("ALTER TABLE dpd_roots ADD COLUMN extra TEXT")
+        conn.commit()
+        conn.close()
+        with self.assertRaises(ValueError):
+            dpd_db.build_dpd_delta(self.target_db, self.new_db, io.BytesIO())
+
+
+# ---------------------------------------------------------------------------
+# Aprovisionamiento único con locks recuperables
+# ---------------------------------------------------------------------------
+
+def _dead_pid():
+    """PID de un proceso que ya terminó."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestProvisioningLock(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.lock_path = self.tmp / "recurso.lock"
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _write_owner(self, pid, host=None, age_seconds=0):
+        self.lock_path.write_text(
+            json.dumps({"pid": pid, "host": host or socket.gethostname(), "token": "otro"}), encoding="utf-8"
+        )
+        stamp = time.time() - age_seconds
+        os.utime(self.lock_path, (stamp, stamp))
+
+    def test_lock_of_dead_process_is_reclaimed(self):
+        self._write_owner(_dead_pid())
+        lock = provisioning.ProvisioningLock(self.lock_path)
+        self.assertTrue(lock.acquire())
+        self.assertEqual(json.loads(self.lock_path.read_text())["pid"], os.getpid())
+        lock.release()
+        self.assertFalse(self.lock_path.exists())
+
+    def test_live_lock_is_respected_until_heartbeat_stops(self):
+        self._write_owner(os.getpid(), host="otra-maquina")
+        self.assertFalse(provisioning.ProvisioningLock(self.lock_path, stale_seconds=60).acquire())
+        self._write_owner(os.getpid(), host="otra-maquina", age_seconds=120)
+        self.assertTrue(provisioning.ProvisioningLock(self.lock_path, stale_seconds=60).acquire())
+
+    def test_legacy_empty_lock_file_expires(self):
+        self.lock_path.touch()
+        self.assertFalse(provisioning.ProvisioningLock(self.lock_path, stale_seconds=60).acquire())
+        stamp = time.time() - 120
+        os.utime(self.lock_path, (stamp, stamp))
+        self.assertTrue(provisioning.ProvisioningLock(self.lock_path, stale_seconds=60).acquire())
+
+    def test_late_reclaimer_does_not_remove_the_winners_lock(self):
+        self._write_owner(_dead_pid())
+        late = provisioning.ProvisioningLock(self.lock_path)
+        # Ve el lock abandonado, pero otro reclamador se adelanta y toma el suyo.
+        stale = late._stale_owner()
+        self.assertEqual(stale[0]["token"], "otro")
+        winner = provisioning.ProvisioningLock(self.lock_path)
+        self.assertTrue(winner.acquire())
+
+        late._reclaim(*stale)
+        self.assertEqual(json.loads(self.lock_path.read_text())["token"], winner.token)
+        self.assertFalse(late.acquire())
+        self.assertEqual(os.listdir(self.tmp), [self.lock_path.name])
+        winner.release()
+
+    def test_racing_reclaimers_take_the_lock_once(self):
+        for _ in range(20):
+            self._write_owner(_dead_pid())
+            locks = [provisioning.ProvisioningLock(self.lock_path) for _ in range(4)]
+            barrier = threading.Barrier(len(locks))
+            acquired = []
+
+            def _reclaim(lock):
+                barrier.wait()
+                if lock.acquire():
+                    acquired.append(lock)
+
+            threads = [threading.Thread(target=_reclaim, args=(lock,)) for lock in locks]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            self.assertEqual(len(acquired), 1)
+            self.assertEqual(json.loads(self.lock_path.read_text())["token"], acquired[0].token)
+            self.assertEqual(os.listdir(self.tmp), [self.lock_path.name])
+            acquired[0].release()
+
+    def test_release_does_not_remove_someone_elses_lock(self):
+        lock = provisioning.ProvisioningLock(self.lock_path)
+        self.assertTrue(lock.acquire())
+        self._write_owner(os.getpid())
+        lock.release()
+        self.assertTrue(self.lock_path.exists())
+
+    def test_concurrent_callers_share_one_in_flight_result(self):
+        calls = []
+        release = threading.Event()
+
+        def _work():
+            calls.append(1)
+            release.wait(5)
+            return "listo"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(provisioning.provision_once("clave", self.lock_path, _work)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["listo"] * 8)
+        self.assertFalse(self.lock_path.exists())
+
+    def test_json_is_decompressed_once_for_concurrent_sessions(self):
+        json_path = self.tmp / "dpd_dictionary.json"
+        with gzip.open(json_path.with_suffix(".json.gz"), "wb") as archive:
+            archive.write(json.dumps({"dhammo": {"meaning": "doctrina"}}).encode("utf-8"))
+        real_gzip_open = gzip.open
+        opened = []
+
+        def _slow_gzip_open(*args, **kwargs):
+            opened.append(args[0])
+            time.sleep(0.2)
+            return real_gzip_open(*args, **kwargs)
+
+        results = []
+        pali_dictionary.ensure_dpd_json_available.clear()
+        self.addCleanup(pali_dictionary.ensure_dpd_json_available.clear)
+        with unittest.mock.patch.object(pali_dictionary, "DPD_JSON_PATH", json_path), \
+             unittest.mock.patch.object(gzip, "open", side_effect=_slow_gzip_open):
+            threads = [threading.Thread(target=lambda: results.append(pali_dictionary.ensure_dpd_json_available())) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(results, [str(json_path)] * 6)
+        self.assertEqual(json.loads(json_path.read_text())["dhammo"]["meaning"], "doctrina")
+
+
+class TestDownloadLockRecovery(_ManagedDbFixture):
+
+    def test_stale_download_lock_does_not_block_updates(self):
+        lock_path = self.db_dir / ".dpd_db_downloading"
+        lock_path.write_text(json.dumps({"pid": _dead_pid(), "host": socket.gethostname()}), encoding="utf-8")
+        new_db = build_synthetic_dpd_db(
+            self.tmp / "new.db", dict(BASE_ENTRIES, navo=("nava 1", "adj", "x", "nuevo", "")), BASE_ROOTS
+        )
+        with serve_files({"/dpd.db": new_db.read_bytes()}, etag='"v2"') as (base_url, _):
+            os.environ["DPD_DB_URL"] = f"{base_url}/dpd.db"
+            dpd_db.ensure_dpd_db_available()
+            self._wait_for_background_work()
+        meta = common._load_json_file(self.meta_path, {})
+        self.assertEqual(Path(meta["last_known_good_path"]).read_bytes(), new_db.read_bytes())
+        self.assertFalse(lock_path.exists())
+
+
+# ---------------------------------------------------------------------------
+# Glosado por lotes
+# ---------------------------------------------------------------------------
+
+class TestBatchGlossing(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+        self.corpus = self.tmp / "corpus"
+        texts = {
+            "mn/mn1.txt": "dhammo buddha, saṅgho.",
+            "mn/mn2.txt": "dhammo navo navo",
+            "sn/sn1.txt": "buddha\nsaṅgho",
+        }
+        for relative, text in texts.items():
+            path = self.corpus / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding="utf-8")
+        self.texts = texts
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _gloss_entries(self, text):
+        lookup_map = lookup._query_dpd_lookup(tuple(pali_text.tokenize_pali_text(text)), self.db_path)
+        return lookup.process_pali_with_lookup_map(text, lookup_map)
+
+    def _expected_output(self, text):
+        return formatting.generate_compact_gloss(self._gloss_entries(text))
+
+    def _run(self, workers):
+        inputs = batch.resolve_batch_inputs([str(self.corpus / "**" / "*.txt")])
+        return batch.gloss_files(inputs, self.tmp / "out", dpd_db_path=self.db_path, workers=workers)
+
+    def test_outputs_mirror_inputs_and_summary_aggregates_coverage(self):
+        summary = self._run(workers=1)
+
+        self.assertEqual((summary["files"], summary["glossed"], summary["failed"]), (3, 3, []))
+        self.assertEqual((summary["words"], summary["found"]), (8, 6))
+        self.assertEqual(summary["coverage"], 75.0)
+        self.assertEqual(summary["top_missing"], [("navo", 2)])
+        for relative, text in self.texts.items():
+            output = self.tmp / "out" / Path(relative).with_suffix(batch.BATCH_OUTPUT_SUFFIX)
+            self.assertEqual(output.read_text(encoding="utf-8"), self._expected_output(text))
+
+    def test_process_pool_matches_single_process(self):
+        single = self._run(workers=1)
+        outputs = {path: path.read_text(encoding="utf-8") for path in (self.tmp / "out").rglob("*.gloss.txt")}
+        pooled = self._run(workers=2)
+
+        self.assertEqual(pooled["workers"], 2)
+        self.assertEqual(pooled["per_file"], single["per_file"])
+        self.assertEqual(
+            {path: path.read_text(encoding="utf-8") for path in (self.tmp / "out").rglob("*.gloss.txt")},
+            outputs,
+        )
+
+    def test_jsonl_output_has_one_line_record_per_input_line(self):
+        (self.corpus / "sn" / "sn2.txt").write_text("buddha\r\n\nnavo dhammo\n", encoding="utf-8")
+        inputs = batch.resolve_batch_inputs([str(self.corpus / "**" / "*.txt")])
+        text_summary = batch.gloss_files(inputs, self.tmp / "out", dpd_db_path=self.db_path, workers=1)
+        summary = batch.gloss_files(inputs, self.tmp / "out", output_format="jsonl", dpd_db_path=self.db_path, workers=1)
+        self.assertEqual((summary["words"], summary["found"]), (text_summary["words"], text_summary["found"]))
+
+        lines = (self.tmp / "out" / "sn" / "sn2.gloss.jsonl").read_text(encoding="utf-8").splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([(record["line"], record["text"]) for record in records], [(1, "buddha"), (2, ""), (3, "navo dhammo")])
+        expected = engine.gloss_line_record(3, "navo dhammo", self._gloss_entries("navo dhammo"))
+        self.assertEqual(records[2], expected)
+        self.assertEqual((records[1]["entries"], records[2]["words"], records[2]["found"]), ([], 2, 1))
+
+    def test_unreadable_file_is_reported_without_stopping_the_batch(self):
+        (self.corpus / "sn" / "roto.txt").write_bytes(b"\xff\xfe dhammo")
+        summary = self._run(workers=1)
+
+        self.assertEqual(summary["glossed"], 3)
+        self.assertEqual([Path(failure["input"]).name for failure in summary["failed"]], ["roto.txt"])
+        self.assertFalse((self.tmp / "out" / "sn" / "roto.gloss.txt").exists())
+
+
+class TestCoverageReport(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        # `nava` sin número de homónimo: la forma `nava` solo se resuelve por `lemma_1`.
+        entries = {**BASE_ENTRIES, "navo": ("nava", "adj", "masc nom sg", "nuevo", "")}
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", entries, BASE_ROOTS))
+        self.corpus = self.tmp / "corpus"
+        (self.corpus / "sub").mkdir(parents=True)
+        (self.corpus / "a.txt").write_text("dhammo buddhā nava kho kho.\n", encoding="utf-8")
+        (self.corpus / "sub" / "b.txt").write_text("saṅgho kho me\n", encoding="utf-8")
+        (self.corpus / "bad.txt").write_bytes(b"\xff\xfe")
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _report(self, db_path=None, workers=1):
+        paths = batch.resolve_batch_inputs([str(self.corpus / "**" / "*.txt")])
+        return coverage.coverage_report(paths, db_path or self.db_path, workers=workers)
+
+    def test_report_breaks_coverage_down_by_match_type(self):
+        report = self._report()
+
+        self.assertEqual((report["files"], report["words"], report["found"]), (3, 8, 4))
+        self.assertEqual(report["match_types"], {"exact": 3, "fallback": 0, "lemma": 1, "json": 0, "missing": 4})
+        self.assertEqual(report["failed"][0]["file"], "bad.txt")
+        self.assertEqual(report["top_missing"][:2], [{"form": "kho", "count": 3, "files": 2}, {"form": "me", "count": 1, "files": 1}])
+        self.assertEqual([item["file"] for item in report["per_file"]], ["a.txt", "sub/b.txt"])
+        self.assertEqual(report["per_file"][1]["coverage"], 33.33)
+
+        # Clasificar por forma distinta da lo mismo que clasificar la glosa token a token.
+        engine_ = engine.GlossEngine(self.db_path)
+        glossed = collections.Counter(
+            coverage.match_category(entry)
+            for path in ("a.txt", "sub/b.txt")
+            for entry in engine_.gloss((self.corpus / path).read_text(encoding="utf-8"))
+            if entry.get("part_of_speech") != "SEP"
+        )
+        engine_.close()
+        self.assertEqual({category: glossed[category] for category in coverage.MATCH_CATEGORIES}, report["match_types"])
+
+    def test_report_is_deterministic_and_comparable_across_releases(self):
+        report = self._report()
+        pooled = self._report(workers=2)
+        report.pop("run")
+        pooled.pop("run")
+        self.assertEqual(pooled, report)
+
+        new_db = build_synthetic_dpd_db(self.tmp / "new.db", {**BASE_ENTRIES, "kho": ("kho 1", "ind", "ind", "en efecto", "")})
+        comparison = coverage.compare_coverage_reports(report, self._report(str(new_db)))
+        self.assertEqual(comparison["coverage"]["delta"], 25.0)
+        self.assertEqual(comparison["missing_forms"], [{"form": "kho", "old": 3, "new": None}, {"form": "nava", "old": None, "new": 1}])
+        self.assertEqual(comparison["files"][0]["file"], "sub/b.txt")
+
+
+class TestGlossStore(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+        self.corpus = self.tmp / "corpus"
+        self.corpus.mkdir()
+        (self.corpus / "a.txt").write_text("dhammo buddhā kho.\n\nsaṅgho, dhammo!\n", encoding="utf-8")
+        (self.corpus / "b.txt").write_text("saṅgho, dhammo!\n\n\nbuddha me\n", encoding="utf-8")
+        self.store_path = self.tmp / "gloss_store.db"
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _build(self, db_path=None, **options):
+        paths = batch.resolve_batch_inputs([str(self.corpus / "*.txt")])
+        return gloss_store.build_gloss_store(paths, db_path or self.db_path, self.store_path, workers=1, **options)
+
+    def _live(self, text, db_path=None):
+        return lookup.process_pali_with_lookup_map(text, lookup.lookup_words_in_dpd(tuple(pali_text.tokenize_pali_text(text)), db_path or self.db_path))
+
+    def test_stored_paragraphs_match_live_gloss(self):
+        summary = self._build()
+        self.assertEqual((summary["paragraphs"], summary["unique"]), (4, 3))
+        self.assertTrue(self._build()["up_to_date"])
+
+        # Mayúsculas, espacios y saltos de línea no cambian el digest del párrafo.
+        text = "Dhammo   buddhā\nkho.\n\n  SAṄGHO, dhammo!"
+        with unittest.mock.patch.object(gloss_store, "lookup_words_in_dpd", side_effect=AssertionError("glosa en vivo")):
+            entries, stats = gloss_store.gloss_with_store(text, self.db_path, store_path=self.store_path)
+        self.assertEqual(stats, {"paragraphs": 2, "stored": 2})
+        self.assertEqual(entries, self._live(text))
+
+        # Un párrafo que no está en el almacén se glosa en vivo y se intercala en su sitio.
+        text = "buddha me\n\nnamo dhammo\n\nsaṅgho, dhammo!"
+        entries, stats = gloss_store.gloss_with_store(text, self.db_path, store_path=self.store_path)
+        self.assertEqual(stats, {"paragraphs": 3, "stored": 2})
+        self.assertEqual(entries, self._live(text))
+
+    def test_store_is_ignored_for_another_dpd_db_until_rebuilt(self):
+        self._build()
+        new_db = str(build_synthetic_dpd_db(self.tmp / "new.db", {**BASE_ENTRIES, "kho": ("kho 1", "ind", "ind", "en efecto", "")}))
+        text = "dhammo buddhā kho."
+        entries, stats = gloss_store.gloss_with_store(text, new_db, store_path=self.store_path)
+        self.assertEqual(stats["stored"], 0)
+        self.assertEqual(entries[2]["meaning"], "en efecto")
+
+        self.assertFalse(self._build(new_db)["up_to_date"])
+        self.assertEqual(gloss_store.gloss_store_meta(self.store_path)["dpd_db_version"], lookup.dpd_db_version_id(new_db))
+        entries, stats = gloss_store.gloss_with_store(text, new_db, store_path=self.store_path)
+        self.assertEqual(stats["stored"], 1)
+        self.assertEqual(entries, self._live(text, new_db))
+        self.assertEqual(gloss_store.gloss_with_store(text, self.db_path, store_path=self.store_path)[1]["stored"], 0)
+
+    def test_store_is_ignored_for_another_fallback_dictionary_until_rebuilt(self):
+        dict_path = self.tmp / "dpd_dictionary.json"
+        self.addCleanup(pali_dictionary.load_dictionary.clear)
+        self.addCleanup(pali_dictionary.ensure_dpd_json_available.clear)
+        self.addCleanup(pali_dictionary._LOADED_DICTIONARY.update, dict(pali_dictionary._LOADED_DICTIONARY))
+        dict_path_patch = unittest.mock.patch.object(pali_dictionary, "DPD_JSON_PATH", dict_path)
+        dict_path_patch.start()
+        self.addCleanup(dict_path_patch.stop)
+        pali_dictionary.load_dictionary.clear()
+        pali_dictionary.ensure_dpd_json_available.clear()
+        self._build()
+        self.assertEqual(gloss_store.gloss_store_meta(self.store_path)["fallback_dictionary_version"], "none")
+
+        dict_path.write_text(json.dumps({"kho": {"meaning": "en verdad"}}), encoding="utf-8")
+        fallback = pali_dictionary.load_dictionary()
+        text = "dhammo buddhā kho."
+        live = lookup.process_pali_with_lookup_map(
+            text, lookup.lookup_words_in_dpd(tuple(pali_text.tokenize_pali_text(text)), self.db_path), fallback_dictionary=fallback
+        )
+        entries, stats = gloss_store.gloss_with_store(text, self.db_path, fallback_dictionary=fallback, store_path=self.store_path)
+        self.assertEqual((stats["stored"], entries), (0, live))
+        self.assertEqual(entries[2]["meaning"], "en verdad")
+
+        pali_dictionary.load_dictionary.clear()
+        self.assertFalse(self._build()["up_to_date"])
+        self.assertEqual(
+            gloss_store.gloss_store_meta(self.store_path)["fallback_dictionary_version"], pali_dictionary.dpd_json_version_id(dict_path)
+        )
+        self.assertTrue(self._build()["up_to_date"])
+        entries, stats = gloss_store.gloss_with_store(text, self.db_path, fallback_dictionary=fallback, store_path=self.store_path)
+        self.assertEqual((stats["stored"], entries), (1, live))
+        self.assertEqual(gloss_store.gloss_with_store(text, self.db_path, store_path=self.store_path)[1]["stored"], 0)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_key_follows_normalized_tokens_and_dpd_db_version(self):
+        key = result_cache.result_cache_key("dhammo buddhā, saṅgho", self.db_path)
+        self.assertEqual(result_cache.result_cache_key("  Dhammo\nBUDDHĀ ,\n\nsaṅgho ", self.db_path), key)
+        self.assertNotEqual(result_cache.result_cache_key("dhammo buddhā saṅgho", self.db_path), key)
+        new_db = str(build_synthetic_dpd_db(self.tmp / "new.db", BASE_ENTRIES, BASE_ROOTS))
+        self.assertNotEqual(result_cache.result_cache_key("dhammo buddhā, saṅgho", new_db), key)
+        self.assertIsNone(result_cache.result_cache_key(" 12 ", self.db_path))
+
+    def _load_fallback_dictionary(self, content):
+        dict_path = self.tmp / "dpd_dictionary.json"
+        temp_path = self.tmp / "dpd_dictionary.json.tmp"
+        temp_path.write_text(json.dumps(content), encoding="utf-8")
+        temp_path.replace(dict_path)  # inodo nuevo, como al reaprovisionar
+        pali_dictionary.load_dictionary.clear()
+        with unittest.mock.patch.object(pali_dictionary, "DPD_JSON_PATH", dict_path):
+            return pali_dictionary.load_dictionary()
+
+    def test_key_follows_the_loaded_fallback_dictionary_version(self):
+        self.addCleanup(pali_dictionary.load_dictionary.clear)
+        self.addCleanup(pali_dictionary._LOADED_DICTIONARY.update, dict(pali_dictionary._LOADED_DICTIONARY))
+        text = "dhammo xyzzo"
+        old = self._load_fallback_dictionary({"xyzzo": {"meaning": "antiguo"}})
+        old_version = pali_dictionary.fallback_dictionary_version(old)
+        self.assertEqual(old_version, pali_dictionary.dpd_json_version_id(self.tmp / "dpd_dictionary.json"))
+        key = result_cache.result_cache_key(text, self.db_path, old_version)
+        self.assertNotEqual(result_cache.result_cache_key(text, self.db_path), key)
+        self.assertEqual(pali_dictionary.fallback_dictionary_version({}), "none")
+
+        cache = result_cache.GlossResultCache(max_bytes=1_000_000)
+        # La clave no recorre el diccionario: solo usa la versión registrada al cargarlo.
+        class _Unlistable(dict):
+            def __iter__(self):
+                raise AssertionError("diccionario recorrido")
+
+            keys = items = values = __iter__
+
+        unlistable = _Unlistable(old)
+        entries, _ = result_cache.cached_gloss(text, self.db_path, fallback_dictionary=unlistable, cache=cache)
+        self.assertEqual(result_cache.cached_gloss(text, self.db_path, fallback_dictionary=unlistable, cache=cache)[1]["cache"], "hit")
+        self.assertEqual(entries[1]["meaning"], "antiguo")
+
+        new = self._load_fallback_dictionary({"xyzzo": {"meaning": "nuevo"}})
+        self.assertNotEqual(pali_dictionary.fallback_dictionary_version(new), old_version)
+        entries, stats = result_cache.cached_gloss(text, self.db_path, fallback_dictionary=new, cache=cache)
+        self.assertEqual((stats["cache"], entries[1]["meaning"]), ("miss", "nuevo"))
+
+        # Un diccionario sin versión conocida no se cachea.
+        pali_dictionary._LOADED_DICTIONARY["version"] = ""
+        entries, stats = result_cache.cached_gloss(text, self.db_path, fallback_dictionary={"xyzzo": {"meaning": "otro"}}, cache=cache)
+        self.assertEqual((stats["cache"], entries[1]["meaning"]), ("miss", "otro"))
+        self.assertEqual(cache.cache_info()["entries"], 2)
+
+    def test_cached_gloss_is_shared_and_returns_copies(self):
+        cache = result_cache.GlossResultCache(max_bytes=1_000_000)
+        entries, stats = result_cache.cached_gloss("dhammo buddhā", self.db_path, cache=cache)
+        self.assertEqual(stats["cache"], "miss")
+        entries[0]["meaning"] = "modificado"
+
+        with unittest.mock.patch.object(result_cache, "gloss_with_store", side_effect=AssertionError("glosa en vivo")):
+            cached, stats = result_cache.cached_gloss("Dhammo\nbuddhā", self.db_path, cache=cache)
+        self.assertEqual(stats["cache"], "hit")
+        self.assertEqual(cached[0]["meaning"], "doctrina")
+        self.assertEqual(cached, lookup.process_pali_with_lookup_map("dhammo buddhā", lookup.lookup_words_in_dpd(("dhammo", "buddhā"), self.db_path)))
+        info = cache.cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["hit_rate"]), (1, 1, 0.5))
+
+    def test_memory_and_disk_evict_by_size(self):
+        disk_path = self.tmp / "results.db"
+        blob_size = len(result_cache._encode_entries([{"word": "x" * 10}]))
+        cache = result_cache.GlossResultCache(max_bytes=3 * (16 + blob_size), disk_path=disk_path, max_disk_bytes=4 * blob_size)
+        keys = [bytes([index]) * 16 for index in range(6)]
+        for index, key in enumerate(keys):
+            cache.put(key, [{"word": str(index) * 10}])
+            if index == 1:
+                self.assertIsNotNone(cache.get(keys[0]))  # keys[0] pasa a ser el más reciente
+        info = cache.cache_info()
+        self.assertEqual((info["entries"], info["evictions"]), (3, 3))
+        self.assertLessEqual(info["bytes"], info["max_bytes"])
+        self.assertLessEqual(info["disk_bytes"], 4 * blob_size)
+        self.assertIsNone(cache.get(keys[1]))
+
+        # Otro proceso (u otro arranque) con el mismo archivo encuentra los resultados en disco.
+        other = result_cache.GlossResultCache(max_bytes=1_000_000, disk_path=disk_path)
+        self.assertEqual(other.get(keys[5]), [{"word": "5" * 10}])
+        self.assertEqual(other.cache_info()["disk_hits"], 1)
+        self.assertIsNone(other.get(keys[1]))
+
+
+class TestHumanizePartOfSpeech(unittest.TestCase):
+
+    def test_abbreviations_are_replaced_as_whole_words(self):
+        self.assertEqual(formatting.humanize_part_of_speech("adjective; NOUN"), "adjetivo; sustantivo")
+        self.assertEqual(formatting.humanize_part_of_speech("ind, adj"), "indeclinable, adjetivo")
+        self.assertEqual(formatting.humanize_part_of_speech("masc"), "masc")
+        self.assertEqual(formatting.humanize_part_of_speech("---"), "")
+
+
+# ---------------------------------------------------------------------------
+# Motor compartido y servicio HTTP
+# ---------------------------------------------------------------------------
+
+class TestGlossEngine(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+        self.engine = engine.GlossEngine(self.db_path)
+
+    def tearDown(self):
+        self.engine.close()
+        self._tmp_dir.cleanup()
+
+    def test_each_form_is_queried_once_including_missing_ones(self):
+        with unittest.mock.patch.object(engine, "_query_dpd_lookup", wraps=lookup._query_dpd_lookup) as query:
+            self.engine.lookup(["dhammo", "navo"])
+            result = self.engine.lookup(["dhammo", "navo", "buddha"])
+
+        self.assertEqual([call.args[0] for call in query.call_args_list], [("dhammo", "navo"), ("buddha",)])
+        self.assertEqual(sorted(result), ["buddha", "dhammo"])
+        self.assertEqual(self.engine.cache_info()["pooled_connections"], 1)
+
+    def test_gloss_many_matches_lookup_module_with_one_query(self):
+        texts = ["dhammo buddha.", "saṅgho navo"]
+        with unittest.mock.patch.object(engine, "_query_dpd_lookup", wraps=lookup._query_dpd_lookup) as query:
+            results = self.engine.gloss_many(texts)
+
+        self.assertEqual(query.call_count, 1)
+        for text, entries in zip(texts, results):
+            lookup_map = lookup._query_dpd_lookup(tuple(pali_text.tokenize_pali_text(text)), self.db_path)
+            self.assertEqual(entries, lookup.process_pali_with_lookup_map(text, lookup_map))
+
+    def test_replaced_db_file_invalidates_cache(self):
+        self.assertNotIn("navo", self.engine.lookup(["navo"]))
+        build_synthetic_dpd_db(self.db_path, dict(BASE_ENTRIES, navo=("nava 1", "adj", "masc nom sg", "nuevo", "")))
+
+        self.assertIn("navo", self.engine.lookup(["navo"]))
+
+
+class TestGlossService(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+        self.service = service.create_gloss_service(self.db_path, port=0, max_concurrency=2, queue_timeout=0.05)
+        self._thread = threading.Thread(target=self.service.serve_forever, daemon=True)
+        self._thread.start()
+        self.port = self.service.server_address[1]
+
+    def tearDown(self):
+        self.service.shutdown()
+        self.service.server_close()
+        self._thread.join(timeout=5)
+        self._tmp_dir.cleanup()
+
+    def _request(self, method, path, payload=None, raw_body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        try:
+            body = raw_body if raw_body is not None else (json.dumps(payload).encode("utf-8") if payload is not None else None)
+            conn.request(method, path, body=body)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def test_gloss_endpoint_matches_process_pali_with_lookup_map(self):
+        text = "dhammo buddha, navo."
+        status, payload = self._request("POST", "/gloss", {"text": text, "format": "compact"})
+
+        lookup_map = lookup._query_dpd_lookup(tuple(pali_text.tokenize_pali_text(text)), self.db_path)
+        expected = lookup.process_pali_with_lookup_map(text, lookup_map)
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["entries"], expected)
+        self.assertEqual((payload["words"], payload["found"]), (3, 2))
+        self.assertEqual(payload["gloss"], formatting.generate_compact_gloss(expected))
+
+    def test_batched_texts_lookup_and_tokenize(self):
+        status, payload = self._request("POST", "/gloss", {"texts": ["dhammo", "saṅgho navo"]})
+        self.assertEqual(status, 200)
+        self.assertEqual([result["found"] for result in payload["results"]], [1, 1])
+
+        status, payload = self._request("POST", "/lookup", {"words": ["Dhammo", "navo"]})
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["entries"]["Dhammo"]["meaning"], "doctrina")
+        self.assertIsNone(payload["entries"]["navo"])
+
+        status, payload = self._request("POST", "/tokenize", {"text": "dhammo."})
+        self.assertEqual([token["kind"] for token in payload["tokens"]], ["word", "separator"])
+
+    def test_health_reports_cache_and_db_stats(self):
+        self._request("POST", "/gloss", {"text": "dhammo"})
+        with unittest.mock.patch.object(service, "get_dpd_db_stats", return_value={"lookup_entries": 3}) as stats:
+            status, payload = self._request("GET", "/health")
+
+        stats.assert_called_once_with(self.db_path)
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["db_stats"], {"lookup_entries": 3})
+        self.assertEqual(payload["cache"]["forms"], 1)
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self._request("POST", "/gloss", raw_body=b"{no es json")[0], 400)
+        self.assertEqual(self._request("POST", "/gloss", {"text": 3})[0], 400)
+        self.assertEqual(self._request("POST", "/gloss", {"text": "x", "format": "pdf"})[0], 400)
+        self.assertEqual(self._request("POST", "/lookup", {"words": "dhammo"})[0], 400)
+        self.assertEqual(self._request("POST", "/otro", {})[0], 404)
+
+    def _request_with_length(self, path, content_length):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        try:
+            conn.putrequest("POST", path)
+            conn.putheader("Content-Length", content_length)
+            conn.endheaders()
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def test_malformed_or_negative_content_length_answers_400(self):
+        for path in ("/gloss", "/otro"):
+            for content_length in ("-1", "abc", "+5", "1_0"):
+                with self.subTest(path=path, content_length=content_length):
+                    status, payload = self._request_with_length(path, content_length)
+                    self.assertEqual(status, 400)
+                    self.assertIn("Content-Length", payload["error"])
+
+    def test_oversized_content_length_answers_413(self):
+        for path in ("/gloss", "/otro"):
+            with self.subTest(path=path):
+                status, _ = self._request_with_length(path, str(service.MAX_REQUEST_BYTES + 1))
+                self.assertEqual(status, 413)
+
+    def test_service_follows_newly_installed_db(self):
+        changed = dict(BASE_ENTRIES, dhammo=("dhamma 1", "masc", "masc nom sg", "verdad", "√dhar"))
+        new_db = str(build_synthetic_dpd_db(self.tmp / "nueva.db", changed, BASE_ROOTS))
+        resolved = [self.db_path]
+        self.service.resolve_dpd_db_path = lambda: resolved[0]
+        self.assertEqual(self._request("POST", "/lookup", {"words": ["dhammo"]})[1]["entries"]["dhammo"]["meaning"], "doctrina")
+
+        resolved[0] = new_db
+        status, payload = self._request("POST", "/lookup", {"words": ["dhammo"]})
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["entries"]["dhammo"]["meaning"], "verdad")
+        self.assertEqual(self._request("GET", "/health")[1]["dpd_db_path"], new_db)
+        # Sin base resuelta se sigue con la última.
+        resolved[0] = ""
+        self.assertEqual(self._request("POST", "/lookup", {"words": ["dhammo"]})[1]["entries"]["dhammo"]["meaning"], "verdad")
+
+    def test_saturated_service_answers_503(self):
+        for _ in range(self.service.max_concurrency):
+            self.service.slots.acquire()
+        try:
+            status, payload = self._request("POST", "/gloss", {"text": "dhammo"})
+        finally:
+            for _ in range(self.service.max_concurrency):
+                self.service.slots.release()
+
+        self.assertEqual(status, 503)
+        self.assertEqual(self._request("POST", "/gloss", {"text": "dhammo"})[0], 200)
+
+
+# ---------------------------------------------------------------------------
+# Daemon sobre socket Unix
+# ---------------------------------------------------------------------------
+
+class TestGlossDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+        self.socket_path = str(self.tmp / "daemon.sock")
+        self._threads = []
+
+    def tearDown(self):
+        gloss_daemon.stop_daemon(self.socket_path)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._tmp_dir.cleanup()
+
+    def _serve(self, idle_seconds=60):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(gloss_daemon.serve_daemon(self.socket_path, idle_seconds)), daemon=True
+        )
+        thread.start()
+        self._threads.append(thread)
+        deadline = time.monotonic() + 5
+        while not gloss_daemon.daemon_request({"op": "ping"}, self.socket_path):
+            self.assertLess(time.monotonic(), deadline, "el daemon no arrancó")
+            time.sleep(0.02)
+        return thread, results
+
+    def test_gloss_reply_matches_in_process_output(self):
+        self._serve()
+        text = "dhammo buddha, navo."
+        reply = gloss_daemon.daemon_request(
+            {"op": "gloss", "text": text, "format": "compact", "db": self.db_path}, self.socket_path
+        )
+
+        lookup_map = lookup._query_dpd_lookup(tuple(pali_text.tokenize_pali_text(text)), self.db_path)
+        self.assertTrue(reply["ok"])
+        self.assertEqual(reply["output"], formatting.generate_compact_gloss(lookup.process_pali_with_lookup_map(text, lookup_map)))
+        self.assertAlmostEqual(reply["coverage"], 66.67)
+        pong = gloss_daemon.daemon_request({"op": "ping"}, self.socket_path)
+        self.assertEqual(pong["engines"][self.db_path]["forms"], 3)
+
+    def test_invalid_requests_get_an_error_reply(self):
+        self._serve()
+        self.assertFalse(gloss_daemon.daemon_request({"op": "otra"}, self.socket_path)["ok"])
+        self.assertFalse(gloss_daemon.daemon_request({"op": "gloss", "text": 1}, self.socket_path)["ok"])
+
+    def test_no_daemon_means_no_reply(self):
+        self.assertIsNone(gloss_daemon.daemon_request({"op": "ping"}, self.socket_path))
+        Path(self.socket_path).touch()
+        self.assertIsNone(gloss_daemon.daemon_request({"op": "ping"}, self.socket_path))
+
+    def test_second_daemon_defers_and_orphan_socket_is_replaced(self):
+        # Un socket huérfano (daemon muerto) no impide arrancar.
+        orphan = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        orphan.bind(self.socket_path)
+        orphan.close()
+        self._serve()
+
+        self.assertFalse(gloss_daemon.serve_daemon(self.socket_path, 60))
+        self.assertTrue(gloss_daemon.daemon_request({"op": "ping"}, self.socket_path)["ok"])
+
+    def test_stop_and_idle_timeout_remove_the_socket(self):
+        thread, results = self._serve()
+        self.assertTrue(gloss_daemon.stop_daemon(self.socket_path))
+        thread.join(timeout=5)
+        self.assertEqual(results, [True])
+        self.assertFalse(Path(self.socket_path).exists())
+
+        thread, _ = self._serve(idle_seconds=0.2)
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(Path(self.socket_path).exists())
+
+    def test_socket_is_created_private(self):
+        # Sin el chmod posterior: el socket ya nace sin permisos para otros.
+        with unittest.mock.patch.object(gloss_daemon.os, "chmod"):
+            self._serve()
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o077, 0)
+
+    def test_tmp_fallback_directory_must_be_private(self):
+        private_dir = self.tmp / "pali-lem-uid"
+        self.socket_path = str(private_dir / "daemon.sock")
+        with unittest.mock.patch.object(gloss_daemon, "_tmp_socket_dir", return_value=private_dir):
+            # Otro usuario (o un enlace) se adelantó con el nombre predecible.
+            os.symlink(self.tmp, private_dir)
+            self.assertIsNone(gloss_daemon.daemon_request({"op": "ping"}, self.socket_path))
+            with self.assertRaises(PermissionError):
+                gloss_daemon.serve_daemon(self.socket_path, 60)
+            private_dir.unlink()
+            private_dir.mkdir(mode=0o755)
+            os.chmod(private_dir, 0o755)
+            with self.assertRaises(PermissionError):
+                gloss_daemon.serve_daemon(self.socket_path, 60)
+            private_dir.rmdir()
+
+            # Si no existe, el daemon lo crea con 0700 y la CLI se conecta.
+            self._serve()
+            self.assertEqual(os.stat(private_dir).st_mode & 0o777, 0o700)
+            self.assertTrue(gloss_daemon.daemon_request({"op": "ping"}, self.socket_path)["ok"])
+            gloss_daemon.stop_daemon(self.socket_path)
+            self._threads[-1].join(timeout=5)
+
+    def test_default_engine_follows_installed_db(self):
+        changed = dict(BASE_ENTRIES, dhammo=("dhamma 1", "masc", "masc nom sg", "verdad", "√dhar"))
+        new_db = str(build_synthetic_dpd_db(self.tmp / "nueva.db", changed, BASE_ROOTS))
+        resolved = [self.db_path]
+        with unittest.mock.patch.object(dpd_db, "follow_dpd_db_path", side_effect=lambda: resolved[0]):
+            self._serve()
+            request = {"op": "gloss", "text": "dhammo", "format": "rich"}
+            self.assertIn("doctrina", gloss_daemon.daemon_request(request, self.socket_path)["output"])
+            resolved[0] = new_db
+            reply = gloss_daemon.daemon_request(request, self.socket_path)
+        self.assertIn("verdad", reply["output"])
+        self.assertEqual(reply["source"], f"dpd.db ({new_db})")
+        self.assertEqual(list(gloss_daemon.daemon_request({"op": "ping"}, self.socket_path)["engines"]), [new_db])
+
+
+class TestLinesMode(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _start(self, *extra):
+        return subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve().parent / "app_cli.py"), "--lines", "--db", self.db_path, *extra],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+
+    def test_each_line_is_emitted_before_stdin_closes(self):
+        process = self._start("--format", "jsonl")
+        try:
+            records = []
+            for text in ("dhammo buddha", "", "navo, saṅgho."):
+                process.stdin.write(text + "\n")
+                process.stdin.flush()
+                # Sin vaciar la salida por línea esta lectura se bloquearía hasta EOF.
+                records.append(json.loads(process.stdout.readline()))
+            process.stdin.close()
+            self.assertEqual(process.stdout.read(), "")
+            self.assertEqual(process.wait(timeout=10), 0)
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.stderr.close()
+
+        self.assertEqual([record["line"] for record in records], [1, 2, 3])
+        self.assertEqual(records[0]["text"], "dhammo buddha")
+        self.assertEqual((records[0]["words"], records[0]["found"]), (2, 2))
+        self.assertEqual(records[1]["entries"], [])
+        self.assertEqual((records[2]["words"], records[2]["found"]), (2, 1))
+
+    def test_text_format_separates_lines_and_keeps_the_cache_warm(self):
+        process = self._start("--format", "compact", "--debug")
+        stdout, stderr = process.communicate("dhammo\ndhammo buddha\n", timeout=30)
+
+        expected = [
+            formatting.generate_compact_gloss(
+                lookup.process_pali_with_lookup_map(
+                    text, lookup._query_dpd_lookup(tuple(pali_text.tokenize_pali_text(text)), self.db_path)
+                )
+            )
+            for text in ("dhammo", "dhammo buddha")
+        ]
+        self.assertEqual(stdout, "".join(block + "\n\n" for block in expected))
+        # `dhammo` se consulta en la primera línea y sale de la caché en la segunda.
+        self.assertIn("cache_hits=1 db_queries=2", stderr)
+
+    def test_jsonl_requires_lines_vocabulary_or_inputs(self):
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve().parent / "app_cli.py"), "--text", "dhammo", "--format", "jsonl"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("--lines", result.stderr)
+
+
+class TestConcordance(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", BASE_ENTRIES, BASE_ROOTS))
+        self.index_path = self.tmp / "concordance.db"
+        self.corpus = self.tmp / "corpus"
+        self.corpus.mkdir()
+        (self.corpus / "a.txt").write_text("Evaṃ me sutaṃ. Dhammo buddha,\nsaṅgho dhammo.\n", encoding="utf-8")
+        (self.corpus / "b.txt").write_text("buddha saṅgho navo\n", encoding="utf-8")
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _update(self, db_path=None):
+        engine_ = engine.GlossEngine(self.db_path if db_path is None else db_path)
+        try:
+            return concordance.update_concordance(sorted(self.corpus.glob("*.txt")), engine_, index_path=self.index_path)
+        finally:
+            engine_.close()
+
+    def test_tokenizer_offsets_point_into_the_nfc_text(self):
+        text = "Evam\u0323 me, dhammo"
+        tokens = pali_text.tokenize_pali_with_separators(text, with_offsets=True)
+        nfc = unicodedata.normalize("NFC", text)
+        self.assertEqual([nfc[token["start"]:token["end"]] for token in tokens], ["Evaṃ", "me", ",", "dhammo"])
+        self.assertNotIn("start", pali_text.tokenize_pali_with_separators(text)[0])
+
+    def test_lemma_and_form_queries_return_kwic_hits(self):
+        summary = self._update()
+        self.assertEqual((summary["added"], summary["words"]), (2, 10))
+
+        by_lemma = concordance.concordance_query("dhamma 1", index_path=self.index_path, width=10)
+        self.assertEqual((by_lemma["term"], by_lemma["total"], by_lemma["forms"]), ("dhamma", 2, {"dhammo": 2}))
+        first = by_lemma["hits"][0]
+        self.assertEqual((first["match"], first["left"], first["right"]), ("Dhammo", "me sutaṃ. ", " buddha, s"))
+        self.assertTrue(first["document"].endswith("a.txt"))
+        self.assertEqual(by_lemma["hits"][1]["left"], "a, saṅgho ")
+
+        by_form = concordance.concordance_query("Navo", mode="form", index_path=self.index_path)
+        self.assertEqual([hit["form"] for hit in by_form["hits"]], ["navo"])
+        self.assertEqual(concordance.concordance_query("navo", index_path=self.index_path)["total"], 0)
+        paged = concordance.concordance_query("saṅgha", limit=1, offset=1, index_path=self.index_path)
+        self.assertEqual((paged["total"], len(paged["hits"])), (2, 1))
+        self.assertTrue(paged["hits"][0]["document"].endswith("b.txt"))
+        self.assertEqual(concordance.concordance_stats(self.index_path)["lemmas"], 3)
+
+    def test_update_is_incremental_and_replaces_changed_documents(self):
+        self._update()
+        self.assertEqual(self._update()["unchanged"], 2)
+
+        changed = self.corpus / "b.txt"
+        changed.write_text("dhammo dhammo dhammo\n", encoding="utf-8")
+        os.utime(changed, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        summary = self._update()
+        self.assertEqual((summary["updated"], summary["unchanged"]), (1, 1))
+        self.assertEqual(concordance.concordance_query("dhamma", index_path=self.index_path)["total"], 5)
+        self.assertEqual(concordance.concordance_query("buddha", index_path=self.index_path)["total"], 1)
+
+    def test_new_dpd_db_re_resolves_lemmas(self):
+        self._update()
+        new_db = build_synthetic_dpd_db(self.tmp / "new.db", {**BASE_ENTRIES, "navo": ("nava 1", "adj", "masc nom sg", "nuevo", "")})
+        self.assertEqual(self._update(str(new_db))["unchanged"], 2)
+        self.assertEqual(concordance.concordance_query("nava", index_path=self.index_path)["total"], 1)
+
+    def test_missing_index_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            concordance.concordance_query("dhamma", index_path=self.tmp / "no.db")
+
+
+class TestVocabulary(unittest.TestCase):
+
+    TEXT = "Dhammo buddha, dhammaṃ navo. Dhammo saṅgho buddha dhammo."
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        entries = {**BASE_ENTRIES, "dhammaṃ": ("dhamma 1", "masc", "masc acc sg", "doctrina", "√dhar")}
+        self.db_path = str(build_synthetic_dpd_db(self.tmp / "dpd.db", entries, BASE_ROOTS))
+        self.engine = engine.GlossEngine(self.db_path)
+
+    def tearDown(self):
+        self.engine.close()
+        self._tmp_dir.cleanup()
+
+    def test_count_forms_matches_the_tokenizer(self):
+        texts = ["Evaṃ me sutaṃ... Dhammo—buddha, dhammo12 saṁgho", "Saṃgho é_x"]
+        expected = collections.Counter(word for text in texts for word in pali_text.tokenize_pali_text(text))
+        self.assertEqual(vocabulary.count_forms(texts), expected)
+
+    def test_forms_are_aggregated_by_lemma_and_ranked_by_frequency(self):
+        result = vocabulary.vocabulary_from_texts(self.TEXT.splitlines(), self.engine)
+
+        self.assertEqual([(entry["word"], entry["count"]) for entry in result], [("dhamma", 4), ("buddha", 2), ("navo", 1), ("saṅgha", 1)])
+        dhamma = result[0]
+        self.assertEqual(dhamma["forms"], [["dhammo", 3], ["dhammaṃ", 1]])
+        self.assertEqual((dhamma["meaning"], dhamma["morphology"]), ("doctrina", "×4 · dhammo 3, dhammaṃ 1"))
+        self.assertFalse(result[2]["found"])
+        # Los formatos de glosa de siempre sirven para exportar el vocabulario.
+        self.assertEqual(
+            formatting.generate_compact_gloss(result[:1]).splitlines()[0], "dhamma (masc) (×4 · dhammo 3, dhammaṃ 1): doctrina"
+        )
+
+    def test_filters_and_gloss_entries_give_the_same_vocabulary(self):
+        filtered = vocabulary.vocabulary_from_texts([self.TEXT], self.engine, parts_of_speech=["MASC"], min_count=2)
+        self.assertEqual([entry["word"] for entry in filtered], ["dhamma", "buddha"])
+        self.assertEqual(len(vocabulary.vocabulary_from_texts([self.TEXT], self.engine, limit=1)), 1)
+
+        gloss_entries = self.engine.gloss(self.TEXT)
+        from_entries = vocabulary.vocabulary_from_gloss_entries(gloss_entries)
+        self.assertEqual(from_entries, vocabulary.vocabulary_from_texts([self.TEXT], self.engine))
+        self.assertEqual(vocabulary.vocabulary_parts_of_speech(from_entries), ["masc"])
+
+    def test_pos_filter_matches_any_part_of_a_compound_pos(self):
+        form_counts = {"sabba": 3, "dhammo": 2, "eva": 1}
+        form_entries = {
+            "sabba": {"word": "sabba", "lemma": "sabba", "part_of_speech": "Adj; PRON"},
+            "dhammo": {"word": "dhammo", "lemma": "dhamma 1", "part_of_speech": "masc"},
+            "eva": {"word": "eva", "lemma": "eva", "part_of_speech": "ind emph"},
+        }
+
+        def _lemmas(*parts_of_speech):
+            return [entry["word"] for entry in vocabulary.aggregate_vocabulary(form_counts, form_entries, parts_of_speech=parts_of_speech)]
+
+        self.assertEqual(_lemmas("pron"), ["sabba"])
+        self.assertEqual(_lemmas("ADJ", "masc"), ["sabba", "dhamma"])
+        self.assertEqual(_lemmas("emph"), ["eva"])
+        self.assertEqual(_lemmas("adj; pron"), ["sabba"])
+        self.assertEqual(_lemmas("fem"), [])
+
+        # La UI filtra el vocabulario ya agregado con el mismo criterio y ofrece las partes como opciones.
+        full = vocabulary.aggregate_vocabulary(form_counts, form_entries)
+        self.assertEqual(vocabulary.vocabulary_parts_of_speech([dict(entry, found=True) for entry in full]), ["adj", "pron", "masc", "ind", "emph"])
+        for selected in (["pron"], ["ADJ", "masc"], ["emph"], []):
+            self.assertEqual(
+                [entry["word"] for entry in vocabulary.filter_by_part_of_speech(full, selected)], _lemmas(*selected)
+            )
+
+    def test_cli_streams_a_corpus_into_jsonl(self):
+        corpus = self.tmp / "corpus"
+        corpus.mkdir()
+        (corpus / "a.txt").write_text("dhammo buddha\ndhammo\n", encoding="utf-8")
+        (corpus / "b.txt").write_text("dhammaṃ saṅgho\n", encoding="utf-8")
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve().parent / "app_cli.py"), "--vocabulary", "--inputs", str(corpus / "*.txt"),
+             "--db", self.db_path, "--format", "jsonl", "--top", "2"],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            check=True,
+        )
+        rows = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual([(row["lemma"], row["count"]) for row in rows], [("dhamma", 3), ("buddha", 1)])
+
+
+# ---------------------------------------------------------------------------
+# Núcleo sin Streamlit
+# ---------------------------------------------------------------------------
+
+class TestCoreImports(unittest.TestCase):
+
+    def test_cli_modules_do_not_import_streamlit_or_heavy_stdlib(self):
+        probe = (
+            "import sys\n"
+            "import pali_lem.dictionary, pali_lem.dpd_db, pali_lem.formatting, pali_lem.lookup, pali_lem.text\n"
+            "heavy = ('streamlit', 'tarfile', 'urllib.request', 'http.client', 'zoneinfo', 'gzip')\n"
+            "print(','.join(name for name in heavy if name in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
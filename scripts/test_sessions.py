@@ -1,9 +1,10 @@
-"""Tests sobre las funciones de sesión de streamlit_app.py.
+"""Tests sobre las sesiones guardadas: store y archivos en `pali_lem`, estado de UI en streamlit_app.py.
 
 Ejecutar:
     python scripts/test_sessions.py
 """
 
+import io
 import json
 import sys
 import os
@@ -18,6 +19,15 @@ os.environ.setdefault("PALI_LEM_NO_UI", "1")
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import streamlit_app as app  # noqa: E402
+from pali_lem import formatting, lookup, sessions as pali_sessions, text as pali_text  # noqa: E402
+
+
+def _make_store(data=None, namespace=None):
+    """SessionStore en memoria (sin disco) precargado con `data`."""
+    store = pali_sessions.SessionStore()
+    if data:
+        store.replace(namespace or pali_sessions.DEFAULT_SESSION_NAMESPACE, data)
+    return store
 
 
 # ---------------------------------------------------------------------------
@@ -27,30 +37,30 @@ import streamlit_app as app  # noqa: E402
 class TestLoadSavedSessions(unittest.TestCase):
 
     def test_returns_empty_dict_when_store_empty(self):
-        with patch.object(app, '_get_sessions_store', return_value={}):
+        with patch.object(app, '_get_sessions_store', return_value=_make_store()):
             result = app.load_saved_sessions()
         self.assertEqual(result, {})
 
     def test_loads_from_store(self):
         data = {"sesión1": {"pali_text": "namo tassa", "dict_name": "dpd"}}
-        with patch.object(app, '_get_sessions_store', return_value=data):
+        with patch.object(app, '_get_sessions_store', return_value=_make_store(data)):
             result = app.load_saved_sessions()
         self.assertEqual(result, data)
 
     def test_returns_copy_not_reference(self):
         """load_saved_sessions() debe devolver una copia, no el store mismo."""
-        data = {"s1": {"pali_text": "namo"}}
-        with patch.object(app, '_get_sessions_store', return_value=data):
+        store = _make_store({"s1": {"pali_text": "namo"}})
+        with patch.object(app, '_get_sessions_store', return_value=store):
             result = app.load_saved_sessions()
-        result["extra"] = {}
-        self.assertNotIn("extra", data)
+            result["extra"] = {}
+            self.assertNotIn("extra", app.load_saved_sessions())
 
     def test_loads_multiple_sessions(self):
         data = {
             "A": {"pali_text": "namo", "dict_name": "dpd"},
             "B": {"pali_text": "tassa", "dict_name": "local"},
         }
-        with patch.object(app, '_get_sessions_store', return_value=data):
+        with patch.object(app, '_get_sessions_store', return_value=_make_store(data)):
             result = app.load_saved_sessions()
         self.assertEqual(len(result), 2)
         self.assertIn("A", result)
@@ -64,47 +74,271 @@ class TestLoadSavedSessions(unittest.TestCase):
 class TestPersistSavedSessions(unittest.TestCase):
 
     def test_updates_store(self):
-        store = {}
+        store = _make_store()
         data = {"mi sesión": {"pali_text": "namo", "dict_name": "dpd"}}
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file'):
+        with patch.object(app, '_get_sessions_store', return_value=store):
             app.persist_saved_sessions(data)
-        self.assertEqual(store, data)
+        self.assertEqual(store.snapshot(pali_sessions.DEFAULT_SESSION_NAMESPACE)[1], data)
 
     def test_replaces_existing_store(self):
-        store = {"vieja": {"pali_text": "x"}}
+        store = _make_store({"vieja": {"pali_text": "x"}})
         updated = {"nueva": {"pali_text": "y"}}
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file'):
+        with patch.object(app, '_get_sessions_store', return_value=store):
             app.persist_saved_sessions(updated)
-        self.assertEqual(store, updated)
-        self.assertNotIn("vieja", store)
+        sessions = store.snapshot(pali_sessions.DEFAULT_SESSION_NAMESPACE)[1]
+        self.assertEqual(sessions, updated)
+        self.assertNotIn("vieja", sessions)
 
     def test_unicode_content_preserved(self):
-        store = {}
+        store = _make_store()
         data = {"Clase SN 56.11": {"pali_text": "サンスタ", "dict_name": "dpd"}}
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file'):
+        with patch.object(app, '_get_sessions_store', return_value=store):
             app.persist_saved_sessions(data)
-        self.assertEqual(store["Clase SN 56.11"]["pali_text"], "サンスタ")
+        self.assertEqual(store.get(pali_sessions.DEFAULT_SESSION_NAMESPACE, "Clase SN 56.11")["pali_text"], "サンスタ")
 
     def test_roundtrip_load_persist(self):
-        store = {}
         data = {"s1": {"pali_text": "namo tassa", "dict_name": "dpd"}}
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file'):
+        with patch.object(app, '_get_sessions_store', return_value=_make_store()):
             app.persist_saved_sessions(data)
             result = app.load_saved_sessions()
         self.assertEqual(result, data)
 
     def test_persist_writes_to_file(self):
-        """persist_saved_sessions() también debe persistir en disco."""
-        store = {}
+        """persist_saved_sessions() también debe persistir en disco, un archivo por espacio."""
         data = {"s1": {"pali_text": "namo"}}
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file') as mock_save:
-            app.persist_saved_sessions(data)
-        mock_save.assert_called_once_with(app.SAVED_SESSIONS_PATH, data)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = pali_sessions.SessionStore(Path(tmp_dir))
+            with patch.object(app, '_get_sessions_store', return_value=store), \
+                 patch.object(pali_sessions, '_save_json_file') as mock_save:
+                app.persist_saved_sessions(data)
+            mock_save.assert_called_once()
+            saved_path, saved_payload = mock_save.call_args[0]
+        self.assertEqual(saved_path.parent, Path(tmp_dir))
+        self.assertEqual(saved_payload, data)
+
+    def test_persisted_namespace_survives_restart(self):
+        data = {"s1": {"pali_text": "namo"}}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pali_sessions.SessionStore(Path(tmp_dir)).replace("alumna", data)
+            reloaded = pali_sessions.SessionStore(Path(tmp_dir))
+            self.assertEqual(reloaded.snapshot("alumna")[1], data)
+            self.assertEqual(reloaded.snapshot("otro")[1], {})
+
+
+# ---------------------------------------------------------------------------
+# SessionStore: espacios por usuario y compare-and-swap
+# ---------------------------------------------------------------------------
+
+class TestSessionStoreConcurrency(unittest.TestCase):
+
+    def test_namespaces_are_isolated(self):
+        store = _make_store()
+        store.replace("ana", {"A": {"pali_text": "namo"}})
+        store.replace("beto", {"B": {"pali_text": "tassa"}})
+        self.assertEqual(list(store.snapshot("ana")[1]), ["A"])
+        self.assertEqual(list(store.snapshot("beto")[1]), ["B"])
+
+    def test_compare_and_swap_rejects_stale_version(self):
+        store = _make_store()
+        version, _ = store.snapshot("ana")
+        self.assertTrue(store.compare_and_swap("ana", version, {"A": {}}))
+        self.assertFalse(store.compare_and_swap("ana", version, {"B": {}}))
+        self.assertEqual(list(store.snapshot("ana")[1]), ["A"])
+
+    def test_concurrent_updates_do_not_lose_writes(self):
+        """Estrés multi-hilo: ninguna escritura concurrente se pierde."""
+        import threading
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = pali_sessions.SessionStore(Path(tmp_dir))
+            namespaces = ["ana", "beto", "carla"]
+            threads_per_namespace = 6
+            writes_per_thread = 40
+            barrier = threading.Barrier(len(namespaces) * threads_per_namespace)
+
+            def _increment(sessions):
+                counter = sessions.get("contador", {"n": 0})
+                sessions["contador"] = {"n": counter["n"] + 1}
+
+            def _worker(namespace, thread_index):
+                barrier.wait()
+                for write_index in range(writes_per_thread):
+                    key = f"t{thread_index}-{write_index}"
+                    store.update(namespace, lambda sessions, key=key: sessions.__setitem__(key, {"pali_text": key}))
+                    store.update(namespace, _increment)
+
+            threads = [
+                threading.Thread(target=_worker, args=(namespace, index))
+                for namespace in namespaces
+                for index in range(threads_per_namespace)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            expected_total = threads_per_namespace * writes_per_thread
+            for namespace in namespaces:
+                _, sessions = store.snapshot(namespace)
+                self.assertEqual(sessions["contador"]["n"], expected_total)
+                self.assertEqual(len(sessions), expected_total + 1)
+                reloaded = pali_sessions.SessionStore(Path(tmp_dir)).snapshot(namespace)[1]
+                self.assertEqual(reloaded, sessions)
+
+
+# ---------------------------------------------------------------------------
+# Búsqueda de texto completo en sesiones
+# ---------------------------------------------------------------------------
+
+class TestSessionSearchIndex(unittest.TestCase):
+
+    def _session(self, text, lemmas=()):
+        entries = [
+            {"word": word, "part_of_speech": "noun", "matched_form": word, "lemma": lemma}
+            for word, lemma in zip(text.split(), list(lemmas) + [""] * len(text.split()))
+        ]
+        return {"pali_text": text, "generated_gloss": True, "gloss_entries": entries}
+
+    def test_finds_sessions_by_text_word_and_lemma(self):
+        store = _make_store({
+            "Clase SN 56.11": self._session("dhammacakkaṃ pavattitaṃ", lemmas=["dhammacakka 1"]),
+            "Clase Dhp": self._session("dhammo have rakkhati", lemmas=["dhamma 1.01"]),
+        })
+        ns = pali_sessions.DEFAULT_SESSION_NAMESPACE
+        self.assertEqual(store.search(ns, "rakkhati"), ["Clase Dhp"])
+        self.assertEqual(store.search(ns, "dhamma"), ["Clase Dhp"])
+        self.assertEqual(store.search(ns, "Dhammacakka"), ["Clase SN 56.11"])
+        self.assertEqual(store.search(ns, "dhammo rakkhati"), ["Clase Dhp"])
+        self.assertEqual(store.search(ns, "dhammo pavattitaṃ"), [])
+        self.assertEqual(store.search(ns, ""), [])
+
+    def test_index_follows_save_and_delete(self):
+        store = _make_store()
+        ns = pali_sessions.DEFAULT_SESSION_NAMESPACE
+        store.update(ns, lambda sessions: sessions.__setitem__("A", self._session("namo tassa")))
+        self.assertEqual(store.search(ns, "namo"), ["A"])
+        store.update(ns, lambda sessions: sessions.__setitem__("A", self._session("bhagavato")))
+        self.assertEqual(store.search(ns, "namo"), [])
+        self.assertEqual(store.search(ns, "bhagavato"), ["A"])
+        store.update(ns, lambda sessions: sessions.pop("A"))
+        self.assertEqual(store.search(ns, "bhagavato"), [])
+        self.assertEqual(dict(store._get_namespace(ns).index), {})
+
+    def test_search_is_per_namespace(self):
+        store = _make_store()
+        store.replace("ana", {"A": self._session("namo")})
+        self.assertEqual(store.search("ana", "namo"), ["A"])
+        self.assertEqual(store.search("beto", "namo"), [])
+
+    def test_index_built_from_disk_on_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pali_sessions.SessionStore(Path(tmp_dir)).replace("ana", {"A": self._session("namo tassa")})
+            self.assertEqual(pali_sessions.SessionStore(Path(tmp_dir)).search("ana", "tassa"), ["A"])
+
+    def test_normalize_lemma_strips_homonym_number(self):
+        self.assertEqual(pali_text._normalize_lemma("dhamma 1.01"), "dhamma")
+        self.assertEqual(pali_text._normalize_lemma("saṁgha 2"), "saṃgha")
+        self.assertEqual(pali_text._normalize_lemma(""), "")
+
+
+# ---------------------------------------------------------------------------
+# Exportación / importación de sesiones (.jsonl.gz)
+# ---------------------------------------------------------------------------
+
+class TestSessionsArchive(unittest.TestCase):
+
+    def _export(self, store, **kwargs):
+        import io
+        buffer = io.BytesIO()
+        count = pali_sessions.export_sessions_archive(buffer, store=store, namespace="ana", **kwargs)
+        buffer.seek(0)
+        return count, buffer
+
+    def test_roundtrip_to_other_namespace(self):
+        data = {
+            "A": {"pali_text": "namo", "saved_at": "2026-01-01T00:00:00Z"},
+            "B": {"pali_text": "tassa", "saved_at": "2026-01-02T00:00:00Z"},
+        }
+        store = _make_store(data, namespace="ana")
+        count, buffer = self._export(store)
+        self.assertEqual(count, 2)
+        report = pali_sessions.import_sessions_archive(buffer, store=store, namespace="beto")
+        self.assertEqual(report["imported"], 2)
+        self.assertEqual(store.snapshot("beto")[1], data)
+        self.assertEqual(store.search("beto", "tassa"), ["B"])
+
+    def test_export_selected_sessions_only(self):
+        import gzip
+        store = _make_store({"A": {"pali_text": "namo"}, "B": {"pali_text": "tassa"}}, namespace="ana")
+        count, buffer = self._export(store, session_names=["B", "inexistente"])
+        self.assertEqual(count, 1)
+        lines = gzip.decompress(buffer.getvalue()).decode("utf-8").splitlines()
+        self.assertEqual(json.loads(lines[0])["format"], pali_sessions.SESSIONS_ARCHIVE_FORMAT)
+        self.assertEqual([json.loads(line)["name"] for line in lines[1:]], ["B"])
+
+    def test_conflict_policies(self):
+        incoming = {"A": {"pali_text": "nuevo", "saved_at": "2026-02-01T00:00:00Z"}}
+        cases = {
+            "skip": {"A": "viejo"},
+            "overwrite": {"A": "nuevo"},
+            "rename": {"A": "viejo", "A (importada)": "nuevo"},
+            "newest": {"A": "nuevo"},
+        }
+        for policy, expected in cases.items():
+            source = _make_store(incoming, namespace="ana")
+            _, buffer = self._export(source)
+            target = _make_store({"A": {"pali_text": "viejo", "saved_at": "2026-01-01T00:00:00Z"}}, namespace="ana")
+            pali_sessions.import_sessions_archive(buffer, policy=policy, store=target, namespace="ana")
+            sessions = target.snapshot("ana")[1]
+            self.assertEqual(
+                {name: session["pali_text"] for name, session in sessions.items()},
+                expected,
+                msg=policy,
+            )
+
+    def test_newest_policy_keeps_more_recent_existing(self):
+        source = _make_store({"A": {"pali_text": "nuevo", "saved_at": "2025-01-01T00:00:00Z"}}, namespace="ana")
+        _, buffer = self._export(source)
+        target = _make_store({"A": {"pali_text": "viejo", "saved_at": "2026-01-01T00:00:00Z"}}, namespace="ana")
+        report = pali_sessions.import_sessions_archive(buffer, policy="newest", store=target, namespace="ana")
+        self.assertEqual(report["skipped"], 1)
+        self.assertEqual(target.get("ana", "A")["pali_text"], "viejo")
+
+    def test_import_in_batches_and_skips_invalid_lines(self):
+        import gzip
+        import io
+        lines = [json.dumps({"format": pali_sessions.SESSIONS_ARCHIVE_FORMAT, "version": 1})]
+        lines += [json.dumps({"name": f"s{i}", "session": {"pali_text": "namo"}}) for i in range(120)]
+        lines += ["{no es json", json.dumps({"name": "", "session": {}})]
+        buffer = io.BytesIO(gzip.compress("\n".join(lines).encode("utf-8")))
+        store = _make_store()
+        with patch.object(store, "update", wraps=store.update) as mock_update:
+            report = pali_sessions.import_sessions_archive(buffer, store=store, namespace="ana")
+        self.assertEqual(report["imported"], 120)
+        self.assertEqual(report["invalid"], 2)
+        self.assertEqual(mock_update.call_count, 3)
+
+    def test_rejects_foreign_archive(self):
+        import gzip
+        import io
+        buffer = io.BytesIO(gzip.compress(b'{"otra": "cosa"}\n'))
+        with self.assertRaises(ValueError):
+            pali_sessions.import_sessions_archive(buffer, store=_make_store(), namespace="ana")
+
+    def test_running_store_sees_import_from_other_process(self):
+        """Una importación por CLI (otro SessionStore) se ve sin reiniciar el servidor."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            server_store = pali_sessions.SessionStore(Path(tmp_dir))
+            server_store.replace("ana", {"A": {"pali_text": "namo"}})
+            cli_store = pali_sessions.SessionStore(Path(tmp_dir))
+            source = _make_store({"B": {"pali_text": "tassa"}}, namespace="ana")
+            _, buffer = self._export(source)
+            # Garantiza un mtime distinto aunque el sistema de archivos tenga poca resolución.
+            time_ns = server_store._disk_mtime_ns("ana") + 10_000_000
+            pali_sessions.import_sessions_archive(buffer, store=cli_store, namespace="ana")
+            os.utime(cli_store._namespace_path("ana"), ns=(time_ns, time_ns))
+            self.assertEqual(sorted(server_store.snapshot("ana")[1]), ["A", "B"])
+            self.assertEqual(server_store.search("ana", "tassa"), ["B"])
 
 
 # ---------------------------------------------------------------------------
@@ -250,6 +484,191 @@ class TestApplyLoadedSession(unittest.TestCase):
         self.assertEqual(captured["gloss_word_total"], 0)
 
 
+# ---------------------------------------------------------------------------
+# Carga paginada de sesiones grandes
+# ---------------------------------------------------------------------------
+
+class TestPaginatedSessionLoading(unittest.TestCase):
+
+    def _make_large_session(self, entry_count):
+        entries = [{"word": f"w{i}", "part_of_speech": "noun"} for i in range(entry_count)]
+        return {
+            "dict_name": "dpd",
+            "pali_text": "namo",
+            "generated_gloss": True,
+            "gloss_entries": entries,
+            "gloss_word_total": entry_count,
+            "gloss_found_words": entry_count,
+            "gloss_coverage": 100.0,
+        }
+
+    def _apply_and_capture(self, session_data, session_name):
+        captured = {}
+        mock_state = MagicMock()
+        mock_state.__setitem__ = lambda self_, k, v: captured.__setitem__(k, v)
+        with patch.object(app.st, "session_state", mock_state):
+            app.apply_loaded_session(session_data, session_name=session_name)
+        return captured
+
+    def test_large_session_loads_first_page_only(self):
+        session = self._make_large_session(1200)
+        with patch.object(app, "LOADED_SESSION_PAGE_SIZE", 500):
+            captured = self._apply_and_capture(session, "grande")
+        self.assertEqual(len(captured["gloss_entries"]), 500)
+        self.assertEqual(captured["gloss_entries_total"], 1200)
+        self.assertEqual(captured["loaded_session_name"], "grande")
+
+    def test_small_session_loads_complete(self):
+        session = self._make_large_session(10)
+        with patch.object(app, "LOADED_SESSION_PAGE_SIZE", 500):
+            captured = self._apply_and_capture(session, "pequeña")
+        self.assertEqual(len(captured["gloss_entries"]), 10)
+        self.assertEqual(captured["loaded_session_name"], "")
+
+    def test_page_size_uses_stored_size_without_reserializing(self):
+        session = self._make_large_session(1000)
+        session["size_bytes"] = 1000 * 1000
+        with patch.object(app, "LOADED_SESSION_PAGE_SIZE", 500), \
+             patch.object(app, "MAX_LOADED_SESSION_BYTES", 100000), \
+             patch.object(app, "estimate_json_size") as mock_estimate:
+            page_size = app._session_page_size(session)
+        mock_estimate.assert_not_called()
+        self.assertEqual(page_size, 100)
+
+    def test_load_session_entries_page_reads_from_store(self):
+        store = _make_store({"grande": self._make_large_session(30)})
+        with patch.object(app, "_get_sessions_store", return_value=store):
+            page = app.load_session_entries_page("grande", 10, 5)
+            missing = app.load_session_entries_page("inexistente", 0, 5)
+        self.assertEqual([entry["word"] for entry in page], ["w10", "w11", "w12", "w13", "w14"])
+        self.assertEqual(missing, [])
+
+    def test_save_completes_partially_loaded_session(self):
+        session = self._make_large_session(30)
+        store = _make_store({"grande": session})
+        state = {
+            "generated_gloss": True,
+            "gloss_entries": session["gloss_entries"][:10],
+            "gloss_entries_total": 30,
+            "loaded_session_name": "grande",
+        }
+        mock_state = MagicMock()
+        mock_state.get = lambda k, default=None: state.get(k, default)
+        with patch.object(app.st, "session_state", mock_state), \
+             patch.object(app, "_get_sessions_store", return_value=store):
+            payload = app.build_session_payload("dpd", "namo")
+        self.assertEqual(len(payload["gloss_entries"]), 30)
+        self.assertGreater(payload["size_bytes"], 0)
+
+
+class TestChunkedSessionStorage(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.storage_dir = Path(self._tmp_dir.name)
+        self._chunk_size = patch.object(pali_sessions, "SESSION_ENTRIES_CHUNK_SIZE", 10)
+        self._chunk_size.start()
+        self.session = TestPaginatedSessionLoading._make_large_session(None, 35)
+        self.session["gloss_entries"][3].update(lemma="dhamma 1")
+        pali_sessions.SessionStore(self.storage_dir).replace("u1", {"grande": self.session, "corta": {"pali_text": "namo"}})
+
+    def tearDown(self):
+        self._chunk_size.stop()
+        self._tmp_dir.cleanup()
+
+    def _chunk_reads(self, store):
+        reads = []
+        original = store._read_chunk
+
+        def _recording(namespace, chunk_name):
+            reads.append(chunk_name)
+            return original(namespace, chunk_name)
+
+        return reads, patch.object(store, "_read_chunk", side_effect=_recording)
+
+    def test_large_session_is_stored_in_chunks(self):
+        stored = json.loads((self.storage_dir / "u1.json").read_text(encoding="utf-8"))
+        self.assertNotIn("gloss_entries", stored["grande"])
+        self.assertEqual(stored["grande"]["gloss_entries_count"], 35)
+        self.assertEqual(len(stored["grande"]["gloss_entries_chunks"]), 4)
+        self.assertEqual(len(list((self.storage_dir / "u1.chunks").glob("*.json"))), 4)
+        self.assertEqual(stored["corta"], {"pali_text": "namo"})
+
+    def test_page_reads_only_its_own_chunks(self):
+        store = pali_sessions.SessionStore(self.storage_dir)
+        reads, recording = self._chunk_reads(store)
+        with patch.object(app, "_get_sessions_store", return_value=store), recording:
+            page = app.load_session_entries_page("grande", 12, 5, namespace="u1")
+            self.assertEqual(len(reads), 1)
+            spanning = app.load_session_entries_page("grande", 18, 5, namespace="u1")
+            self.assertEqual(len(reads), 3)
+            tail = app.load_session_entries_page("grande", 30, 10, namespace="u1")
+        self.assertEqual([entry["word"] for entry in page], ["w12", "w13", "w14", "w15", "w16"])
+        self.assertEqual([entry["word"] for entry in spanning], ["w18", "w19", "w20", "w21", "w22"])
+        self.assertEqual([entry["word"] for entry in tail], ["w30", "w31", "w32", "w33", "w34"])
+
+    def test_apply_loaded_session_reads_first_page_from_chunks(self):
+        store = pali_sessions.SessionStore(self.storage_dir)
+        captured = {}
+        mock_state = MagicMock()
+        mock_state.__setitem__ = lambda self_, k, v: captured.__setitem__(k, v)
+        reads, recording = self._chunk_reads(store)
+        with patch.object(app, "_get_sessions_store", return_value=store), recording, \
+             patch.object(app.st, "session_state", mock_state), \
+             patch.object(app, "LOADED_SESSION_PAGE_SIZE", 10), \
+             patch.object(app, "_current_session_namespace", return_value="u1"):
+            app.apply_loaded_session(store.get("u1", "grande"), session_name="grande")
+        self.assertEqual(len(reads), 1)
+        self.assertEqual([entry["word"] for entry in captured["gloss_entries"]], [f"w{i}" for i in range(10)])
+        self.assertEqual(captured["gloss_entries_total"], 35)
+        self.assertEqual(captured["loaded_session_name"], "grande")
+
+    def test_full_vocabulary_reads_chunks_once_per_gloss_revision(self):
+        store = pali_sessions.SessionStore(self.storage_dir)
+        reads, recording = self._chunk_reads(store)
+        state = {
+            "gloss_entries": self.session["gloss_entries"][:10],
+            "gloss_entries_total": 35,
+            "loaded_session_name": "grande",
+            "gloss_revision": "r1",
+        }
+        with patch.object(app, "_get_sessions_store", return_value=store), recording, \
+             patch.object(app.st, "session_state", state), \
+             patch.object(app, "_current_session_namespace", return_value="u1"):
+            vocabulary = app._full_vocabulary()
+            chunk_reads = len(reads)
+            # Reruns y «Cargar más entradas» no cambian la glosa: no se vuelve a leer el store.
+            state["gloss_entries"] = self.session["gloss_entries"][:20]
+            self.assertIs(app._full_vocabulary(), vocabulary)
+            self.assertEqual(len(reads), chunk_reads)
+            state["gloss_revision"] = "r2"
+            self.assertEqual(app._full_vocabulary(), vocabulary)
+            self.assertGreater(len(reads), chunk_reads)
+        self.assertEqual(sum(entry["count"] for entry in vocabulary), 35)
+
+    def test_search_and_export_use_the_whole_session(self):
+        store = pali_sessions.SessionStore(self.storage_dir)
+        self.assertEqual(store.search("u1", "dhamma"), ["grande"])
+        self.assertEqual(store.full_session("u1", store.get("u1", "grande"))["gloss_entries"], self.session["gloss_entries"])
+
+        archive = io.BytesIO()
+        pali_sessions.export_sessions_archive(archive, namespace="u1", store=store)
+        archive.seek(0)
+        other = pali_sessions.SessionStore()
+        pali_sessions.import_sessions_archive(archive, namespace="u2", store=other)
+        self.assertEqual(other.get("u2", "grande")["gloss_entries"], self.session["gloss_entries"])
+
+    def test_unreferenced_chunks_are_collected(self):
+        store = pali_sessions.SessionStore(self.storage_dir)
+        chunks_dir = self.storage_dir / "u1.chunks"
+        store.update("u1", lambda sessions: sessions.pop("grande"))
+        # Dentro del margen se conservan: otro proceso podría estar publicándolos.
+        self.assertEqual(len(list(chunks_dir.glob("*.json"))), 4)
+        with patch.object(pali_sessions, "_SESSION_CHUNK_GRACE_SECONDS", -1):
+            store.update("u1", lambda sessions: sessions.update(otra={"pali_text": "buddho"}))
+        self.assertEqual(list(chunks_dir.iterdir()), [])
+
+
 # ---------------------------------------------------------------------------
 # _dict_name_to_option  /  _dict_option_to_name
 # ---------------------------------------------------------------------------
@@ -345,13 +764,21 @@ class TestGetSessionsStoreInit(unittest.TestCase):
         # Always clear the resource cache before each test so the
         # initialization logic runs fresh (reads the file anew).
         app._get_sessions_store.clear()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._dir_patch = patch.object(app, 'SAVED_SESSIONS_DIR', Path(self._tmp_dir.name) / "saved_sessions")
+        self._dir_patch.start()
 
     def tearDown(self):
         # Restore a clean cache so other tests are not affected.
+        self._dir_patch.stop()
+        self._tmp_dir.cleanup()
         app._get_sessions_store.clear()
 
+    def _default_sessions(self):
+        return app._get_sessions_store().snapshot(pali_sessions.DEFAULT_SESSION_NAMESPACE)[1]
+
     def test_loads_from_file_on_init(self):
-        """_get_sessions_store() debe cargar sesiones de saved_sessions.json al iniciar."""
+        """El saved_sessions.json antiguo debe cargarse en el espacio por defecto."""
         existing = {
             "session_antigua": {
                 "pali_text": "namo tassa",
@@ -365,16 +792,29 @@ class TestGetSessionsStoreInit(unittest.TestCase):
             tmp_path = Path(f.name)
         try:
             with patch.object(app, 'SAVED_SESSIONS_PATH', tmp_path):
-                store = app._get_sessions_store()
+                store = self._default_sessions()
             self.assertIn("session_antigua", store)
             self.assertEqual(store["session_antigua"]["pali_text"], "namo tassa")
         finally:
             tmp_path.unlink(missing_ok=True)
 
+    def test_legacy_file_not_visible_to_other_namespaces(self):
+        with tempfile.NamedTemporaryFile(
+            mode="w", suffix=".json", encoding="utf-8", delete=False
+        ) as f:
+            json.dump({"compartida": {"pali_text": "namo"}}, f)
+            tmp_path = Path(f.name)
+        try:
+            with patch.object(app, 'SAVED_SESSIONS_PATH', tmp_path):
+                _, sessions = app._get_sessions_store().snapshot("otra-alumna")
+            self.assertEqual(sessions, {})
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
     def test_returns_empty_dict_when_file_missing(self):
         """_get_sessions_store() debe devolver {} si el archivo no existe."""
         with patch.object(app, 'SAVED_SESSIONS_PATH', Path("/nonexistent/sessions.json")):
-            store = app._get_sessions_store()
+            store = self._default_sessions()
         self.assertEqual(store, {})
 
     def test_ignores_corrupt_file_on_init(self):
@@ -386,7 +826,7 @@ class TestGetSessionsStoreInit(unittest.TestCase):
             tmp_path = Path(f.name)
         try:
             with patch.object(app, 'SAVED_SESSIONS_PATH', tmp_path):
-                store = app._get_sessions_store()
+                store = self._default_sessions()
             self.assertEqual(store, {})
         finally:
             tmp_path.unlink(missing_ok=True)
@@ -400,12 +840,91 @@ class TestGetSessionsStoreInit(unittest.TestCase):
             tmp_path = Path(f.name)
         try:
             with patch.object(app, 'SAVED_SESSIONS_PATH', tmp_path):
-                store = app._get_sessions_store()
+                store = self._default_sessions()
             self.assertEqual(store, {})
         finally:
             tmp_path.unlink(missing_ok=True)
 
 
+class TestSessionNamespaceResolution(unittest.TestCase):
+
+    def _resolve(self, query_value=None, email=""):
+        query_params = {} if query_value is None else {app.SESSION_NAMESPACE_QUERY_PARAM: query_value}
+        user = MagicMock(is_logged_in=bool(email), email=email)
+        with patch.object(app.st, "query_params", query_params), patch.object(app.st, "user", user):
+            return app._resolve_user_namespace(), query_params
+
+    def test_generated_anonymous_id_is_reused(self):
+        namespace, query_params = self._resolve()
+        self.assertRegex(namespace, r"^[0-9a-f]{16}$")
+        self.assertEqual(query_params[app.SESSION_NAMESPACE_QUERY_PARAM], namespace)
+        self.assertEqual(self._resolve(namespace)[0], namespace)
+
+    def test_spoofed_user_and_default_namespaces_are_rejected(self):
+        for spoofed in ("user-alice@example.com", "default", pali_sessions.DEFAULT_SESSION_NAMESPACE, "ana", "0123456789ABCDEF"):
+            namespace, query_params = self._resolve(spoofed)
+            self.assertNotEqual(namespace, spoofed)
+            self.assertRegex(namespace, r"^[0-9a-f]{16}$")
+            self.assertEqual(query_params[app.SESSION_NAMESPACE_QUERY_PARAM], namespace)
+
+    def test_user_namespace_comes_only_from_authenticated_identity(self):
+        namespace, _ = self._resolve("0123456789abcdef", email="Alice@Example.com")
+        self.assertEqual(namespace, "user-alice@example.com")
+
+
+class TestLegacySessionsMigration(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp_dir.name)
+        self.legacy_path = self.tmp / "saved_sessions.json"
+        self.legacy_path.write_text(
+            json.dumps({"A": {"pali_text": "namo"}, "B": {"pali_text": "tassa"}}), encoding="utf-8"
+        )
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _store(self):
+        return pali_sessions.SessionStore(self.tmp / "saved_sessions", legacy_path=self.legacy_path)
+
+    def test_first_namespace_claims_legacy_sessions_once(self):
+        store = self._store()
+        self.assertEqual(set(store.snapshot(pali_sessions.DEFAULT_SESSION_NAMESPACE)[1]), {"A", "B"})
+        store.replace("0123456789abcdef", {"A": {"pali_text": "propia"}})
+
+        self.assertEqual(store.claim_legacy_sessions("0123456789abcdef"), 2)
+        _, sessions = store.snapshot("0123456789abcdef")
+        self.assertEqual(sessions["A"]["pali_text"], "propia")
+        self.assertEqual(sessions["A (importada)"]["pali_text"], "namo")
+        self.assertEqual(sessions["B"]["pali_text"], "tassa")
+        self.assertEqual(store.snapshot(pali_sessions.DEFAULT_SESSION_NAMESPACE)[1], {})
+
+        # Otro usuario, en este proceso o en otro, ya no recibe nada.
+        self.assertEqual(store.claim_legacy_sessions("fedcba9876543210"), 0)
+        self.assertEqual(self._store().claim_legacy_sessions("fedcba9876543210"), 0)
+        self.assertEqual(self._store().snapshot("fedcba9876543210")[1], {})
+        self.assertEqual(set(self._store().snapshot("0123456789abcdef")[1]), {"A", "A (importada)", "B"})
+
+    def test_concurrent_claims_move_sessions_to_a_single_namespace(self):
+        import threading
+
+        stores = [self._store() for _ in range(8)]
+        barrier = threading.Barrier(len(stores))
+        counts = [0] * len(stores)
+
+        def _claim(index):
+            barrier.wait()
+            counts[index] = stores[index].claim_legacy_sessions(f"{index:016x}")
+
+        threads = [threading.Thread(target=_claim, args=(index,)) for index in range(len(stores))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(counts), [0] * (len(stores) - 1) + [2])
+
+
 # ---------------------------------------------------------------------------
 # Full save → load → persist cycle
 # ---------------------------------------------------------------------------
@@ -426,12 +945,8 @@ class TestFullSessionCycle(unittest.TestCase):
             "gloss_found_words": 0,
             "gloss_coverage": 0.0,
         }
-        store = {}
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file'):
-            sessions = {}
-            sessions["Clase SN"] = payload
-            app.persist_saved_sessions(sessions)
+        with patch.object(app, '_get_sessions_store', return_value=_make_store()):
+            app.update_saved_sessions(lambda sessions: sessions.__setitem__("Clase SN", payload))
             loaded = app.load_saved_sessions()
 
         self.assertIn("Clase SN", loaded)
@@ -444,12 +959,8 @@ class TestFullSessionCycle(unittest.TestCase):
             "Clase A": {"pali_text": "namo"},
             "Clase B": {"pali_text": "tassa"},
         }
-        store = dict(data)
-        with patch.object(app, '_get_sessions_store', return_value=store), \
-             patch.object(app, '_save_json_file'):
-            sessions = app.load_saved_sessions()
-            del sessions["Clase A"]
-            app.persist_saved_sessions(sessions)
+        with patch.object(app, '_get_sessions_store', return_value=_make_store(data)):
+            app.update_saved_sessions(lambda sessions: sessions.pop("Clase A", None))
             final = app.load_saved_sessions()
 
         self.assertNotIn("Clase A", final)
@@ -463,13 +974,13 @@ class TestFullSessionCycle(unittest.TestCase):
 class TestLongFinalVowelFallback(unittest.TestCase):
 
     def test_generate_final_vowel_fallbacks(self):
-        self.assertEqual(app._generate_final_vowel_fallbacks("rājā"), ["rājā", "rāja"])
-        self.assertEqual(app._generate_final_vowel_fallbacks("bhikkhū"), ["bhikkhū", "bhikkhu"])
-        self.assertEqual(app._generate_final_vowel_fallbacks("dhamma"), ["dhamma"])
+        self.assertEqual(pali_text._generate_final_vowel_fallbacks("rājā"), ["rājā", "rāja"])
+        self.assertEqual(pali_text._generate_final_vowel_fallbacks("bhikkhū"), ["bhikkhū", "bhikkhu"])
+        self.assertEqual(pali_text._generate_final_vowel_fallbacks("dhamma"), ["dhamma"])
 
     def test_generate_final_niggahita_fallbacks(self):
-        self.assertEqual(app._generate_final_vowel_fallbacks("buddhaṃ"), ["buddhaṃ", "buddham"])
-        self.assertEqual(app._generate_final_vowel_fallbacks("buddham"), ["buddham", "buddhaṃ"])
+        self.assertEqual(pali_text._generate_final_vowel_fallbacks("buddhaṃ"), ["buddhaṃ", "buddham"])
+        self.assertEqual(pali_text._generate_final_vowel_fallbacks("buddham"), ["buddham", "buddhaṃ"])
 
     def test_process_pali_text_uses_short_vowel_fallback(self):
         """Long final vowel (ā+ti sandhi / meter) must be found without ≈ alarm."""
@@ -482,7 +993,7 @@ class TestLongFinalVowelFallback(unittest.TestCase):
                 "translation": "rey",
             }
         }
-        entries = app.process_pali_text("rājā", dictionary)
+        entries = lookup.process_pali_text("rājā", dictionary)
         self.assertEqual(len(entries), 1)
         self.assertEqual(entries[0]["word"], "rājā")
         self.assertEqual(entries[0]["meaning"], "rey")
@@ -502,7 +1013,7 @@ class TestLongFinalVowelFallback(unittest.TestCase):
                 "translation": "monje",
             }
         }
-        entries = app.process_pali_with_lookup_map("bhikkhū", lookup_map, fallback_dictionary={})
+        entries = lookup.process_pali_with_lookup_map("bhikkhū", lookup_map, fallback_dictionary={})
         self.assertEqual(len(entries), 1)
         self.assertEqual(entries[0]["word"], "bhikkhū")
         self.assertEqual(entries[0]["meaning"], "monje")
@@ -521,7 +1032,7 @@ class TestLongFinalVowelFallback(unittest.TestCase):
                 "translation": "Buda",
             }
         }
-        entries = app.process_pali_with_lookup_map("buddhaṃ", lookup_map, fallback_dictionary={})
+        entries = lookup.process_pali_with_lookup_map("buddhaṃ", lookup_map, fallback_dictionary={})
         self.assertEqual(len(entries), 1)
         self.assertEqual(entries[0]["word"], "buddhaṃ")
         self.assertEqual(entries[0]["meaning"], "Buda (acusativo)")
@@ -546,8 +1057,8 @@ class TestLongFinalVowelFallback(unittest.TestCase):
             }
         ]
 
-        compact = app.generate_compact_gloss(entries)
-        rich = app.generate_rich_gloss_text(entries)
+        compact = formatting.generate_compact_gloss(entries)
+        rich = formatting.generate_rich_gloss_text(entries)
 
         self.assertIn("[≈ buddham]", compact)
         self.assertIn("[≈ buddham]", rich)
@@ -577,7 +1088,7 @@ class TestLongFinalVowelFallback(unittest.TestCase):
                     "translation": "test",
                 }
             }
-            entries = app.process_pali_with_lookup_map(long_form, lm, fallback_dictionary={})
+            entries = lookup.process_pali_with_lookup_map(long_form, lm, fallback_dictionary={})
             self.assertEqual(len(entries), 1, msg=f"No entry for {long_form!r}")
             self.assertEqual(entries[0]["match_type"], "exact",
                              msg=f"Expected exact for {long_form!r}, got {entries[0]['match_type']!r}")
@@ -594,7 +1105,7 @@ class TestLongFinalVowelFallback(unittest.TestCase):
                     "translation": "test",
                 }
             }
-            entries = app.process_pali_text(long_form, d)
+            entries = lookup.process_pali_text(long_form, d)
             self.assertEqual(len(entries), 1, msg=f"No entry for {long_form!r}")
             self.assertEqual(entries[0]["match_type"], "exact",
                              msg=f"Expected exact for {long_form!r}")
@@ -602,16 +1113,16 @@ class TestLongFinalVowelFallback(unittest.TestCase):
 
     def test_is_final_long_vowel_shortening(self):
         """Helper must detect long-vowel shortening and not confuse other diffs."""
-        self.assertTrue(app._is_final_long_vowel_shortening("vapissāmī", "vapissāmi"))
-        self.assertTrue(app._is_final_long_vowel_shortening("nibbānā", "nibbāna"))
-        self.assertTrue(app._is_final_long_vowel_shortening("bhikkhū", "bhikkhu"))
-        self.assertTrue(app._is_final_long_vowel_shortening("rājā", "rāja"))
+        self.assertTrue(pali_text._is_final_long_vowel_shortening("vapissāmī", "vapissāmi"))
+        self.assertTrue(pali_text._is_final_long_vowel_shortening("nibbānā", "nibbāna"))
+        self.assertTrue(pali_text._is_final_long_vowel_shortening("bhikkhū", "bhikkhu"))
+        self.assertTrue(pali_text._is_final_long_vowel_shortening("rājā", "rāja"))
         # Niggahita is NOT a long-vowel shortening
-        self.assertFalse(app._is_final_long_vowel_shortening("buddhaṃ", "buddham"))
+        self.assertFalse(pali_text._is_final_long_vowel_shortening("buddhaṃ", "buddham"))
         # Identical words are not shortenings
-        self.assertFalse(app._is_final_long_vowel_shortening("dhamma", "dhamma"))
+        self.assertFalse(pali_text._is_final_long_vowel_shortening("dhamma", "dhamma"))
         # Different word entirely
-        self.assertFalse(app._is_final_long_vowel_shortening("rājā", "raja"))
+        self.assertFalse(pali_text._is_final_long_vowel_shortening("rājā", "raja"))
 
 
 if __name__ == "__main__":
@@ -1,58 +1,53 @@
+"""Interfaz Streamlit de Pali Glosser sobre el núcleo `pali_lem`."""
+
 import streamlit as st
 import streamlit.components.v1 as components
-import json
-import re
+import io
 import os
-import sqlite3
-import threading
-import unicodedata
-import html
-import gzip
-import tarfile
-from pathlib import Path
-import urllib.request
-from datetime import datetime, timedelta
+import re
+import uuid
+from datetime import datetime
 from zoneinfo import ZoneInfo
 
 from streamlit.logger import get_logger as _get_st_logger
 
+from pali_lem.common import IS_DEBUG, _utcnow
+from pali_lem.concordance import CONCORDANCE_INDEX_PATH, concordance_query, format_kwic_line
+from pali_lem.dictionary import load_dictionary
+from pali_lem.dpd_db import get_dpd_db_path, get_dpd_db_stats
+from pali_lem.formatting import (
+    _gloss_coverage_stats,
+    build_philological_gloss_html,
+    generate_compact_gloss,
+    generate_rich_gloss_text,
+    humanize_part_of_speech,
+)
+from pali_lem.lookup import pinned_dpd_db, process_pali_text
+from pali_lem.result_cache import cached_gloss, get_result_cache
+from pali_lem.sessions import (
+    DEFAULT_SESSION_NAMESPACE,
+    SAVED_SESSIONS_DIR,
+    SAVED_SESSIONS_PATH,
+    SESSION_IMPORT_POLICIES,
+    SessionStore,
+    estimate_json_size,
+    export_sessions_archive,
+    import_sessions_archive,
+    is_chunked_session,
+    session_entry_count,
+)
+from pali_lem.text import _normalize_lemma
+from pali_lem.vocabulary import filter_by_part_of_speech, vocabulary_from_gloss_entries, vocabulary_parts_of_speech
+
+# Mismo logger que el núcleo ("pali_lem"), con el formato de Streamlit.
 logger = _get_st_logger("pali_lem")
 
-PUNCTUATION_LABELS = {
-    ".": "<PUNTO>",
-    ",": "<COMA>",
-    ";": "<PUNTO_Y_COMA>",
-    ":": "<DOS_PUNTOS>",
-    "!": "<EXCLAMACION>",
-    "?": "<INTERROGACION>",
-    "—": "<RAYA>",
-    "–": "<GUION>",
-    "-": "<GUION>",
-    "(": "<ABRE_PARENTESIS>",
-    ")": "<CIERRA_PARENTESIS>",
-    "«": "<ABRE_COMILLAS>",
-    "»": "<CIERRA_COMILLAS>",
-    '"': "<COMILLAS>",
-    "'": "<APOSTROFE>",
-    "“": "<ABRE_COMILLAS>",
-    "”": "<CIERRA_COMILLAS>",
-    "‘": "<ABRE_COMILLA_SIMPLE>",
-    "’": "<CIERRA_COMILLA_SIMPLE>",
-    "…": "<ELIPSIS>",
-    "...": "<ELIPSIS>",
-    "¶": "<FIN_SECCION>",
-}
-
-WORD_RE = re.compile(r"[^\W\d_]+", flags=re.UNICODE)
-TOKEN_RE = re.compile(r"[^\W\d_]+|\.\.\.|[.,;:!?…—–\-()«»\"'“”‘’¶]", flags=re.UNICODE)
-
 IS_CONSOLE_MODE = os.environ.get("PALI_LEM_NO_UI") == "1"
-# Activa trazas completas en la consola del servidor: PALI_LEM_DEBUG=1 streamlit run ...
-IS_DEBUG = os.environ.get("PALI_LEM_DEBUG") == "1"
-SAVED_SESSIONS_PATH = Path(__file__).parent / "saved_sessions.json"
-CACHE_TTL_ONE_MONTH_SECONDS = 30 * 24 * 60 * 60
+SESSION_NAMESPACE_QUERY_PARAM = "u"
 MAX_LOADED_SESSION_BYTES = int(os.environ.get("PALI_LEM_MAX_SESSION_BYTES", "1500000"))
 MAX_LOADED_GLOSS_ENTRIES = int(os.environ.get("PALI_LEM_MAX_GLOSS_ENTRIES", "3000"))
+# Sesiones grandes se cargan por páginas: la primera se muestra al instante y el resto bajo demanda.
+LOADED_SESSION_PAGE_SIZE = int(os.environ.get("PALI_LEM_SESSION_PAGE_SIZE", "500"))
 
 if IS_DEBUG:
     logger.setLevel("DEBUG")
@@ -66,1166 +61,104 @@ if not IS_CONSOLE_MODE:
         layout="centered"
     )
 
-# Cargar diccionario DPD
-@st.cache_data(ttl=CACHE_TTL_ONE_MONTH_SECONDS, max_entries=1, show_spinner="Cargando diccionario DPD...")
-def load_dictionary():
-    """Carga únicamente `dpd_dictionary.json`."""
-    ensure_dpd_json_available()
-    dict_path = Path(__file__).parent / "dpd_dictionary.json"
-
-    if not dict_path.exists():
-        raise FileNotFoundError(
-            "No se encontró dpd_dictionary.json. Configura DPD_JSON_URL o añade dpd_dictionary.json.gz/local."
-        )
-
-    with open(dict_path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-@st.cache_data(ttl=CACHE_TTL_ONE_MONTH_SECONDS, show_spinner="Preparando diccionario por primera vez...")
-def ensure_dpd_json_available():
-    """Asegura `dpd_dictionary.json` desde archivo local comprimido o URL remota."""
-    dict_path = Path(__file__).parent / "dpd_dictionary.json"
-    gz_path = Path(__file__).parent / "dpd_dictionary.json.gz"
-    if dict_path.exists():
-        return str(dict_path)
-
-    if gz_path.exists():
-        temp_path = dict_path.with_suffix(".json.part")
-        try:
-            with gzip.open(gz_path, "rb") as input_file, open(temp_path, "wb") as output_file:
-                while True:
-                    chunk = input_file.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    output_file.write(chunk)
-            temp_path.replace(dict_path)
-            return str(dict_path)
-        except Exception:
-            logger.exception("Error descomprimiendo dpd_dictionary.json.gz desde %s", gz_path)
-            if temp_path.exists():
-                temp_path.unlink()
-            return ""
-
-    dpd_json_url = os.environ.get("DPD_JSON_URL", "").strip()
-    if not dpd_json_url:
-        return ""
-
-    temp_path = dict_path.with_suffix(".json.part")
-    try:
-        with urllib.request.urlopen(dpd_json_url, timeout=180) as response, open(
-            temp_path, "wb"
-        ) as output_file:
-            while True:
-                chunk = response.read(1024 * 1024)
-                if not chunk:
-                    break
-                output_file.write(chunk)
-        temp_path.replace(dict_path)
-        return str(dict_path)
-    except Exception:
-        logger.exception("Error descargando dpd_dictionary.json desde %s", dpd_json_url)
-        if temp_path.exists():
-            temp_path.unlink()
-        return ""
-
-
-def _is_valid_dpd_db(path):
-    if not path or not path.exists() or not path.is_file():
-        return False
-    try:
-        conn = sqlite3.connect(str(path))
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='lookup' LIMIT 1"
-        )
-        result = cursor.fetchone()
-        conn.close()
-        return result is not None
-    except sqlite3.Error:
-        logger.debug("_is_valid_dpd_db: error SQLite en %s", path, exc_info=True)
-        return False
-
-
-def _build_dpd_db_candidates():
-    module_dir = Path(__file__).resolve().parent
-    env_path = os.environ.get("DPD_DB_PATH", "").strip()
-
-    candidate_paths = []
-    if env_path:
-        candidate_paths.append(Path(env_path).expanduser())
-
-    search_roots = [module_dir, Path.cwd(), *module_dir.parents]
-    for root in search_roots:
-        candidate_paths.append(root / "dpd-db" / "dpd.db")
-        candidate_paths.append(root / "dpd.db")
-    return candidate_paths
-
-
-def _resolve_dpd_db_download_url():
-    db_url = os.environ.get("DPD_DB_URL", "").strip()
-    if db_url:
-        return db_url
-
-    release_tag = os.environ.get("DPD_DB_RELEASE_TAG", "").strip()
-    if release_tag:
-        return (
-            "https://github.com/digitalpalidictionary/dpd-db/"
-            f"releases/download/{release_tag}/dpd.db.tar.bz2"
-        )
-
-    return os.environ.get(
-        "DPD_DB_TARBZ2_URL",
-        "https://github.com/digitalpalidictionary/dpd-db/releases/latest/download/dpd.db.tar.bz2",
-    ).strip()
-
-
-def _as_bool(value, default=True):
-    if value is None:
-        return default
-    return str(value).strip().lower() not in {"0", "false", "no", "off", ""}
-
-
-def _load_json_file(path, default):
-    if not path.exists():
-        return default
-    try:
-        with open(path, "r", encoding="utf-8") as file_handle:
-            return json.load(file_handle)
-    except Exception:
-        logger.exception("Error leyendo JSON desde %s", path)
-        return default
-
-
-def _save_json_file(path, payload):
-    temp_path = path.with_suffix(".tmp")
-    try:
-        with open(temp_path, "w", encoding="utf-8") as file_handle:
-            json.dump(payload, file_handle, ensure_ascii=False, indent=2)
-        temp_path.replace(path)
-    except Exception:
-        logger.exception("Error guardando JSON en %s", path)
-        if temp_path.exists():
-            temp_path.unlink()
-
-
-def _utcnow():
-    return datetime.now(ZoneInfo("UTC"))
-
 
-def _should_check_update(last_checked_at, interval_hours):
-    if interval_hours <= 0:
-        return True
-    if not last_checked_at:
-        return True
-    try:
-        parsed = datetime.fromisoformat(last_checked_at)
-    except ValueError:
-        logger.debug("_should_check_update: valor de fecha inválido: %r", last_checked_at)
-        return True
-    return _utcnow() - parsed >= timedelta(hours=interval_hours)
-
-
-def _fetch_remote_signature(download_url, timeout):
-    def build_signature(response):
-        return {
-            "resolved_url": response.geturl(),
-            "etag": response.headers.get("ETag", ""),
-            "last_modified": response.headers.get("Last-Modified", ""),
-            "content_length": response.headers.get("Content-Length", ""),
-        }
-
-    try:
-        request = urllib.request.Request(download_url, method="HEAD")
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            return build_signature(response)
-    except Exception:
-        logger.exception("Error obteniendo firma remota (HEAD) de %s", download_url)
-        return {}
-
-
-def _download_dpd_db(download_url, target_dir, target_db, timeout):
-    if download_url.endswith(".db"):
-        temp_path = target_db.with_suffix(".db.part")
-        try:
-            with urllib.request.urlopen(download_url, timeout=timeout) as response, open(
-                temp_path, "wb"
-            ) as output_file:
-                while True:
-                    chunk = response.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    output_file.write(chunk)
-            temp_path.replace(target_db)
-            return True
-        except Exception:
-            logger.exception("Error descargando dpd.db directamente desde %s", download_url)
-            if temp_path.exists():
-                temp_path.unlink()
-            return False
-
-    archive_path = target_dir / "dpd.db.tar.bz2.part"
-    temp_db_path = target_dir / "dpd.db.part"
-    try:
-        with urllib.request.urlopen(download_url, timeout=timeout) as response, open(
-            archive_path, "wb"
-        ) as output_file:
-            while True:
-                chunk = response.read(1024 * 1024)
-                if not chunk:
-                    break
-                output_file.write(chunk)
-
-        with tarfile.open(archive_path, mode="r:bz2") as archive:
-            member = None
-            for item in archive.getmembers():
-                if item.isfile() and Path(item.name).name == "dpd.db":
-                    member = item
-                    break
-            if member is None:
-                return False
-
-            with archive.extractfile(member) as source_file, open(
-                temp_db_path, "wb"
-            ) as output_file:
-                while True:
-                    chunk = source_file.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    output_file.write(chunk)
-
-        temp_db_path.replace(target_db)
-        return True
-    except Exception:
-        logger.exception("Error descargando/extrayendo dpd.db.tar.bz2 desde %s", download_url)
-        if temp_db_path.exists():
-            temp_db_path.unlink()
-        return False
-    finally:
-        if archive_path.exists():
-            archive_path.unlink()
-
-
-def _start_background_db_download(download_url, target_dir, target_db, timeout, meta, meta_path, remote_signature):
-    """Descarga dpd.db en un hilo de fondo para no bloquear el script de Streamlit."""
-    in_progress_file = target_dir / ".dpd_db_downloading"
-    try:
-        in_progress_file.open("x").close()
-    except FileExistsError:
-        return
-
-    def _worker():
-        try:
-            if _download_dpd_db(download_url, target_dir, target_db, timeout) and _is_valid_dpd_db(
-                target_db
-            ):
-                meta.update(
-                    {
-                        "download_url": download_url,
-                        "updated_at": _utcnow().isoformat(),
-                        "last_checked_at": _utcnow().isoformat(),
-                        "remote_signature": remote_signature,
-                    }
-                )
-                _save_json_file(meta_path, meta)
-                get_dpd_db_path.clear()
-        finally:
-            if in_progress_file.exists():
-                in_progress_file.unlink()
-
-    t = threading.Thread(target=_worker, daemon=True)
-    t.start()
-
-
-def ensure_dpd_db_available():
-    """Asegura `dpd.db` local y lo actualiza periódicamente desde releases remotos."""
-    module_dir = Path(__file__).resolve().parent
-    target_dir = module_dir / "dpd-db"
-    target_dir.mkdir(parents=True, exist_ok=True)
-    target_db = target_dir / "dpd.db"
-    meta_path = target_dir / ".dpd_db_meta.json"
-
-    valid_candidates = []
-    seen = set()
-    for candidate in _build_dpd_db_candidates():
-        resolved = str(candidate.resolve()) if candidate.exists() else str(candidate)
-        if resolved in seen:
-            continue
-        seen.add(resolved)
-        if _is_valid_dpd_db(candidate):
-            valid_candidates.append(candidate.resolve())
-
-    managed_db = target_db.resolve()
-    selected_db = valid_candidates[0] if valid_candidates else None
-    if selected_db and selected_db != managed_db:
-        return str(selected_db)
-
-    download_url = _resolve_dpd_db_download_url()
-    if not download_url:
-        return str(selected_db) if selected_db else ""
-
-    timeout = int(os.environ.get("DPD_DB_DOWNLOAD_TIMEOUT", "300"))
-    head_timeout = int(os.environ.get("DPD_DB_HEAD_TIMEOUT", "10"))
-    auto_update = _as_bool(os.environ.get("DPD_DB_AUTO_UPDATE", "1"), default=True)
-    interval_hours = int(os.environ.get("DPD_DB_UPDATE_INTERVAL_HOURS", "24"))
-
-    meta = _load_json_file(meta_path, default={})
-    remote_signature = _fetch_remote_signature(download_url, head_timeout)
-    should_download = selected_db is None
-
-    if selected_db is not None and auto_update:
-        if _should_check_update(meta.get("last_checked_at", ""), interval_hours):
-            if remote_signature:
-                previous_signature = meta.get("remote_signature", {})
-                should_download = previous_signature != remote_signature
-
-    if not should_download:
-        if auto_update:
-            meta.update(
-                {
-                    "download_url": download_url,
-                    "last_checked_at": _utcnow().isoformat(),
-                    "remote_signature": remote_signature or meta.get("remote_signature", {}),
-                }
-            )
-            _save_json_file(meta_path, meta)
-        return str(selected_db)
-
-    _start_background_db_download(
-        download_url, target_dir, target_db, timeout, meta.copy(), meta_path, remote_signature
+def render_philological_gloss(gloss_entries):
+    gloss_html = build_philological_gloss_html(gloss_entries)
+    if gloss_html:
+        st.markdown(gloss_html, unsafe_allow_html=True)
+
+
+def render_vocabulary(vocabulary):
+    """Tarjetas de vocabulario (una por lema) con filtro por categoría; devuelve las entradas mostradas."""
+    pos_options = vocabulary_parts_of_speech(vocabulary)
+    selected_pos = st.multiselect(
+        "Categoría gramatical",
+        pos_options,
+        key="vocabulary_pos_filter",
+        format_func=lambda pos: humanize_part_of_speech(pos) or pos,
+        placeholder="Todas",
     )
-    return str(selected_db) if selected_db else ""
-
-
-@st.cache_data(ttl=CACHE_TTL_ONE_MONTH_SECONDS, max_entries=1, show_spinner=False)
-def get_dpd_db_path():
-    """Encuentra una base `dpd.db` válida usando referencias relativas al proyecto.
-
-    El resultado se cachea durante 1 hora para evitar re-escaneos, peticiones HEAD
-    y posibles descargas en cada rerun de Streamlit (por ejemplo, al pulsar 'Cargar sesión').
-    """
-    return ensure_dpd_db_available()
-
-
-def _load_json_field(value, default):
-    if not value:
-        return default
-    try:
-        return json.loads(value)
-    except json.JSONDecodeError:
-        logger.debug("_load_json_field: JSON inválido en campo: %r", value)
-        return default
+    vocabulary = filter_by_part_of_speech(vocabulary, selected_pos)
+    word_total = sum(entry["count"] for entry in vocabulary)
+    st.caption(f"{len(vocabulary):,} lemas · {word_total:,} palabras")
+    # Una tarjeta por lema: el coste de renderizado crece con el vocabulario, no con el texto.
+    render_philological_gloss(vocabulary)
+    return vocabulary
 
 
-def _dedupe(values):
-    """Deduplica preservando orden. Descarta None y cadenas vacías, pero conserva 0 y otros falsos numéricos."""
-    seen = set()
-    result = []
-    for value in values:
-        if value is None:
-            continue
-        if isinstance(value, str) and not value:
-            continue
-        if value not in seen:
-            seen.add(value)
-            result.append(value)
-    return result
+def render_concordance_panel(gloss_entries, total_entries=0):
+    """Apariciones en el corpus indexado de una palabra de la glosa (si hay índice).
 
-
-def _dedupe_normalized(values):
-    seen = set()
-    result = []
-    for value in values:
-        if not value:
-            continue
-        normalized_key = re.sub(r"\s+", " ", str(value).strip()).lower()
-        if normalized_key and normalized_key not in seen:
-            seen.add(normalized_key)
-            result.append(value)
-    return result
-
-
-def _normalize_token(token):
-    normalized = unicodedata.normalize("NFC", token.strip().lower())
-    return normalized.replace("ṁ", "ṃ")
-
-
-ROOT_GROUP_NAMES = {
-    "1": "bhvādi",
-    "2": "adādi",
-    "3": "juhotyādi",
-    "4": "divādi",
-    "5": "svādi",
-    "6": "tudādi",
-    "7": "rudhādi",
-    "8": "tanādi",
-    "9": "kryādi",
-    "10": "curādi",
-}
-
-FINAL_LONG_VOWEL_MAP = {
-    "ā": "a",
-    "ī": "i",
-    "ū": "u",
-}
-
-FINAL_NIGGAHITA_MAP = {
-    "ṃ": "m",
-    "m": "ṃ",
-}
-
-
-def _generate_final_vowel_fallbacks(word):
-    normalized_word = _normalize_token(word)
-    if not normalized_word:
-        return []
-
-    candidates = [normalized_word]
-    for long_vowel, short_vowel in FINAL_LONG_VOWEL_MAP.items():
-        if normalized_word.endswith(long_vowel):
-            candidates.append(f"{normalized_word[:-1]}{short_vowel}")
-            break
-
-    for source_char, target_char in FINAL_NIGGAHITA_MAP.items():
-        if normalized_word.endswith(source_char):
-            candidates.append(f"{normalized_word[:-1]}{target_char}")
-            break
-
-    return _dedupe(candidates)
-
-
-def _is_final_long_vowel_shortening(original, candidate):
-    """True when candidate is original with its final long vowel (ā/ī/ū) shortened.
-
-    Pali words frequently end in a lengthened vowel due to ā+ti sandhi or
-    metrical requirements.  That is a natural phonological variant of the same
-    word, not a different lexical form, so it should not be flagged as an
-    approximate ('fallback') match.
+    Las palabras salen de las entradas ya cargadas: con una sesión paginada
+    (`total_entries` mayor) el panel lo indica en vez de leer todas las páginas.
     """
-    for long_v, short_v in FINAL_LONG_VOWEL_MAP.items():
-        if original.endswith(long_v) and candidate == original[:-1] + short_v:
-            return True
-    return False
-
-
-def _resolve_entry_with_fallback(word, dictionary):
-    normalized_word = _normalize_token(word)
-    for candidate in _generate_final_vowel_fallbacks(normalized_word):
-        entry = dictionary.get(candidate)
-        if entry:
-            is_fallback = (
-                candidate != normalized_word
-                and not _is_final_long_vowel_shortening(normalized_word, candidate)
-            )
-            return entry, is_fallback, candidate
-    return None, False, ""
-
-
-def _build_root_label(root_sign, root_key, root_group):
-    if not root_key:
-        return ""
-
-    base_root = f"{root_sign or ''}{root_key}"
-    group_text = str(root_group).strip() if root_group is not None else ""
-    if group_text and group_text not in {"N/A", "---"}:
-        group_label = ROOT_GROUP_NAMES.get(group_text, "")
-        group_display = f"{group_text} ({group_label})" if group_label else group_text
-        if base_root.strip().endswith(f" {group_text}"):
-            if group_label:
-                return f"{base_root} ({group_label})"
-            return base_root
-        return f"{base_root} · {group_display}"
-    return base_root
-
-
-def _build_etymology_label(derived_from_values, construction_values, stem_values, pattern_values):
-    derived_from = "; ".join(_dedupe(derived_from_values))
-    construction = "; ".join(_dedupe(construction_values))
-    stem = "; ".join(_dedupe(stem_values))
-    pattern = "; ".join(_dedupe(pattern_values))
-
-    parts = []
-    if derived_from:
-        parts.append(f"deriva de {derived_from}")
-    if construction:
-        parts.append(f"construcción: {construction}")
-    if stem:
-        parts.append(f"tema: {stem}")
-    if pattern:
-        parts.append(f"patrón: {pattern}")
-
-    return " · ".join(parts)
-
-
-def _fetch_root_group(conn, root_key, root_sign, root_group_cache):
-    if not root_key:
-        return ""
-
-    cache_key = (str(root_sign or ""), str(root_key))
-    if cache_key in root_group_cache:
-        return root_group_cache[cache_key]
-
-    row = conn.execute(
-        """
-        SELECT root_group
-        FROM dpd_roots
-        WHERE root = ?
-        ORDER BY CASE WHEN root_sign = ? THEN 0 ELSE 1 END
-        LIMIT 1
-        """,
-        (root_key, root_sign or ""),
-    ).fetchone()
-
-    root_group = ""
-    if row and row["root_group"] is not None:
-        root_group = str(row["root_group"]).strip()
-
-    root_group_cache[cache_key] = root_group
-    return root_group
-
-
-def tokenize_pali_with_separators(text):
-    normalized_text = unicodedata.normalize("NFC", text)
-    token_stream = []
-    for raw_token in TOKEN_RE.findall(normalized_text):
-        if WORD_RE.fullmatch(raw_token):
-            normalized_word = _normalize_token(raw_token)
-            if normalized_word:
-                token_stream.append(
-                    {
-                        "kind": "word",
-                        "surface": raw_token,
-                        "norm": normalized_word,
-                    }
-                )
-        else:
-            token_stream.append(
-                {
-                    "kind": "separator",
-                    "surface": raw_token,
-                    "separator": PUNCTUATION_LABELS.get(
-                        raw_token, f"<SIMBOLO:{raw_token}>"
-                    ),
-                }
-            )
-    return token_stream
-
-
-def tokenize_pali_text(text):
-    token_stream = tokenize_pali_with_separators(text)
-    return [token["norm"] for token in token_stream if token["kind"] == "word"]
-
-
-@st.cache_data(ttl=CACHE_TTL_ONE_MONTH_SECONDS, max_entries=2)
-def get_dpd_lookup_count(dpd_db_path):
-    conn = sqlite3.connect(dpd_db_path)
-    try:
-        row = conn.execute("SELECT COUNT(*) FROM lookup").fetchone()
-        return int(row[0]) if row else 0
-    except sqlite3.OperationalError:
-        logger.debug("get_dpd_lookup_count: tabla lookup no encontrada en %s", dpd_db_path)
-        return 0
-    finally:
-        conn.close()
-
-
-_SQLITE_MAX_VARS = 900  # SQLite limita a 999; usamos 900 para margen seguro
-
-
-def _sqlite_fetchall_chunked(conn, query_prefix, params, query_suffix=""):
-    """Ejecuta una query con IN(?) dividiendo params en chunks seguros para SQLite."""
-    rows = []
-    for i in range(0, len(params), _SQLITE_MAX_VARS):
-        chunk = params[i:i + _SQLITE_MAX_VARS]
-        placeholders = ",".join("?" for _ in chunk)
-        rows.extend(conn.execute(f"{query_prefix} ({placeholders}) {query_suffix}", chunk).fetchall())
-    return rows
-
-
-@st.cache_data(show_spinner=False, ttl=CACHE_TTL_ONE_MONTH_SECONDS, max_entries=128)
-def lookup_words_in_dpd(words, dpd_db_path):
-    """Busca palabras en `lookup` y `dpd_headwords` usando dpd.db."""
-    unique_words = [word for word in _dedupe(words) if word]
-    if not unique_words or not dpd_db_path:
-        return {}
-
-    result = {}
-    word_candidates = {
-        word: _generate_final_vowel_fallbacks(word)
-        for word in unique_words
-    }
-    query_words = [
-        candidate
-        for candidate in _dedupe(
-            item
-            for candidates in word_candidates.values()
-            for item in candidates
-        )
-        if candidate
-    ]
-
-    if not query_words:
-        return {}
-
-    conn = sqlite3.connect(dpd_db_path)
-    try:
-        conn.row_factory = sqlite3.Row
-        root_group_cache = {}
-        lookup_rows = _sqlite_fetchall_chunked(
-            conn,
-            "SELECT lookup_key, headwords, grammar FROM lookup WHERE lookup_key IN",
-            query_words,
-        )
-        # Parsear headwords JSON una sola vez y almacenarlo junto a la fila
-        lookup_map = {}
-        headword_ids = []
-        for row in lookup_rows:
-            parsed_ids = _load_json_field(row["headwords"], [])
-            if not isinstance(parsed_ids, list):
-                parsed_ids = []
-            lookup_map[row["lookup_key"]] = (row, parsed_ids)
-            headword_ids.extend(parsed_ids)
-        # _dedupe ahora preserva 0 como entero válido; además filtramos solo ints
-        unique_headword_ids = [item for item in _dedupe(headword_ids) if isinstance(item, int)]
-
-        headwords_by_id = {}
-        if unique_headword_ids:
-            hw_rows = _sqlite_fetchall_chunked(
-                conn,
-                "SELECT id, lemma_1, pos, grammar, meaning_1, meaning_2, meaning_lit, sanskrit,"
-                " root_key, root_sign, derived_from, construction, stem, pattern"
-                " FROM dpd_headwords WHERE id IN",
-                unique_headword_ids,
-            )
-            headwords_by_id = {row["id"]: row for row in hw_rows}
-
-        # Bulk-load root_group para todas las raíces únicas encontradas en headwords
-        # evitando N queries individuales a dpd_roots
-        all_root_keys = set()
-        for hw in headwords_by_id.values():
-            if hw["root_key"]:
-                all_root_keys.add(str(hw["root_key"]))
-        if all_root_keys:
-            root_rows = _sqlite_fetchall_chunked(
-                conn,
-                "SELECT root, root_sign, root_group FROM dpd_roots WHERE root IN",
-                list(all_root_keys),
-            )
-            for rr in root_rows:
-                cache_key = (str(rr["root_sign"] or ""), str(rr["root"] or ""))
-                if cache_key not in root_group_cache:
-                    root_group_cache[cache_key] = str(rr["root_group"]).strip() if rr["root_group"] is not None else ""
-
-        missing_words = []
-        for word in unique_words:
-            row = None
-            parsed_ids = []
-            matched_candidate = word
-            for candidate in word_candidates.get(word, [word]):
-                entry = lookup_map.get(candidate)
-                if entry:
-                    row, parsed_ids = entry
-                    matched_candidate = candidate
-                    break
-            if not row:
-                missing_words.append(word)
-                continue
-
-            grammar_list = _load_json_field(row["grammar"], [])
-            pos_list = []
-            morph_list = []
-            if isinstance(grammar_list, list):
-                for item in grammar_list:
-                    if isinstance(item, (list, tuple)) and len(item) >= 3:
-                        if item[1]:
-                            pos_list.append(str(item[1]))
-                        if item[2]:
-                            morph_list.append(str(item[2]))
-
-            meanings = []
-            lemmas = []
-            headword_pos_list = []
-            headword_morph_list = []
-            root_key_value = ""
-            root_sign_value = ""
-            sanskrit_root = ""
-            derived_from_values = []
-            construction_values = []
-            stem_values = []
-            pattern_values = []
-            if isinstance(parsed_ids, list):
-                for headword_id in parsed_ids:
-                    hw = headwords_by_id.get(headword_id)
-                    if not hw:
-                        continue
-                    meaning = hw["meaning_1"] or hw["meaning_2"] or ""
-                    if hw["meaning_lit"]:
-                        meaning = f"{meaning} ({hw['meaning_lit']})" if meaning else hw["meaning_lit"]
-                    if meaning:
-                        meanings.append(meaning)
-                    if hw["lemma_1"]:
-                        lemmas.append(hw["lemma_1"])
-                    if hw["pos"]:
-                        headword_pos_list.append(str(hw["pos"]))
-                    if hw["grammar"]:
-                        headword_morph_list.append(str(hw["grammar"]))
-                    if not root_key_value and hw["root_key"]:
-                        root_key_value = str(hw["root_key"])
-                        root_sign_value = str(hw["root_sign"] or "")
-                    if not sanskrit_root and hw["sanskrit"]:
-                        sanskrit_root = str(hw["sanskrit"]).strip()
-                    if hw["derived_from"]:
-                        derived_from_values.append(str(hw["derived_from"]).strip())
-                    if hw["construction"]:
-                        construction_values.append(str(hw["construction"]).strip())
-                    if hw["stem"]:
-                        stem_values.append(str(hw["stem"]).strip())
-                    if hw["pattern"]:
-                        pattern_values.append(str(hw["pattern"]).strip())
-
-            final_pos_list = _dedupe(pos_list) or _dedupe(headword_pos_list)
-            final_morph_list = _dedupe(morph_list) or _dedupe(headword_morph_list)
-            root_group = _fetch_root_group(
-                conn,
-                root_key_value,
-                root_sign_value,
-                root_group_cache,
-            )
-            root_label = _build_root_label(root_sign_value, root_key_value, root_group)
-            etymology_label = _build_etymology_label(
-                derived_from_values,
-                construction_values,
-                stem_values,
-                pattern_values,
-            )
-            merged_meaning = "; ".join(_dedupe_normalized(meanings)) or "; ".join(_dedupe_normalized(lemmas))
-            result[word] = {
-                "meaning": merged_meaning or "N/A",
-                "morphology": "; ".join(final_morph_list) or "N/A",
-                "part_of_speech": "; ".join(final_pos_list) or "N/A",
-                "root": root_label or etymology_label or "N/A",
-                "sanskrit_root": sanskrit_root or "N/A",
-                "etymology": etymology_label or "N/A",
-                "translation": merged_meaning or "N/A",
-                "match_type": (
-                    "exact"
-                    if matched_candidate == word
-                    or _is_final_long_vowel_shortening(word, matched_candidate)
-                    else "fallback"
-                ),
-                "matched_form": matched_candidate,
-            }
-
-        if missing_words:
-            lemma_candidates = [
-                candidate
-                for candidate in _dedupe(
-                    item
-                    for word in missing_words
-                    for item in word_candidates.get(word, [word])
-                )
-                if candidate
-            ]
-            if not lemma_candidates:
-                return result
-
-            lemma_rows = _sqlite_fetchall_chunked(
-                conn,
-                "SELECT lemma_1, pos, grammar, meaning_1, meaning_2, meaning_lit, sanskrit, root_key, root_sign"
-                ", derived_from, construction, stem, pattern"
-                " FROM dpd_headwords WHERE lower(lemma_1) IN",
-                lemma_candidates,
-            )
-
-            lemma_map = {}
-            for row in lemma_rows:
-                lemma_key = _normalize_token(row["lemma_1"] or "")
-                if not lemma_key or lemma_key in lemma_map:
-                    continue
-                meaning = row["meaning_1"] or row["meaning_2"] or ""
-                if row["meaning_lit"]:
-                    meaning = f"{meaning} ({row['meaning_lit']})" if meaning else row["meaning_lit"]
-                root_group = _fetch_root_group(
-                    conn,
-                    row["root_key"] or "",
-                    row["root_sign"] or "",
-                    root_group_cache,
-                )
-                root = _build_root_label(
-                    row["root_sign"] or "",
-                    row["root_key"] or "",
-                    root_group,
-                )
-                etymology = _build_etymology_label(
-                    [str(row["derived_from"] or "").strip()],
-                    [str(row["construction"] or "").strip()],
-                    [str(row["stem"] or "").strip()],
-                    [str(row["pattern"] or "").strip()],
-                )
-                lemma_map[lemma_key] = {
-                    "meaning": meaning or "N/A",
-                    "morphology": row["grammar"] or "N/A",
-                    "part_of_speech": row["pos"] or "N/A",
-                    "root": root or etymology or "N/A",
-                    "sanskrit_root": (row["sanskrit"] or "").strip() or "N/A",
-                    "etymology": etymology or "N/A",
-                    "translation": meaning or "N/A",
-                }
-
-            for word in missing_words:
-                for candidate in word_candidates.get(word, [word]):
-                    if candidate in lemma_map:
-                        lemma_entry = dict(lemma_map[candidate])
-                        lemma_entry["match_type"] = (
-                            "exact"
-                            if candidate == word
-                            or _is_final_long_vowel_shortening(word, candidate)
-                            else "fallback"
-                        )
-                        lemma_entry["matched_form"] = candidate
-                        result[word] = lemma_entry
-                        break
-    finally:
-        conn.close()
-
-    return result
-
-
-# Procesar texto Pali
-def process_pali_text(text, dictionary):
-    if not isinstance(dictionary, dict):
-        logger.debug("process_pali_text: dictionary inválido (%s), usando diccionario vacío", type(dictionary).__name__)
-        dictionary = {}
-    token_stream = tokenize_pali_with_separators(text)
-    gloss_entries = []
-
-    for token in token_stream:
-        if token["kind"] == "separator":
-            gloss_entries.append({
-                "word": token["separator"],
-                "meaning": "[Separador sintáctico]",
-                "morphology": "---",
-                "part_of_speech": "SEP",
-                "root": "---",
-                "translation": token["surface"],
-                "separator_symbol": token["surface"],
-            })
-            continue
-
-        word = token["norm"]
-        entry, used_fallback, matched_form = _resolve_entry_with_fallback(word, dictionary)
-        if entry:
-            gloss_entries.append({
-                "word": word,
-                "meaning": entry.get("meaning", "N/A"),
-                "morphology": entry.get("morphology", "N/A"),
-                "part_of_speech": entry.get("part_of_speech", "N/A"),
-                "root": entry.get("root", "N/A"),
-                "sanskrit_root": entry.get("sanskrit_root", "N/A"),
-                "etymology": entry.get("etymology", "N/A"),
-                "translation": entry.get("translation", "N/A"),
-                "match_type": entry.get("match_type", "fallback" if used_fallback else "exact"),
-                "matched_form": entry.get("matched_form", matched_form or word),
-            })
-        else:
-            gloss_entries.append({
-                "word": word,
-                "meaning": "[No encontrado en diccionario]",
-                "morphology": "---",
-                "part_of_speech": "---",
-                "root": "---",
-                "sanskrit_root": "---",
-                "etymology": "---",
-                "translation": "---"
-            })
-
-    return gloss_entries
-
-
-def process_pali_with_lookup_map(text, lookup_map, fallback_dictionary=None):
-    if not isinstance(lookup_map, dict):
-        logger.debug("process_pali_with_lookup_map: lookup_map inválido (%s), usando mapa vacío", type(lookup_map).__name__)
-        lookup_map = {}
-    if fallback_dictionary is None or not isinstance(fallback_dictionary, dict):
-        fallback_dictionary = {}
-    token_stream = tokenize_pali_with_separators(text)
-    gloss_entries = []
-    fallback_dictionary = fallback_dictionary or {}
-
-    for token in token_stream:
-        if token["kind"] == "separator":
-            gloss_entries.append({
-                "word": token["separator"],
-                "meaning": "[Separador sintáctico]",
-                "morphology": "---",
-                "part_of_speech": "SEP",
-                "root": "---",
-                "translation": token["surface"],
-                "separator_symbol": token["surface"],
-            })
-            continue
-
-        word = token["norm"]
-        entry, used_fallback, matched_form = _resolve_entry_with_fallback(word, lookup_map)
-        if not entry:
-            entry, used_fallback, matched_form = _resolve_entry_with_fallback(word, fallback_dictionary)
-        if entry:
-            gloss_entries.append({
-                "word": word,
-                "meaning": entry.get("meaning", "N/A"),
-                "morphology": entry.get("morphology", "N/A"),
-                "part_of_speech": entry.get("part_of_speech", "N/A"),
-                "root": entry.get("root", "N/A"),
-                "sanskrit_root": entry.get("sanskrit_root", "N/A"),
-                "etymology": entry.get("etymology", "N/A"),
-                "translation": entry.get("translation", "N/A"),
-                "match_type": entry.get("match_type", "fallback" if used_fallback else "exact"),
-                "matched_form": entry.get("matched_form", matched_form or word),
-            })
-        else:
-            gloss_entries.append({
-                "word": word,
-                "meaning": "[No encontrado en diccionario]",
-                "morphology": "---",
-                "part_of_speech": "---",
-                "root": "---",
-                "sanskrit_root": "---",
-                "etymology": "---",
-                "translation": "---"
-            })
-    
-    return gloss_entries
-
-
-def humanize_part_of_speech(pos_value):
-    if not pos_value or pos_value == "---":
-        return ""
-
-    pos_map = {
-        "noun": "sustantivo",
-        "adj": "adjetivo",
-        "adjective": "adjetivo",
-        "verb": "verbo",
-        "adv": "adverbio",
-        "adverb": "adverbio",
-        "prep": "preposición",
-        "preposition": "preposición",
-        "conj": "conjunción",
-        "conjunction": "conjunción",
-        "pron": "pronombre",
-        "pronoun": "pronombre",
-        "num": "numeral",
-        "numeral": "numeral",
-        "part": "partícula",
-        "particle": "partícula",
-        "prefix": "prefijo",
-        "suffix": "sufijo",
-        "interj": "interjección",
-        "interjection": "interjección",
-        "idiom": "modismo",
-        "loc": "locativo",
-        "locative": "locativo",
-        "indeclinable": "indeclinable",
-        "ind": "indeclinable",
-    }
-
-    parts = [part.strip() for part in str(pos_value).split(";")]
-    mapped = []
-    for part in parts:
-        if not part:
-            continue
-        normalized_part = part
-        for source, target in pos_map.items():
-            normalized_part = re.sub(
-                rf"(?<!\w){re.escape(source)}(?!\w)",
-                target,
-                normalized_part,
-                flags=re.IGNORECASE,
-            )
-        mapped.append(normalized_part)
-    return "; ".join(mapped)
-
-# Generar formato compacto de glosa (una línea por palabra)
-def generate_compact_gloss(gloss_entries):
-    lines = []
+    if not CONCORDANCE_INDEX_PATH.is_file():
+        return
+    options = {}
     for entry in gloss_entries:
-        if entry["part_of_speech"] == "SEP":
-            symbol = entry.get("separator_symbol", "")
-            line = f"{entry['word']} {symbol}".strip()
-            lines.append(line)
+        if entry.get("part_of_speech") == "SEP" or not entry.get("word"):
             continue
-
-        pos = humanize_part_of_speech(entry.get('part_of_speech'))
-        morph = entry['morphology'] if entry['morphology'] != "---" else ""
-        meaning = entry['meaning']
-        
-        fallback_suffix = ""
-        if entry.get("match_type") == "fallback" and entry.get("matched_form") and entry.get("matched_form") != entry.get("word"):
-            fallback_suffix = f" [≈ {entry.get('matched_form')}]"
-
-        if pos and morph:
-            line = f"{entry['word']}{fallback_suffix} ({pos}) ({morph}): {meaning}"
-        elif pos:
-            line = f"{entry['word']}{fallback_suffix} ({pos}): {meaning}"
-        else:
-            line = f"{entry['word']}{fallback_suffix}: {meaning}"
-        
-        lines.append(line)
-    
-    return "\n".join(lines)
-
-
-def _display_value(value, fallback="—"):
-    if value is None:
-        return fallback
-    normalized = str(value).strip()
-    if not normalized or normalized in {"---", "N/A"}:
-        return fallback
-    return normalized
-
-
-def _same_content(value_a, value_b):
-    norm_a = re.sub(r"\s+", " ", str(value_a or "").strip()).lower()
-    norm_b = re.sub(r"\s+", " ", str(value_b or "").strip()).lower()
-    return bool(norm_a and norm_b and norm_a == norm_b)
-
-
-def _entry_has_lexical_data(entry):
-    if entry.get("part_of_speech") == "SEP":
-        return False
-
-    placeholders = {"", "---", "N/A", "—", "[No encontrado en diccionario]"}
-    fields = [
-        entry.get("part_of_speech"),
-        entry.get("morphology"),
-        entry.get("meaning"),
-        entry.get("root"),
-        entry.get("sanskrit_root"),
-        entry.get("etymology"),
-    ]
-    for value in fields:
-        normalized = str(value or "").strip()
-        if normalized and normalized not in placeholders:
-            return True
-    return False
-
-
-def render_philological_gloss(gloss_entries):
-    def _row(label, value, extra_class=""):
-        if value == "—":
-            val_html = f'<span class="gloss-dash">—</span>'
-        else:
-            val_html = html.escape(value)
-        return (
-            f'<div class="gloss-row {extra_class}">'
-            f'<span class="gloss-label">{label}</span>'
-            f'<span class="gloss-value">{val_html}</span>'
-            f'</div>'
+        lemma = _normalize_lemma(str(entry.get("lemma", "") or "").split(";")[0])
+        label = f"{entry['word']} → {lemma}" if lemma else entry["word"]
+        options.setdefault(label, (entry["word"], lemma))
+    if not options:
+        return
+    with st.expander("🔎 Concordancia en el corpus"):
+        if total_entries > len(gloss_entries):
+            st.caption(
+                f"Palabras de las {len(gloss_entries):,} entradas cargadas de {total_entries:,};"
+                " carga más entradas para ampliar la lista."
+            )
+        word, lemma = options[st.selectbox("Palabra", list(options), key="concordance_word")]
+        by_lemma = bool(lemma) and st.toggle("Todas las formas del lema", value=True, key="concordance_by_lemma")
+        try:
+            result = concordance_query(lemma if by_lemma else word, mode="lemma" if by_lemma else "form", width=50, limit=30)
+        except Exception as exc:
+            logger.exception("Error consultando el índice de concordancias")
+            st.warning(f"No se pudo consultar el índice de concordancias: {exc}")
+            return
+        if not result["hits"]:
+            st.caption("Sin apariciones en el corpus indexado.")
+            return
+        forms = ", ".join(f"{form} ({count})" for form, count in result["forms"].items())
+        st.caption(f"{result['total']:,} apariciones · {forms}")
+        st.code(
+            "\n".join(
+                f"{format_kwic_line(hit, 50)}  · {os.path.basename(hit['document'])}" for hit in result["hits"]
+            ),
+            language=None,
         )
 
-    # Acumular todo el HTML en una sola cadena y emitirlo con un único st.markdown()
-    # evita la penalización de N llamadas individuales a Streamlit (crítico con 1000+ tarjetas).
-    parts = []
-    entry_number = 0
-    for entry in gloss_entries:
-        if entry.get("part_of_speech") == "SEP":
-            symbol = _display_value(entry.get("separator_symbol"), "")
-            parts.append(f'<span class="sep-chip">{html.escape(symbol)}</span>')
-            continue
 
-        entry_number += 1
-        word       = _display_value(entry.get("word"))
-        pos        = _display_value(humanize_part_of_speech(entry.get("part_of_speech")))
-        morphology = _display_value(entry.get("morphology"))
-        meaning    = _display_value(entry.get("meaning"))
-        translation = _display_value(entry.get("translation"))
-        show_translation = translation != "—" and not _same_content(meaning, translation)
-        root         = _display_value(entry.get("root"))
-        sanskrit_root = _display_value(entry.get("sanskrit_root"))
-        etymology    = _display_value(entry.get("etymology"))
-
-        has_data = _entry_has_lexical_data(entry)
-        card_class = "gloss-card" if has_data else "gloss-card not-found"
-
-        fallback_html = ""
-        if entry.get("match_type") == "fallback":
-            mf = _display_value(entry.get("matched_form"), "")
-            if mf and mf != word:
-                fallback_html = f'<span class="gloss-fallback"> ≈ {html.escape(mf)}</span>'
-
-        not_found_html = "" if has_data else ' <span title="No encontrado en el diccionario">⚠️</span>'
-        pos_badge = f'<span class="pos-badge">{html.escape(pos)}</span>' if pos != "—" else ""
-
-        rows_html = "".join([
-            _row("Morfología", morphology, "gloss-morph"),
-            _row("Significado", meaning, "gloss-meaning"),
-            (_row("Traducción", translation) if show_translation else ""),
-            _row("Raíz", root, "gloss-root"),
-            _row("Sánscrito", sanskrit_root),
-            _row("Etimología", etymology, "gloss-etym"),
-        ])
-
-        parts.append(
-            f'<div class="{card_class}">'
-            f'<div class="gloss-card-header">'
-            f'<span class="gloss-num">{entry_number}.</span>'
-            f'<span class="gloss-word">{html.escape(word)}</span>{fallback_html}{not_found_html}'
-            f' {pos_badge}'
-            f'</div>'
-            f'<div class="gloss-fields">{rows_html}</div>'
-            f'</div>'
+def render_debug_panel():
+    """Panel de depuración (PALI_LEM_DEBUG=1): caché de resultados compartida y última glosa."""
+    cache_info = get_result_cache().cache_info()
+    with st.expander("🛠️ Depuración"):
+        hit_col, memory_col, disk_col = st.columns(3)
+        hit_col.metric(
+            "Aciertos de caché",
+            f"{cache_info['hit_rate'] * 100:.1f}%",
+            help=f"{cache_info['hits']:,} aciertos ({cache_info['disk_hits']:,} desde disco), {cache_info['misses']:,} fallos",
         )
-
-    if parts:
-        st.markdown("\n".join(parts), unsafe_allow_html=True)
-
-
-def generate_rich_gloss_text(gloss_entries):
-    lines = []
-    entry_number = 0
-    for entry in gloss_entries:
-        if entry.get("part_of_speech") == "SEP":
-            symbol = _display_value(entry.get("separator_symbol"), "")
-            label = _display_value(entry.get("word"), "<SEP>")
-            lines.append(f"{label} {symbol}".strip())
-            continue
-
-        entry_number += 1
-        word = _display_value(entry.get("word"))
-        fallback_suffix = ""
-        if entry.get("match_type") == "fallback":
-            matched_form = _display_value(entry.get("matched_form"), "")
-            if matched_form and matched_form != word:
-                fallback_suffix = f" [≈ {matched_form}]"
-        pos = _display_value(humanize_part_of_speech(entry.get("part_of_speech")))
-        morphology = _display_value(entry.get("morphology"))
-        meaning = _display_value(entry.get("meaning"))
-        translation = _display_value(entry.get("translation"))
-        show_translation = translation != "—" and not _same_content(meaning, translation)
-        root = _display_value(entry.get("root"))
-        sanskrit_root = _display_value(entry.get("sanskrit_root"))
-        etymology = _display_value(entry.get("etymology"))
-
-        lines.extend(
-            [
-                f"{entry_number}. {word}{fallback_suffix}",
-                f"  Categoría: {pos}",
-                f"  Morfología: {morphology}",
-                f"  Significado: {meaning}",
-            ]
+        memory_col.metric(
+            "Memoria",
+            f"{cache_info['bytes'] / 1_000_000:.1f} / {cache_info['max_bytes'] / 1_000_000:.0f} MB",
+            help=f"{cache_info['entries']:,} resultados, {cache_info['evictions']:,} expulsados",
         )
-        if show_translation:
-            lines.append(f"  Traducción: {translation}")
-        lines.extend(
-            [
-                f"  Raíz: {root}",
-                f"  Raíz sánscrita: {sanskrit_root}",
-                f"  Etimología: {etymology}",
-                "",
-            ]
+        disk_col.metric(
+            "Disco",
+            f"{cache_info['disk_bytes'] / 1_000_000:.1f} MB" if cache_info["disk_path"] else "—",
+            help=cache_info["disk_path"] or "Sin capa en disco (PALI_LEM_RESULT_CACHE)",
         )
-
-    return "\n".join(lines).strip()
+        gloss_stats = st.session_state.get("gloss_stats")
+        if gloss_stats:
+            if gloss_stats["cache"] == "hit":
+                st.caption("Última glosa: acierto de la caché compartida")
+            else:
+                st.caption(
+                    f"Última glosa: fallo de caché · {gloss_stats['stored']}/{gloss_stats['paragraphs']}"
+                    " párrafos del almacén precalculado"
+                )
 
 
 def render_copy_button(text_to_copy, button_label, key_suffix):
@@ -1318,61 +251,189 @@ def _format_saved_at_santiago(saved_at):
         return saved_at
 
 
+# Email de la identidad autenticada, del que sale el espacio `user-<email>`.
+_SESSION_EMAIL_RE = re.compile(r"^[A-Za-z0-9_.@+-]{1,128}$")
+# `?u=` solo admite el identificador que genera la propia app: un `?u=user-…` o
+# `?u=default` escrito a mano daría acceso a las sesiones de otro usuario.
+_ANONYMOUS_NAMESPACE_RE = re.compile(r"^[0-9a-f]{16}$")
+
+
 @st.cache_resource
 def _get_sessions_store():
-    """Server-side in-memory session store backed by Streamlit's resource cache.
+    """Server-side session store backed by Streamlit's resource cache.
 
-    The returned dict is a singleton that persists for the lifetime of the
-    Streamlit server process and is shared across all reruns.
-    Initialized from saved_sessions.json if it exists (migration / restore after restart).
+    The returned SessionStore is a singleton that persists for the lifetime of
+    the Streamlit server process. Each namespace is read lazily from
+    saved_sessions/; the legacy saved_sessions.json seeds the default namespace
+    until the first UI namespace claims it (`claim_legacy_sessions`).
     """
-    store: dict = {}
-    if SAVED_SESSIONS_PATH.exists():
-        try:
-            with open(SAVED_SESSIONS_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, dict):
-                store.update(data)
-        except (json.JSONDecodeError, OSError, ValueError):
-            pass
-    return store
+    return SessionStore(SAVED_SESSIONS_DIR, legacy_path=SAVED_SESSIONS_PATH)
+
+
+def _resolve_user_namespace():
+    user = getattr(st, "user", None)
+    try:
+        email = str(user.email or "") if user is not None and user.is_logged_in else ""
+    except Exception:
+        email = ""
+    if email and _SESSION_EMAIL_RE.match(email):
+        return f"user-{email.lower()}"
+
+    namespace = str(st.query_params.get(SESSION_NAMESPACE_QUERY_PARAM, "")).strip()
+    if _ANONYMOUS_NAMESPACE_RE.match(namespace):
+        return namespace
+
+    # Sin login: identificador por navegador, guardado en la URL para poder volver a él.
+    namespace = uuid.uuid4().hex[:16]
+    st.query_params[SESSION_NAMESPACE_QUERY_PARAM] = namespace
+    return namespace
 
 
-def load_saved_sessions():
+def _current_session_namespace():
+    if IS_CONSOLE_MODE:
+        return DEFAULT_SESSION_NAMESPACE
+    namespace = st.session_state.get("session_namespace", "")
+    if not namespace:
+        namespace = _resolve_user_namespace()
+        st.session_state["session_namespace"] = namespace
+        # Las sesiones del antiguo saved_sessions.json compartido pasan al primer usuario que llega.
+        _get_sessions_store().claim_legacy_sessions(namespace)
+    return namespace
+
+
+def load_saved_sessions(namespace=None):
     # Return a copy so callers cannot accidentally mutate the shared cache store.
-    return dict(_get_sessions_store())
+    _, sessions = _get_sessions_store().snapshot(namespace or _current_session_namespace())
+    return dict(sessions)
 
 
-def persist_saved_sessions(sessions):
-    store = _get_sessions_store()
-    store.clear()
-    store.update(sessions)
-    # Also persist to disk so sessions survive server restarts.
-    # _save_json_file silently ignores write errors (e.g. read-only filesystems).
-    _save_json_file(SAVED_SESSIONS_PATH, sessions)
+def persist_saved_sessions(sessions, namespace=None):
+    # Also persists to disk so sessions survive server restarts.
+    _get_sessions_store().replace(namespace or _current_session_namespace(), sessions)
 
 
-def _estimate_json_size(payload):
-    try:
-        return len(json.dumps(payload, ensure_ascii=False))
-    except Exception:
+def update_saved_sessions(mutate, namespace=None):
+    """Modifica las sesiones del usuario sin perder escrituras concurrentes."""
+    return _get_sessions_store().update(namespace or _current_session_namespace(), mutate)
+
+
+def search_saved_sessions(query, namespace=None):
+    """Busca sesiones del usuario por palabra del texto o lema glosado."""
+    return _get_sessions_store().search(namespace or _current_session_namespace(), query)
+
+
+def _session_size_bytes(session_data):
+    """Tamaño en bytes de una sesión guardada.
+
+    Usa `size_bytes` registrado al guardar; solo las sesiones antiguas (sin ese
+    campo) se re-serializan para estimarlo.
+    """
+    if not isinstance(session_data, dict):
         return -1
+    stored_size = session_data.get("size_bytes")
+    if isinstance(stored_size, int) and stored_size >= 0:
+        return stored_size
+    return estimate_json_size(session_data)
+
+
+def _session_entry_count(session_data):
+    return session_entry_count(session_data)
+
+
+def _session_page_size(session_data):
+    """Entradas por página para una sesión, acotadas por entradas y por bytes.
+
+    El presupuesto de bytes (`MAX_LOADED_SESSION_BYTES`) se reparte usando el
+    tamaño medio por entrada calculado a partir del tamaño almacenado.
+    """
+    page_size = max(1, min(LOADED_SESSION_PAGE_SIZE, MAX_LOADED_GLOSS_ENTRIES))
+    entry_count = _session_entry_count(session_data)
+    session_size = _session_size_bytes(session_data)
+    if entry_count and session_size > 0:
+        average_entry_bytes = max(1, session_size // entry_count)
+        page_size = min(page_size, max(1, MAX_LOADED_SESSION_BYTES // average_entry_bytes))
+    return page_size
+
+
+def get_saved_session(session_name, namespace=None):
+    """Devuelve el payload almacenado de una sesión sin copiar el resto del store."""
+    return _get_sessions_store().get(namespace or _current_session_namespace(), session_name)
+
+
+def _read_session_entries(session_data, start, limit, namespace=None):
+    """Entradas `[start, start + limit)` de una sesión guardada.
+
+    Las sesiones grandes están fragmentadas en el store: solo se leen los
+    fragmentos que cubren la página.
+    """
+    if is_chunked_session(session_data):
+        namespace = namespace or _current_session_namespace()
+    return _get_sessions_store().read_entries(namespace, session_data, start, limit) if session_data else []
+
+
+def load_session_entries_page(session_name, start, limit, namespace=None):
+    """Lee una página de `gloss_entries` de una sesión directamente desde el store."""
+    session_data = get_saved_session(session_name, namespace=namespace)
+    if not isinstance(session_data, dict):
+        return []
+    start = max(0, _safe_int(start, default=0))
+    limit = max(0, _safe_int(limit, default=0))
+    return _read_session_entries(session_data, start, limit, namespace=namespace)
+
+
+def _collect_full_gloss_entries():
+    """Entradas de la glosa actual, completando las páginas aún no cargadas de una sesión."""
+    gloss_entries = st.session_state.get("gloss_entries", [])
+    total_entries = _safe_int(st.session_state.get("gloss_entries_total", 0), default=0)
+    loaded_session_name = st.session_state.get("loaded_session_name", "")
+    if loaded_session_name and isinstance(gloss_entries, list) and total_entries > len(gloss_entries):
+        remaining = load_session_entries_page(
+            loaded_session_name,
+            len(gloss_entries),
+            total_entries - len(gloss_entries),
+        )
+        return list(gloss_entries) + remaining
+    return gloss_entries
+
+
+def _new_gloss_revision():
+    """Marca que `gloss_entries` es otra glosa (no otra página de la misma)."""
+    st.session_state["gloss_revision"] = uuid.uuid4().hex
+
+
+def _full_vocabulary():
+    """Vocabulario de la glosa entera, agregado una vez por revisión de la glosa.
+
+    Con una sesión paginada, `_collect_full_gloss_entries` lee del store todas
+    las páginas que faltan; el resultado se guarda en `st.session_state` para
+    que cada rerun (cambiar el filtro, por ejemplo) no vuelva a leerlas.
+    """
+    revision = st.session_state.get("gloss_revision", "")
+    cached = st.session_state.get("vocabulary_cache")
+    if cached and cached[0] == revision:
+        return cached[1]
+    vocabulary = vocabulary_from_gloss_entries(_collect_full_gloss_entries())
+    st.session_state["vocabulary_cache"] = (revision, vocabulary)
+    return vocabulary
 
 
 def build_session_payload(dict_name, pali_text):
-    return {
+    payload = {
         "saved_at": _utcnow().isoformat(timespec="seconds").replace("+00:00", "Z"),
 
         "dict_name": dict_name,
         "pali_text": pali_text,
         "generated_gloss": bool(st.session_state.get("generated_gloss", False)),
-        "gloss_entries": st.session_state.get("gloss_entries", []),
+        "gloss_entries": _collect_full_gloss_entries(),
         "gloss_compact_text": st.session_state.get("gloss_compact_text", ""),
         "gloss_rich_text": st.session_state.get("gloss_rich_text", ""),
         "gloss_word_total": int(st.session_state.get("gloss_word_total", 0)),
         "gloss_found_words": int(st.session_state.get("gloss_found_words", 0)),
         "gloss_coverage": float(st.session_state.get("gloss_coverage", 0.0)),
     }
+    # Se serializa una sola vez al guardar para que la carga no tenga que hacerlo.
+    payload["size_bytes"] = max(0, estimate_json_size(payload))
+    return payload
 
 
 def _safe_int(value, default=0):
@@ -1389,7 +450,12 @@ def _safe_float(value, default=0.0):
         return default
 
 
-def apply_loaded_session(session_data):
+def apply_loaded_session(session_data, session_name=""):
+    """Aplica una sesión guardada al estado de la UI.
+
+    Solo se carga la primera página de `gloss_entries`; si `session_name` está
+    disponible, el resto se lee desde el store con `load_session_entries_page`.
+    """
     if not isinstance(session_data, dict):
         logger.debug("apply_loaded_session: payload inválido (%s), usando {}", type(session_data).__name__)
         session_data = {}
@@ -1401,8 +467,13 @@ def apply_loaded_session(session_data):
 
     generated_gloss = bool(session_data.get("generated_gloss", False))
     st.session_state["generated_gloss"] = generated_gloss
-    gloss_entries = session_data.get("gloss_entries", [])
-    st.session_state["gloss_entries"] = gloss_entries if generated_gloss and isinstance(gloss_entries, list) else []
+    total_entries = _session_entry_count(session_data) if generated_gloss else 0
+    page_size = _session_page_size(session_data) if session_name else total_entries
+    st.session_state["gloss_entries"] = _read_session_entries(session_data, 0, page_size) if total_entries else []
+    _new_gloss_revision()
+    st.session_state["gloss_entries_total"] = total_entries
+    st.session_state["loaded_session_name"] = session_name if total_entries > page_size else ""
+    st.session_state["loaded_session_page_size"] = page_size
     st.session_state["gloss_compact_text"] = str(session_data.get("gloss_compact_text", ""))
     st.session_state["gloss_rich_text"] = str(session_data.get("gloss_rich_text", ""))
     gloss_word_total = max(0, _safe_int(session_data.get("gloss_word_total", 0), default=0))
@@ -1426,6 +497,10 @@ if not IS_CONSOLE_MODE:
         st.session_state.gloss_word_total = 0
         st.session_state.gloss_found_words = 0
         st.session_state.gloss_coverage = 0.0
+    if "gloss_entries_total" not in st.session_state:
+        st.session_state["gloss_entries_total"] = len(st.session_state.get("gloss_entries", []))
+        st.session_state["loaded_session_name"] = ""
+        st.session_state["loaded_session_page_size"] = LOADED_SESSION_PAGE_SIZE
     if "show_save_session_form" not in st.session_state:
         st.session_state["show_save_session_form"] = False
     if "save_session_name_input" not in st.session_state:
@@ -1438,6 +513,8 @@ if not IS_CONSOLE_MODE:
         st.session_state["pending_session_picker_name"] = None
     if "pending_delete_session_name" not in st.session_state:
         st.session_state["pending_delete_session_name"] = ""
+    if "session_search_query" not in st.session_state:
+        st.session_state["session_search_query"] = ""
 
     st.markdown(
         """
@@ -1618,8 +695,13 @@ if not IS_CONSOLE_MODE:
         _safe_status_update(label="Recursos DPD listos", state="complete")
 
     if dpd_db_path:
-        total_words = get_dpd_lookup_count(dpd_db_path)
-        src_label = f"📦 dpd.db · {total_words:,} entradas lookup"
+        db_stats = get_dpd_db_stats(dpd_db_path)
+        if db_stats:
+            src_label = f"📦 dpd.db · {db_stats['lookup_entries']:,} entradas lookup"
+            if db_stats.get("release_tag"):
+                src_label += f" · {db_stats['release_tag']}"
+        else:
+            src_label = "📦 dpd.db · calculando estadísticas…"
     else:
         total_words = len(dictionary)
         src_label = f"📄 DPD JSON · {total_words:,} entradas"
@@ -1629,7 +711,11 @@ if not IS_CONSOLE_MODE:
 
     # ── Sesiones guardadas (colapsadas) ───────────────────────────────────
     saved_sessions = load_saved_sessions()
-    session_options = [""] + sorted(saved_sessions.keys())
+    session_search_query = st.session_state.get("session_search_query", "").strip()
+    if session_search_query:
+        session_options = [""] + search_saved_sessions(session_search_query)
+    else:
+        session_options = [""] + sorted(saved_sessions.keys())
 
     pending_picker = st.session_state.get("pending_session_picker_name")
     if pending_picker is not None:
@@ -1640,7 +726,21 @@ if not IS_CONSOLE_MODE:
         st.session_state["session_picker_name"] = ""
 
     sessions_label = f"🗂 Sesiones guardadas ({len(saved_sessions)})" if saved_sessions else "🗂 Sesiones guardadas"
-    with st.expander(sessions_label, expanded=False):
+    with st.expander(sessions_label, expanded=bool(session_search_query)):
+        if saved_sessions:
+            st.text_input(
+                "Buscar en sesiones",
+                key="session_search_query",
+                placeholder="🔎 Palabra o lema (ej: dhamma)",
+                label_visibility="collapsed",
+            )
+            if session_search_query:
+                match_count = len(session_options) - 1
+                st.caption(
+                    f"{match_count} sesión(es) contienen «{session_search_query}»."
+                    if match_count
+                    else f"Ninguna sesión contiene «{session_search_query}»."
+                )
         session_col, load_col, delete_col = st.columns([3, 1, 1])
         with session_col:
             st.selectbox(
@@ -1665,24 +765,11 @@ if not IS_CONSOLE_MODE:
 
         if load_clicked:
             selected_name = st.session_state.get("session_picker_name")
-            selected_session = saved_sessions.get(selected_name)
+            selected_session = get_saved_session(selected_name)
             if selected_session:
-                session_size = _estimate_json_size(selected_session)
-                gloss_entries = selected_session.get("gloss_entries", []) if isinstance(selected_session, dict) else []
-                if session_size > MAX_LOADED_SESSION_BYTES:
-                    st.toast(
-                        f"Sesión demasiado grande para cargar en este entorno ({session_size:,} bytes).",
-                        icon="⚠️",
-                    )
-                elif isinstance(gloss_entries, list) and len(gloss_entries) > MAX_LOADED_GLOSS_ENTRIES:
-                    st.toast(
-                        f"Sesión con demasiadas entradas ({len(gloss_entries):,}). Máximo: {MAX_LOADED_GLOSS_ENTRIES:,}.",
-                        icon="⚠️",
-                    )
-                else:
-                    apply_loaded_session(selected_session)
-                    st.toast(f"Sesión cargada: {selected_name}", icon="✅")
-                    st.rerun()
+                apply_loaded_session(selected_session, session_name=selected_name)
+                st.toast(f"Sesión cargada: {selected_name}", icon="✅")
+                st.rerun()
             else:
                 st.toast("No se pudo cargar la sesión seleccionada.", icon="⚠️")
 
@@ -1694,6 +781,56 @@ if not IS_CONSOLE_MODE:
             else:
                 st.toast("No se pudo borrar la sesión seleccionada.", icon="⚠️")
 
+        if st.toggle("📦 Importar / exportar", key="show_sessions_archive"):
+            export_names = st.multiselect(
+                "Sesiones a exportar (vacío = todas)",
+                sorted(saved_sessions.keys()),
+                key="sessions_export_names",
+            )
+            if st.button("Preparar exportación", use_container_width=True, disabled=not saved_sessions):
+                export_buffer = io.BytesIO()
+                export_sessions_archive(
+                    export_buffer,
+                    session_names=export_names or None,
+                    namespace=_current_session_namespace(),
+                    store=_get_sessions_store(),
+                )
+                st.session_state["sessions_export_bytes"] = export_buffer.getvalue()
+            if st.session_state.get("sessions_export_bytes"):
+                st.download_button(
+                    label="⬇ Descargar sesiones (.jsonl.gz)",
+                    data=st.session_state["sessions_export_bytes"],
+                    file_name="pali_lem_sessions.jsonl.gz",
+                    mime="application/gzip",
+                    use_container_width=True,
+                )
+
+            st.divider()
+            import_file = st.file_uploader("Archivo de sesiones", type=["gz"], key="sessions_import_file")
+            import_policy = st.selectbox(
+                "Si el nombre ya existe",
+                list(SESSION_IMPORT_POLICIES),
+                format_func=SESSION_IMPORT_POLICIES.get,
+                key="sessions_import_policy",
+            )
+            if st.button("Importar sesiones", use_container_width=True, disabled=import_file is None):
+                try:
+                    import_report = import_sessions_archive(
+                        import_file,
+                        policy=import_policy,
+                        namespace=_current_session_namespace(),
+                        store=_get_sessions_store(),
+                    )
+                except (OSError, ValueError) as exc:
+                    st.toast(f"No se pudo importar: {exc}", icon="⚠️")
+                else:
+                    st.toast(
+                        f"Importadas: {import_report['imported']} · Omitidas: {import_report['skipped']}"
+                        f" · Inválidas: {import_report['invalid']}",
+                        icon="📦",
+                    )
+                    st.rerun()
+
         pending_delete_name = st.session_state.get("pending_delete_session_name", "")
         if pending_delete_name:
             st.warning(f"¿Seguro que deseas borrar **{pending_delete_name}**?")
@@ -1704,9 +841,7 @@ if not IS_CONSOLE_MODE:
                 cancel_delete_clicked = st.button("Cancelar", use_container_width=True)
 
             if confirm_delete_clicked:
-                sessions = load_saved_sessions()
-                sessions.pop(pending_delete_name, None)
-                persist_saved_sessions(sessions)
+                update_saved_sessions(lambda sessions: sessions.pop(pending_delete_name, None))
                 st.session_state["pending_delete_session_name"] = ""
                 st.session_state["pending_session_picker_name"] = ""
                 st.toast(f"Sesión borrada: {pending_delete_name}", icon="🗑️")
@@ -1735,49 +870,49 @@ if not IS_CONSOLE_MODE:
 
     if generate_clicked:
         if pali_text.strip():
-            with st.spinner("Analizando texto pali…"):
+            with st.spinner("Analizando texto pali…"), pinned_dpd_db(dpd_db_path):
                 if dpd_db_path:
                     if dictionary is None:
                         try:
                             dictionary = load_dictionary()
                         except Exception:
                             dictionary = {}
-                    words = tuple(tokenize_pali_text(pali_text))
-                    lookup_map = lookup_words_in_dpd(words, dpd_db_path)
-                    gloss_entries = process_pali_with_lookup_map(
-                        pali_text,
-                        lookup_map,
-                        fallback_dictionary=dictionary,
-                    )
+                    # Caché compartida entre usuarios; si falla, párrafos del almacén precalculado y el resto en vivo.
+                    gloss_entries, gloss_stats = cached_gloss(pali_text, dpd_db_path, fallback_dictionary=dictionary)
+                    st.session_state["gloss_stats"] = gloss_stats
+                    if gloss_stats["stored"]:
+                        logger.debug(
+                            "Almacén de glosas: %d/%d párrafos precalculados", gloss_stats["stored"], gloss_stats["paragraphs"]
+                        )
                 else:
                     gloss_entries = process_pali_text(pali_text, dictionary)
 
-                found_words = sum(
-                    1
-                    for entry in gloss_entries
-                    if _entry_has_lexical_data(entry)
-                )
-                word_total = sum(1 for entry in gloss_entries if entry["part_of_speech"] != "SEP")
-                coverage = (found_words / word_total * 100) if word_total else 0
+                found_words, word_total, coverage = _gloss_coverage_stats(gloss_entries)
                 compact_text = generate_compact_gloss(gloss_entries)
                 rich_text = generate_rich_gloss_text(gloss_entries)
 
             st.session_state.generated_gloss = True
             st.session_state.gloss_entries = gloss_entries
+            _new_gloss_revision()
             st.session_state.gloss_compact_text = compact_text
             st.session_state.gloss_rich_text = rich_text
             st.session_state.gloss_word_total = word_total
             st.session_state.gloss_found_words = found_words
             st.session_state.gloss_coverage = coverage
+            st.session_state["gloss_entries_total"] = len(gloss_entries)
+            st.session_state["loaded_session_name"] = ""
             st.toast("Glosa generada", icon="✨")
         else:
             st.session_state.generated_gloss = False
             st.session_state.gloss_entries = []
+            _new_gloss_revision()
             st.session_state.gloss_compact_text = ""
             st.session_state.gloss_rich_text = ""
             st.session_state.gloss_word_total = 0
             st.session_state.gloss_found_words = 0
             st.session_state.gloss_coverage = 0.0
+            st.session_state["gloss_entries_total"] = 0
+            st.session_state["loaded_session_name"] = ""
             st.info("Ingresa texto en Pali para generar la glosa.")
 
     if st.session_state.generated_gloss:
@@ -1794,9 +929,46 @@ if not IS_CONSOLE_MODE:
         )
         st.write("")
 
-        # ── Glosa filológica ───────────────────────────────────────────────
-        st.subheader("📖 Glosa filológica")
-        render_philological_gloss(st.session_state.gloss_entries)
+        # ── Glosa filológica / vocabulario ─────────────────────────────────
+        gloss_view = st.radio(
+            "Vista",
+            ["📖 Glosa filológica", "📚 Vocabulario"],
+            horizontal=True,
+            key="gloss_view",
+            label_visibility="collapsed",
+        )
+        export_compact_text = st.session_state.gloss_compact_text
+        export_rich_text = st.session_state.gloss_rich_text
+        export_file_name = "pali_gloss_compact.txt"
+        if gloss_view == "📚 Vocabulario":
+            st.subheader("📚 Vocabulario")
+            # El vocabulario agrega la sesión entera, no solo las páginas ya cargadas.
+            vocabulary = render_vocabulary(_full_vocabulary())
+            export_compact_text = generate_compact_gloss(vocabulary)
+            export_rich_text = generate_rich_gloss_text(vocabulary)
+            export_file_name = "pali_vocabulary_compact.txt"
+        else:
+            st.subheader("📖 Glosa filológica")
+            render_philological_gloss(st.session_state.gloss_entries)
+        loaded_entries = len(st.session_state.gloss_entries)
+        total_entries = _safe_int(st.session_state.get("gloss_entries_total", 0), default=0)
+        render_concordance_panel(st.session_state.gloss_entries, total_entries)
+
+        loaded_session_name = st.session_state.get("loaded_session_name", "")
+        if loaded_session_name and total_entries > loaded_entries:
+            st.caption(f"Mostrando {loaded_entries:,} de {total_entries:,} entradas.")
+            if st.button("⬇ Cargar más entradas", use_container_width=True):
+                next_page = load_session_entries_page(
+                    loaded_session_name,
+                    loaded_entries,
+                    st.session_state.get("loaded_session_page_size", LOADED_SESSION_PAGE_SIZE),
+                )
+                if next_page:
+                    st.session_state.gloss_entries = list(st.session_state.gloss_entries) + next_page
+                else:
+                    # La sesión cambió o se borró en el store; no hay más páginas que leer.
+                    st.session_state["loaded_session_name"] = ""
+                st.rerun()
 
         # ── Exportar ──────────────────────────────────────────────────────
         st.write("")
@@ -1805,20 +977,20 @@ if not IS_CONSOLE_MODE:
         with exp_col1:
             st.download_button(
                 label="⬇ Descargar .txt",
-                data=st.session_state.gloss_compact_text,
-                file_name="pali_gloss_compact.txt",
+                data=export_compact_text,
+                file_name=export_file_name,
                 mime="text/plain",
                 use_container_width=True,
             )
         with exp_col2:
             render_copy_button(
-                st.session_state.gloss_rich_text,
+                export_rich_text,
                 "📋 Copiar enriquecida",
                 "rich",
             )
         with exp_col3:
             render_copy_button(
-                st.session_state.gloss_compact_text,
+                export_compact_text,
                 "📋 Copiar compacta",
                 "compact",
             )
@@ -1854,9 +1026,8 @@ if not IS_CONSOLE_MODE:
                 if not session_name:
                     st.toast("Escribe un nombre para guardar la sesión.", icon="⚠️")
                 else:
-                    sessions = load_saved_sessions()
-                    sessions[session_name] = build_session_payload(dict_name, pali_text)
-                    persist_saved_sessions(sessions)
+                    session_payload = build_session_payload(dict_name, pali_text)
+                    update_saved_sessions(lambda sessions: sessions.__setitem__(session_name, session_payload))
                     st.session_state["pending_session_picker_name"] = session_name
                     st.session_state["show_save_session_form"] = False
                     st.session_state["pending_reset_save_input"] = True
@@ -1864,10 +1035,12 @@ if not IS_CONSOLE_MODE:
                     st.rerun()
     elif not pali_text.strip():
         st.info("✍️ Ingresa texto en Pali para comenzar.")
+
+    if IS_DEBUG:
+        render_debug_panel()
   except Exception as _top_exc:
       logger.exception("Excepción no capturada en el bloque principal de la UI")
       if IS_DEBUG:
           st.exception(_top_exc)
       else:
           st.error(f"Error inesperado: {_top_exc}\n\nActiva PALI_LEM_DEBUG=1 para ver el traceback completo en la consola del servidor.")
-